@@ -0,0 +1,90 @@
+"""
+Burst of concurrent DOWNLOADs against one peer: unbounded transfers vs the admission-controlled
+transfer pool. Reports per-transfer completion latency, BUSY replies and the peer's admission
+counters (queue depth, rejections).
+
+    python benchmarks/bench_admission.py --clients 200 --size-mb 8 --active 16 --queued 64
+"""
+import argparse
+import contextlib
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils.commands_enum import Commands
+from src.utils.framing import FramedReader, STATUS_BUSY, format_command
+from src.peer.admission import AdmissionController
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def download(address, results):
+    start = time.perf_counter()
+    sock = socket.create_connection(address)
+    sock.sendall(f"{format_command(Commands.DOWNLOAD, 2)}\n0\n".encode())
+    reader = FramedReader(sock)
+    header = reader.read_header()
+    busy = header.status == STATUS_BUSY
+    for _ in reader.iter_payload(header.size):
+        pass
+    sock.close()
+    results.append((time.perf_counter() - start, busy))
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def run_burst(shared_dir, clients, admission):
+    peer = FileSharePeer(0)
+    peer.admission = admission
+    threading.Thread(target=peer.start_peer, daemon=True).start()
+    time.sleep(0.1)
+    results = []
+    threads = [threading.Thread(target=download, args=((peer.host, peer.port), results)) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    peer.peer_socket.close()
+    return wall, results, admission.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--active", type=int, default=16)
+    parser.add_argument("--queued", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        Config.SHARED_FILES_DIR = shared_dir
+        with open(os.path.join(shared_dir, "payload.bin"), "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+
+        configs = [
+            ("unbounded", AdmissionController(max_active=10**6, max_queued=0, max_per_client=10**6)),
+            (f"pool {args.active}/{args.queued}", AdmissionController(max_active=args.active, max_queued=args.queued,
+                                                                     max_per_client=10**6)),
+        ]
+        print(f"{'transfers':<16}{'wall s':>8}{'served':>8}{'busy':>6}{'p50 s':>8}{'p99 s':>8}{'peak queue':>12}{'rejected':>10}")
+        for label, admission in configs:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                wall, results, stats = run_burst(shared_dir, args.clients, admission)
+                time.sleep(0.1) # let peer threads finish logging
+            served = [elapsed for elapsed, busy in results if not busy]
+            busy = len(results) - len(served)
+            print(f"{label:<16}{wall:>8.2f}{len(served):>8}{busy:>6}{percentile(served, 0.5):>8.2f}"
+                  f"{percentile(served, 0.99):>8.2f}{stats['peak_queue_depth']:>12}{stats['rejected']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Small downloads next to a bulk download on a capped uplink, per bandwidth scheduler policy.
+
+The peer runs in its own process with its uplink capped at --uplink-mbps
+(Config.PEER_UPLINK_RATE). One client host (127.0.0.2) pulls a --big-mb file over --streams
+parallel ranged connections, as a swarm download would; meanwhile a second host (127.0.0.3)
+downloads --small files of --small-mb each, one after another. "fifo" hands out pieces in
+request order, which is roughly what per-connection TCP sharing gives; "fair" splits the
+uplink per client host; "srpt" sends the transfer closest to completion first.
+
+    python benchmarks/bench_bandwidth.py --uplink-mbps 400 --big-mb 256 --streams 8 --small 10 --small-mb 1
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils.commands_enum import Commands
+from src.utils.framing import FramedReader, format_arguments, format_command
+from src.peer.fileshare_peer import FileSharePeer
+
+
+BULK_HOST, SMALL_HOST = "127.0.0.2", "127.0.0.3"
+
+
+def run_peer(shared_dir, policy, rate, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_BANDWIDTH_POLICY = policy
+    Config.PEER_UPLINK_RATE = rate
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def download(address, source_host, file_id, offset=0, length=None):
+    """One framed DOWNLOAD from `source_host`; returns the number of bytes received."""
+    with socket.create_connection(address, source_address=(source_host, 0)) as sock:
+        argument = format_arguments(file_id, offset=offset, length=length)
+        sock.sendall(f"{format_command(Commands.DOWNLOAD, 2)}\n{argument}\n".encode())
+        reader = FramedReader(sock)
+        header = reader.read_header()
+        return sum(len(chunk) for chunk in reader.iter_payload(header.size))
+
+
+def run_policy(address, args):
+    big = args.big_mb * 1024 * 1024
+    part = big // args.streams
+    bulk_done = []
+
+    def bulk_stream(i):
+        bulk_done.append(download(address, BULK_HOST, "0", i * part, part))
+
+    start = time.perf_counter()
+    streams = [threading.Thread(target=bulk_stream, args=(i,)) for i in range(args.streams)]
+    for t in streams:
+        t.start()
+    time.sleep(0.3)
+    latencies = []
+    for i in range(args.small):
+        t0 = time.perf_counter()
+        download(address, SMALL_HOST, str(i + 1))
+        latencies.append(time.perf_counter() - t0)
+    for t in streams:
+        t.join()
+    bulk_seconds = time.perf_counter() - start
+    return latencies, sum(bulk_done) / bulk_seconds / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uplink-mbps", type=float, default=400)
+    parser.add_argument("--big-mb", type=int, default=256)
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument("--small", type=int, default=10)
+    parser.add_argument("--small-mb", type=float, default=1)
+    parser.add_argument("--policies", nargs="+", default=["fifo", "fair", "srpt"])
+    args = parser.parse_args()
+
+    rate = args.uplink_mbps * 1e6 / 8
+    print(f"uplink {args.uplink_mbps:.0f} Mbit/s ({rate / 1e6:.0f} MB/s)")
+    print(f"{'policy':<8}{'small p50 s':>13}{'small max s':>13}{'bulk MB/s':>11}")
+    with tempfile.TemporaryDirectory() as shared_dir:
+        with open(os.path.join(shared_dir, "0_big.bin"), "wb") as f:
+            f.write(os.urandom(args.big_mb * 1024 * 1024))
+        for i in range(args.small):
+            with open(os.path.join(shared_dir, f"small_{i:04d}.bin"), "wb") as f:
+                f.write(os.urandom(int(args.small_mb * 1024 * 1024)))
+
+        for policy in args.policies:
+            port_queue = multiprocessing.Queue()
+            peer = multiprocessing.Process(target=run_peer, args=(shared_dir, policy, rate, port_queue), daemon=True)
+            peer.start()
+            address = (Config.PEER_HOST, port_queue.get())
+            time.sleep(0.2)
+            try:
+                latencies, bulk_rate = run_policy(address, args)
+                print(f"{policy:<8}{statistics.median(latencies):>13.3f}{max(latencies):>13.3f}{bulk_rate:>11.1f}")
+            finally:
+                peer.terminate()
+
+
+if __name__ == "__main__":
+    main()
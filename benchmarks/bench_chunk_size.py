@@ -0,0 +1,115 @@
+"""
+UPLOAD and DOWNLOAD throughput on loopback as a grid of transfer chunk size x file size.
+
+For each chunk size in --chunks-kb, and for "adaptive" (the per-transfer choice from file
+size, socket buffers and measured throughput, within the limits both ends advertise), a
+peer is started in its own process. The fixed rows pin Config.TRANSFER_MIN_CHUNK_SIZE and
+TRANSFER_MAX_CHUNK_SIZE to that size on both ends; 100 KB is the old fixed
+Config.CHUNK_SIZE. Each cell moves about --mb-per-cell MB as files of one --sizes-kb size,
+uploaded and then downloaded over one keep-alive connection. Downloads go through the
+client's resumable receive loop. The peer's sendfile() path does not use chunks at all,
+so it is off unless --zero-copy is given.
+
+    python benchmarks/bench_chunk_size.py --chunks-kb 16 100 1024 4096 --sizes-kb 4 256 16384 262144 --mb-per-cell 512
+"""
+import argparse
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def pin_chunk_size(chunk):
+    if chunk is not None:
+        Config.TRANSFER_MIN_CHUNK_SIZE = Config.TRANSFER_MAX_CHUNK_SIZE = chunk
+
+
+def run_peer(shared_dir, chunk, zero_copy, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLOAD_FSYNC = False
+    Config.PEER_ZERO_COPY_SEND = zero_copy
+    pin_chunk_size(chunk)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def run_cell(address, size, count, part_path):
+    """Uploads then downloads `count` distinct files of `size` bytes. Returns (upload MB/s, download MB/s)."""
+    client = FileShareClient()
+    files = [os.urandom(size) for _ in range(count)]
+    hashes = [hashlib.sha256(data).hexdigest() for data in files]
+    start = time.perf_counter()
+    for i, (data, file_hash) in enumerate(zip(files, hashes)):
+        client._send_ciphertext(address, f"f{i}.bin", data, file_hash=file_hash)
+    upload = time.perf_counter() - start
+    start = time.perf_counter()
+    for data, file_hash in zip(files, hashes):
+        received = client._receive_ciphertext_resumable(address, "0", part_path, file_hash=file_hash)
+        assert received == data
+    download = time.perf_counter() - start
+    client._discard_partial_download(part_path)
+    client.close_connections()
+    total = size * count / 2**20
+    return total / upload, total / download
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks-kb", type=int, nargs="+", default=[16, 100, 1024, 4096])
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[4, 256, 16384, 262144])
+    parser.add_argument("--mb-per-cell", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=3, help="rounds over the grid, in rotating row order; the best is reported")
+    parser.add_argument("--zero-copy", action="store_true", help="let the peer serve downloads with sendfile()")
+    args = parser.parse_args()
+
+    rows = [(f"{kb} KB", kb * 1024) for kb in args.chunks_kb] + [("adaptive", None)]
+    root = tempfile.mkdtemp()
+    processes, addresses = [], []
+    defaults = Config.TRANSFER_MIN_CHUNK_SIZE, Config.TRANSFER_MAX_CHUNK_SIZE
+    best = {}
+    try:
+        for i, (_, chunk) in enumerate(rows):
+            port_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_peer, daemon=True,
+                                              args=(os.path.join(root, f"peer{i}"), chunk, args.zero_copy, port_queue))
+            process.start()
+            processes.append(process)
+            addresses.append((Config.PEER_HOST, port_queue.get()))
+        time.sleep(0.2)
+        for repeat in range(args.repeats):
+            for i in range(len(rows)):
+                row = (i + repeat) % len(rows)
+                Config.TRANSFER_MIN_CHUNK_SIZE, Config.TRANSFER_MAX_CHUNK_SIZE = defaults
+                pin_chunk_size(rows[row][1])
+                for kb in args.sizes_kb:
+                    size = kb * 1024
+                    count = max(1, args.mb_per_cell * 2**20 // size)
+                    up, down = run_cell(addresses[row], size, count, os.path.join(root, "download.part"))
+                    old_up, old_down = best.get((row, kb), (0, 0))
+                    best[(row, kb)] = max(up, old_up), max(down, old_down)
+    finally:
+        Config.TRANSFER_MIN_CHUNK_SIZE, Config.TRANSFER_MAX_CHUNK_SIZE = defaults
+        for process in processes:
+            process.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(f"{'chunk':>10}" + "".join(f"{f'{kb} KB file':>22}" for kb in args.sizes_kb))
+    print(f"{'':>10}" + "".join(f"{'up / down MB/s':>22}" for _ in args.sizes_kb))
+    for row, (label, _) in enumerate(rows):
+        print(f"{label:>10}" + "".join(f"{f'{best[(row, kb)][0]:.0f} / {best[(row, kb)][1]:.0f}':>22}" for kb in args.sizes_kb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compress-then-encrypt upload pipeline on text-heavy and already-compressed data.
+
+For each dataset and codec the script runs the client's upload preparation
+(compression.compress_for_upload + crypto_utils.encrypt_data) and the download side
+(decrypt_data + decompress), and reports the bytes that go over the wire and onto the peer's
+disk, the CPU time of each side, and the end-to-end time on a --link-mbps link
+(upload CPU + transfer + download CPU). "none" is the old pipeline; for the already-compressed
+data the sampled compressibility check is what keeps zlib/zstd from wasting time on it.
+
+    python benchmarks/bench_compression.py --size-mb 64 --link-mbps 100
+"""
+import argparse
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import compression, crypto_utils
+
+
+def make_logs(size):
+    rng = random.Random(1)
+    levels, paths = ["INFO", "WARN", "ERROR", "DEBUG"], ["/api/files", "/api/login", "/api/peers", "/static/app.js"]
+    lines, total = [], 0
+    while total < size:
+        line = (f"2024-05-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}Z "
+                f"{rng.choice(levels)} {rng.choice(paths)} user={rng.randint(1, 5000)} status={rng.choice([200, 200, 200, 404, 500])} "
+                f"took={rng.randint(1, 900)}ms\n")
+        lines.append(line)
+        total += len(line)
+    return "".join(lines).encode()[:size]
+
+
+def make_csv(size):
+    rng = random.Random(2)
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(["id", "date", "region", "product", "quantity", "price"])
+    i = 0
+    while out.tell() < size:
+        writer.writerow([i, f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(["EU", "US", "APAC"]),
+                         f"SKU-{rng.randint(1000, 1200)}", rng.randint(1, 50), f"{rng.uniform(1, 500):.2f}"])
+        i += 1
+    return out.getvalue().encode()[:size]
+
+
+def make_compressed(size):
+    # stands in for archives, images and video: compressed data looks random
+    return zlib.compress(os.urandom(size), 1)[:size]
+
+
+def run(data, codec, key, link_bytes_per_s):
+    start = time.perf_counter()
+    used, payload = compression.compress_for_upload(data, codec)
+    ciphertext = crypto_utils.encrypt_data(payload, key)
+    upload_cpu = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull): # decrypt_data prints a line
+        plaintext = compression.decompress(crypto_utils.decrypt_data(ciphertext, key), used)
+    download_cpu = time.perf_counter() - start
+    assert plaintext == data
+    return used, len(ciphertext), upload_cpu, download_cpu, upload_cpu + len(ciphertext) / link_bytes_per_s + download_cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--link-mbps", type=float, default=100)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    key = crypto_utils.generate_session_id() # any string works as key material for encrypt_data
+    link = args.link_mbps * 1e6 / 8
+    datasets = {"logs": make_logs(size), "csv": make_csv(size), "compressed": make_compressed(size)}
+    print(f"{args.size_mb} MB per dataset, {args.link_mbps:.0f} Mbit/s link; codecs available: {compression.available_codecs()}")
+    print(f"{'dataset':<12}{'codec':<6}{'used':<6}{'wire MB':>9}{'ratio':>7}{'up cpu s':>10}{'down cpu s':>12}{'end-to-end s':>14}")
+    for name, data in datasets.items():
+        for codec in ["none", "zlib"] + (["zstd"] if "zstd" in compression.available_codecs() else []):
+            used, wire, up, down, total = run(data, codec, key, link)
+            print(f"{name:<12}{codec:<6}{used:<6}{wire / 1e6:>9.1f}{wire / len(data):>7.2f}{up:>10.2f}{down:>12.2f}{total:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
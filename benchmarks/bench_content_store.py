@@ -0,0 +1,95 @@
+"""
+Repeated UPLOADs of identical content: flat shared directory (every upload rewrites the file)
+vs the content store (duplicates are acknowledged without sending the payload), plus the cost
+of resolving a DOWNLOAD by content hash vs by position in the sorted listing.
+
+    python benchmarks/bench_content_store.py --size-mb 64 --uploads 20 --files 10000
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.content_store import ContentStore
+from src.peer.fileshare_peer import FileSharePeer
+from src.peer.strategies.download_strategy import DownloadStrategy
+
+
+def time_uploads(client, address, payload, uploads, file_hash):
+    start = time.perf_counter()
+    for i in range(uploads):
+        client._send_ciphertext(address, f"copy_{i}.bin", payload, file_hash=file_hash)
+    return time.perf_counter() - start
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    file_hash = hashlib.sha256(payload).hexdigest()
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        Config.SHARED_FILES_DIR = shared_dir
+        peer = FileSharePeer(0)
+        address = (peer.host, peer.port)
+        client = FileShareClient()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            threading.Thread(target=peer.start_peer, daemon=True).start()
+            time.sleep(0.1)
+            flat = time_uploads(client, address, payload, args.uploads, None)
+            stored = time_uploads(client, address, payload, args.uploads, file_hash)
+            time.sleep(0.1) # let the peer thread finish logging the last upload
+        disk_flat = sum(os.path.getsize(os.path.join(shared_dir, f"copy_{i}.bin")) for i in range(args.uploads))
+
+    print(f"{'upload path':<16}{'uploads':>9}{'MB each':>9}{'total s':>9}{'disk MB':>9}")
+    print(f"{'flat directory':<16}{args.uploads:>9}{args.size_mb:>9}{flat:>9.2f}{disk_flat / 2**20:>9.0f}")
+    print(f"{'content store':<16}{args.uploads:>9}{args.size_mb:>9}{stored:>9.2f}{args.size_mb:>9}")
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        store = ContentStore.for_directory(shared_dir)
+        hashes = []
+        for i in range(args.files):
+            data = str(i).encode()
+            with open(os.path.join(shared_dir, f"file_{i:07d}.bin"), "wb") as f:
+                f.write(data)
+            tmp_path = store.new_temp_path()
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            hashes.append(hashlib.sha256(data).hexdigest())
+            store.commit(tmp_path, hashes[-1], f"file_{i:07d}.bin")
+        time.sleep(0.1) # step out of the shared index's racy-mtime window
+
+        download = DownloadStrategy()
+        by_position = per_call_us(lambda i: download.get_file_path(str(i % args.files), shared_dir), args.lookups)
+        for i in range(args.files): # the first hash lookup per ID also records the ID alias on disk
+            download.get_file_path(str(i), shared_dir, hashes[i])
+        by_hash = per_call_us(lambda i: download.get_file_path(str(i % args.files), shared_dir, hashes[i % args.files]), args.lookups)
+        by_file_id = per_call_us(lambda i: download.get_file_path(str(i % args.files), shared_dir), args.lookups)
+    print(f"\n{'lookup':<16}{'files':>9}{'us/call':>9}")
+    print(f"{'by position':<16}{args.files:>9}{by_position:>9.1f}")
+    print(f"{'by hash':<16}{args.files:>9}{by_hash:>9.1f}")
+    print(f"{'by file ID':<16}{args.files:>9}{by_file_id:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Re-uploading a large file after scattered edits: the whole file again vs a delta sync
+against the version already on the peer (block signature fetch, rsync-style matching,
+only changed blocks encrypted and sent, peer rebuilds the new version).
+
+    python benchmarks/bench_delta.py --size-mb 1024 --edits 0.01 0.1 --edit-kb 1024
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import delta
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+class CountingSocket:
+    """Counts bytes sent through a client socket."""
+    def __init__(self, sock, stats):
+        self.sock, self.stats = sock, stats
+    def sendall(self, data):
+        self.stats["sent"] += len(data)
+        return self.sock.sendall(data)
+    def __getattr__(self, attr):
+        return getattr(self.sock, attr)
+
+
+def edited_copy(data: bytes, fraction: float, edit_size: int, mode: str, seed: int) -> bytes:
+    """`data` with `fraction` of its bytes overwritten (or inserted) in edit_size pieces at random places."""
+    rng = random.Random(seed)
+    edited = bytearray(data)
+    for _ in range(max(1, int(len(data) * fraction / edit_size))):
+        offset = rng.randrange(len(edited) - edit_size)
+        if mode == "insert":
+            edited[offset:offset] = os.urandom(edit_size)
+        else:
+            edited[offset:offset + edit_size] = os.urandom(edit_size)
+    return bytes(edited)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--edits", type=float, nargs="+", default=[0.01, 0.1])
+    parser.add_argument("--edit-kb", type=int, default=1024)
+    parser.add_argument("--mode", choices=["overwrite", "insert"], default="overwrite")
+    parser.add_argument("--link-mbps", type=float, default=0, help="also estimate the time over a link this fast")
+    args = parser.parse_args()
+    key = "k" * 64
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        Config.SHARED_FILES_DIR = shared_dir
+        Config.PEER_UPLOAD_FSYNC = False
+        peer = FileSharePeer(0)
+        address = (peer.host, peer.port)
+        data = os.urandom(args.size_mb * 1024 * 1024)
+
+        client = FileShareClient()
+        stats = {"sent": 0}
+        real_connect = client._connect_socket
+        client._connect_socket = lambda host, port: CountingSocket(real_connect(host, port), stats)
+        header = f"{'upload':<8}{'edited':>8}{'MB':>7}{'MB sent':>10}{'wall s':>9}"
+        print(header + (f"{'@' + str(int(args.link_mbps)) + ' Mbps s':>14}" if args.link_mbps else ""))
+        results = []
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            threading.Thread(target=peer.start_peer, daemon=True).start()
+            time.sleep(0.1)
+            base = delta.plan_revision(data, key).stored_bytes()
+            base_size = len(base)
+            data_hash = hashlib.sha256(base).hexdigest() # content store key of the base version
+            client._send_ciphertext(address, "base.bin", base, file_hash=data_hash)
+            del base
+            for seed, fraction in enumerate(args.edits):
+                new = edited_copy(data, fraction, args.edit_kb * 1024, args.mode, seed)
+                for label in ("full", "delta"):
+                    stats["sent"] = 0
+                    start = time.perf_counter()
+                    if label == "full":
+                        client._send_ciphertext(address, f"full-{seed}.bin", delta.plan_revision(new, key).stored_bytes())
+                    else:
+                        signature = client.fetch_signature(address, "0", data_hash, base_size, key)
+                        plan = delta.plan_revision(new, key, signature)
+                        client._send_delta(address, "base.bin", plan, data_hash)
+                    wall = time.perf_counter() - start
+                    results.append((label, fraction, stats["sent"], wall))
+                del new
+            time.sleep(0.1)
+        for label, fraction, sent, wall in results:
+            line = f"{label:<8}{fraction:>8.0%}{args.size_mb:>7}{sent / 2**20:>10.1f}{wall:>9.2f}"
+            if args.link_mbps:
+                line += f"{wall + sent * 8 / (args.link_mbps * 1e6):>14.1f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Downloading a folder of many small files: one download_file() per file vs download_files().
+
+A registry and a peer run in their own processes on loopback; the registry does not
+persist its data during the run. --files files of --size-kb KB are uploaded and registered
+by one user, who then downloads all of them three ways: the download_file() loop with
+keep-alive off (a registry round trip each for CHECK_ACCESS and REQUEST_KEY, then a fresh
+peer connection per file), the same loop over pooled keep-alive connections, and
+download_files(), which fetches every key in one REQUEST_KEYS round trip and the files in
+DOWNLOAD_MANY batches of --batch files while worker threads decrypt and write them.
+
+    python benchmarks/bench_download_many.py --files 2000 --size-kb 4 --batch 256
+"""
+import argparse
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils import crypto_utils
+import src.central_registry.registry as registry
+import src.client.fileshare_client as fileshare_client
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_registry(data_file, port):
+    logging.disable(logging.WARNING)
+    registry.REGISTRY_DATA_FILE = data_file
+    registry.save_registry_data = lambda: None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        registry.start_registry_server(Config.REGISTRY_IP, port)
+
+
+def run_peer(shared_dir, port_queue):
+    logging.disable(logging.WARNING)
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLOAD_FSYNC = False
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((Config.REGISTRY_IP, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(address):
+    for _ in range(100):
+        try:
+            socket.create_connection(address).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on {address}")
+
+
+def download_loop(client, files, destination):
+    for file_id, info in files.items():
+        assert client.download_file(file_id, destination, info["owner_address"], info["filename"], info["file_hash"],
+                                    holders=info.get("holders"), size=info.get("size"), codec=info.get("codec"),
+                                    content_hash=info.get("content_hash"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size-kb", type=float, default=4)
+    parser.add_argument("--batch", type=int, default=256, help="Config.CLIENT_BATCH_FILES")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    Config.CLIENT_BATCH_FILES = args.batch
+    Config.CLIENT_SEED_DOWNLOADS = False
+
+    root = tempfile.mkdtemp()
+    fileshare_client.REGISTRY_PORT = free_port()
+    registry_process = multiprocessing.Process(target=run_registry, daemon=True,
+                                               args=(os.path.join(root, "registry.json"), fileshare_client.REGISTRY_PORT))
+    port_queue = multiprocessing.Queue()
+    peer_process = multiprocessing.Process(target=run_peer, args=(os.path.join(root, "shared"), port_queue), daemon=True)
+    try:
+        registry_process.start()
+        peer_process.start()
+        client = FileShareClient()
+        client.peer_address = (Config.PEER_HOST, port_queue.get())
+        wait_for((Config.REGISTRY_IP, fileshare_client.REGISTRY_PORT))
+        size = int(args.size_kb * 1024)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            assert client.register_user("bench", "bench-password") and client.login_user("bench", "bench-password")
+            for i in range(args.files):
+                plaintext = os.urandom(size)
+                file_hash = crypto_utils.compute_hash(plaintext)
+                ciphertext = crypto_utils.encrypt_data(plaintext, client.key)
+                content_hash = crypto_utils.compute_hash(ciphertext)
+                client._send_ciphertext(client.peer_address, f"file{i:05}.bin", ciphertext, file_hash=content_hash)
+                client.register_file_with_registry(f"file{i:05}.bin", file_hash, size=len(ciphertext), codec="none",
+                                                   content_hash=content_hash)
+        files = client.get_files_from_registry()
+        total_mb = len(files) * size / 2**20
+
+        print(f"{len(files)} files of {args.size_kb:g} KB")
+        print(f"{'method':>36}{'seconds':>10}{'files/s':>10}{'MB/s':>8}")
+        baseline = None
+        methods = (("download_file loop, no keep-alive", False, False),
+                   ("download_file loop, keep-alive", True, False),
+                   ("download_files (DOWNLOAD_MANY)", True, True))
+        for run, (label, keepalive, batch) in enumerate(methods):
+            Config.CLIENT_KEEPALIVE = keepalive
+            client.close_connections()
+            destination = os.path.join(root, "out", str(run))
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                if batch:
+                    assert not any(client.download_files(files, destination).values())
+                else:
+                    download_loop(client, files, destination)
+                seconds = time.perf_counter() - start
+            assert len(os.listdir(destination)) == len(files)
+            baseline = baseline or seconds
+            print(f"{label:>36}{seconds:>10.2f}{len(files) / seconds:>10.0f}{total_mb / seconds:>8.1f}"
+                  f"  ({baseline / seconds:.1f}x)")
+        client.close_connections()
+    finally:
+        peer_process.terminate()
+        registry_process.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Microbenchmark for request-header parsing on the peer: byte-at-a-time recv(1) vs FramedReader.
+
+For every connection a client on loopback sends an UPLOAD header followed by the first payload
+chunk; the server parses the command and filename and acknowledges. Reports recv() syscalls
+per connection and connection-setup latency (connect -> header parsed -> ack received).
+
+    python benchmarks/bench_header_parsing.py --connections 2000
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.framing import FramedReader
+
+
+class CountingSocket:
+    """Counts recv() calls made on the wrapped socket."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.recv_calls = 0
+
+    def recv(self, bufsize):
+        self.recv_calls += 1
+        return self.sock.recv(bufsize)
+
+
+def parse_byte_at_a_time(sock):
+    """The parser FileSharePeer.handle_client_connection used before FramedReader."""
+    lines = []
+    for _ in range(2):
+        line = b""
+        while b"\n" not in line:
+            chunk = sock.recv(1)
+            if not chunk:
+                break
+            line += chunk
+        lines.append(line)
+    return lines
+
+
+def parse_buffered(sock):
+    reader = FramedReader(sock)
+    return [reader.readline(), reader.readline()]
+
+
+def serve(server_sock, parser, connections, recv_counts):
+    for _ in range(connections):
+        conn, _ = server_sock.accept()
+        counting = CountingSocket(conn)
+        parser(counting)
+        recv_counts.append(counting.recv_calls)
+        conn.sendall(b"OK")
+        conn.close()
+
+
+def run(parser, connections, payload):
+    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server_sock.bind(("127.0.0.1", 0))
+    server_sock.listen(128)
+    port = server_sock.getsockname()[1]
+    recv_counts, latencies = [], []
+    server = threading.Thread(target=serve, args=(server_sock, parser, connections, recv_counts))
+    server.start()
+
+    request = b"UPLOAD\n" + b"quarterly_report_final_v2.pdf\n" + payload
+    for _ in range(connections):
+        start = time.perf_counter()
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(request)
+        sock.recv(2)
+        latencies.append(time.perf_counter() - start)
+        sock.close()
+
+    server.join()
+    server_sock.close()
+    return recv_counts, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--payload", type=int, default=16 * 1024, help="payload bytes sent right after the header")
+    args = parser.parse_args()
+    payload = os.urandom(args.payload)
+
+    print(f"{'parser':<16}{'recv/conn':>11}{'p50 us':>10}{'p99 us':>10}{'mean us':>10}")
+    for label, fn in (("recv(1) loop", parse_byte_at_a_time), ("FramedReader", parse_buffered)):
+        recv_counts, latencies = run(fn, args.connections, payload)
+        latencies.sort()
+        print(f"{label:<16}{statistics.mean(recv_counts):>11.1f}"
+              f"{statistics.median(latencies) * 1e6:>10.0f}"
+              f"{latencies[int(len(latencies) * 0.99) - 1] * 1e6:>10.0f}"
+              f"{statistics.mean(latencies) * 1e6:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
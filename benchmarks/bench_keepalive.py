@@ -0,0 +1,76 @@
+"""
+Latency of many small-file DOWNLOADs: a new TCP connection per request vs pooled keep-alive connections.
+
+The peer runs in its own process; the client downloads --files small files one after
+another, first with Config.CLIENT_KEEPALIVE off (connect, request, teardown every time)
+and then with it on (one pooled connection carries every request).
+
+    python benchmarks/bench_keepalive.py --files 1000 --size-kb 4 --mode threaded asyncio
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, mode, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer_async() if mode == "asyncio" else peer.start_peer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--size-kb", type=int, default=4)
+    parser.add_argument("--mode", nargs="+", default=["threaded", "asyncio"], choices=["threaded", "asyncio"])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        for i in range(args.files):
+            with open(os.path.join(shared_dir, f"file{i:06d}.bin"), "wb") as f:
+                f.write(os.urandom(args.size_kb * 1024))
+
+        print(f"{'peer mode':<10}{'connections':<13}{'requests':>9}{'total s':>9}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>9}{'opened':>8}")
+        for mode in args.mode:
+            port_queue = multiprocessing.Queue()
+            peer = multiprocessing.Process(target=run_peer, args=(shared_dir, mode, port_queue), daemon=True)
+            peer.start()
+            address = (Config.PEER_HOST, port_queue.get())
+            time.sleep(0.2)
+            try:
+                for label, keep_alive in (("per request", False), ("keep-alive", True)):
+                    Config.CLIENT_KEEPALIVE = keep_alive
+                    client = FileShareClient()
+                    latencies = []
+                    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                        client._receive_ciphertext(address, "0") # warm-up, also settles the protocol version
+                        start = time.perf_counter()
+                        for i in range(args.files):
+                            t0 = time.perf_counter()
+                            client._receive_ciphertext(address, str(i))
+                            latencies.append(time.perf_counter() - t0)
+                        total = time.perf_counter() - start
+                    latencies.sort()
+                    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                    print(f"{mode:<10}{label:<13}{args.files:>9}{total:>9.2f}{statistics.median(latencies) * 1000:>9.3f}"
+                          f"{p99 * 1000:>9.3f}{args.files / total:>9.0f}{client.connection_pool.stats()['opened']:>8}")
+                    client.close_connections()
+            finally:
+                peer.terminate()
+
+
+if __name__ == "__main__":
+    main()
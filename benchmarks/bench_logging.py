@@ -0,0 +1,131 @@
+"""
+Per-request cost of the peer's logging.
+
+First the caller-side cost of the lines a DOWNLOAD request used to print (accepted,
+handling, received, executing with args, sending, sent, closing): print()ed to a file, as
+logger.debug() calls at the default INFO level, and as the same calls at DEBUG (queued,
+formatted on the listener thread). The same for the registry's GET_FILES line with a dict
+of --registry-files entries. Then the end-to-end effect: --files small keep-alive DOWNLOADs
+from a peer logging at INFO and at DEBUG.
+
+    python benchmarks/bench_logging.py --calls 20000 --files 2000 --registry-files 1000
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+from src.utils.logging_utils import get_logger, setup_logging, stop_logging
+
+ADDRESS = ('127.0.0.1', 54321)
+ARGS = {'version': 3, 'file_id_str': '17', 'options': {'hash': 'ab' * 32}}
+
+
+def request_lines_print(out):
+    print(f"Peer: Accepted connection from {ADDRESS}", file=out)
+    print(f"Peer: Handling connection from {ADDRESS}", file=out)
+    print(f"Peer: Received command 'DOWNLOAD/3' from {ADDRESS}", file=out)
+    print(f"Peer: Executing handler for command DOWNLOAD with args: {ARGS}", file=out)
+    print(f"Peer (Download): Sending file 'file000017.bin' (ID: 17, offset 0)...", file=out)
+    print(f"Peer (Download): File 'file000017.bin' sent successfully ({123456789 / 1e6:.1f} MB/s).", file=out)
+    print(f"Peer: Closing connection from {ADDRESS}", file=out)
+
+
+def request_lines_log(logger):
+    logger.debug("Accepted connection from %s", ADDRESS)
+    logger.debug("Handling connection from %s", ADDRESS)
+    logger.debug("Received command '%s' from %s", 'DOWNLOAD/3', ADDRESS)
+    logger.debug("Executing handler for command %s with args: %s", 'DOWNLOAD', ARGS)
+    logger.debug("Sending file '%s' (ID: %s, offset %s)...", 'file000017.bin', '17', 0)
+    logger.debug("File '%s' sent successfully (%.1f MB/s).", 'file000017.bin', 123456789 / 1e6)
+    logger.debug("Closing connection from %s", ADDRESS)
+
+
+def per_call_us(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def caller_costs(calls, registry_files):
+    files = {str(i): {"filename": f"file{i}.bin", "owner": "moamen", "file_hash": "ab" * 32, "size": 4096,
+                      "holders": [["127.0.0.1", 6000]], "allowed_users": ["moamen"]} for i in range(registry_files)}
+    logger = get_logger("bench")
+    rows = []
+    with tempfile.TemporaryFile("w") as out:
+        rows.append(("print (before)", per_call_us(lambda: request_lines_print(out), calls),
+                     per_call_us(lambda: print(f"Registry: Sent accessible file list for user 'moamen': {files}", file=out), max(1, calls // 100))))
+        for level in ("INFO", "DEBUG"):
+            setup_logging(level, stream=out)
+            rows.append((f"logger at {level}", per_call_us(lambda: request_lines_log(logger), calls),
+                         per_call_us(lambda: logger.debug("Sent accessible file list for user '%s' (%d files).", 'moamen', len(files)), calls)))
+            stop_logging()
+    return rows
+
+
+def run_peer(shared_dir, level, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        setup_logging(level, stream=devnull)
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def download_latencies(shared_dir, files, level):
+    port_queue = multiprocessing.Queue()
+    peer = multiprocessing.Process(target=run_peer, args=(shared_dir, level, port_queue), daemon=True)
+    peer.start()
+    address = (Config.PEER_HOST, port_queue.get())
+    time.sleep(0.2)
+    try:
+        client = FileShareClient()
+        latencies = []
+        client._receive_ciphertext(address, "0") # warm-up
+        for i in range(files):
+            t0 = time.perf_counter()
+            client._receive_ciphertext(address, str(i))
+            latencies.append(time.perf_counter() - t0)
+        client.close_connections()
+    finally:
+        peer.terminate()
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=4)
+    parser.add_argument("--registry-files", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'':<16}{'request lines us':>18}{'GET_FILES line us':>19}")
+    for label, request_us, registry_us in caller_costs(args.calls, args.registry_files):
+        print(f"{label:<16}{request_us:>18.2f}{registry_us:>19.2f}")
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        for i in range(args.files):
+            with open(os.path.join(shared_dir, f"file{i:06d}.bin"), "wb") as f:
+                f.write(os.urandom(args.size_kb * 1024))
+        print(f"\n{'peer level':<12}{'requests':>9}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+        for level in ("INFO", "DEBUG"):
+            latencies = download_latencies(shared_dir, args.files, level)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{level:<12}{args.files:>9}{statistics.median(latencies) * 1000:>9.3f}"
+                  f"{p99 * 1000:>9.3f}{len(latencies) / sum(latencies):>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Recovering from one corrupted byte in a DOWNLOAD: a single hash over the whole file (the
+old behaviour: the mismatch is found at the end and everything is downloaded again) vs
+per-chunk Merkle verification (only the bad chunk is fetched again). Also reports the
+cost of verifying a clean download chunk by chunk.
+
+    python benchmarks/bench_merkle.py --size-mb 512 --chunk-kb 1024
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import merkle
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+class FlippingSocket:
+    """Counts received bytes and inverts the one at stream position `position` (None: leave the data alone)."""
+    def __init__(self, sock, stats, position):
+        self.sock, self.stats, self.position = sock, stats, position
+    def recv(self, bufsize):
+        data = bytearray(self.sock.recv(bufsize))
+        self._flip(data, len(data))
+        return bytes(data)
+    def recv_into(self, buffer, nbytes=0):
+        n = self.sock.recv_into(buffer, nbytes)
+        self._flip(buffer, n)
+        return n
+    def _flip(self, buffer, n):
+        if self.position is not None and self.stats["bytes"] <= self.position < self.stats["bytes"] + n:
+            buffer[self.position - self.stats["bytes"]] ^= 0xFF
+        self.stats["bytes"] += n
+    def __getattr__(self, attr):
+        return getattr(self.sock, attr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--chunk-kb", type=int, default=Config.MERKLE_CHUNK_SIZE // 1024)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+    chunk_size = args.chunk_kb * 1024
+
+    with tempfile.TemporaryDirectory() as shared_dir, tempfile.TemporaryDirectory() as download_dir:
+        Config.SHARED_FILES_DIR = shared_dir
+        path = os.path.join(shared_dir, "payload.bin")
+        with open(path, "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+        expected = hashlib.sha256(open(path, "rb").read()).hexdigest()
+        root = merkle.merkle_root(merkle.file_leaf_hashes(path, chunk_size))
+
+        peer = FileSharePeer(0)
+        address = (peer.host, peer.port)
+        print(f"{'verification':<14}{'corrupt':>8}{'MB':>7}{'MB received':>13}{'wall s':>9}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            threading.Thread(target=peer.start_peer, daemon=True).start()
+            time.sleep(0.1)
+            results = []
+            for corrupt in (False, True):
+                for label in ("whole file", "per chunk"):
+                    client = FileShareClient()
+                    real_connect = client._connect_socket
+                    stats = {"bytes": 0}
+                    position = [size // 2 if corrupt else None]
+                    client._connect_socket = lambda host, port: FlippingSocket(real_connect(host, port), stats, position[0])
+                    part_path = os.path.join(download_dir, "payload.part")
+
+                    start = time.perf_counter()
+                    if label == "whole file":
+                        data = client._receive_ciphertext_resumable(address, "0", part_path)
+                        client._discard_partial_download(part_path)
+                        if hashlib.sha256(data).hexdigest() != expected:
+                            position[0] = None
+                            client.close_connections()
+                            data = client._receive_ciphertext_resumable(address, "0", part_path)
+                    else:
+                        verifier = client._chunk_verifier([address], "0", None, root, chunk_size, size)
+                        data = client._receive_ciphertext_resumable(address, "0", part_path, verifier=verifier)
+                        if verifier.bad_chunks:
+                            position[0] = None
+                            client.close_connections()
+                            data = bytearray(data)
+                            client._repair_chunks(data, verifier, [address], "0", None)
+                    assert hashlib.sha256(data).hexdigest() == expected
+                    results.append((label, corrupt, stats["bytes"], time.perf_counter() - start))
+                    client._discard_partial_download(part_path)
+                    client.close_connections()
+            time.sleep(0.1)
+        for label, corrupt, received, wall in results:
+            print(f"{label:<14}{'yes' if corrupt else 'no':>8}{args.size_mb:>7}{received / 2**20:>13.1f}{wall:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+One large UPLOAD and DOWNLOAD over an emulated long, fat link, one TCP stream vs several.
+
+The peer runs in its own process behind an in-process relay that emulates the link on
+loopback. Each direction of every connection is delayed by half of --rtt-ms. Each
+connection may have at most --window-kb in flight, standing in for a TCP window that
+limits one stream to window / RTT. All connections share a --link-mbps budget.
+For each stream count in --streams, a --size-mb file is uploaded as a multipart upload
+and downloaded as parallel ranged DOWNLOADs ("1" is the plain single-stream transfer).
+"auto" runs --auto-runs transfers each way and lets the client's peer table size the
+stream count from the throughput it measures.
+
+    python benchmarks/bench_multi_stream.py --size-mb 64 --rtt-ms 40 --window-kb 256 --link-mbps 100 --streams 1 2 4 8 auto
+"""
+import argparse
+import contextlib
+import hashlib
+import heapq
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLOAD_FSYNC = False
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+class Link:
+    """Shared capacity of the emulated link: a token bucket of `rate` bytes per second."""
+    def __init__(self, rate):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.free_at = time.monotonic()
+
+    def reserve(self, nbytes) -> float:
+        """Books `nbytes` on the link and returns when they have gone out."""
+        with self.lock:
+            self.free_at = max(self.free_at, time.monotonic()) + nbytes / self.rate
+            return self.free_at
+
+
+class LatencyRelay:
+    """Accepts connections and relays each to `target` through the emulated link."""
+    def __init__(self, target, rtt, window, link):
+        self.target, self.rtt, self.window, self.link = target, rtt, window, link
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(128)
+        self.address = self.listener.getsockname()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(client, upstream)
+            self._pipe(upstream, client)
+
+    def _pipe(self, source, sink):
+        queue, cond = [], threading.Condition()
+
+        def read():
+            in_flight = [] # ack times of the bytes sent, as (time, nbytes)
+            seq = 0
+            while True:
+                now = time.monotonic()
+                while in_flight and in_flight[0][0] <= now:
+                    heapq.heappop(in_flight)
+                unacked = sum(nbytes for _, nbytes in in_flight)
+                if unacked >= self.window:
+                    time.sleep(in_flight[0][0] - now)
+                    continue
+                try:
+                    data = source.recv(min(64 * 1024, self.window - unacked))
+                except OSError:
+                    data = b""
+                sent = self.link.reserve(len(data)) if data else time.monotonic()
+                with cond:
+                    queue.append((sent + self.rtt / 2, seq, data))
+                    cond.notify()
+                seq += 1
+                if not data:
+                    return
+                heapq.heappush(in_flight, (sent + self.rtt, len(data)))
+
+        def write():
+            while True:
+                with cond:
+                    while not queue:
+                        cond.wait()
+                    deliver_at, _, data = queue.pop(0)
+                time.sleep(max(0.0, deliver_at - time.monotonic()))
+                try:
+                    if not data:
+                        sink.shutdown(socket.SHUT_WR)
+                        return
+                    sink.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=read, daemon=True).start()
+        threading.Thread(target=write, daemon=True).start()
+
+    def close(self):
+        self.listener.close()
+
+
+def transfer(client, address, data, streams):
+    """Uploads `data` over `streams` streams and downloads it back. Returns (upload s, download s)."""
+    file_hash = hashlib.sha256(data).hexdigest()
+    start = time.perf_counter()
+    if streams > 1:
+        client._send_ciphertext_parallel(address, "payload.bin", data, file_hash, streams)
+    else:
+        client._send_ciphertext(address, "payload.bin", data, file_hash=file_hash)
+    upload = time.perf_counter() - start
+    start = time.perf_counter()
+    if streams > 1:
+        received = client.fetch_parallel(address, "payload.bin", len(data), file_hash=file_hash, streams=streams)
+    else:
+        received = client.fetch_range(address, "payload.bin", 0, file_hash=file_hash)
+    download = time.perf_counter() - start
+    assert received == data
+    return upload, download
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--rtt-ms", type=float, default=40)
+    parser.add_argument("--window-kb", type=int, default=256, help="bytes one stream may have in flight")
+    parser.add_argument("--link-mbps", type=float, default=100, help="capacity of the link in MB/s")
+    parser.add_argument("--streams", nargs="+", default=["1", "2", "4", "8", "auto"])
+    parser.add_argument("--auto-runs", type=int, default=4)
+    args = parser.parse_args()
+    Config.CLIENT_MAX_STREAMS = max(int(s) for s in args.streams if s != "auto") if any(s != "auto" for s in args.streams) else 8
+    Config.SWARM_PIECE_SIZE = 4 * 1024 * 1024
+
+    root = tempfile.mkdtemp()
+    port_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_peer, args=(root, port_queue), daemon=True)
+    process.start()
+    relay = LatencyRelay((Config.PEER_HOST, port_queue.get()), args.rtt_ms / 1000, args.window_kb * 1024,
+                         Link(args.link_mbps * 2**20))
+    time.sleep(0.2)
+    size = args.size_mb * 2**20
+    one_stream = args.window_kb * 1024 / (args.rtt_ms / 1000) / 2**20
+    print(f"emulated link: RTT {args.rtt_ms:g} ms, {args.link_mbps:g} MB/s, one stream at most {one_stream:.1f} MB/s")
+    print(f"{'streams':>8}{'upload MB/s':>13}{'download MB/s':>15}")
+    try:
+        for setting in args.streams:
+            client = FileShareClient()
+            if setting == "auto":
+                for _ in range(args.auto_runs):
+                    streams = client.peer_table.stream_count(relay.address, size)
+                    upload, download = transfer(client, relay.address, os.urandom(size), streams)
+                    print(f"{'auto ' + str(streams):>8}{size / upload / 2**20:>13.1f}{size / download / 2**20:>15.1f}")
+            else:
+                upload, download = transfer(client, relay.address, os.urandom(size), int(setting))
+                print(f"{setting:>8}{size / upload / 2**20:>13.1f}{size / download / 2**20:>15.1f}")
+            client.close_connections()
+    finally:
+        relay.close()
+        process.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compares the threaded and asyncio peer servers under thousands of concurrent connections.
+
+Each simulated client opens its own connection, sends DOWNLOAD for a small shared file and
+reads until the DONE marker, exactly like FileShareClient.download_file does.
+
+    python benchmarks/bench_peer_concurrency.py --connections 2000 --file-size 65536
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils.commands_enum import Commands
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def raise_fd_limit(wanted):
+    """Thousands of sockets on both ends of loopback need a high RLIMIT_NOFILE."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(max(soft, wanted), hard)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    return target
+
+
+async def one_download(port, done_marker, latencies, failures):
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(Config.PEER_HOST, port)
+        writer.write(f"{Commands.DOWNLOAD}\n0\n".encode())
+        await writer.drain()
+        received = b""
+        while not received.endswith(done_marker):
+            chunk = await reader.read(Config.CHUNK_SIZE)
+            if not chunk:
+                break
+            received += chunk
+        writer.close()
+        if received.endswith(done_marker):
+            latencies.append(time.perf_counter() - start)
+        else:
+            failures.append("short read")
+    except OSError as e:
+        failures.append(type(e).__name__)
+
+
+def run_load(port, connections):
+    latencies, failures = [], []
+    done_marker = str(Commands.DONE).encode()
+
+    async def run():
+        await asyncio.gather(*(one_download(port, done_marker, latencies, failures) for _ in range(connections)))
+
+    peak_threads = [threading.active_count()]
+    sampling = threading.Event()
+
+    def sample_threads():
+        while not sampling.is_set():
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+            time.sleep(0.005)
+
+    sampler = threading.Thread(target=sample_threads, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    sampling.set()
+    sampler.join()
+    return elapsed, latencies, failures, peak_threads[0]
+
+
+def start_server(mode):
+    peer = FileSharePeer(0, backlog=4096)
+    target = peer.start_peer_async if mode == "asyncio" else peer.start_peer
+    threading.Thread(target=target, daemon=True).start()
+    time.sleep(0.2)
+    return peer.port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--file-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    limit = raise_fd_limit(args.connections * 2 + 256)
+    if limit < args.connections * 2:
+        print(f"warning: RLIMIT_NOFILE is {limit}, expect connection failures above ~{limit // 2} clients")
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        with open(os.path.join(shared_dir, "payload.bin"), "wb") as f:
+            f.write(os.urandom(args.file_size))
+        Config.SHARED_FILES_DIR = shared_dir
+
+        print(f"{'mode':<10}{'conns':>8}{'ok':>8}{'failed':>8}{'wall s':>9}{'p50 ms':>9}{'p99 ms':>9}{'threads':>9}")
+        for mode in ("threaded", "asyncio"):
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                port = start_server(mode)
+                elapsed, latencies, failures, peak_threads = run_load(port, args.connections)
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float("nan")
+            print(f"{mode:<10}{args.connections:>8}{len(latencies):>8}{len(failures):>8}"
+                  f"{elapsed:>9.2f}{p50:>9.1f}{p99:>9.1f}{peak_threads:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Listing a very large shared directory: one JSON object vs cursor pages vs an NDJSON stream.
+
+The peer runs in its own process with --files shared files. Each mode lists all of them
+--repeat times and reports the time to the first entry, the time for the whole listing and
+the client's peak Python memory while listing (tracemalloc). "full" is the version 1
+request, whose reply is the whole list in one JSON object; "pages" walks next_cursor with
+--page-size entries per request on a keep-alive connection; "stream" reads the NDJSON
+stream entry by entry. The last column is the same for every mode: the number of files seen.
+
+    python benchmarks/bench_peer_listing.py --files 100000 --page-size 1000
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def iter_full(client, address, page_size):
+    yield from client._request_legacy_peer_files(address)["files"]
+
+
+def iter_pages(client, address, page_size):
+    cursor = None
+    while True:
+        page = client.get_peer_files_page(address, cursor=cursor, limit=page_size)
+        yield from page["files"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+def iter_stream(client, address, page_size):
+    yield from client.iter_peer_files(address)
+
+
+def measure(listing, client, address, page_size):
+    """Returns (seconds to first entry, seconds in total, peak MB, entries)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, count = None, 0
+    for _ in listing(client, address, page_size):
+        if first is None:
+            first = time.perf_counter() - start
+        count += 1
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak / 1e6, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        for i in range(args.files):
+            with open(os.path.join(shared_dir, f"shared_{i:07d}.bin"), "wb") as f:
+                f.write(b"x" * (i % 4096))
+        port_queue = multiprocessing.Queue()
+        peer = multiprocessing.Process(target=run_peer, args=(shared_dir, port_queue), daemon=True)
+        peer.start()
+        address = (Config.PEER_HOST, port_queue.get())
+        time.sleep(0.2)
+
+        client = FileShareClient()
+        try:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                # wait until the peer listens, which also builds its index before anything is timed
+                while client.get_peer_files_page(address, limit=1) is None:
+                    time.sleep(0.2)
+            print(f"{'mode':<8}{'first entry ms':>16}{'total s':>10}{'peak MB':>10}{'files':>10}")
+            for mode, listing in (("full", iter_full), ("pages", iter_pages), ("stream", iter_stream)):
+                runs = []
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    for _ in range(args.repeat):
+                        runs.append(measure(listing, client, address, args.page_size))
+                first, total, peak, count = min(runs, key=lambda run: run[1])
+                print(f"{mode:<8}{first * 1000:>16.1f}{total:>10.2f}{peak:>10.1f}{count:>10}")
+        finally:
+            client.close_connections()
+            peer.terminate()
+
+
+if __name__ == "__main__":
+    main()
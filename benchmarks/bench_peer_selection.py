@@ -0,0 +1,127 @@
+"""
+Repeated peer listings and single-source downloads with a dead peer and a slow peer in the
+mix, registry order vs the client's peer performance table.
+
+Three peers, listed by the (stand-in) registry in this order: a dead one, whose listen
+backlog is full so connects hang until the timeout; a slow one, its uplink capped at
+--slow-mbps; and a fast one at --fast-mbps. Both live peers hold the same --size-mb file.
+Every round the client lists the files of all peers, then downloads the file from one
+holder. Without the table, every round waits out the connect timeout on the dead peer and
+takes the first holder the registry names; with it, the dead peer is skipped once it has
+failed Config.CLIENT_PEER_MAX_FAILURES times and downloads go to the quicker holder.
+
+    python benchmarks/bench_peer_selection.py --rounds 10 --size-mb 16 --slow-mbps 8 --fast-mbps 64 --connect-timeout 1
+"""
+import argparse
+import contextlib
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.content_store import ContentStore
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, uplink_bytes_per_s, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLINK_RATE = uplink_bytes_per_s
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def dead_peer():
+    """A listener that never accepts, its backlog already full: further connects time out."""
+    listener = socket.socket()
+    listener.bind((Config.PEER_HOST, 0))
+    listener.listen(0)
+    filler = socket.create_connection(listener.getsockname())
+    return listener, filler
+
+
+def run_rounds(args, peers, holders, file_hash, use_table):
+    client = FileShareClient()
+    client.session_id = "bench"
+    client.get_peers = lambda: list(peers)
+    if not use_table:
+        Config.CLIENT_PEER_MAX_FAILURES = float("inf")
+        Config.CLIENT_MIN_CONNECT_TIMEOUT = Config.CLIENT_CONNECT_TIMEOUT
+    listing_walls, download_walls = [], []
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                client.get_files_from_peers()
+                listing_walls.append(time.perf_counter() - start)
+
+                source = client.peer_table.rank(holders, args.size_mb * 2**20, skip_suspended=True)[0] if use_table else holders[0]
+                start = time.perf_counter()
+                data = client.fetch_range(source, "0", 0, file_hash=file_hash)
+                download_walls.append(time.perf_counter() - start)
+                assert hashlib.sha256(data).hexdigest() == file_hash
+    finally:
+        client.close_connections()
+    return listing_walls, download_walls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--size-mb", type=int, default=16)
+    parser.add_argument("--slow-mbps", type=float, default=8, help="uplink cap of the slow peer in MB/s")
+    parser.add_argument("--fast-mbps", type=float, default=64, help="uplink cap of the fast peer in MB/s")
+    parser.add_argument("--connect-timeout", type=float, default=1.0, help="Config.CLIENT_CONNECT_TIMEOUT")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING) # the dead peer's connect failures
+    Config.CLIENT_CONNECT_TIMEOUT = args.connect_timeout
+    defaults = Config.CLIENT_PEER_MAX_FAILURES, Config.CLIENT_MIN_CONNECT_TIMEOUT
+
+    ciphertext = os.urandom(args.size_mb * 2**20)
+    file_hash = hashlib.sha256(ciphertext).hexdigest()
+    root = tempfile.mkdtemp()
+    processes, holders = [], []
+    listener, filler = dead_peer()
+    try:
+        for name, mbps in (("slow", args.slow_mbps), ("fast", args.fast_mbps)):
+            shared_dir = os.path.join(root, name)
+            store = ContentStore.for_directory(shared_dir)
+            tmp_path = store.new_temp_path()
+            with open(tmp_path, "wb") as f:
+                f.write(ciphertext)
+            store.commit(tmp_path, file_hash, "payload.bin")
+            port_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_peer, daemon=True, args=(shared_dir, mbps * 2**20, port_queue))
+            process.start()
+            processes.append(process)
+            holders.append((Config.PEER_HOST, port_queue.get()))
+        time.sleep(0.2)
+        peers = [listener.getsockname()] + holders
+
+        print(f"{'mode':>16}{'total s':>9}{'listing s':>11}{'download s':>12}  first / last round")
+        for use_table in (False, True):
+            Config.CLIENT_PEER_MAX_FAILURES, Config.CLIENT_MIN_CONNECT_TIMEOUT = defaults
+            listings, downloads = run_rounds(args, peers, holders, file_hash, use_table)
+            rounds = [a + b for a, b in zip(listings, downloads)]
+            print(f"{'peer table' if use_table else 'registry order':>16}{sum(rounds):>9.2f}{sum(listings):>11.2f}"
+                  f"{sum(downloads):>12.2f}  {rounds[0]:.2f} / {rounds[-1]:.2f}")
+    finally:
+        for process in processes:
+            process.terminate()
+        filler.close()
+        listener.close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
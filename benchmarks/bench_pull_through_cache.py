@@ -0,0 +1,138 @@
+"""
+Downloads of one popular file by a group of users, with and without pull-through caching.
+
+Every user has their own peer process on loopback with its own shared directory, and every
+peer (the owner's included) caps its uplink at --uplink-mbps (Config.PEER_UPLINK_RATE). The
+users download in waves of --wave at once, each with a swarm download over the holders the
+registry lists. Without caching the owner's peer serves every copy; with it, each verified
+download is cached by the downloader's peer and registered as a holder, so later waves are
+served by the earlier downloaders. The registry is an in-process stand-in.
+
+    python benchmarks/bench_pull_through_cache.py --size-mb 32 --users 8 --wave 2 --uplink-mbps 20
+"""
+import argparse
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.client.swarm import SwarmDownload
+from src.peer.content_store import ContentStore
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, uplink_bytes_per_s, budget, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLINK_RATE = uplink_bytes_per_s
+    Config.PEER_CACHE_BUDGET_BYTES = budget
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+class FakeRegistry:
+    """Holder list of the one file, updated by REGISTER_HOLDER and UNREGISTER_HOLDER."""
+    def __init__(self, owner):
+        self.lock = threading.Lock()
+        self.holders = [list(owner)]
+
+    def request(self, request):
+        with self.lock:
+            address = list(request["holder_address"])
+            if request["command"] == "REGISTER_HOLDER" and address not in self.holders:
+                self.holders.append(address)
+            elif request["command"] == "UNREGISTER_HOLDER" and address in self.holders:
+                self.holders.remove(address)
+            return {"status": "OK", "holders": list(self.holders)}
+
+
+def download(peer_address, registry, ciphertext, file_hash, cache, piece_size):
+    client = FileShareClient()
+    client.session_id = "bench"
+    client.peer_address = peer_address
+    client._send_registry_request = registry.request
+    with registry.lock:
+        holders = [tuple(h) for h in registry.holders]
+    start = time.perf_counter()
+    data = SwarmDownload(client, holders, "1", len(ciphertext), file_hash=file_hash, piece_size=piece_size).run()
+    wall = time.perf_counter() - start
+    assert data == ciphertext
+    if cache:
+        client.seed_downloaded_file("1", "payload.bin", data, file_hash)
+    client.close_connections()
+    return wall
+
+
+def run(args, cache, ciphertext, file_hash):
+    root = tempfile.mkdtemp()
+    processes, peers = [], []
+    try:
+        for i in range(args.users + 1):
+            shared_dir = os.path.join(root, f"peer{i}")
+            if i == 0: # the owner's peer
+                store = ContentStore.for_directory(shared_dir)
+                tmp_path = store.new_temp_path()
+                with open(tmp_path, "wb") as f:
+                    f.write(ciphertext)
+                store.commit(tmp_path, file_hash, "payload.bin")
+            port_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_peer, daemon=True,
+                                              args=(shared_dir, args.uplink_mbps * 2**20, args.budget_mb * 2**20, port_queue))
+            process.start()
+            processes.append(process)
+            peers.append((Config.PEER_HOST, port_queue.get()))
+        time.sleep(0.2)
+
+        registry = FakeRegistry(peers[0])
+        walls = []
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for first in range(1, args.users + 1, args.wave):
+                wave = peers[first:first + args.wave]
+                results = [None] * len(wave)
+                def worker(i):
+                    results[i] = download(wave[i], registry, ciphertext, file_hash, cache, args.piece_mb * 2**20)
+                threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(wave))]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                walls.append(max(results))
+            owner_sent = FileShareClient().get_peer_stats(peers[0])["bandwidth"]["bytes_sent"]
+        return walls, owner_sent, len(registry.holders)
+    finally:
+        for process in processes:
+            process.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=32)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--wave", type=int, default=2, help="users downloading at the same time")
+    parser.add_argument("--uplink-mbps", type=float, default=20, help="per-peer upload cap in MB/s")
+    parser.add_argument("--budget-mb", type=int, default=1024, help="cache budget of each downloader's peer")
+    parser.add_argument("--piece-mb", type=int, default=4)
+    args = parser.parse_args()
+
+    ciphertext = os.urandom(args.size_mb * 1024 * 1024)
+    file_hash = hashlib.sha256(ciphertext).hexdigest()
+    print(f"{'mode':>8}{'total s':>9}{'owner MB':>10}{'holders':>9}  seconds per wave")
+    for cache in (False, True):
+        walls, owner_sent, holders = run(args, cache, ciphertext, file_hash)
+        print(f"{'cache' if cache else 'off':>8}{sum(walls):>9.2f}{owner_sent / 2**20:>10.0f}{holders:>9}  "
+              + " ".join(f"{wall:.2f}" for wall in walls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Simulation of popularity-driven replication under a skewed (Zipf) access pattern.
+
+Runs the registry's ReplicationPlanner against a simulated population: --peers peers each
+own some of --files files, and every tick (one simulated minute) --downloads downloads
+pick a file by Zipf popularity and a random online downloader. A peer is offline for a
+tick with probability --offline; a download fails if none of the file's holders is online,
+otherwise it is swarmed evenly across the online holders. With replication, every online
+peer asks for work once per tick and finishes the copy by the next tick (the rate limit),
+and the copy's bytes are counted as background load on the holders it came from.
+
+Reports, without and with replication: failed downloads, and after the first quarter of
+the run (while demand builds up): the busiest peer's share of all bytes served, the
+busiest peer's load vs the mean averaged over the ticks, copies made per download and
+holders per file at the end.
+
+    python benchmarks/bench_replication.py --peers 50 --files 500 --zipf 1.1 --ticks 240 --downloads 60 --max-replicas 5
+"""
+import argparse
+import os
+import random
+import sys
+from collections import Counter
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.central_registry.replication import ReplicationPlanner
+from src.utils.config import Config
+
+TICK_SECONDS = 60
+
+
+def simulate(args, replicate: bool) -> dict:
+    rng = random.Random(args.seed)
+    peers = [("10.0.0.%d" % (i // 250), 5000 + i) for i in range(args.peers)]
+    files = {file_id: {"owner_address": owner, "holders": [list(owner)], "merkle_root": "ab" * 32}
+             for file_id, owner in enumerate(rng.choice(peers) for _ in range(args.files))}
+    popularity = list(files)
+    rng.shuffle(popularity) # popular files are spread over the owners
+    cumulative, total = [], 0.0
+    for rank in range(1, args.files + 1):
+        total += 1 / rank ** args.zipf
+        cumulative.append(total)
+
+    planner = ReplicationPlanner()
+    served = Counter()
+    warmup = args.ticks // 4
+    ratios, failed, replication_bytes, in_flight = [], 0, 0.0, []
+    for tick in range(args.ticks):
+        if tick == warmup:
+            served.clear()
+        now = tick * TICK_SECONDS
+        online = {peer for peer in peers if rng.random() >= args.offline}
+        for file_id, peer in in_flight: # copies assigned last tick are done
+            sources = [tuple(h) for h in files[file_id]["holders"] if tuple(h) in online] or [tuple(files[file_id]["holders"][0])]
+            for source in sources:
+                served[source] += 1 / len(sources)
+            replication_bytes += 1
+            files[file_id]["holders"].append(list(peer))
+            planner.completed(file_id, peer)
+        in_flight = []
+
+        load = Counter()
+        for file_id in rng.choices(popularity, cum_weights=cumulative, k=args.downloads):
+            planner.record_download(file_id, now=now)
+            live = [tuple(h) for h in files[file_id]["holders"] if tuple(h) in online]
+            if not live:
+                failed += 1
+                continue
+            for holder in live:
+                load[holder] += 1 / len(live)
+        served.update(load)
+        if load and tick >= warmup:
+            ratios.append(max(load.values()) / (sum(load.values()) / len(online)))
+
+        if replicate:
+            for peer in rng.sample(sorted(online), len(online)): # peers ask at their own times
+                in_flight += [(file_id, peer) for file_id in planner.assign(peer, files, now=now)]
+
+    downloads = args.ticks * args.downloads
+    return {"failed": failed / downloads, "top_share": max(served.values()) / sum(served.values()),
+            "max_mean": sum(ratios) / len(ratios), "replication": replication_bytes / downloads,
+            "replicas": sum(len(info["holders"]) for info in files.values()) / len(files)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--peers", type=int, default=50)
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of file popularity")
+    parser.add_argument("--ticks", type=int, default=240, help="simulated minutes")
+    parser.add_argument("--downloads", type=int, default=60, help="downloads per tick")
+    parser.add_argument("--offline", type=float, default=0.1, help="chance a peer is offline in a tick")
+    parser.add_argument("--max-replicas", type=int, default=Config.REPLICATION_MAX_REPLICAS)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    Config.REPLICATION_MAX_REPLICAS = args.max_replicas
+
+    print(f"{'mode':>12}{'failed':>9}{'top peer share':>16}{'tick max/mean':>15}"
+          f"{'copies/download':>17}{'holders/file':>14}")
+    for replicate in (False, True):
+        result = simulate(args, replicate)
+        print(f"{'replication' if replicate else 'owner only':>12}{result['failed']:>9.1%}{result['top_share']:>16.1%}"
+              f"{result['max_mean']:>15.1f}{result['replication']:>17.3f}{result['replicas']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
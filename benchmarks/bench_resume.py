@@ -0,0 +1,90 @@
+"""
+Cost of finishing a DOWNLOAD that was cut off part-way: restarting from byte 0 (the old
+behaviour) vs resuming from the partial ciphertext kept next to the destination.
+
+    python benchmarks/bench_resume.py --size-mb 512 --cut-at 0.95
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+class CountingSocket:
+    """Counts received bytes and drops the connection once `limit` is reached."""
+    def __init__(self, sock, stats, limit):
+        self.sock, self.stats, self.limit = sock, stats, limit
+    def recv(self, bufsize):
+        data = self.sock.recv(self._allow(bufsize))
+        self.stats["bytes"] += len(data)
+        return data
+    def recv_into(self, buffer, nbytes=0):
+        n = self.sock.recv_into(buffer, self._allow(nbytes or len(buffer)))
+        self.stats["bytes"] += n
+        return n
+    def _allow(self, size):
+        if self.limit is not None and self.stats["bytes"] >= self.limit:
+            raise ConnectionResetError("cut")
+        return size if self.limit is None else min(size, self.limit - self.stats["bytes"])
+    def __getattr__(self, attr):
+        return getattr(self.sock, attr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--cut-at", type=float, default=0.95)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as shared_dir, tempfile.TemporaryDirectory() as download_dir:
+        Config.SHARED_FILES_DIR = shared_dir
+        with open(os.path.join(shared_dir, "payload.bin"), "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        peer = FileSharePeer(0)
+        address = (peer.host, peer.port)
+        print(f"{'recovery':<10}{'MB':>7}{'cut at':>8}{'MB received':>13}{'wall s':>9}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            threading.Thread(target=peer.start_peer, daemon=True).start()
+            time.sleep(0.1)
+            results = []
+            for label in ("restart", "resume"):
+                client = FileShareClient()
+                real_connect = client._connect_socket
+                stats = {"bytes": 0}
+                limit = [int(size * args.cut_at)]
+                def connect(host, port):
+                    return CountingSocket(real_connect(host, port), stats, limit[0])
+                client._connect_socket = connect
+                part_path = os.path.join(download_dir, f"{label}.part")
+
+                start = time.perf_counter()
+                try:
+                    client._receive_ciphertext_resumable(address, "0", part_path)
+                except ConnectionError:
+                    pass
+                limit[0] = None
+                if label == "restart":
+                    client._discard_partial_download(part_path)
+                client._receive_ciphertext_resumable(address, "0", part_path)
+                results.append((label, stats["bytes"], time.perf_counter() - start))
+                client._discard_partial_download(part_path)
+            time.sleep(0.1)
+        for label, received, wall in results:
+            print(f"{label:<10}{args.size_mb:>7}{args.cut_at:>8.0%}{received / 2**20:>13.0f}{wall:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-request cost of DOWNLOAD path lookup and GET_PEER_FILES listing vs shared-directory size:
+listdir()+stat() on every request vs the in-memory SharedFileIndex.
+
+    python benchmarks/bench_shared_index.py --sizes 1000 10000 50000
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.peer.shared_index import SharedFileIndex
+from src.peer.strategies.download_strategy import DownloadStrategy
+from src.peer.strategies.get_peer_files_strategy import GetPeerFilesStrategy
+
+
+def legacy_get_file_path(file_id, shared_files_path):
+    """DownloadStrategy.get_file_path before the index."""
+    files = sorted([f for f in os.listdir(shared_files_path) if os.path.isfile(os.path.join(shared_files_path, f))])
+    return os.path.join(shared_files_path, files[file_id])
+
+
+def legacy_list(shared_files_path):
+    """GetPeerFilesStrategy listing before the index."""
+    files = [f for f in os.listdir(shared_files_path) if os.path.isfile(os.path.join(shared_files_path, f)) and not f.startswith('.')]
+    return [{"filename": f, "size": os.path.getsize(os.path.join(shared_files_path, f))} for f in sorted(files)]
+
+
+def per_call_us(fn, repeat):
+    start = time.perf_counter()
+    for i in range(repeat):
+        fn(i)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    download, listing = DownloadStrategy(), GetPeerFilesStrategy()
+    print(f"{'files':>8}{'build ms':>10}{'lookup old us':>15}{'lookup new us':>15}{'list old ms':>13}{'list new ms':>13}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as shared_dir:
+            for i in range(size):
+                with open(os.path.join(shared_dir, f"file_{i:07d}.bin"), "wb") as f:
+                    f.write(b"x" * (i % 512))
+            time.sleep(0.1) # step out of the index's racy-mtime window
+
+            start = time.perf_counter()
+            SharedFileIndex.for_directory(shared_dir)
+            build_ms = (time.perf_counter() - start) * 1e3
+
+            repeat = max(5, args.requests * 1000 // size)
+            old_lookup = per_call_us(lambda i: legacy_get_file_path(i % size, shared_dir), repeat)
+            new_lookup = per_call_us(lambda i: download.get_file_path(str(i % size), shared_dir), args.requests * 10)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                old_list = per_call_us(lambda i: legacy_list(shared_dir), repeat) / 1e3
+                new_list = per_call_us(lambda i: listing.list_shared_files(shared_dir), repeat) / 1e3
+            print(f"{size:>8}{build_ms:>10.1f}{old_lookup:>15.1f}{new_lookup:>15.1f}{old_list:>13.2f}{new_list:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Aggregate download throughput of a swarm download vs the number of holders.
+
+Each holder is a separate peer process on loopback with its own shared directory. Loopback
+has no real uplink limit, so every peer paces its sends to --uplink-mbps to stand in for a
+home connection; the swarm should scale roughly linearly until the client becomes the limit.
+
+    python benchmarks/bench_swarm.py --size-mb 256 --holders 1 2 4 8 --uplink-mbps 50
+"""
+import argparse
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.client.swarm import SwarmDownload
+from src.peer.content_store import ContentStore
+from src.peer.fileshare_peer import FileSharePeer
+from src.peer.strategies.download_strategy import DownloadStrategy
+
+
+def paced_send(uplink_bytes_per_s):
+    """Replacement for DownloadStrategy.send_file_contents that sends at most `uplink_bytes_per_s`."""
+    def send_file_contents(self, client_socket, f, offset=0, count=None):
+        f.seek(offset)
+        remaining = count
+        start, sent = time.perf_counter(), 0
+        while remaining is None or remaining > 0:
+            chunk = f.read(Config.CHUNK_SIZE if remaining is None else min(Config.CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            client_socket.sendall(chunk)
+            sent += len(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+            ahead = sent / uplink_bytes_per_s - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+    return send_file_contents
+
+
+def run_peer(shared_dir, uplink_bytes_per_s, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    DownloadStrategy.send_file_contents = paced_send(uplink_bytes_per_s)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--holders", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--uplink-mbps", type=float, default=50, help="per-peer upload cap in MB/s")
+    parser.add_argument("--piece-mb", type=int, default=4)
+    args = parser.parse_args()
+
+    ciphertext = os.urandom(args.size_mb * 1024 * 1024)
+    file_hash = hashlib.sha256(ciphertext).hexdigest() # the content store key
+    root = tempfile.mkdtemp()
+    processes, holders = [], []
+    try:
+        for i in range(max(args.holders)):
+            shared_dir = os.path.join(root, f"peer{i}")
+            store = ContentStore.for_directory(shared_dir)
+            tmp_path = store.new_temp_path()
+            with open(tmp_path, "wb") as f:
+                f.write(ciphertext)
+            store.commit(tmp_path, file_hash, "payload.bin")
+
+            port_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=run_peer, args=(shared_dir, args.uplink_mbps * 2**20, port_queue), daemon=True)
+            process.start()
+            processes.append(process)
+            holders.append((Config.PEER_HOST, port_queue.get()))
+        time.sleep(0.2)
+
+        client = FileShareClient()
+        print(f"{'holders':>8}{'MB':>7}{'wall s':>9}{'MB/s':>9}{'speedup':>9}  pieces per holder")
+        baseline = None
+        for count in args.holders:
+            swarm = SwarmDownload(client, holders[:count], "0", len(ciphertext), file_hash=file_hash,
+                                  piece_size=args.piece_mb * 2**20)
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                data = swarm.run()
+                wall = time.perf_counter() - start
+            assert hashlib.sha256(data).hexdigest() == file_hash
+            rate = args.size_mb / wall
+            baseline = baseline or rate
+            pieces = " ".join(str(stats["pieces"]) for stats in swarm.holder_stats.values())
+            print(f"{count:>8}{args.size_mb:>7}{wall:>9.2f}{rate:>9.0f}{rate / baseline:>8.1f}x  {pieces}")
+    finally:
+        for process in processes:
+            process.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
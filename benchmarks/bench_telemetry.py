@@ -0,0 +1,129 @@
+"""
+Cost of the peer's always-on telemetry (the counters served by STATS).
+
+First the raw cost of the hooks: a request_done() per request and a connection_opened()/
+connection_closed() pair per connection, from --threads threads at once. Then the end-to-end
+effect: --files small keep-alive DOWNLOADs against a peer with its telemetry on and with it
+replaced by no-op hooks, plus the peer's own latency report fetched with STATS.
+
+    python benchmarks/bench_telemetry.py --files 2000 --size-kb 4 --threads 1 8
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils.commands_enum import Commands
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+from src.peer.telemetry import PeerTelemetry
+
+
+class NoTelemetry(PeerTelemetry):
+    """Hooks that do nothing, for the baseline."""
+    def connection_opened(self, sock): pass
+    def connection_closed(self, sock): pass
+    def request_done(self, command, seconds, failure=None): pass
+    def failure(self, kind): pass
+
+
+def run_peer(shared_dir, telemetry, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        if not telemetry:
+            peer.telemetry = NoTelemetry()
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def hook_cost(threads, calls):
+    """Nanoseconds per request_done(), and per open/close pair on a real socket."""
+    telemetry = PeerTelemetry()
+    sock = socket.socket()
+
+    def requests():
+        for i in range(calls):
+            telemetry.request_done(Commands.DOWNLOAD, i * 1e-6)
+
+    def connections():
+        for _ in range(calls // 10):
+            telemetry.connection_opened(sock)
+            telemetry.connection_closed(sock)
+
+    results = []
+    for work, count in ((requests, calls), (connections, calls // 10)):
+        workers = [threading.Thread(target=work) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        results.append((time.perf_counter() - start) / (count * threads) * 1e9)
+    sock.close()
+    return results
+
+
+def download_latencies(shared_dir, files, telemetry):
+    port_queue = multiprocessing.Queue()
+    peer = multiprocessing.Process(target=run_peer, args=(shared_dir, telemetry, port_queue), daemon=True)
+    peer.start()
+    address = (Config.PEER_HOST, port_queue.get())
+    time.sleep(0.2)
+    try:
+        client = FileShareClient()
+        latencies = []
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            client._receive_ciphertext(address, "0") # warm-up
+            for i in range(files):
+                t0 = time.perf_counter()
+                client._receive_ciphertext(address, str(i))
+                latencies.append(time.perf_counter() - t0)
+            stats = client.get_peer_stats(address) if telemetry else None
+        client.close_connections()
+    finally:
+        peer.terminate()
+    latencies.sort()
+    return latencies, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=4)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    print(f"{'threads':<9}{'request_done ns':>16}{'open+close ns':>15}")
+    for threads in args.threads:
+        request_ns, connection_ns = hook_cost(threads, args.calls)
+        print(f"{threads:<9}{request_ns:>16.0f}{connection_ns:>15.0f}")
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        for i in range(args.files):
+            with open(os.path.join(shared_dir, f"file{i:06d}.bin"), "wb") as f:
+                f.write(os.urandom(args.size_kb * 1024))
+
+        print(f"\n{'telemetry':<11}{'requests':>9}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+        for label, telemetry in (("off", False), ("on", True)):
+            latencies, stats = download_latencies(shared_dir, args.files, telemetry)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{label:<11}{args.files:>9}{statistics.median(latencies) * 1000:>9.3f}"
+                  f"{p99 * 1000:>9.3f}{len(latencies) / sum(latencies):>9.0f}")
+        download = stats["commands"]["DOWNLOAD"]
+        print(f"\npeer-side DOWNLOAD latency from STATS: p50 {download['p50_ms']} ms, p99 {download['p99_ms']} ms "
+              f"over {download['count']} requests; bytes out {stats['bytes']['out']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Throughput of DOWNLOAD and UPLOAD transfers: legacy DONE-sentinel protocol vs length-prefixed framing.
+
+The legacy receivers decode every chunk as UTF-8 to look for the DONE sentinel; the framed
+receivers read the size header and then count raw bytes. Payload bytes are discarded on the
+client side so the numbers reflect protocol overhead, not memory growth.
+
+    python benchmarks/bench_transfer_framing.py --size-mb 1024
+"""
+import argparse
+import contextlib
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils.commands_enum import Commands
+from src.utils.framing import FramedReader, STATUS_OK, format_command, pack_header
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def download_legacy(address):
+    sock = socket.create_connection(address)
+    sock.sendall(f"{Commands.DOWNLOAD}\n0\n".encode())
+    received = 0
+    while True:
+        chunk = sock.recv(Config.CHUNK_SIZE)
+        if not chunk or chunk.decode(errors='ignore').strip() == str(Commands.DONE):
+            break
+        received += len(chunk)
+    sock.close()
+    return received
+
+
+def download_framed(address):
+    sock = socket.create_connection(address)
+    sock.sendall(f"{format_command(Commands.DOWNLOAD, 2)}\n0\n".encode())
+    reader = FramedReader(sock)
+    header = reader.read_header()
+    received = sum(len(chunk) for chunk in reader.iter_payload(header.size))
+    sock.close()
+    return received
+
+
+def upload_legacy(address, size):
+    block = os.urandom(Config.CHUNK_SIZE)
+    sock = socket.create_connection(address)
+    sock.sendall(f"{Commands.UPLOAD}\nupload.bin\n".encode())
+    for sent in range(0, size, len(block)):
+        sock.sendall(block[:size - sent])
+    sock.close()
+
+
+def upload_framed(address, size):
+    block = os.urandom(Config.CHUNK_SIZE)
+    sock = socket.create_connection(address)
+    sock.sendall(f"{format_command(Commands.UPLOAD, 2)}\nupload.bin\n".encode())
+    reader = FramedReader(sock)
+    reader.read_header()
+    sock.sendall(pack_header(size))
+    for sent in range(0, size, len(block)):
+        sock.sendall(block[:size - sent])
+    assert reader.read_header().status == STATUS_OK
+    sock.close()
+
+
+def wait_for_upload(path, size):
+    """Legacy uploads have no acknowledgement, so poll until the peer has written everything."""
+    while not os.path.exists(path) or os.path.getsize(path) < size:
+        time.sleep(0.001)
+
+
+def measure(fn):
+    wall, cpu = time.perf_counter(), time.process_time()
+    fn()
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    args = parser.parse_args()
+    size = args.size_mb * 1024 * 1024
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        Config.SHARED_FILES_DIR = shared_dir
+        source = os.path.join(shared_dir, "a_source.bin")
+        with open(source, "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        peer = FileSharePeer(0)
+        address = (peer.host, peer.port)
+        uploaded = os.path.join(shared_dir, "upload.bin")
+
+        runs = [
+            ("download legacy", lambda: download_legacy(address)),
+            ("download framed", lambda: download_framed(address)),
+            ("upload legacy", lambda: (upload_legacy(address, size), wait_for_upload(uploaded, size))),
+            ("upload framed", lambda: upload_framed(address, size)),
+        ]
+
+        print(f"{'transfer':<18}{'MB':>7}{'wall s':>9}{'MB/s':>9}{'cpu s/GB':>10}")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            threading.Thread(target=peer.start_peer, daemon=True).start()
+            time.sleep(0.1)
+            results = []
+            for label, fn in runs:
+                if os.path.exists(uploaded):
+                    os.remove(uploaded)
+                results.append((label, *measure(fn)))
+            time.sleep(0.1) # let the peer thread finish logging the last transfer
+        for label, wall, cpu in results:
+            print(f"{label:<18}{args.size_mb:>7}{wall:>9.2f}{args.size_mb / wall:>9.0f}{cpu / (size / 2**30):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
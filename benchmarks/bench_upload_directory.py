@@ -0,0 +1,150 @@
+"""
+Uploading a directory tree: one upload_file() per file vs upload_directory().
+
+A registry and a peer run in their own processes on loopback; the registry does not
+persist its data unless --persist is given (it rewrites its whole data file after every
+registration). For each workload, a tree of --small-files files of --small-kb KB and one
+of --large-files files of --large-mb MB, one user uploads a fresh tree of random files
+three ways: the upload_file() loop with keep-alive off (a new peer connection and a
+REGISTER_FILE round trip per file), the same loop over pooled keep-alive connections, and
+upload_directory(), where --workers processes read, hash, compress and encrypt the files
+while the client sends them over one pooled connection and registers them all in one
+REGISTER_FILES request. Times include registration.
+
+    python benchmarks/bench_upload_directory.py --small-files 2000 --small-kb 4 --large-files 8 --large-mb 32 --workers 0
+"""
+import argparse
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+import src.central_registry.registry as registry
+import src.client.fileshare_client as fileshare_client
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_registry(data_file, port, persist):
+    logging.disable(logging.WARNING)
+    registry.REGISTRY_DATA_FILE = data_file
+    if not persist:
+        registry.save_registry_data = lambda: None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        registry.start_registry_server(Config.REGISTRY_IP, port)
+
+
+def run_peer(shared_dir, port_queue):
+    logging.disable(logging.WARNING)
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLOAD_FSYNC = False
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((Config.REGISTRY_IP, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(address):
+    for _ in range(100):
+        try:
+            socket.create_connection(address).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Nothing listening on {address}")
+
+
+def make_tree(path, files, size):
+    """Writes `files` random files of `size` bytes, 100 to a subdirectory (fresh content, so the peer stores every one)."""
+    for i in range(files):
+        filepath = os.path.join(path, f"d{i // 100:03}", f"file{i:05}.bin")
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "wb") as f:
+            f.write(os.urandom(size))
+
+
+def upload_loop(client, path):
+    for directory, _, filenames in os.walk(path):
+        for filename in filenames:
+            assert client.upload_file(os.path.join(directory, filename))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--small-files", type=int, default=2000)
+    parser.add_argument("--small-kb", type=float, default=4)
+    parser.add_argument("--large-files", type=int, default=8)
+    parser.add_argument("--large-mb", type=float, default=32)
+    parser.add_argument("--workers", type=int, default=0, help="Config.CLIENT_UPLOAD_WORKERS (0: one per CPU)")
+    parser.add_argument("--persist", action="store_true", help="let the registry save its data file after every change")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    Config.CLIENT_UPLOAD_WORKERS = args.workers
+
+    root = tempfile.mkdtemp()
+    fileshare_client.REGISTRY_PORT = free_port()
+    registry_process = multiprocessing.Process(target=run_registry, daemon=True,
+                                               args=(os.path.join(root, "registry.json"), fileshare_client.REGISTRY_PORT,
+                                                     args.persist))
+    port_queue = multiprocessing.Queue()
+    peer_process = multiprocessing.Process(target=run_peer, args=(os.path.join(root, "shared"), port_queue), daemon=True)
+    try:
+        registry_process.start()
+        peer_process.start()
+        client = FileShareClient()
+        client.peer_address = (Config.PEER_HOST, port_queue.get())
+        wait_for((Config.REGISTRY_IP, fileshare_client.REGISTRY_PORT))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            assert client.register_user("bench", "bench-password") and client.login_user("bench", "bench-password")
+
+        print(f"{os.cpu_count()} CPUs, {args.workers or os.cpu_count()} upload workers")
+        workloads = ((args.small_files, int(args.small_kb * 1024), f"{args.small_kb:g} KB"),
+                     (args.large_files, int(args.large_mb * 2**20), f"{args.large_mb:g} MB"))
+        methods = (("upload_file loop, no keep-alive", False, False),
+                   ("upload_file loop, keep-alive", True, False),
+                   ("upload_directory", True, True))
+        for files, size, label in workloads:
+            total_mb = files * size / 2**20
+            print(f"\n{files} files of {label}")
+            print(f"{'method':>34}{'seconds':>10}{'files/s':>10}{'MB/s':>8}")
+            baseline = None
+            for run, (method, keepalive, directory) in enumerate(methods):
+                Config.CLIENT_KEEPALIVE = keepalive
+                client.close_connections()
+                tree = os.path.join(root, f"tree-{label}-{run}")
+                make_tree(tree, files, size)
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    start = time.perf_counter()
+                    if directory:
+                        file_ids, errors = client.upload_directory(tree)
+                        assert len(file_ids) == files and not errors
+                    else:
+                        upload_loop(client, tree)
+                    seconds = time.perf_counter() - start
+                shutil.rmtree(tree)
+                baseline = baseline or seconds
+                print(f"{method:>34}{seconds:>10.2f}{files / seconds:>10.0f}{total_mb / seconds:>8.1f}"
+                      f"  ({baseline / seconds:.1f}x)")
+        client.close_connections()
+    finally:
+        peer_process.terminate()
+        registry_process.terminate()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Sustained UPLOAD throughput while other clients list the peer's shared directory non-stop.
+
+The peer runs in its own process with --files existing shared files (so each GET_PEER_FILES
+is a sizeable listing); --listers processes request listings in a tight loop while this
+process uploads --uploads files of --size-mb each. Every listing is also checked for
+uploads that show up before they are complete ("torn" entries) - there should be none.
+Rows are repeated with and without the fsync before each upload is published.
+
+    python benchmarks/bench_upload_listing.py --uploads 20 --size-mb 64 --listers 0 4 --files 5000
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.client.fileshare_client import FileShareClient
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, fsync, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_UPLOAD_FSYNC = fsync
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def run_lister(address, upload_size, stop, results):
+    client = FileShareClient()
+    listings = torn = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        while not stop.is_set():
+            listings += 1
+            torn += sum(1 for entry in client.iter_peer_files(address)
+                        if entry["filename"].startswith("upload_") and entry["size"] != upload_size)
+    results.put((listings, torn))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--listers", type=int, nargs="+", default=[0, 4])
+    parser.add_argument("--files", type=int, default=5000, help="files already in the shared directory")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    print(f"{'fsync':<7}{'listers':>8}{'uploads':>9}{'MB/s':>9}{'listings/s':>12}{'torn':>6}")
+    for fsync in (True, False):
+        for listers in args.listers:
+            with tempfile.TemporaryDirectory() as shared_dir:
+                for i in range(args.files):
+                    with open(os.path.join(shared_dir, f"existing_{i:06d}.bin"), "wb") as f:
+                        f.write(b"x" * 100)
+                port_queue = multiprocessing.Queue()
+                peer = multiprocessing.Process(target=run_peer, args=(shared_dir, fsync, port_queue), daemon=True)
+                peer.start()
+                address = (Config.PEER_HOST, port_queue.get())
+                time.sleep(0.2)
+
+                stop, results = multiprocessing.Event(), multiprocessing.Queue()
+                lister_processes = [multiprocessing.Process(target=run_lister, args=(address, len(payload), stop, results), daemon=True)
+                                    for _ in range(listers)]
+                try:
+                    for process in lister_processes:
+                        process.start()
+                    time.sleep(0.5 if listers else 0)
+
+                    client = FileShareClient()
+                    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                        start = time.perf_counter()
+                        for i in range(args.uploads):
+                            client._send_ciphertext(address, f"upload_{i:04d}.bin", payload)
+                        wall = time.perf_counter() - start
+
+                    stop.set()
+                    counts = [results.get() for _ in lister_processes]
+                    listings, torn = sum(c[0] for c in counts), sum(c[1] for c in counts)
+                    print(f"{'on' if fsync else 'off':<7}{listers:>8}{args.uploads:>9}"
+                          f"{args.uploads * args.size_mb / wall:>9.0f}{listings / wall:>12.0f}{torn:>6}")
+                finally:
+                    stop.set()
+                    for process in lister_processes:
+                        process.join(5)
+                    peer.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Peer CPU cost and loopback throughput of serving DOWNLOADs: read()+sendall() vs zero-copy sendfile().
+
+The peer runs in its own process so its CPU time (from /proc/<pid>/stat) is measured apart
+from the client that drains the socket.
+
+    python benchmarks/bench_zero_copy.py --size-mb 1024 --rounds 3
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.config import Config
+from src.utils.commands_enum import Commands
+from src.utils.framing import FramedReader, format_command
+from src.peer.fileshare_peer import FileSharePeer
+
+
+def run_peer(shared_dir, zero_copy, port_queue):
+    Config.SHARED_FILES_DIR = shared_dir
+    Config.PEER_ZERO_COPY_SEND = zero_copy
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        peer = FileSharePeer(0)
+        port_queue.put(peer.port)
+        peer.start_peer()
+
+
+def process_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK") # utime + stime
+
+
+def download(port, buffer):
+    sock = socket.create_connection((Config.PEER_HOST, port))
+    sock.sendall(f"{format_command(Commands.DOWNLOAD, 2)}\n0\n".encode())
+    reader = FramedReader(sock)
+    header = reader.read_header()
+    remaining = header.size
+    if reader.pending: # payload bytes that arrived together with the header
+        remaining -= len(reader.recv(reader.pending))
+    view = memoryview(buffer)
+    while remaining:
+        n = sock.recv_into(view, min(len(view), remaining))
+        if not n:
+            raise ConnectionError("short read")
+        remaining -= n
+    sock.close()
+    return header.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        with open(os.path.join(shared_dir, "payload.bin"), "wb") as f:
+            block = os.urandom(1024 * 1024)
+            for _ in range(args.size_mb):
+                f.write(block)
+
+        buffer = bytearray(1024 * 1024)
+        print(f"{'serve path':<18}{'GB sent':>9}{'peak MB/s':>11}{'mean MB/s':>11}{'peer cpu s/GB':>15}")
+        for label, zero_copy in (("read+sendall", False), ("sendfile", True)):
+            port_queue = multiprocessing.Queue()
+            peer = multiprocessing.Process(target=run_peer, args=(shared_dir, zero_copy, port_queue), daemon=True)
+            peer.start()
+            port = port_queue.get()
+            time.sleep(0.1)
+
+            download(port, buffer) # warm the page cache
+            cpu_before = process_cpu_seconds(peer.pid)
+            rates, total = [], 0
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                total += download(port, buffer)
+                rates.append(args.size_mb / (time.perf_counter() - start))
+            cpu = process_cpu_seconds(peer.pid) - cpu_before
+            peer.terminate()
+            peer.join()
+
+            gigabytes = total / 2**30
+            print(f"{label:<18}{gigabytes:>9.1f}{max(rates):>11.0f}{sum(rates) / len(rates):>11.0f}{cpu / gigabytes:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
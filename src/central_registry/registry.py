@@ -1,13 +1,16 @@
 import socket
 import threading
 import json
+import ntpath
 import sys, os
 import atexit # for saving data on exit
 # Add parent directory to sys.path to import modules from src
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from src.utils.config import Config
 from src.utils.commands_enum import Commands
+from src.central_registry.replication import ReplicationPlanner
 from src.utils.crypto_utils import *
+from src.utils.logging_utils import get_logger, setup_logging
 
 REGISTRY_ADDRESS = Config.REGISTRY_IP
 REGISTRY_PORT = Config.REGISTRY_PORT
@@ -16,8 +19,13 @@ REGISTRY_DATA_FILE = Config.REGISTRY_DATA_FILE
 REGISTERED_PEERS = {}   # {username: (host, port)}
 USER_CREDENTIALS = {}   # {username: {hashed_password, salt, key}}
 USER_SESSIONS = {}      # {session_id: username}            NB: sessions are not persisted
-SHARED_FILES = {}       # {file_id: {filename: , owner: , owner_addr: , file_hash: , allowed_users: []}}
+SHARED_FILES = {}       # {file_id: {filename: , owner: , owner_addr: , file_hash: , content_hash: , size: , codec: , merkle_root: , chunk_size: , format: , revision: , revisions: [], holders: [], allowed_users: []}}
+# per-version fields of a file entry; UPDATE_FILE replaces them and keeps the old values in "revisions"
+REVISION_FIELDS = ("file_hash", "content_hash", "size", "codec", "merkle_root", "chunk_size", "format")
 FILE_ID_COUNTER = 0
+REPLICATION = ReplicationPlanner() # download demand and replica assignments; not persisted
+
+logger = get_logger("registry")
 
 def load_registry_data():
     """Loads registry data from the persistence file on startup."""
@@ -30,18 +38,18 @@ def load_registry_data():
                 USER_CREDENTIALS = data.get("user_credentials", {})
                 SHARED_FILES = data.get("shared_files", {})
                 FILE_ID_COUNTER = data.get("file_id_counter", 0)
-            print(f"Registry: Data loaded successfully from {REGISTRY_DATA_FILE}")
+            logger.info("Data loaded successfully from %s", REGISTRY_DATA_FILE)
         else:
-            print(f"Registry: No data file found at {REGISTRY_DATA_FILE}. Starting with empty data.")
+            logger.info("No data file found at %s. Starting with empty data.", REGISTRY_DATA_FILE)
     except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Registry Error loading data: {e}. Starting with empty data.")
+        logger.error("Error loading data: %s. Starting with empty data.", e)
         # Initialize with empty data if loading fails
         REGISTERED_PEERS = {}
         USER_CREDENTIALS = {}
         SHARED_FILES = {}
         FILE_ID_COUNTER = 0
     except Exception as e:
-        print(f"Registry unexpected error during data loading: {e}. Starting with empty data.")
+        logger.error("Unexpected error during data loading: %s. Starting with empty data.", e)
         # Initialize with empty data if loading fails
         REGISTERED_PEERS = {}
         USER_CREDENTIALS = {}
@@ -59,38 +67,96 @@ def save_registry_data():
     try:
         with open(REGISTRY_DATA_FILE, 'w') as f:
             json.dump(data, f, indent=4)
-        print(f"Registry: Data saved successfully to {REGISTRY_DATA_FILE}")
+        logger.debug("Data saved successfully to %s", REGISTRY_DATA_FILE)
     except IOError as e:
-        print(f"Registry Error saving data to {REGISTRY_DATA_FILE}: {e}")
+        logger.error("Error saving data to %s: %s", REGISTRY_DATA_FILE, e)
     except Exception as e:
-        print(f"Registry unexpected error during data saving: {e}")
+        logger.error("Unexpected error during data saving: %s", e)
+
+
+
+def file_holders(file_info):
+    """Peers holding a copy of a file; entries registered before holders were tracked only have the owner."""
+    return file_info.setdefault("holders", [list(file_info["owner_address"])])
+
+
+def is_safe_filename(filename):
+    """
+    True for a relative name that stays inside whatever directory a downloader saves it
+    under ("photos/2024/a.jpg"); absolute names, drive names and ".." components are not.
+    """
+    if not isinstance(filename, str) or not filename:
+        return False
+    parts = filename.replace("\\", "/").split("/")
+    return not filename.startswith(("/", "\\")) and not ntpath.splitdrive(filename)[0] and os.pardir not in parts
+
+
+def new_file_entry(request, username, owner_address):
+    """A SHARED_FILES entry for a newly uploaded file, from the fields of a REGISTER_FILE(S) request."""
+    return {
+        "filename": request["filename"],
+        "owner": username,
+        "owner_address": tuple(owner_address),
+        "file_hash": request["file_hash"],
+        "content_hash": request.get("content_hash"), # SHA-256 of the stored ciphertext; peers' content stores are keyed by it
+        "size": request.get("size"), # stored (encrypted) size in bytes, used to split swarm downloads
+        "codec": request.get("codec"), # compression under the encryption; None for files from older clients
+        "merkle_root": request.get("merkle_root"), # over the stored ciphertext, in chunk_size leaves
+        "chunk_size": request.get("chunk_size"),
+        "format": request.get("format"), # how the stored bytes are laid out (see src/utils/delta.py); None is "stream"
+        "revision": 0,
+        "revisions": [],
+        "holders": [list(owner_address)],
+        "allowed_users": [username] # owner has access by default
+    }
+
 
+def read_request(client_socket):
+    """
+    Reads one JSON request. Batch requests span several reads; the request is complete once
+    it parses (or the client hangs up).
+
+    Raises:
+        json.JSONDecodeError: If the request is not valid JSON.
+        ValueError: If it grows past Config.REGISTRY_MAX_REQUEST_SIZE without parsing.
+    """
+    data = bytearray()
+    while chunk := client_socket.recv(64 * 1024):
+        data += chunk
+        if data.rstrip().endswith(b"}"):
+            try:
+                return json.loads(data.decode())
+            except json.JSONDecodeError:
+                pass
+        if len(data) > Config.REGISTRY_MAX_REQUEST_SIZE:
+            raise ValueError(f"Request exceeds {Config.REGISTRY_MAX_REQUEST_SIZE} bytes")
+    return json.loads(data.decode())
 
 
 def handle_client(client_socket):
     global FILE_ID_COUNTER
     # print("Registry: A client has connected") # Keep logging minimal unless debugging
     try:
-        data = client_socket.recv(1024).decode()
-        request = json.loads(data)
+        request = read_request(client_socket)
         command_str = request.get("command")
         command = Commands.from_string(command_str)
 
         # --- Authentication Check for commands requiring login ---
         # these commands require a valid session_id
         commands_requiring_auth = [
-            Commands.REGISTER_FILE, Commands.GET_FILES, Commands.REQUEST_KEY,
-            Commands.SHARE_FILE, Commands.REVOKE_ACCESS, Commands.CHECK_ACCESS
+            Commands.REGISTER_FILE, Commands.REGISTER_FILES, Commands.GET_FILES, Commands.REQUEST_KEY, Commands.REQUEST_KEYS,
+            Commands.SHARE_FILE, Commands.REVOKE_ACCESS, Commands.CHECK_ACCESS, Commands.REGISTER_HOLDER,
+            Commands.UNREGISTER_HOLDER, Commands.UPDATE_FILE, Commands.GET_REPLICATION_TASKS
         ]
         session_id = request.get("session_id")
         username = None
         if command in commands_requiring_auth:
             if session_id not in USER_SESSIONS:
                 client_socket.send(json.dumps({"status": "ERROR", "message": "Authentication required"}).encode())
-                print(f"Registry: Authentication failed for command {command_str} (Invalid session ID: {session_id})")
+                logger.warning("Authentication failed for command %s (Invalid session ID: %s)", command_str, session_id)
                 return # Close connection after sending error
             username = USER_SESSIONS[session_id]
-            print(f"Registry: Authenticated user '{username}' for command {command_str}")
+            logger.debug("Authenticated user '%s' for command %s", username, command_str)
         # --- End Authentication Check ---
 
 
@@ -105,7 +171,7 @@ def handle_client(client_socket):
                 USER_CREDENTIALS[username_reg] = {"hashed_password": hashed_password, "salt": salt, "key": key}
                 REGISTERED_PEERS[username_reg] = peer_address
                 client_socket.send(json.dumps({"status": "OK"}).encode())
-                print(f"Registry: User {username_reg} registered")
+                logger.info("User %s registered", username_reg)
                 save_registry_data() # save data after login 
             else:
                 client_socket.send(json.dumps({"status": "ERROR", "message": "Username already exists"}).encode())
@@ -127,7 +193,7 @@ def handle_client(client_socket):
                     USER_SESSIONS[session_id] = username_login
                     REGISTERED_PEERS[username_login] = peer_address # Update peer address on login
                     client_socket.send(json.dumps({"status": "OK", "session_id": session_id, "key": stored_key}).encode())
-                    print(f"Registry: User {username_login} logged in, Session ID: {session_id}")
+                    logger.info("User %s logged in, Session ID: %s", username_login, session_id)
                     save_registry_data()
                 else:
                     client_socket.send(json.dumps({"status": "ERROR", "message": "Invalid credentials"}).encode())
@@ -154,7 +220,7 @@ def handle_client(client_socket):
             # only return peers that are currently logged in (have a session)
             active_peers = [REGISTERED_PEERS[u] for u in USER_SESSIONS.values() if u in REGISTERED_PEERS]
             client_socket.send(json.dumps(active_peers).encode())
-            print(f"Registry: Sent active peer list: {active_peers}")
+            logger.debug("Sent active peer list (%d peers).", len(active_peers))
 
         elif command == Commands.REGISTER_FILE:
             filename = request["filename"]
@@ -165,25 +231,163 @@ def handle_client(client_socket):
             if username is None: # should not happen due to auth check but safety first
                  client_socket.send(json.dumps({"status": "ERROR", "message": "User not authenticated"}).encode())
                  return
+            if not is_safe_filename(filename):
+                 client_socket.send(json.dumps({"status": "ERROR", "message": f"Unsafe filename {filename!r}"}).encode())
+                 return
 
             # ensure the owner_address matches the registered peer address for the user
             if username in REGISTERED_PEERS and REGISTERED_PEERS[username] != tuple(owner_address):
-                 print(f"Registry: WARNING - Registered file owner address mismatch! User: {username}, Sent: {owner_address}, Registered: {REGISTERED_PEERS[username]}")
+                 logger.warning("Registered file owner address mismatch! User: %s, Sent: %s, Registered: %s", username, owner_address, REGISTERED_PEERS[username])
             
 
             file_id = FILE_ID_COUNTER
-            SHARED_FILES[file_id] = {
-                "filename": filename,
-                "owner": username, 
-                "owner_address": tuple(owner_address),
-                "file_hash": file_hash,
-                "allowed_users": [username] # owner has access by default
-            }
+            SHARED_FILES[file_id] = new_file_entry(request, username, owner_address)
             FILE_ID_COUNTER += 1
             client_socket.send(json.dumps({"status": "OK", "file_id": file_id}).encode())
-            print(f"Registry: File '{filename}' (Owner: {username}) registered with ID: {file_id}")
+            logger.info("File '%s' (Owner: %s) registered with ID: %s", filename, username, file_id)
             save_registry_data() 
 
+        elif command == Commands.REGISTER_FILES:
+            # REGISTER_FILE for every file of a directory upload; all or none are registered, with one save
+            files = request.get("files")
+            owner_address = request.get("owner_address")
+            if not isinstance(files, list) or owner_address is None:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "Files or owner address not provided"}).encode())
+                 return
+            if not all(isinstance(entry, dict) and entry.get("filename") and entry.get("file_hash") for entry in files):
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "Every file needs a filename and file_hash"}).encode())
+                 return
+            unsafe = [entry["filename"] for entry in files if not is_safe_filename(entry["filename"])]
+            if unsafe:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": f"Unsafe filename {unsafe[0]!r}"}).encode())
+                 return
+            if username in REGISTERED_PEERS and REGISTERED_PEERS[username] != tuple(owner_address):
+                 logger.warning("Registered file owner address mismatch! User: %s, Sent: %s, Registered: %s", username, owner_address, REGISTERED_PEERS[username])
+
+            file_ids = list(range(FILE_ID_COUNTER, FILE_ID_COUNTER + len(files)))
+            for file_id, entry in zip(file_ids, files):
+                SHARED_FILES[file_id] = new_file_entry(entry, username, owner_address)
+            FILE_ID_COUNTER += len(files)
+            client_socket.sendall(json.dumps({"status": "OK", "file_ids": file_ids}).encode())
+            logger.info("%d files (Owner: %s) registered in one batch", len(files), username)
+            save_registry_data()
+
+        elif command == Commands.REGISTER_HOLDER:
+            file_id_str = request.get("file_id")
+            holder_address = request.get("holder_address")
+            if file_id_str is None or holder_address is None:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "File ID or holder address not provided"}).encode())
+                 return
+
+            try:
+                file_id = int(file_id_str)
+            except ValueError:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "Invalid File ID format"}).encode())
+                 return
+
+            if file_id in SHARED_FILES:
+                file_info = SHARED_FILES[file_id]
+                # a user may only register their own peer, and only for a file they may read or their
+                # peer was assigned to replicate, and only a copy that verified against its hash
+                if tuple(holder_address) != tuple(REGISTERED_PEERS.get(username, ())):
+                    client_socket.send(json.dumps({"status": "ERROR", "message": "Holder is not this user's peer"}).encode())
+                    logger.warning("Holder registration for file ID %s denied for user '%s'.", file_id, username)
+                elif (username not in file_info.get("allowed_users", [])
+                      and not REPLICATION.is_assigned(file_id, holder_address)):
+                    client_socket.send(json.dumps({"status": "ERROR", "message": "Access denied"}).encode())
+                    logger.warning("Holder registration denied for user '%s' on file ID %s.", username, file_id)
+                elif request.get("file_hash") != file_info["file_hash"]:
+                    client_socket.send(json.dumps({"status": "ERROR", "message": "File hash mismatch"}).encode())
+                    logger.warning("Holder registration for file ID %s rejected - hash mismatch.", file_id)
+                else:
+                    holders = file_holders(file_info)
+                    if list(holder_address) not in holders:
+                        holders.append(list(holder_address))
+                        save_registry_data()
+                    REPLICATION.completed(file_id, holder_address)
+                    client_socket.send(json.dumps({"status": "OK", "holders": holders}).encode())
+                    logger.info("Peer %s ('%s') now holds file ID %s (%s holders).", tuple(holder_address), username, file_id, len(holders))
+            else:
+                client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
+                logger.warning("Holder registration failed - File with ID %s not found.", file_id)
+
+        elif command == Commands.UNREGISTER_HOLDER:
+            file_id_str = request.get("file_id")
+            holder_address = request.get("holder_address")
+            if file_id_str is None or holder_address is None:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "File ID or holder address not provided"}).encode())
+                 return
+
+            try:
+                file_id = int(file_id_str)
+            except ValueError:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "Invalid File ID format"}).encode())
+                 return
+
+            if file_id in SHARED_FILES:
+                file_info = SHARED_FILES[file_id]
+                holders = file_holders(file_info)
+                # the owner's copy is the file of record; a user may only withdraw their own peer
+                if list(holder_address) == list(file_info["owner_address"]):
+                    client_socket.send(json.dumps({"status": "ERROR", "message": "The owner's copy cannot be withdrawn"}).encode())
+                elif tuple(holder_address) != tuple(REGISTERED_PEERS.get(username, ())):
+                    client_socket.send(json.dumps({"status": "ERROR", "message": "Holder is not this user's peer"}).encode())
+                    logger.warning("Holder withdrawal for file ID %s denied for user '%s'.", file_id, username)
+                else:
+                    if list(holder_address) in holders:
+                        holders.remove(list(holder_address))
+                        save_registry_data()
+                    client_socket.send(json.dumps({"status": "OK", "holders": holders}).encode())
+                    logger.info("Peer %s ('%s') no longer holds file ID %s (%s holders).", tuple(holder_address), username, file_id, len(holders))
+            else:
+                client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
+                logger.warning("Holder withdrawal failed - File with ID %s not found.", file_id)
+
+        elif command == Commands.GET_REPLICATION_TASKS:
+            peer_address = REGISTERED_PEERS.get(username)
+            if peer_address is None:
+                client_socket.send(json.dumps({"status": "ERROR", "message": "No peer registered for this user"}).encode())
+                return
+            tasks = []
+            for file_id in REPLICATION.assign(peer_address, SHARED_FILES):
+                file_info = SHARED_FILES[file_id]
+                tasks.append({"file_id": file_id, "filename": file_info["filename"], "holders": file_holders(file_info),
+                              **{field: file_info.get(field) for field in REVISION_FIELDS}})
+                logger.info("Peer %s ('%s') assigned to replicate file ID %s (target %s copies).",
+                            tuple(peer_address), username, file_id, REPLICATION.target_replicas(file_id))
+            client_socket.send(json.dumps({"status": "OK", "tasks": tasks}).encode())
+
+        elif command == Commands.UPDATE_FILE:
+            file_id_str = request.get("file_id")
+            if file_id_str is None or not request.get("file_hash") or not request.get("owner_address"):
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "File ID, file hash or owner address not provided"}).encode())
+                 return
+
+            try:
+                file_id = int(file_id_str)
+            except ValueError:
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "Invalid File ID format"}).encode())
+                 return
+
+            if file_id in SHARED_FILES:
+                file_info = SHARED_FILES[file_id]
+                if file_info["owner"] != username:
+                    client_socket.send(json.dumps({"status": "ERROR", "message": "Only the owner can update a file"}).encode())
+                    logger.warning("Update of file ID %s denied for user '%s'.", file_id, username)
+                else:
+                    file_info.setdefault("revisions", []).append({field: file_info.get(field) for field in REVISION_FIELDS})
+                    for field in REVISION_FIELDS:
+                        file_info[field] = request.get(field)
+                    file_info["revision"] = len(file_info["revisions"])
+                    file_info["owner_address"] = tuple(request["owner_address"])
+                    file_info["holders"] = [list(request["owner_address"])] # other holders only have older revisions
+                    client_socket.send(json.dumps({"status": "OK", "file_id": file_id, "revision": file_info["revision"]}).encode())
+                    logger.info("File ID %s (Owner: %s) updated to revision %s.", file_id, username, file_info['revision'])
+                    save_registry_data()
+            else:
+                client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
+                logger.warning("Update failed - File with ID %s not found.", file_id)
+
         elif command == Commands.GET_FILES:
             # filter files to only include those the requesting user is allowed to access
             accessible_files = {
@@ -191,9 +395,11 @@ def handle_client(client_socket):
                 for file_id, file_info in SHARED_FILES.items()
                 if username in file_info.get("allowed_users", [])
             }
+            for file_info in accessible_files.values():
+                file_holders(file_info)
 
-            client_socket.send(json.dumps(accessible_files).encode())
-            print(f"Registry: Sent accessible file list for user '{username}': {accessible_files}")
+            client_socket.sendall(json.dumps(accessible_files).encode())
+            logger.debug("Sent accessible file list for user '%s' (%d files).", username, len(accessible_files))
 
 
 
@@ -219,18 +425,49 @@ def handle_client(client_socket):
                          key = USER_CREDENTIALS[owner_username]["key"]
                          # print(f"Registry: Sending key for file ID {file_id} to user {username}") 
                          client_socket.send(json.dumps({"status": "OK", "key": key}).encode())
+                         REPLICATION.record_download(file_id)
                     else:
                          # this case indicates an internal inconsistency (file registered but owner credentials missing)
-                         print(f"Registry ERROR: File ID {file_id} registered to user '{owner_username}', but credentials not found.")
+                         logger.error("File ID %s registered to user '%s', but credentials not found.", file_id, owner_username)
                          client_socket.send(json.dumps({"status": "ERROR", "message": "Internal error retrieving key"}).encode())
                 else:
-                    print(f"Registry: Access denied for user '{username}' to file ID {file_id}.")
+                    logger.warning("Access denied for user '%s' to file ID %s.", username, file_id)
                     client_socket.send(json.dumps({"status": "ERROR", "message": "Access denied"}).encode())
                 # --- End Access Control Check ---
             else:
-                print(f"Registry: File with ID {file_id} not found.")
+                logger.warning("File with ID %s not found.", file_id)
                 client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
 
+        elif command == Commands.REQUEST_KEYS:
+            # CHECK_ACCESS + REQUEST_KEY for every file of a batch download in one round trip
+            file_ids = request.get("file_ids")
+            if not isinstance(file_ids, list):
+                 client_socket.send(json.dumps({"status": "ERROR", "message": "File IDs not provided"}).encode())
+                 return
+
+            keys, errors = {}, {}
+            for file_id_str in file_ids:
+                try:
+                    file_id = int(file_id_str)
+                except (TypeError, ValueError):
+                    errors[str(file_id_str)] = "Invalid File ID format"
+                    continue
+                file_info = SHARED_FILES.get(file_id)
+                if file_info is None:
+                    errors[str(file_id_str)] = "File not found"
+                elif username not in file_info.get("allowed_users", []):
+                    errors[str(file_id_str)] = "Access denied"
+                elif file_info["owner"] not in USER_CREDENTIALS:
+                    logger.error("File ID %s registered to user '%s', but credentials not found.", file_id, file_info["owner"])
+                    errors[str(file_id_str)] = "Internal error retrieving key"
+                else:
+                    keys[str(file_id_str)] = USER_CREDENTIALS[file_info["owner"]]["key"]
+                    REPLICATION.record_download(file_id)
+            if errors:
+                logger.warning("Keys refused to user '%s' for %d of %d files.", username, len(errors), len(file_ids))
+            # thousands of keys do not fit one send()
+            client_socket.sendall(json.dumps({"status": "OK", "keys": keys, "errors": errors}).encode())
+
         elif command == Commands.SHARE_FILE:
             file_id_str = request.get("file_id")
             target_username = request.get("target_username")
@@ -254,20 +491,20 @@ def handle_client(client_socket):
                         if target_username not in file_info.get("allowed_users", []):
                             file_info.setdefault("allowed_users", []).append(target_username)
                             client_socket.send(json.dumps({"status": "OK", "message": f"File shared with {target_username}"}).encode())
-                            print(f"Registry: User '{username}' shared file ID {file_id} with '{target_username}'.")
+                            logger.info("User '%s' shared file ID %s with '%s'.", username, file_id, target_username)
                             save_registry_data() 
                         else:
                             client_socket.send(json.dumps({"status": "ERROR", "message": f"File already shared with {target_username}"}).encode())
-                            print(f"Registry: File ID {file_id} already shared with '{target_username}'.")
+                            logger.debug("File ID %s already shared with '%s'.", file_id, target_username)
                     else:
                         client_socket.send(json.dumps({"status": "ERROR", "message": f"Target user '{target_username}' not found"}).encode())
-                        print(f"Registry: Share failed - Target user '{target_username}' not found.")
+                        logger.warning("Share failed - Target user '%s' not found.", target_username)
                 else:
                     client_socket.send(json.dumps({"status": "ERROR", "message": "Only the file owner can share the file"}).encode())
-                    print(f"Registry: Share failed - User '{username}' is not the owner of file ID {file_id}.")
+                    logger.warning("Share failed - User '%s' is not the owner of file ID %s.", username, file_id)
             else:
                 client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
-                print(f"Registry: Share failed - File with ID {file_id} not found.")
+                logger.warning("Share failed - File with ID %s not found.", file_id)
 
         elif command == Commands.REVOKE_ACCESS:
             file_id_str = request.get("file_id")
@@ -290,23 +527,23 @@ def handle_client(client_socket):
                     # prevent owner from revoking their own access (unless specific logic is needed)
                     if target_username == username:
                         client_socket.send(json.dumps({"status": "ERROR", "message": "Cannot revoke access for the file owner"}).encode())
-                        print(f"Registry: Revoke failed - Owner '{username}' tried to revoke their own access for file ID {file_id}.")
+                        logger.warning("Revoke failed - Owner '%s' tried to revoke their own access for file ID %s.", username, file_id)
                         return
 
                     if target_username in file_info.get("allowed_users", []):
                         file_info["allowed_users"].remove(target_username)
                         client_socket.send(json.dumps({"status": "OK", "message": f"Access revoked for {target_username}"}).encode())
-                        print(f"Registry: User '{username}' revoked access for '{target_username}' to file ID {file_id}.")
+                        logger.info("User '%s' revoked access for '%s' to file ID %s.", username, target_username, file_id)
                         save_registry_data() 
                     else:
                         client_socket.send(json.dumps({"status": "ERROR", "message": f"User {target_username} does not have access to this file"}).encode())
-                        print(f"Registry: Revoke failed - User '{target_username}' does not have access to file ID {file_id}.")
+                        logger.warning("Revoke failed - User '%s' does not have access to file ID %s.", target_username, file_id)
                 else:
                     client_socket.send(json.dumps({"status": "ERROR", "message": "Only the file owner can revoke access"}).encode())
-                    print(f"Registry: Revoke failed - User '{username}' is not the owner of file ID {file_id}.")
+                    logger.warning("Revoke failed - User '%s' is not the owner of file ID %s.", username, file_id)
             else:
                 client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
-                print(f"Registry: Revoke failed - File with ID {file_id} not found.")
+                logger.warning("Revoke failed - File with ID %s not found.", file_id)
 
         elif command == Commands.CHECK_ACCESS:        
             file_id_str = request.get("file_id")
@@ -324,29 +561,29 @@ def handle_client(client_socket):
                 file_info = SHARED_FILES[file_id]
                 if username in file_info.get("allowed_users", []):
                     client_socket.send(json.dumps({"status": "OK", "message": "Access granted"}).encode())
-                    print(f"Registry: Access check passed for user '{username}' on file ID {file_id}.")
+                    logger.debug("Access check passed for user '%s' on file ID %s.", username, file_id)
                 else:
                     client_socket.send(json.dumps({"status": "ERROR", "message": "Access denied"}).encode())
-                    print(f"Registry: Access check failed for user '{username}' on file ID {file_id}.")
+                    logger.warning("Access check failed for user '%s' on file ID %s.", username, file_id)
             else:
                 client_socket.send(json.dumps({"status": "ERROR", "message": "File not found"}).encode())
-                print(f"Registry: Access check failed - File with ID {file_id} not found.")
+                logger.warning("Access check failed - File with ID %s not found.", file_id)
 
 
         else:
-             print(f"Registry: Received unknown or unhandled command: {command_str}")
+             logger.warning("Received unknown or unhandled command: %s", command_str)
              # Optionally send an error response for unknown commands
              client_socket.send(json.dumps({"status": "ERROR", "message": "Unknown command"}).encode())
 
 
     except json.JSONDecodeError:
-         print("Registry Error: Invalid JSON received.")
+         logger.warning("Invalid JSON received.")
          client_socket.send(json.dumps({"status": "ERROR", "message": "Invalid request format"}).encode())
     except KeyError as e:
-        print(f"Registry Error: Missing key in request: {e}")
+        logger.warning("Missing key in request: %s", e)
         client_socket.send(json.dumps({"status": "ERROR", "message": f"Missing parameter: {e}"}).encode())
     except Exception as e:
-        print(f"Registry Error handling client: {e}")
+        logger.error("Error handling client: %s", e)
         client_socket.send(json.dumps({"status": "ERROR", "message": f"Internal server error: {e}"}).encode())
     finally:
         client_socket.close()
@@ -359,25 +596,26 @@ def start_registry_server(address=REGISTRY_ADDRESS, port=REGISTRY_PORT):
         load_registry_data()
         server_socket.bind((address, port))
         server_socket.listen(5)
-        print(f"Registry server listening on {address}:{port}")
+        logger.info("Server listening on %s:%s", address, port)
 
         # register save_registry_data to be called on exit
         atexit.register(save_registry_data)
 
         while True:
             client_sock, addr = server_socket.accept()
-            # print(f"Registry: Accepted connection from {addr}") # Keep logging minimal
+            logger.debug("Accepted connection from %s", addr)
             threading.Thread(target=handle_client, args=(client_sock,), daemon=True).start()
     except OSError as e:
-         print(f"Registry Error starting server: {e}")
+         logger.error("Error starting server: %s", e)
     except KeyboardInterrupt:
-         print("\nRegistry: Shutting down...")
+         logger.info("Shutting down...")
     finally:
          save_registry_data()
          server_socket.close()
-         print("Registry server shut down.")
+         logger.info("Server shut down.")
 
 
 if __name__ == "__main__":
+    setup_logging()
     start_registry_server()
 
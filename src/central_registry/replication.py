@@ -0,0 +1,96 @@
+import threading
+import time
+
+from src.utils.config import Config
+
+
+class ReplicationPlanner:
+    """
+    Decides which files need more copies and which online peers should make them.
+
+    A file's demand is its download count (key requests), decaying with a half-life of
+    Config.REPLICATION_HALF_LIFE seconds. Its target replica count is one copy plus one per
+    Config.REPLICATION_DEMAND_PER_REPLICA of demand, capped at
+    Config.REPLICATION_MAX_REPLICAS. Peers pull work: a peer that asks is online, and gets
+    the files furthest below their target that it does not hold yet. Each assignment is
+    reserved for Config.REPLICATION_ASSIGNMENT_TIMEOUT seconds so peers asking at the same
+    time spread over different files; it ends when the peer registers as a holder.
+
+    Only files with a Merkle root are replicated: a replica cannot decrypt the file, so it
+    checks the ciphertext against the root instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._demand = {}     # {file_id: (decayed download count, as of time)}
+        self._assigned = {}   # {file_id: {holder address tuple: deadline}}
+
+    def _decayed(self, file_id, now: float) -> float:
+        count, at = self._demand.get(file_id, (0.0, now))
+        return count * 0.5 ** ((now - at) / Config.REPLICATION_HALF_LIFE)
+
+    def record_download(self, file_id, now: float | None = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._demand[file_id] = (self._decayed(file_id, now) + 1.0, now)
+
+    def demand(self, file_id, now: float | None = None) -> float:
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._decayed(file_id, now)
+
+    @staticmethod
+    def replicas_for(demand: float) -> int:
+        return min(Config.REPLICATION_MAX_REPLICAS, 1 + int(demand / Config.REPLICATION_DEMAND_PER_REPLICA))
+
+    def target_replicas(self, file_id, now: float | None = None) -> int:
+        return self.replicas_for(self.demand(file_id, now))
+
+    def _pending(self, file_id, now: float) -> dict:
+        """Unexpired assignments of a file. Must hold the lock."""
+        assigned = {address: deadline for address, deadline in self._assigned.get(file_id, {}).items() if deadline > now}
+        if assigned:
+            self._assigned[file_id] = assigned
+        else:
+            self._assigned.pop(file_id, None)
+        return assigned
+
+    def is_assigned(self, file_id, address, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        with self._lock:
+            return tuple(address) in self._pending(file_id, now)
+
+    def completed(self, file_id, address):
+        """Ends an assignment: the peer registered as a holder (or gave up)."""
+        with self._lock:
+            self._assigned.get(file_id, {}).pop(tuple(address), None)
+
+    def assign(self, address, shared_files: dict, limit: int | None = None, now: float | None = None) -> list:
+        """
+        Picks up to `limit` (default Config.REPLICATION_TASKS_PER_POLL) files for the peer at
+        `address` to copy, largest shortfall first, then highest demand.
+
+        Returns:
+            The file IDs assigned to the peer.
+        """
+        address = tuple(address)
+        limit = Config.REPLICATION_TASKS_PER_POLL if limit is None else limit
+        now = time.time() if now is None else now
+        candidates = []
+        with self._lock:
+            for file_id, file_info in shared_files.items():
+                if not file_info.get("merkle_root"):
+                    continue
+                holders = [tuple(h) for h in file_info.get("holders") or [file_info["owner_address"]]]
+                pending = self._pending(file_id, now)
+                if address in holders or address in pending:
+                    continue
+                demand = self._decayed(file_id, now)
+                shortfall = self.replicas_for(demand) - len(holders) - len(pending)
+                if shortfall > 0:
+                    candidates.append((-shortfall, -demand, file_id))
+            candidates.sort(key=lambda candidate: candidate[:2])
+            chosen = [file_id for _, _, file_id in candidates[:limit]]
+            for file_id in chosen:
+                self._assigned.setdefault(file_id, {})[address] = now + Config.REPLICATION_ASSIGNMENT_TIMEOUT
+        return chosen
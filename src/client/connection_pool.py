@@ -0,0 +1,117 @@
+import itertools
+import threading
+import time
+from collections import Counter, defaultdict
+
+from src.utils.config import Config
+from src.utils.framing import FramedReader
+
+
+class PeerConnection:
+    """A client connection to one peer, with the buffered reader that has to outlive each request."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.reader = FramedReader(sock)
+        self.requests = 0 # requests sent so far; 0 means the connection is fresh
+        self.keep_alive = False # set once the peer has answered in a keep-alive protocol version
+        self.last_used = time.monotonic()
+        self._request_ids = itertools.count(1)
+
+    def next_request_id(self) -> str:
+        self.requests += 1
+        return str(next(self._request_ids))
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive connections to peers, keyed by peer address.
+
+    acquire() hands out an idle connection to the peer if there is one and opens a new one
+    otherwise; a connection is used by one request at a time, so concurrent callers (e.g.
+    swarm workers) each get their own. release() parks a connection whose exchange finished
+    cleanly for the next request, discard() closes one that may be out of step. Connections
+    idle for more than `idle_timeout` seconds are closed the next time the pool is used,
+    before the peer's own keep-alive timeout would close them from the other end.
+    """
+
+    def __init__(self, connect, idle_timeout=None, max_idle_per_peer=None):
+        self.connect = connect # connect(host, port) -> socket, or None if the peer is unreachable
+        self.idle_timeout = Config.CLIENT_POOL_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self.max_idle_per_peer = Config.CLIENT_POOL_MAX_IDLE_PER_PEER if max_idle_per_peer is None else max_idle_per_peer
+        self._lock = threading.Lock()
+        self._idle = defaultdict(list) # {address: [PeerConnection, ...]}, most recently used last
+        self._stats = Counter()
+
+    def acquire(self, address) -> PeerConnection | None:
+        """Returns a connection to `address`, reusing an idle one when possible. None if the peer is unreachable."""
+        address = tuple(address)
+        self.evict_idle()
+        with self._lock:
+            idle = self._idle.get(address)
+            if idle:
+                connection = idle.pop()
+                if not idle:
+                    del self._idle[address]
+                self._stats["reused"] += 1
+                return connection
+        sock = self.connect(address[0], address[1])
+        if sock is None:
+            return None
+        with self._lock:
+            self._stats["opened"] += 1
+        return PeerConnection(sock, address)
+
+    def release(self, connection: PeerConnection):
+        """Parks a connection for reuse, or closes it if the peer does not keep connections open."""
+        if not connection.keep_alive:
+            connection.close()
+            return
+        connection.last_used = time.monotonic()
+        with self._lock:
+            idle = self._idle[connection.address]
+            if len(idle) < self.max_idle_per_peer:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def discard(self, connection: PeerConnection):
+        """Closes a connection that must not be reused."""
+        connection.close()
+
+    def evict_idle(self):
+        """Closes connections that have been idle longer than idle_timeout."""
+        cutoff = time.monotonic() - self.idle_timeout
+        expired = []
+        with self._lock:
+            for address in list(self._idle):
+                idle = self._idle[address]
+                expired += [connection for connection in idle if connection.last_used < cutoff]
+                idle[:] = [connection for connection in idle if connection.last_used >= cutoff]
+                if not idle:
+                    del self._idle[address]
+            self._stats["evicted"] += len(expired)
+        for connection in expired:
+            connection.close()
+
+    def close_all(self):
+        """Closes every idle connection."""
+        with self._lock:
+            connections = [connection for idle in self._idle.values() for connection in idle]
+            self._idle.clear()
+        for connection in connections:
+            connection.close()
+
+    def stats(self) -> dict:
+        """Returns connection counters and the number of idle connections."""
+        with self._lock:
+            return {"opened": self._stats["opened"], "reused": self._stats["reused"],
+                    "evicted": self._stats["evicted"],
+                    "idle": sum(len(idle) for idle in self._idle.values())}
@@ -2,7 +2,11 @@ import socket
 import os
 import sys
 import json
+import multiprocessing
 import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 from colorama import Fore, Style
 
@@ -11,9 +15,18 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 from src.utils.ui_utils import client_ui
 from src.utils.config import Config
 from src.utils.commands_enum import Commands
-
-from src.utils import crypto_utils
-
+from src.utils.logging_utils import get_logger, setup_logging
+
+from src.utils import compression, crypto_utils, delta, merkle
+from src.utils.chunking import chunk_size_for
+from src.utils.framing import (KEEPALIVE_PROTOCOL_VERSION, PROTOCOL_VERSION, LEGACY_PROTOCOL_VERSION,
+                               FLAG_STREAM, STATUS_OK, STATUS_EXISTS, STATUS_BUSY, STATUS_REPLY, format_arguments,
+                               format_command, pack_header)
+
+from src.client.connection_pool import ConnectionPool
+from src.client.peer_table import PeerPerformanceTable
+from src.client.replicator import Replicator
+from src.client.swarm import SwarmDownload
 from src.peer.fileshare_peer import FileSharePeer
 
 
@@ -21,6 +34,53 @@ REGISTRY_ADDRESS = Config.REGISTRY_IP
 REGISTRY_PORT = Config.REGISTRY_PORT
 CHUNK_SIZE = Config.CHUNK_SIZE
 
+logger = get_logger("client")
+
+
+def prepare_upload(filepath, key, file_format=None):
+    """
+    Reads a file and turns it into the ciphertext to upload, in `file_format`
+    (Config.CLIENT_UPLOAD_FORMAT by default): compressed (if it pays off) and encrypted as
+    one stream, or encrypted block by block for the "blocks" format.
+
+    Returns:
+        {"file_hash", "content_hash", "codec", "format", "ciphertext", "merkle_root"}; file_hash
+        is over the plaintext, content_hash (the peer's content store key) over the ciphertext,
+        and the Merkle root over the ciphertext in Config.MERKLE_CHUNK_SIZE leaves.
+    """
+    file_format = file_format or Config.CLIENT_UPLOAD_FORMAT
+    with open(filepath, 'rb') as f:
+        plaintext = f.read()
+    file_hash = crypto_utils.compute_hash(plaintext)
+    if file_format == delta.FORMAT_BLOCKS:
+        # encrypted block by block, uncompressed, so later revisions can be sent as deltas
+        codec = compression.CODEC_NONE
+        ciphertext = delta.plan_revision(plaintext, key).stored_bytes()
+    else:
+        codec, payload = compression.compress_for_upload(plaintext)
+        if codec != compression.CODEC_NONE:
+            logger.debug("Compressed '%s' with %s: %s -> %s bytes.", filepath, codec, len(plaintext), len(payload))
+        ciphertext = crypto_utils.encrypt_data(payload, key)
+    return {"file_hash": file_hash, "content_hash": crypto_utils.compute_hash(ciphertext), "codec": codec,
+            "format": file_format, "ciphertext": ciphertext, "merkle_root": merkle.merkle_root(merkle.leaf_hashes(ciphertext))}
+
+
+def _apply_settings(settings):
+    """Process pool initializer: copies the parent's Config values, which may differ from the defaults."""
+    for name, value in settings.items():
+        setattr(Config, name, value)
+
+
+def _prepare_uploads(filepaths, key):
+    """Worker task of upload_directory(): [(prepare_upload() result, None) or (None, error)] per file."""
+    results = []
+    for filepath in filepaths:
+        try:
+            results.append((prepare_upload(filepath, key), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
 
 class FileShareClient:
     def __init__(self):
@@ -29,42 +89,793 @@ class FileShareClient:
         self.key = None # this is the user's symmetric key derived from their password
         self.peer_address = None
         self.peer_listening_port = None # store the port the peer thread is listening on
+        self.peer_protocol_versions = {} # {(host, port): transfer protocol version negotiated with that peer}
+        # keep-alive peer connections; looked up through self._connect_socket at connect time
+        self.connection_pool = ConnectionPool(lambda host, port: self._connect_socket(host, port))
+        self.replicator = None # copies popular files to our peer when Config.CLIENT_REPLICATE is on
+        self.peer_table = PeerPerformanceTable() # RTT, throughput and failures per peer, from our own transfers
         # self.shared_files = [] # Keep track of files this client's peer is sharing (IDs, names) - Registry is the source of truth now
 
-    def _connect_socket(self, address, port):
-        """Helper to create and connect a socket."""
+    def _connect_socket(self, address, port, record=True):
+        """
+        Helper to create and connect a socket. The connect gives up after the peer table's
+        timeout for that address (short for peers that answered quickly before), and its
+        round trip or failure is recorded in the table. Once connected, every send and recv
+        waits at most Config.CLIENT_READ_TIMEOUT, so a peer that stops answering in the middle
+        of a request (pooled connections included) fails it instead of hanging the client.
+
+        With record=False (the registry) the connect waits Config.CLIENT_CONNECT_TIMEOUT and
+        nothing is recorded, so the peer table only describes peers.
+        """
+        sock = None
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # small request/reply frames on a reused connection must not wait for delayed ACKs
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(self.peer_table.connect_timeout((address, port)) if record else Config.CLIENT_CONNECT_TIMEOUT)
+            started = time.perf_counter()
             sock.connect((address, port))
+            if record:
+                self.peer_table.record_rtt((address, port), time.perf_counter() - started)
+            sock.settimeout(Config.CLIENT_READ_TIMEOUT)
             return sock
         except socket.error as e:
-            print(Fore.RED + f"Client: Socket error connecting to {address}:{port}: {e}" + Style.RESET_ALL)
+            logger.warning("Socket error connecting to %s:%s: %s", address, port, e)
+            if record:
+                self.peer_table.record_failure((address, port))
+            if sock is not None:
+                sock.close()
             return None
 
+    def _peer_failed(self, address, error):
+        """
+        Records a failed exchange with a peer and returns the exception to raise for it. A peer
+        that went silent for Config.CLIENT_READ_TIMEOUT is a ConnectionError, like any other
+        peer that dropped the connection, so callers fall back to another source the same way.
+        """
+        self.peer_table.record_failure(address)
+        if isinstance(error, socket.timeout):
+            return ConnectionError(f"Peer {tuple(address)} timed out after {Config.CLIENT_READ_TIMEOUT}s")
+        return error
+
     def _send_registry_request(self, request):
         """Helper to send a request to the registry and receive the response."""
-        sock = self._connect_socket(REGISTRY_ADDRESS, REGISTRY_PORT)
+        sock = self._connect_socket(REGISTRY_ADDRESS, REGISTRY_PORT, record=False)
         if not sock:
             return {"status": "ERROR", "message": "Could not connect to registry"}
         try:
             sock.sendall(json.dumps(request).encode())
-            response = sock.recv(4096).decode() # Increased buffer size
-            return json.loads(response)
+            # the reply can span several reads; it is complete once it parses (or the registry hangs up)
+            response = bytearray()
+            while chunk := sock.recv(4096):
+                response += chunk
+                if response.rstrip().endswith((b"}", b"]")):
+                    try:
+                        return json.loads(response.decode())
+                    except json.JSONDecodeError:
+                        continue
+            return json.loads(response.decode())
         except json.JSONDecodeError:
-            print(Fore.RED + "Client: Error decoding JSON response from registry." + Style.RESET_ALL)
+            logger.error("Error decoding JSON response from registry.")
             return {"status": "ERROR", "message": "Invalid response from registry"}
         except Exception as e:
-            print(Fore.RED + f"Client: Error communicating with registry: {e}" + Style.RESET_ALL)
+            logger.error("Error communicating with registry: %s", e)
             return {"status": "ERROR", "message": f"Registry communication error: {e}"}
         finally:
             sock.close()
-    def get_files_from_peers(self):
-        """Fetches file lists from all active peers."""
+
+    def _open_framed_request(self, peer_address, command, argument):
+        """
+        Sends a command and its argument line to a peer using the framed transfer protocol
+        and reads the peer's first reply header. The request goes out on a pooled keep-alive
+        connection if there is one; an idle connection the peer has meanwhile closed is
+        replaced by a fresh one. A BUSY reply is retried after the peer's retry-after hint,
+        up to Config.CLIENT_BUSY_RETRIES times.
+
+        Returns:
+            (connection, header). header is None if the peer does not speak the framed
+            protocol; it is then remembered as a legacy peer and the connection is already
+            closed. connection is None if the peer could not be reached. Otherwise the caller
+            reads the rest of the reply from connection.reader and hands the connection back
+            with _end_request().
+
+        Raises:
+            ConnectionError: If the peer is still busy after the last retry, stops answering, or its reply is out of step.
+            ValueError: If the peer's reply is not framed.
+        """
+        peer_address = tuple(peer_address)
+        attempt = 0
+        while True:
+            connection = self.connection_pool.acquire(peer_address)
+            if connection is None:
+                return None, None
+            reused = connection.requests > 0
+            request_id = connection.next_request_id()
+            try:
+                # version 2 peers ignore the id option; version 3 peers echo it in a REPLY frame
+                argument_line = " ".join(filter(None, (argument, format_arguments(id=request_id))))
+                connection.sock.sendall(f"{format_command(command, PROTOCOL_VERSION)}\n{argument_line}\n".encode('utf-8'))
+                header = self._read_reply_header(connection, request_id)
+            except ConnectionError as e:
+                # legacy peers reset the connection on the unknown versioned command
+                if not (reused or isinstance(e, ConnectionResetError)):
+                    connection.close()
+                    raise
+                header = None
+            except socket.timeout as e:
+                connection.close()
+                raise self._peer_failed(peer_address, e)
+            except Exception:
+                connection.close()
+                raise
+            if header is None:
+                connection.close()
+                if reused:
+                    continue # the peer closed the idle connection in the meantime
+                self.peer_protocol_versions[peer_address] = LEGACY_PROTOCOL_VERSION
+                logger.info("Peer %s does not support framed transfers, using the legacy protocol.", peer_address)
+                return connection, None
+
+            self.peer_protocol_versions[peer_address] = header.version
+            connection.keep_alive = header.version >= KEEPALIVE_PROTOCOL_VERSION
+            if header.status != STATUS_BUSY:
+                return connection, header
+
+            retry_after = float(connection.reader.read_exactly(header.size).decode('ascii') or Config.PEER_BUSY_RETRY_AFTER)
+            self._end_request(connection, completed=True)
+            if attempt >= Config.CLIENT_BUSY_RETRIES:
+                raise ConnectionError(f"Peer {peer_address} is busy, try again in {retry_after:.2f}s")
+            attempt += 1
+            logger.warning("Peer %s is busy, retrying %s in %.2fs.", peer_address, command, retry_after)
+            time.sleep(retry_after)
+
+    def _read_reply_header(self, connection, request_id):
+        """
+        Reads the first header of the reply to `request_id`, skipping past the REPLY frame
+        that opens every reply on a keep-alive connection.
+
+        Returns:
+            The header, or None if the peer closed the connection before replying.
+
+        Raises:
+            ConnectionError: If the reply belongs to a different request.
+        """
+        header = connection.reader.read_header()
+        if header is None or header.status != STATUS_REPLY:
+            return header # version 2 peers reply without a REPLY frame
+        reply_id = connection.reader.read_exactly(header.size).decode('ascii')
+        if reply_id != request_id:
+            raise ConnectionError(f"Peer {connection.address} answered request {reply_id} instead of {request_id}")
+        header = connection.reader.read_header()
+        if header is None:
+            raise ConnectionError(f"Peer {connection.address} closed the connection after opening its reply")
+        return header
+
+    def _end_request(self, connection, completed):
+        """
+        Hands a connection back after a request: to the pool if its reply was read in full,
+        otherwise it is closed because the next reply could start anywhere.
+        """
+        if completed and Config.CLIENT_KEEPALIVE:
+            self.connection_pool.release(connection)
+        else:
+            self.connection_pool.discard(connection)
+
+    def close_connections(self):
+        """Closes every pooled peer connection."""
+        self.connection_pool.close_all()
+
+    def _uses_framed_protocol(self, peer_address):
+        return self.peer_protocol_versions.get(tuple(peer_address), PROTOCOL_VERSION) > LEGACY_PROTOCOL_VERSION
+
+    def _send_payload(self, connection, ready, payload):
+        """
+        Sends an upload's framed payload once the peer's `ready` reply header is in, in chunks
+        sized for the transfer (chunk_size_for()) within the chunk limit a peer that was
+        offered one (the `chunk=` option) advertises in the reply.
+        """
+        limit = None
+        if ready.size:
+            advertised = connection.reader.read_exactly(ready.size).decode('ascii', errors='replace')
+            limit = int(advertised) if advertised.isdigit() else None
+        chunk = chunk_size_for(len(payload), connection.sock, self.peer_table.throughput(connection.address), limit)
+        connection.sock.sendall(pack_header(len(payload), version=ready.version))
+        view = memoryview(payload)
+        for i in range(0, len(view), chunk):
+            connection.sock.sendall(view[i:i + chunk])
+
+    def _send_ciphertext(self, peer_address, filename, ciphertext, file_hash=None, cache_file_id=None):
+        """
+        Uploads already-encrypted bytes to a peer under `filename`. With a `file_hash` (the
+        SHA-256 of `ciphertext`, which the peer checks), the peer files the upload in its
+        content store and the bytes are not sent at all if it already holds them.
+
+        With a `cache_file_id` (and a `file_hash`), the upload is a pull-through cache copy of
+        that registry file: the peer may refuse it or evict other copies to stay within its
+        cache budget, and the evicted files are withdrawn from the registry.
+
+        Returns:
+            True if the bytes were sent, False if the peer already stored this content.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer reports that the upload failed.
+        """
+        if self._uses_framed_protocol(peer_address):
+            cache_options = {} if cache_file_id is None else {"cache": 1, "file_id": cache_file_id, "size": len(ciphertext)}
+            connection, header = self._open_framed_request(peer_address, Commands.UPLOAD,
+                                                           format_arguments(filename, hash=file_hash, chunk=Config.TRANSFER_MAX_CHUNK_SIZE,
+                                                                            **cache_options))
+            if connection is None:
+                raise ConnectionError(f"Could not connect to peer {peer_address}")
+            if header is not None:
+                completed = False
+                try:
+                    if header.status == STATUS_EXISTS:
+                        completed = True
+                        logger.info("Peer %s already stores this content, skipped sending '%s'.", tuple(peer_address), filename)
+                        return False
+                    if header.status != STATUS_OK:
+                        raise RuntimeError(connection.reader.read_exactly(header.size).decode('utf-8', errors='replace'))
+                    self._send_payload(connection, header, ciphertext)
+                    result = connection.reader.read_header()
+                    if result is None:
+                        raise ConnectionError("Peer closed the connection without confirming the upload")
+                    if result.status != STATUS_OK:
+                        raise RuntimeError(connection.reader.read_exactly(result.size).decode('utf-8', errors='replace'))
+                    evicted = json.loads(connection.reader.read_exactly(result.size)).get("evicted", []) if result.size else []
+                    completed = True
+                finally:
+                    self._end_request(connection, completed)
+                for evicted_id in evicted:
+                    self.unregister_holder(evicted_id, peer_address)
+                return True
+
+        # legacy protocol: raw bytes, end of upload signalled by closing the connection
+        sock = self._connect_socket(peer_address[0], peer_address[1])
+        if not sock:
+            raise ConnectionError(f"Could not connect to peer {peer_address}")
+        try:
+            sock.sendall(f"{str(Commands.UPLOAD)}\n{filename}\n".encode('utf-8'))
+            for i in range(0, len(ciphertext), CHUNK_SIZE):
+                sock.sendall(ciphertext[i:i+CHUNK_SIZE])
+            return True
+        finally:
+            sock.close()
+
+    def _send_part(self, peer_address, filename, ciphertext, file_hash, upload_id, offset, length):
+        """
+        Uploads `length` bytes of `ciphertext` from `offset` as one part of multipart upload
+        `upload_id`; the peer assembles the parts and stores the file once all have arrived.
+
+        Returns:
+            True if the part was sent, False if the peer already stores this content.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer refuses the part.
+        """
+        connection, header = self._open_newer_request(peer_address, Commands.UPLOAD,
+                                                      format_arguments(filename, hash=file_hash, part=upload_id,
+                                                                       offset=offset, total=len(ciphertext),
+                                                                       chunk=Config.TRANSFER_MAX_CHUNK_SIZE))
+        completed = False
+        try:
+            if header.status == STATUS_EXISTS:
+                completed = True
+                return False
+            if header.status != STATUS_OK:
+                raise RuntimeError(connection.reader.read_exactly(header.size).decode('utf-8', errors='replace'))
+            self._send_payload(connection, header, memoryview(ciphertext)[offset:offset + length])
+            result = connection.reader.read_header()
+            if result is None:
+                raise ConnectionError("Peer closed the connection without confirming the part")
+            if result.status != STATUS_OK:
+                raise RuntimeError(connection.reader.read_exactly(result.size).decode('utf-8', errors='replace'))
+            completed = True
+            return True
+        finally:
+            self._end_request(connection, completed)
+
+    def _send_ciphertext_parallel(self, peer_address, filename, ciphertext, file_hash, streams):
+        """
+        _send_ciphertext() over `streams` connections at once, one contiguous part each, and
+        records the outcome in the peer table to size the next transfer.
+
+        Returns:
+            True if the bytes were sent, False if the peer already stored this content.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer refuses a part.
+        """
+        upload_id = os.urandom(8).hex()
+        size = len(ciphertext)
+        part_size = -(-size // streams)
+        parts = [(offset, min(part_size, size - offset)) for offset in range(0, size, part_size)]
+        busy = [0.0] * len(parts)
+
+        def send(i):
+            started = time.perf_counter()
+            sent = self._send_part(peer_address, filename, ciphertext, file_hash, upload_id, *parts[i])
+            busy[i] = time.perf_counter() - started
+            return sent
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+            sent = list(pool.map(send, range(len(parts))))
+        if all(sent):
+            self.peer_table.record_streams(peer_address, len(parts), size, time.perf_counter() - started, sum(busy))
+        return any(sent)
+
+    def _upload_ciphertext(self, peer_address, filename, ciphertext, file_hash):
+        """
+        Uploads a file's ciphertext to a peer, over several parallel streams when it is large
+        enough and the peer takes multipart uploads (see _stream_count()), else over one.
+        """
+        streams = self._stream_count(peer_address, len(ciphertext), upload=True)
+        if streams > 1:
+            logger.debug("Uploading '%s' to %s over %s streams.", filename, tuple(peer_address), streams)
+            return self._send_ciphertext_parallel(peer_address, filename, ciphertext, file_hash, streams)
+        return self._send_ciphertext(peer_address, filename, ciphertext, file_hash=file_hash)
+
+    def _send_delta(self, peer_address, filename, plan, base_hash):
+        """
+        Uploads a new version of a file as a DeltaPlan against `base_hash` (the content hash
+        of a version the peer must already store): only the plan's new blocks are sent.
+
+        Returns:
+            The content hash of the new version, computed by the peer as it rebuilt it.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer does not have the base version, does not support
+                DELTA_UPLOAD, or reports that rebuilding the file failed.
+        """
+        if not self._uses_framed_protocol(peer_address):
+            raise RuntimeError(f"Peer {tuple(peer_address)} does not support delta uploads")
+        connection, header = self._open_newer_request(peer_address, Commands.DELTA_UPLOAD,
+                                                      format_arguments(filename, base=base_hash, size=plan.size))
+        completed = False
+        try:
+            if header.status != STATUS_OK:
+                completed = True
+                raise RuntimeError(connection.reader.read_exactly(header.size).decode('utf-8', errors='replace'))
+            self._send_payload(connection, header, plan.pack())
+            result = connection.reader.read_header()
+            if result is None:
+                raise ConnectionError("Peer closed the connection without confirming the upload")
+            payload = connection.reader.read_exactly(result.size)
+            if result.status != STATUS_OK:
+                raise RuntimeError(payload.decode('utf-8', errors='replace'))
+            completed = True
+            return json.loads(payload)["content_hash"]
+        finally:
+            self._end_request(connection, completed)
+
+    def fetch_signature(self, peer_address, file_id_str, file_hash, size, key):
+        """
+        Reads the block Signature stored at the end of a "blocks" file, with two ranged downloads.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer reports an error.
+            ValueError: If the file is not in the block format or the signature does not decrypt.
+        """
+        if size is None or size < delta.TRAILER.size:
+            raise ValueError("Stored size unknown or too small for the block format")
+        tail = self.fetch_range(peer_address, file_id_str, size - delta.TRAILER.size, delta.TRAILER.size, file_hash=file_hash)
+        offset = delta.read_trailer(bytes(tail))
+        if not 0 < offset < size - delta.TRAILER.size:
+            raise ValueError("Block format trailer points outside the file")
+        record = self.fetch_range(peer_address, file_id_str, offset, size - delta.TRAILER.size - offset, file_hash=file_hash)
+        return delta.read_signature(bytes(record), key)
+
+    def _receive_ciphertext(self, peer_address, file_id_str, file_hash=None):
+        """
+        Downloads the stored (encrypted) bytes of a file from a peer. A `file_hash` (the
+        registry entry's content_hash) lets framed peers look the content up directly in
+        their content store.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached or the transfer is cut short.
+            RuntimeError: If the peer reports an error (e.g. unknown file ID).
+        """
+        if self._uses_framed_protocol(peer_address):
+            connection, header = self._open_framed_request(peer_address, Commands.DOWNLOAD,
+                                                           format_arguments(file_id_str, hash=file_hash, chunk=Config.TRANSFER_MAX_CHUNK_SIZE))
+            if connection is None:
+                raise ConnectionError(f"Could not connect to peer {peer_address}")
+            if header is not None:
+                return self._read_framed_payload(connection, header)
+
+        # legacy protocol: raw bytes followed by the DONE sentinel, then the peer hangs up.
+        # Read to EOF and strip the trailing sentinel rather than decoding every chunk.
+        sock = self._connect_socket(peer_address[0], peer_address[1])
+        if not sock:
+            raise ConnectionError(f"Could not connect to peer {peer_address}")
+        try:
+            sock.sendall(f"{str(Commands.DOWNLOAD)}\n{file_id_str}\n".encode('utf-8'))
+            encrypted = bytearray()
+            while True:
+                chunk = sock.recv(CHUNK_SIZE)
+                if not chunk:
+                    break
+                encrypted += chunk
+            done_marker = str(Commands.DONE).encode('utf-8')
+            if not encrypted.endswith(done_marker):
+                raise ConnectionError("Legacy peer closed the connection before sending DONE")
+            return encrypted[:-len(done_marker)]
+        except socket.timeout as e:
+            raise self._peer_failed(peer_address, e)
+        finally:
+            sock.close()
+
+    def fetch_range(self, peer_address, file_id_str, offset, length=None, file_hash=None, background=False):
+        """
+        Downloads `length` bytes (default: the rest) of a file's stored ciphertext starting
+        at byte `offset`. Ranges past the end of the file are clamped to it. A `background`
+        fetch only gets the peer's uplink when no other download is waiting for it.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached or the transfer is cut short.
+            RuntimeError: If the peer reports an error or does not support ranged downloads.
+        """
+        connection, header = self._open_framed_request(peer_address, Commands.DOWNLOAD,
+                                                       format_arguments(file_id_str, hash=file_hash,
+                                                                        offset=offset, length=length,
+                                                                        background=1 if background else None,
+                                                                        chunk=Config.TRANSFER_MAX_CHUNK_SIZE))
+        if connection is None:
+            raise ConnectionError(f"Could not connect to peer {peer_address}")
+        if header is None:
+            raise RuntimeError(f"Peer {tuple(peer_address)} does not support ranged downloads")
+        return self._read_framed_payload(connection, header)
+
+    def fetch_chunk_hashes(self, peer_address, file_id_str, chunk_size, file_hash=None):
+        """
+        Asks a peer for the Merkle leaf hashes of a file's stored ciphertext. They are not to be
+        trusted until ChunkVerifier.from_leaves() has checked them against the registry's root.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer reports an error or does not support GET_HASHES.
+            ValueError: If the reply is not a list of hashes.
+        """
+        connection, header = self._open_newer_request(peer_address, Commands.GET_HASHES,
+                                                      format_arguments(file_id_str, hash=file_hash, chunk_size=chunk_size))
+        return merkle.unpack_leaves(self._read_framed_payload(connection, header))
+
+    def iter_many(self, peer_address, files):
+        """
+        Downloads the stored ciphertext of several files from one peer with a single
+        DOWNLOAD_MANY request. `files` is a list of (file_id_str, file_hash). Yields
+        (file_id_str, ciphertext) in that order as each file arrives; for a file the peer
+        could not send, the second item is a RuntimeError with its message instead.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached or the reply is cut short.
+            RuntimeError: If the peer does not support DOWNLOAD_MANY.
+        """
+        argument = format_arguments(*(file_id_str for file_id_str, _ in files),
+                                    hashes=",".join(file_hash or "" for _, file_hash in files),
+                                    chunk=Config.TRANSFER_MAX_CHUNK_SIZE)
+        connection, header = self._open_newer_request(peer_address, Commands.DOWNLOAD_MANY, argument)
+        reader = connection.reader
+        completed = False
+        started = time.perf_counter()
+        received = 0
+        try:
+            for i, (file_id_str, _) in enumerate(files):
+                if i:
+                    header = reader.read_header()
+                    if header is None:
+                        raise ConnectionError(f"Peer {connection.address} closed the connection after {i} of {len(files)} files")
+                payload = reader.read_exactly(header.size)
+                received += header.size
+                if header.status != STATUS_OK:
+                    yield file_id_str, RuntimeError(payload.decode('utf-8', errors='replace'))
+                else:
+                    yield file_id_str, payload
+            completed = True
+        except (ConnectionError, OSError) as e:
+            raise self._peer_failed(connection.address, e)
+        finally:
+            # a caller that stops early leaves the rest of the reply unread, so the connection is not reused
+            self._end_request(connection, completed)
+        self.peer_table.record_transfer(connection.address, received, time.perf_counter() - started)
+
+    def get_peer_stats(self, peer_address):
+        """
+        Asks a peer for its live counters: connections, bytes in and out, per-command latency
+        (p50/p99), failures by type, and its admission and bandwidth state.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer reports an error or does not support STATS.
+        """
+        connection, header = self._open_newer_request(peer_address, Commands.STATS, "")
+        return json.loads(self._read_framed_payload(connection, header).decode('utf-8'))
+
+    def rank_holders(self, holders, size=0):
+        """
+        Orders holders quickest first for a single-source download of `size` bytes. Every
+        holder not suspended in the peer table is asked for its STATS at once (a cheap probe
+        whose round trip goes into the table), then they are ranked by the table's expected
+        transfer time x (1 + transfers running or queued there), so a nearby, fast copy wins
+        unless it is busy. Holders that do not answer come after the ones that did.
+        """
+        holders = [tuple(h) for h in holders]
+        if len(holders) < 2:
+            return holders
+
+        def probe(holder):
+            if self.peer_table.is_suspended(holder):
+                return None
+            started = time.perf_counter()
+            try:
+                stats = self.get_peer_stats(holder)
+            except (ConnectionError, RuntimeError, OSError, ValueError) as e:
+                logger.debug("Holder %s did not report its load: %s", holder, e)
+                return None
+            self.peer_table.record_rtt(holder, time.perf_counter() - started)
+            admission = stats.get("admission", {})
+            self.peer_table.record_stream_limits(holder, admission.get("max_per_client"), "multipart_uploads" in stats)
+            return admission.get("active", 0) + admission.get("queue_depth", 0)
+
+        with ThreadPoolExecutor(max_workers=len(holders)) as pool:
+            loads = {holder: load for holder, load in zip(holders, pool.map(probe, holders)) if load is not None}
+        ranked = self.peer_table.rank(holders, nbytes=size or 0, load=loads)
+        ranked = [h for h in ranked if h in loads] + [h for h in ranked if h not in loads]
+        logger.debug("Holders ranked: %s", ", ".join(f"{h} (load {loads.get(h)})" for h in ranked))
+        return ranked
+
+    def _stream_count(self, peer_address, nbytes, upload=False):
+        """
+        Parallel streams for moving `nbytes` to or from a peer (Config.CLIENT_MAX_STREAMS,
+        PeerPerformanceTable.stream_count()). The peer's per-client transfer limit and, for
+        uploads, its multipart support come from one STATS probe, remembered in the peer table.
+        """
+        if Config.CLIENT_MAX_STREAMS < 2 or nbytes < 2 * Config.CLIENT_STREAM_MIN_BYTES:
+            return 1
+        limits = self.peer_table.stream_limits(peer_address)
+        if limits is None:
+            try:
+                stats = self.get_peer_stats(peer_address)
+                limits = stats.get("admission", {}).get("max_per_client"), "multipart_uploads" in stats
+            except (ConnectionError, RuntimeError, OSError, ValueError) as e:
+                logger.debug("Peer %s did not report its stream limits: %s", peer_address, e)
+                limits = 1, False
+            self.peer_table.record_stream_limits(peer_address, *limits)
+        if upload and not limits[1]:
+            return 1
+        return self.peer_table.stream_count(peer_address, nbytes)
+
+    def fetch_parallel(self, peer_address, file_id_str, size, file_hash=None, verifier=None, streams=None):
+        """
+        Downloads a file's `size` bytes of stored ciphertext from one peer over `streams`
+        (default: _stream_count()) parallel connections as a SwarmDownload, and records the
+        outcome in the peer table to size the next transfer. Unlike the single-stream
+        download, an interrupted transfer is not resumable.
+
+        Raises:
+            ConnectionError: If the transfer could not be completed.
+        """
+        streams = streams or self._stream_count(peer_address, size)
+        swarm = SwarmDownload(self, [peer_address], file_id_str, size, file_hash=file_hash, verifier=verifier, streams=streams)
+        started = time.perf_counter()
+        data = swarm.run()
+        busy = sum(stats["seconds"] for stats in swarm.holder_stats.values())
+        self.peer_table.record_streams(peer_address, streams, size, time.perf_counter() - started, busy)
+        return data
+
+    def _open_newer_request(self, peer_address, command, argument):
+        """
+        _open_framed_request() for a command that peers from before it was added do not know.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+            RuntimeError: If the peer hung up on the command.
+        """
+        peer_address = tuple(peer_address)
+        known_version = self.peer_protocol_versions.get(peer_address)
+        connection, header = self._open_framed_request(peer_address, command, argument)
+        if connection is None:
+            raise ConnectionError(f"Could not connect to peer {peer_address}")
+        if header is None:
+            # an older peer hangs up on an unknown command; that says nothing about its DOWNLOAD support
+            if known_version is None:
+                self.peer_protocol_versions.pop(peer_address, None)
+            else:
+                self.peer_protocol_versions[peer_address] = known_version
+            raise RuntimeError(f"Peer {peer_address} does not support {command}")
+        return connection, header
+
+    def _chunk_verifier(self, sources, file_id_str, file_hash, merkle_root, chunk_size, size):
+        """
+        Fetches the chunk hashes of a file from the first of `sources` whose list matches the
+        Merkle root. Returns None if none of them can provide one.
+        """
+        for source in sources:
+            try:
+                leaves = self.fetch_chunk_hashes(source, file_id_str, chunk_size, file_hash=file_hash)
+                return merkle.ChunkVerifier.from_leaves(leaves, merkle_root, chunk_size, size)
+            except (ConnectionError, RuntimeError, ValueError) as e:
+                logger.warning("No usable chunk hashes from %s: %s", tuple(source), e)
+        return None
+
+    def _repair_chunks(self, encrypted, verifier, sources, file_id_str, file_hash):
+        """
+        Re-fetches the chunks in verifier.bad_chunks, trying each of `sources` until one sends
+        a copy that verifies, and patches them into `encrypted` (a bytearray).
+
+        Raises:
+            ConnectionError: If a chunk could not be fetched intact from any source.
+        """
+        sources = self.peer_table.rank(sources, verifier.chunk_size)
+        for index in sorted(verifier.bad_chunks):
+            offset, length = verifier.chunk_range(index)
+            for source in sources:
+                try:
+                    data = self.fetch_range(source, file_id_str, offset, length, file_hash=file_hash)
+                except (ConnectionError, RuntimeError) as e:
+                    logger.warning("Could not re-fetch chunk %s from %s: %s", index, tuple(source), e)
+                    continue
+                if verifier.check_chunk(index, data):
+                    encrypted[offset:offset + length] = data
+                    logger.info("Re-fetched chunk %s from %s.", index, tuple(source))
+                    break
+                logger.warning("Chunk %s from %s failed verification too.", index, tuple(source))
+            else:
+                raise ConnectionError(f"Chunk {index} of file ID {file_id_str} could not be fetched intact from any holder")
+        verifier.bad_chunks.clear()
+
+    def _read_framed_payload(self, connection, header):
+        """
+        Reads the payload announced by `header` and hands the connection back.
+
+        Raises:
+            ConnectionError: If the transfer is cut short.
+            RuntimeError: If the header is an error reply (its payload is the message).
+        """
+        completed = False
+        started = time.perf_counter()
+        try:
+            payload = connection.reader.read_exactly(header.size)
+            completed = True
+        except (ConnectionError, OSError) as e:
+            raise self._peer_failed(connection.address, e)
+        finally:
+            self._end_request(connection, completed)
+        self.peer_table.record_transfer(connection.address, header.size, time.perf_counter() - started)
+        if header.status != STATUS_OK:
+            raise RuntimeError(payload.decode('utf-8', errors='replace'))
+        return payload
+
+    def _load_resume_marker(self, part_path, file_id_str, file_hash):
+        """Returns the resume marker of a partial download of this file, or None if there is none."""
+        try:
+            with open(part_path + ".resume", 'r') as f:
+                marker = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if marker.get("file_id") != file_id_str or marker.get("file_hash") != file_hash:
+            return None # leftover from a different file
+        return marker
+
+    def _save_resume_marker(self, part_path, file_id_str, file_hash, received, total):
+        tmp_path = part_path + ".resume.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"file_id": file_id_str, "file_hash": file_hash, "received": received, "size": total}, f)
+        os.replace(tmp_path, part_path + ".resume")
+
+    def _discard_partial_download(self, part_path):
+        for path in (part_path, part_path + ".resume"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _receive_ciphertext_resumable(self, peer_address, file_id_str, part_path, file_hash=None, verifier=None):
+        """
+        Downloads a file's ciphertext into `part_path`, continuing a partial download left
+        there by an earlier interrupted attempt.
+
+        Progress is recorded in a resume marker next to the part file, checkpointed every
+        Config.CLIENT_RESUME_CHECKPOINT_BYTES and when the transfer breaks off. Peers that
+        do not support ranged downloads get a plain whole-file download.
+
+        With a ChunkVerifier each chunk is checked as soon as it has arrived; chunks that fail
+        are collected in verifier.bad_chunks for the caller to re-fetch.
+
+        Returns:
+            The complete ciphertext. The part file and marker are left for the caller to discard.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached or the transfer is cut short (the partial data is kept).
+            RuntimeError: If the peer reports an error (the partial data is discarded).
+        """
+        if not self._uses_framed_protocol(peer_address):
+            data = self._receive_ciphertext(peer_address, file_id_str, file_hash=file_hash)
+            if verifier is not None:
+                verifier.bad_chunks.update(verifier.bad_chunks_in(0, data))
+            return data
+
+        marker = self._load_resume_marker(part_path, file_id_str, file_hash)
+        offset = 0
+        if marker and os.path.exists(part_path):
+            offset = min(marker["received"], os.path.getsize(part_path))
+
+        with open(part_path, 'r+b' if os.path.exists(part_path) else 'w+b') as f:
+            while True:
+                f.truncate(offset) # anything past the last checkpoint may be torn
+                f.seek(offset)
+                connection, header = self._open_framed_request(peer_address, Commands.DOWNLOAD,
+                                                               format_arguments(file_id_str, hash=file_hash,
+                                                                                offset=offset or None,
+                                                                                chunk=Config.TRANSFER_MAX_CHUNK_SIZE))
+                if connection is None:
+                    raise ConnectionError(f"Could not connect to peer {peer_address}")
+                if header is None:
+                    break # peer turned out to be legacy: no ranges, download the whole file below
+                reader = connection.reader
+                completed = False
+                try:
+                    if header.status != STATUS_OK:
+                        message = reader.read_exactly(header.size).decode('utf-8', errors='replace')
+                        completed = True
+                        self._discard_partial_download(part_path)
+                        raise RuntimeError(message)
+                    total = offset + header.size
+                    if offset and total != marker.get("size"):
+                        # the stored file changed since the partial download began; start over
+                        logger.warning("Remote file ID %s changed size, restarting download.", file_id_str)
+                        offset, marker = 0, None
+                        continue
+                    if offset:
+                        logger.info("Resuming download of file ID %s at byte %s of %s.", file_id_str, offset, total)
+                    self._save_resume_marker(part_path, file_id_str, file_hash, offset, total)
+                    received = checkpoint = offset
+                    check = None
+                    if verifier is not None:
+                        # chunks finished by an earlier attempt were verified by a verifier that is gone
+                        chunk_start = offset - offset % verifier.chunk_size
+                        f.seek(0)
+                        verifier.bad_chunks.update(verifier.bad_chunks_in(0, f.read(chunk_start)))
+                        check = verifier.stream(offset, f.read(offset - chunk_start))
+                    started = time.perf_counter()
+                    chunk_size = chunk_size_for(header.size, connection.sock, self.peer_table.throughput(peer_address))
+                    try:
+                        for chunk in reader.iter_payload(header.size, chunk_size):
+                            f.write(chunk)
+                            if check is not None:
+                                check.update(chunk)
+                            received += len(chunk)
+                            if received - checkpoint >= Config.CLIENT_RESUME_CHECKPOINT_BYTES:
+                                f.flush()
+                                self._save_resume_marker(part_path, file_id_str, file_hash, received, total)
+                                checkpoint = received
+                    except (ConnectionError, OSError) as e:
+                        f.flush()
+                        self._save_resume_marker(part_path, file_id_str, file_hash, received, total)
+                        raise self._peer_failed(peer_address, e)
+                    completed = True
+                    self.peer_table.record_transfer(peer_address, header.size, time.perf_counter() - started)
+                    f.seek(0)
+                    return f.read()
+                finally:
+                    self._end_request(connection, completed)
+
+        data = self._receive_ciphertext(peer_address, file_id_str, file_hash=file_hash)
+        if verifier is not None:
+            verifier.bad_chunks.update(verifier.bad_chunks_in(0, data))
+        return data
+
+    def get_files_from_peers(self, prefix=None, min_size=None, max_size=None):
+        """Fetches file lists from all active peers, optionally only names starting with `prefix` and sizes within [min_size, max_size]."""
         if not self.session_id:
             print(Fore.RED + "Client: Not logged in. Cannot discover files from peers." + Style.RESET_ALL)
             return {}
 
-        print(Fore.YELLOW + "Client: Discovering files from active peers..." + Style.RESET_ALL)
+        logger.info("Discovering files from active peers...")
         active_peers = self.get_peers() # Get active peers from the registry
         all_peer_files = {} # {peer_address: [{filename, size}, ...]}
 
@@ -72,53 +883,138 @@ class FileShareClient:
             print(Fore.YELLOW + "Client: No other active peers found to query." + Style.RESET_ALL)
             return all_peer_files
 
-        for peer_addr in active_peers:
-            print(f"Client: Querying peer {peer_addr} for file list...")
-            sock = self._connect_socket(peer_addr[0], peer_addr[1])
-            if not sock:
-                print(Fore.RED + f"Client: Could not connect to peer {peer_addr}." + Style.RESET_ALL)
-                continue
-
+        # quickest peers first; peers that keep failing are skipped until their failures decay
+        ranked = self.peer_table.rank(active_peers, skip_suspended=True)
+        if len(ranked) < len(active_peers):
+            logger.info("Skipping %s unresponsive peer(s).", len(active_peers) - len(ranked))
+        for peer_addr in ranked:
+            logger.debug("Querying peer %s for file list...", peer_addr)
             try:
-                # Send the GET_PEER_FILES command
-                command_msg = f"{str(Commands.GET_PEER_FILES)}\n"
-                sock.sendall(command_msg.encode('utf-8'))
+                all_peer_files[peer_addr] = list(self.iter_peer_files(peer_addr, prefix=prefix, min_size=min_size, max_size=max_size))
+                logger.debug("Successfully received file list from %s.", peer_addr)
 
+            except RuntimeError as e:
+                logger.warning("Error response from peer %s: %s", peer_addr, e)
+            except json.JSONDecodeError:
+                logger.warning("Error decoding JSON response from peer %s.", peer_addr)
+            except Exception as e:
+                logger.warning("Error communicating with peer %s: %s", peer_addr, e)
 
-                response_data = b''
-                # Set a shorter timeout for receiving from peer after sending command
-                sock.settimeout(10) # e.g., 10 seconds to get the file list response
+        return all_peer_files
 
-                while True:
-                    chunk = sock.recv(4096) # Read in chunks
-                    if not chunk:
-                        break # Connection closed by peer
-                    response_data += chunk
+    def iter_peer_files(self, peer_addr, prefix=None, min_size=None, max_size=None):
+        """
+        Yields one peer's shared files ({filename, size[, file_hash]}) as they arrive. Version 3
+        peers stream the listing as NDJSON, so a huge shared directory is never held in memory
+        on either side; older peers send their whole list at once and ignore the filters.
 
-                if not response_data:
-                    print(Fore.RED + f"Client: No response received from peer {peer_addr}." + Style.RESET_ALL)
-                    continue
+        Raises:
+            ConnectionError: If the peer cannot be reached or the listing is cut short.
+            RuntimeError: If the peer answers with an error.
+        """
+        options = format_arguments(prefix=prefix, min_size=min_size, max_size=max_size, format="ndjson")
+        connection, header = self._open_peer_files_request(peer_addr, options)
+        if header is None or not header.flags & FLAG_STREAM:
+            # legacy and version 2 peers send their whole list as one JSON object
+            if header is None:
+                response = self._request_legacy_peer_files(peer_addr)
+            else:
+                response = json.loads(self._read_framed_payload(connection, header).decode('utf-8'))
+            if response.get("status") != "OK":
+                raise RuntimeError(response.get("message", "Unknown error"))
+            yield from response.get("files", [])
+            return
 
-                try:
-                    response = json.loads(response_data.decode('utf-8'))
-                    if response.get("status") == "OK":
-                        all_peer_files[peer_addr] = response.get("files", [])
-                        print(Fore.GREEN + f"Client: Successfully received file list from {peer_addr}." + Style.RESET_ALL)
-                    else:
-                         print(Fore.RED + f"Client: Error response from peer {peer_addr}: {response.get('message', 'Unknown error')}" + Style.RESET_ALL)
+        completed = False
+        try:
+            for payload in connection.reader.iter_stream(header):
+                # frames only ever carry whole lines, so each one decodes as a single JSON array
+                for entry in json.loads(b"[" + b",".join(bytes(payload).splitlines()) + b"]"):
+                    if "filename" in entry: # the closing {"next_cursor", "count"} line is not a file
+                        yield entry
+            completed = True
+        finally:
+            # a caller that stops early leaves the rest of the stream unread, so the connection is not reused
+            self._end_request(connection, completed)
 
-                except json.JSONDecodeError:
-                    print(Fore.RED + f"Client: Error decoding JSON response from peer {peer_addr}." + Style.RESET_ALL)
-                except Exception as response_e:
-                    print(Fore.RED + f"Client: Error processing response from peer {peer_addr}: {response_e}" + Style.RESET_ALL)
+    def get_peer_files_page(self, peer_addr, cursor=None, limit=None, prefix=None, min_size=None, max_size=None):
+        """
+        Asks one peer for one page of its file list, over a pooled connection where the peer
+        supports it. Passing the page's next_cursor back as `cursor` fetches the page after it;
+        next_cursor is None on the last page. Peers that predate pagination send their whole
+        list as one page.
 
+        Returns:
+            The peer's JSON response ({"status", "files", "next_cursor"}), or None if it could not be reached or sent nothing.
+        """
+        options = format_arguments(cursor=cursor, limit=limit, prefix=prefix, min_size=min_size, max_size=max_size)
+        try:
+            connection, header = self._open_peer_files_request(peer_addr, options)
+            if header is None:
+                return self._request_legacy_peer_files(peer_addr)
+        except ConnectionError as e:
+            logger.warning("%s.", e)
+            return None
+        try:
+            payload = self._read_framed_payload(connection, header)
+        except RuntimeError as e:
+            return {"status": "ERROR", "message": str(e)}
+        return json.loads(payload.decode('utf-8'))
 
-            except Exception as e:
-                print(Fore.RED + f"Client: Error communicating with peer {peer_addr}: {e}" + Style.RESET_ALL)
-            finally:
-                sock.close()
+    def _open_peer_files_request(self, peer_addr, options):
+        """
+        Sends GET_PEER_FILES with the `options` argument line to a peer that speaks the framed protocol.
 
-        return all_peer_files
+        Returns:
+            (connection, header) as _open_framed_request() does, or (None, None) if the peer
+            only answers the unframed request (see _request_legacy_peer_files()).
+
+        Raises:
+            ConnectionError: If the peer cannot be reached.
+        """
+        if not self._uses_framed_protocol(peer_addr):
+            return None, None
+        try:
+            connection, header = self._open_framed_request(peer_addr, Commands.GET_PEER_FILES, options)
+        except ValueError:
+            return None, None # version 2 peers answer GET_PEER_FILES with bare JSON
+        if connection is None:
+            raise ConnectionError(f"Could not connect to peer {peer_addr}")
+        if header is None:
+            return None, None
+        return connection, header
+
+    def _request_legacy_peer_files(self, peer_addr):
+        """
+        Asks a peer for its whole file list with the unframed version 1 request.
+
+        Raises:
+            ConnectionError: If the peer cannot be reached or sends nothing.
+        """
+        sock = self._connect_socket(peer_addr[0], peer_addr[1])
+        if not sock:
+            raise ConnectionError(f"Could not connect to peer {peer_addr}")
+
+        try:
+            # Send the GET_PEER_FILES command
+            command_msg = f"{str(Commands.GET_PEER_FILES)}\n"
+            sock.sendall(command_msg.encode('utf-8'))
+
+
+            response_data = b''
+            while True:
+                chunk = sock.recv(4096) # Read in chunks (each waits at most Config.CLIENT_READ_TIMEOUT)
+                if not chunk:
+                    break # Connection closed by peer
+                response_data += chunk
+        except socket.timeout as e:
+            raise self._peer_failed(peer_addr, e)
+        finally:
+            sock.close()
+
+        if not response_data:
+            raise ConnectionError(f"No response received from peer {peer_addr}")
+        return json.loads(response_data.decode('utf-8'))
 
     def register_user(self, username, password):
         if not self.peer_address:
@@ -149,6 +1045,9 @@ class FileShareClient:
             self.key = response_data["key"] # User's own key
             # print(f"Recieved sessionId: ({self.session_id})\nRecieved key: ({self.key})") # Avoid printing sensitive info
             print(Fore.GREEN + "Client: Login successful!" + Style.RESET_ALL)
+            if Config.CLIENT_REPLICATE:
+                self.replicator = self.replicator or Replicator(self)
+                self.replicator.start()
             return True
         else:
             print(Fore.RED + f"Client: Login failed: {response_data['message']}" + Style.RESET_ALL)
@@ -157,9 +1056,12 @@ class FileShareClient:
             self.key = None
             return False
     def logout(self):
+        if self.replicator:
+            self.replicator.stop()
         self.username = None
         self.session_id = None
         self.key = None
+        self.close_connections()
     def get_peers(self):
         if not self.session_id:
             print(Fore.RED + "Client: Not logged in. Cannot get peers." + Style.RESET_ALL)
@@ -187,9 +1089,10 @@ class FileShareClient:
 
         return response_data # assuming response_data is the dictionary of files
 
-    def register_file_with_registry(self, filename, file_hash):
+    def register_file_with_registry(self, filename, file_hash, size=None, codec=None, merkle_root=None, chunk_size=None,
+                                    file_format=None, content_hash=None):
         if not self.session_id or not self.username or not self.peer_address:
-            print(Fore.RED + "Client: Not logged in or peer address not set. Cannot register file." + Style.RESET_ALL)
+            logger.warning("Not logged in or peer address not set. Cannot register file.")
             return None
 
         request = {"command": str(Commands.REGISTER_FILE),
@@ -197,24 +1100,138 @@ class FileShareClient:
                    "filename": filename,
                    # "owner": self.username, # Owner is determined by the registry from session_id
                    "owner_address": self.peer_address,
-                   "file_hash":     file_hash}
+                   "file_hash":     file_hash,
+                   "content_hash":  content_hash, # SHA-256 of the stored ciphertext, which peers look it up by
+                   "size":          size, # stored (encrypted) size, lets downloaders split the file across holders
+                   "codec":         codec, # compression applied before encryption, undone after decryption
+                   "merkle_root":   merkle_root, # lets downloaders verify each chunk of the stored ciphertext
+                   "chunk_size":    chunk_size,
+                   "format":        file_format} # stored layout; "blocks" files can be updated with deltas
         response_data = self._send_registry_request(request)
 
         if response_data.get("status") == "OK":
             file_id = response_data.get("file_id")
             if file_id is not None:
-                 print(Fore.GREEN + f"Client: File '{filename}' registered with registry (ID: {file_id}, hash {file_hash})." + Style.RESET_ALL)
+                 logger.info("File '%s' registered with registry (ID: %s, hash %s).", filename, file_id, file_hash)
                  return file_id
             else:
-                 print(Fore.RED + f"Client: Error registering file '{filename}' - Registry did not return file_id. Response: {response_data}" + Style.RESET_ALL)
+                 logger.error("Error registering file '%s' - Registry did not return file_id. Response: %s", filename, response_data)
                  return None
         else:
-             print(Fore.RED + f"Client: Error registering file '{filename}': {response_data.get('message', 'Unknown error')}" + Style.RESET_ALL)
+             logger.error("Error registering file '%s': %s", filename, response_data.get('message', 'Unknown error'))
              return None
 
+    def register_files_with_registry(self, entries):
+        """
+        Registers many uploaded files in one REGISTER_FILES request. `entries` are dicts with
+        the fields of register_file_with_registry() ("filename", "file_hash", "size", ...).
+
+        Returns:
+            The new file IDs, in the order of `entries`.
+
+        Raises:
+            RuntimeError: If the registry refuses the batch; then none of the files is registered.
+        """
+        if not self.session_id or not self.peer_address:
+            raise RuntimeError("Not logged in or peer address not set")
+        request = {"command": str(Commands.REGISTER_FILES),
+                   "session_id": self.session_id,
+                   "owner_address": self.peer_address,
+                   "files": entries}
+        response_data = self._send_registry_request(request)
+        file_ids = response_data.get("file_ids")
+        if response_data.get("status") != "OK" or not isinstance(file_ids, list) or len(file_ids) != len(entries):
+            raise RuntimeError(response_data.get("message", f"Unexpected response {response_data}"))
+        return file_ids
+
+    def register_revision(self, file_id, file_hash, size=None, codec=None, merkle_root=None, chunk_size=None,
+                          file_format=None, content_hash=None):
+        """Tells the registry that file `file_id` now has new content. Returns the revision number, or None."""
+        if not self.session_id or not self.peer_address:
+            logger.warning("Not logged in or peer address not set. Cannot register a revision.")
+            return None
+
+        request = {"command": str(Commands.UPDATE_FILE),
+                   "session_id": self.session_id,
+                   "file_id": file_id,
+                   "owner_address": self.peer_address,
+                   "file_hash": file_hash,
+                   "content_hash": content_hash,
+                   "size": size,
+                   "codec": codec,
+                   "merkle_root": merkle_root,
+                   "chunk_size": chunk_size,
+                   "format": file_format}
+        response_data = self._send_registry_request(request)
+        if response_data.get("status") == "OK":
+            return response_data.get("revision")
+        logger.error("Error updating file ID %s: %s", file_id, response_data.get('message', 'Unknown error'))
+        return None
+
+    def register_holder(self, file_id, file_hash):
+        """Tells the registry that this client's peer now holds a verified copy of a file."""
+        if not self.session_id or not self.peer_address:
+            logger.warning("Not logged in or peer address not set. Cannot register as holder.")
+            return False
+
+        request = {"command": str(Commands.REGISTER_HOLDER),
+                   "session_id": self.session_id,
+                   "file_id": file_id,
+                   "holder_address": self.peer_address,
+                   "file_hash": file_hash}
+        response_data = self._send_registry_request(request)
+        if response_data.get("status") == "OK":
+            logger.info("Peer %s registered as a holder of file ID %s (%s holders).", tuple(self.peer_address), file_id,
+                        len(response_data.get('holders', [])))
+            return True
+        logger.warning("Failed to register as holder of file ID %s: %s", file_id, response_data.get('message', 'Unknown error'))
+        return False
+
+    def get_replication_tasks(self):
+        """Files the registry wants this client's peer to copy: registry entries plus their current holders."""
+        if not self.session_id:
+            return []
+        response_data = self._send_registry_request({"command": str(Commands.GET_REPLICATION_TASKS),
+                                                     "session_id": self.session_id})
+        if response_data.get("status") != "OK":
+            logger.warning("Could not get replication tasks: %s", response_data.get('message', 'Unknown error'))
+            return []
+        return response_data.get("tasks", [])
+
+    def unregister_holder(self, file_id, holder_address):
+        """Tells the registry that this client's peer no longer holds a copy of a file (it was evicted)."""
+        request = {"command": str(Commands.UNREGISTER_HOLDER),
+                   "session_id": self.session_id,
+                   "file_id": file_id,
+                   "holder_address": list(holder_address)}
+        response_data = self._send_registry_request(request)
+        if response_data.get("status") == "OK":
+            logger.info("Withdrew peer %s as a holder of file ID %s.", tuple(holder_address), file_id)
+            return True
+        logger.warning("Could not withdraw peer %s as a holder of file ID %s: %s", tuple(holder_address), file_id,
+                       response_data.get('message', 'Unknown error'))
+        return False
+
+    def seed_downloaded_file(self, file_id, filename, ciphertext, file_hash):
+        """
+        Stores the exact ciphertext of a verified download in this client's own peer's cache
+        (within its Config.PEER_CACHE_BUDGET_BYTES) and registers the peer as a holder, so
+        later downloaders can fetch pieces from it.
+        """
+        if not self.peer_address:
+            return False
+        try:
+            # stored or not, our peer now holds these exact bytes: its store is keyed by their hash
+            self._send_ciphertext(self.peer_address, filename, ciphertext, file_hash=crypto_utils.compute_hash(ciphertext),
+                                  cache_file_id=file_id)
+        except Exception as e:
+            logger.warning("Could not keep a copy of file ID %s on own peer: %s", file_id, e)
+            return False
+        return self.register_holder(file_id, file_hash)
+
     def request_key(self, file_id):
         if not self.session_id:
-            print(Fore.RED + "Client: Not logged in. Cannot request key." + Style.RESET_ALL)
+            logger.warning("Not logged in. Cannot request key.")
             return None
 
         request = {"command": str(Commands.REQUEST_KEY),
@@ -226,19 +1243,41 @@ class FileShareClient:
             key = response_data.get("key")
             if key:
                 # print(f"Recieved key: ({key})") # Avoid printing sensitive info
-                print(Fore.GREEN + f"Client: Successfully retrieved key for file ID {file_id}." + Style.RESET_ALL)
+                logger.debug("Retrieved key for file ID %s.", file_id)
                 return key
             else:
-                 print(Fore.RED + f"Client: Registry did not return a key for file ID {file_id}. Response: {response_data}" + Style.RESET_ALL)
+                 logger.error("Registry did not return a key for file ID %s. Response status: %s", file_id, response_data.get("status"))
                  return None
         else:
-            print(Fore.RED + f"Client: Failed to retrieve key for file ID {file_id}: {response_data.get('message', 'Unknown error')}" + Style.RESET_ALL)
+            logger.warning("Failed to retrieve key for file ID %s: %s", file_id, response_data.get('message', 'Unknown error'))
             return None
 
+    def request_keys(self, file_ids):
+        """
+        Checks access to many files and fetches their decryption keys in one registry round
+        trip (instead of a CHECK_ACCESS and a REQUEST_KEY per file).
+
+        Returns:
+            (keys, errors): {file_id: key} for the files the user may download, and
+            {file_id: message} for the rest.
+        """
+        file_ids = [str(file_id) for file_id in file_ids]
+        if not self.session_id:
+            return {}, {file_id: "Not logged in" for file_id in file_ids}
+
+        request = {"command": str(Commands.REQUEST_KEYS),
+                   "session_id": self.session_id,
+                   "file_ids": file_ids}
+        response_data = self._send_registry_request(request)
+        if response_data.get("status") != "OK":
+            message = response_data.get("message", "Unknown error")
+            return {}, {file_id: message for file_id in file_ids}
+        return response_data.get("keys", {}), response_data.get("errors", {})
+
     def check_access(self, file_id):
         """Checks with the registry if the current user has access to a file."""
         if not self.session_id:
-            print(Fore.RED + "Client: Not logged in. Cannot check access." + Style.RESET_ALL)
+            logger.warning("Not logged in. Cannot check access.")
             return False
 
         request = {"command": str(Commands.CHECK_ACCESS),
@@ -247,10 +1286,10 @@ class FileShareClient:
         response_data = self._send_registry_request(request)
 
         if response_data.get("status") == "OK":
-            print(Fore.GREEN + f"Client: Access granted for file ID {file_id}." + Style.RESET_ALL)
+            logger.debug("Access granted for file ID %s.", file_id)
             return True
         else:
-            print(Fore.RED + f"Client: Access denied for file ID {file_id}: {response_data.get('message', 'Unknown error')}" + Style.RESET_ALL)
+            logger.warning("Access denied for file ID %s: %s", file_id, response_data.get('message', 'Unknown error'))
             return False
 
     def share_file(self, file_id, target_username):
@@ -302,34 +1341,22 @@ class FileShareClient:
             return False
 
         filename = os.path.basename(filepath)
-        sock = self._connect_socket(self.peer_address[0], self.peer_address[1]) # Connect to own peer
-        if not sock:
-            return False
 
         try:
-            # Send command and filename
-            command_msg = f"{str(Commands.UPLOAD)}\n{filename}\n"
-            sock.sendall(command_msg.encode('utf-8'))
-            print(f"Client: Sending command '{Commands.UPLOAD}' and filename '{filename}' to own peer {self.peer_address}")
+            # integrity hash over the plaintext, then compress (if it pays off) and encrypt with the user's key
+            prepared = prepare_upload(filepath, self.key)
+            ciphertext, file_hash = prepared["ciphertext"], prepared["file_hash"]
 
-            # Compute integrity hash over plaintext
-            file_hash = crypto_utils.compute_file_hash(filepath)
+            logger.debug("Sending command '%s' and filename '%s' to own peer %s", Commands.UPLOAD, filename, self.peer_address)
+            self._upload_ciphertext(self.peer_address, filename, ciphertext, prepared["content_hash"])
 
-            # Encrypt entire file using the user's key
-            with open(filepath, 'rb') as f:
-                plaintext = f.read()
-            ciphertext = crypto_utils.encrypt_data(plaintext, self.key)
-
-            # Send encrypted bytes in chunks
-            for i in range(0, len(ciphertext), CHUNK_SIZE):
-                sock.sendall(ciphertext[i:i+CHUNK_SIZE])
-
-
-
-            print(Fore.GREEN + f"Client: Encrypted File '{filename}' uploaded to own peer {self.peer_address}." + Style.RESET_ALL)
+            logger.info("Encrypted file '%s' uploaded to own peer %s.", filename, self.peer_address)
 
             # Register file with registry AFTER successful upload
-            file_id = self.register_file_with_registry(filename, file_hash)
+            file_id = self.register_file_with_registry(filename, file_hash, size=len(ciphertext), codec=prepared["codec"],
+                                                       merkle_root=prepared["merkle_root"],
+                                                       chunk_size=Config.MERKLE_CHUNK_SIZE, file_format=prepared["format"],
+                                                       content_hash=prepared["content_hash"])
             if file_id is not None:
                  print(Fore.GREEN + f"Client: File '{filename}' registered with registry (ID: {file_id})." + Style.RESET_ALL)
                  return True
@@ -340,18 +1367,209 @@ class FileShareClient:
         except Exception as e:
             print(Fore.RED + f"Client: Error uploading file '{filename}' to own peer {self.peer_address}: {e}" + Style.RESET_ALL)
             return False
-        finally:
-            sock.close()
 
 
-    def download_file(self, file_id_str, destination_path, peer_address, filename, expected_hash):
+    def upload_directory(self, dirpath):
+        """
+        Uploads every file under `dirpath` to this client's peer and registers them all with
+        one REGISTER_FILES request. Files are registered under their path from the parent of
+        `dirpath` ("photos/2024/a.jpg" for upload_directory("photos")), which download_files()
+        recreates under its destination.
+
+        Config.CLIENT_UPLOAD_WORKERS processes read, hash, compress and encrypt the small files
+        in groups of about Config.CLIENT_UPLOAD_TASK_BYTES (as many threads do the larger
+        files), while this thread sends the ones already prepared over the pooled keep-alive
+        connection to the peer (a large one over several streams, as in upload_file()). At
+        most two groups per worker are prepared ahead of the upload, which bounds memory. A
+        file that cannot be read or sent is reported and left out of the registration.
+
+        Returns:
+            ({filename: file_id}, {filename: why it was not uploaded}).
+        """
+        if not self.session_id or not self.peer_address or not self.key:
+            print(Fore.RED + "Client: Not logged in or peer address/key not set. Cannot upload files." + Style.RESET_ALL)
+            return {}, {}
+        if not os.path.isdir(dirpath):
+            print(Fore.RED + f"Client: Error - Directory not found at '{dirpath}'" + Style.RESET_ALL)
+            return {}, {}
+
+        root = os.path.dirname(os.path.abspath(dirpath))
+        groups, group, group_bytes = [], [], 0 # [[(path, filename, size)]], one process pool task each
+        for directory, subdirs, filenames in os.walk(dirpath):
+            subdirs.sort()
+            for filename in sorted(filenames):
+                filepath = os.path.join(directory, filename)
+                if not os.path.isfile(filepath):
+                    continue
+                size = os.path.getsize(filepath)
+                if group and group_bytes + size > Config.CLIENT_UPLOAD_TASK_BYTES:
+                    groups.append(group)
+                    group, group_bytes = [], 0
+                group.append((filepath, os.path.relpath(os.path.abspath(filepath), root).replace(os.sep, "/"), size))
+                group_bytes += size
+        if group:
+            groups.append(group)
+        if not groups:
+            print(Fore.YELLOW + f"Client: No files to upload in '{dirpath}'." + Style.RESET_ALL)
+            return {}, {}
+
+        entries, errors = [], {}
+        sent_bytes = 0
+        workers = min(Config.CLIENT_UPLOAD_WORKERS or os.cpu_count() or 1, len(groups))
+        settings = {name: value for name, value in vars(Config).items() if name.isupper()}
+        # forking this process would copy the peer's and connection pool's threads' locks mid-use
+        context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None)
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_apply_settings,
+                                 initargs=(settings,)) as processes, ThreadPoolExecutor(max_workers=workers) as threads:
+            waiting, pending = iter(groups), deque()
+
+            def submit_next():
+                group = next(waiting, None)
+                if group is not None:
+                    # hashing, compressing and encrypting a large file mostly runs outside the GIL, so a
+                    # thread does it without copying the ciphertext back through a pipe
+                    pool = threads if group[0][2] > Config.CLIENT_UPLOAD_TASK_BYTES else processes
+                    pending.append((group, pool.submit(_prepare_uploads, [filepath for filepath, _, _ in group], self.key)))
+
+            for _ in range(2 * workers):
+                submit_next()
+            while pending:
+                group, future = pending.popleft()
+                submit_next()
+                try:
+                    prepared_files = future.result()
+                except Exception as e: # e.g. a worker process died
+                    prepared_files = [(None, str(e))] * len(group)
+                for (filepath, filename, size), (prepared, error) in zip(group, prepared_files):
+                    if error is not None:
+                        errors[filename] = error
+                        continue
+                    try:
+                        self._upload_ciphertext(self.peer_address, filename, prepared["ciphertext"], prepared["content_hash"])
+                    except (ConnectionError, RuntimeError, OSError) as e:
+                        errors[filename] = str(e)
+                        continue
+                    sent_bytes += size
+                    entries.append({"filename": filename, "file_hash": prepared["file_hash"],
+                                    "content_hash": prepared["content_hash"], "size": len(prepared["ciphertext"]), "codec": prepared["codec"],
+                                    "merkle_root": prepared["merkle_root"], "chunk_size": Config.MERKLE_CHUNK_SIZE,
+                                    "format": prepared["format"]})
+        seconds = time.perf_counter() - started
+        logger.info("Uploaded %s files (%s bytes) in %.2f s.", len(entries), sent_bytes, seconds)
+
+        file_ids = {}
+        if entries:
+            try:
+                file_ids = dict(zip((entry["filename"] for entry in entries), self.register_files_with_registry(entries)))
+            except RuntimeError as e:
+                errors.update({entry["filename"]: f"Uploaded but not registered: {e}" for entry in entries})
+        for filename, error in errors.items():
+            logger.warning("File '%s' not uploaded: %s", filename, error)
+        print(Fore.GREEN + f"Client: {len(file_ids)} of {len(file_ids) + len(errors)} files from '{dirpath}' uploaded "
+              f"and registered." + Style.RESET_ALL)
+        return file_ids, errors
+
+    def update_file(self, file_id_str, filepath):
+        """
+        Publishes the contents of `filepath` as a new revision of file `file_id_str` (same
+        file ID, access list and name). The new revision is stored in the "blocks" format.
+
+        If the current revision is in that format and still on this client's peer, this is a
+        delta sync: the block signature stored with it is fetched and decrypted, the new
+        contents are matched against it rsync-style, and only the blocks that changed are
+        encrypted and sent; the peer copies the rest from the current revision. Otherwise the
+        whole file is uploaded.
+
+        The Merkle root is only registered for full uploads: the client never sees the
+        ciphertext a delta copies on the peer.
+        """
+        if not self.session_id or not self.peer_address or not self.key:
+            print(Fore.RED + "Client: Not logged in or peer address/key not set. Cannot update file." + Style.RESET_ALL)
+            return False
+        if not os.path.isfile(filepath):
+            print(Fore.RED + f"Client: Error - File not found at '{filepath}'" + Style.RESET_ALL)
+            return False
+        info = self.get_files_from_registry().get(str(file_id_str))
+        if not info or info.get("owner") != self.username:
+            print(Fore.RED + f"Client: File ID {file_id_str} not found among your files." + Style.RESET_ALL)
+            return False
+
+        filename = info["filename"]
+        try:
+            file_hash = crypto_utils.compute_file_hash(filepath)
+            if file_hash == info.get("file_hash"):
+                print(Fore.GREEN + f"Client: '{filename}' is unchanged, nothing to update." + Style.RESET_ALL)
+                return True
+            with open(filepath, 'rb') as f:
+                plaintext = f.read()
+
+            signature = None
+            if info.get("format") == delta.FORMAT_BLOCKS:
+                try:
+                    signature = self.fetch_signature(self.peer_address, file_id_str, info.get("content_hash"), info.get("size"), self.key)
+                except (ConnectionError, RuntimeError, ValueError) as e:
+                    logger.warning("Cannot delta-sync '%s' (%s), uploading it whole.", filename, e)
+
+            plan = content_hash = None
+            if signature is not None:
+                plan = delta.plan_revision(plaintext, self.key, signature)
+                logger.debug("Sending %s of %s bytes of '%s' as a delta to own peer %s", plan.sent, plan.size, filename, self.peer_address)
+                try:
+                    content_hash = self._send_delta(self.peer_address, filename, plan, info.get("content_hash"))
+                except RuntimeError as e:
+                    logger.warning("Delta upload of '%s' failed (%s), uploading it whole.", filename, e)
+                    plan = None
+            merkle_root = chunk_size = None
+            if plan is None or plan.is_full:
+                plan = plan or delta.plan_revision(plaintext, self.key)
+                ciphertext = plan.stored_bytes()
+                content_hash = crypto_utils.compute_hash(ciphertext)
+                logger.debug("Sending command '%s' and filename '%s' to own peer %s", Commands.UPLOAD, filename, self.peer_address)
+                self._upload_ciphertext(self.peer_address, filename, ciphertext, content_hash)
+                merkle_root, chunk_size = merkle.merkle_root(merkle.leaf_hashes(ciphertext)), Config.MERKLE_CHUNK_SIZE
+
+            revision = self.register_revision(file_id_str, file_hash, size=plan.size, codec=compression.CODEC_NONE,
+                                              merkle_root=merkle_root, chunk_size=chunk_size, file_format=delta.FORMAT_BLOCKS,
+                                              content_hash=content_hash)
+            if revision is None:
+                print(Fore.RED + f"Client: Warning - New version of '{filename}' uploaded but the registry was not updated." + Style.RESET_ALL)
+                return False
+            print(Fore.GREEN + f"Client: File ID {file_id_str} ('{filename}') updated to revision {revision}." + Style.RESET_ALL)
+            return True
+        except Exception as e:
+            print(Fore.RED + f"Client: Error updating file '{filename}' on own peer {self.peer_address}: {e}" + Style.RESET_ALL)
+            return False
+
+    def download_file(self, file_id_str, destination_path, peer_address, filename, expected_hash, holders=None, size=None,
+                      codec=None, merkle_root=None, chunk_size=None, file_format=None, content_hash=None):
         """
         Handles the download process including access check and key retrieval.
         Note: The key is now retrieved dynamically via request_key after access check.
+        `codec` is the compression recorded in the registry file entry; it is undone after decryption.
+        `file_format` is the entry's stored layout ("blocks" files are decrypted record by record).
+        `content_hash` is the entry's hash of the stored ciphertext, which holders look it up by;
+        `expected_hash` is over the plaintext and checked after decryption.
+
+        With the entry's `merkle_root` and `chunk_size`, every chunk of ciphertext is verified as
+        it arrives (swarm pieces per holder), so a corrupt chunk or a lying holder only costs
+        that chunk, which is re-fetched from the holders; the plaintext hash is still checked
+        at the end.
+
+        With several `holders` (from the registry file entry) and a known stored `size`, the
+        ciphertext is fetched from all holders at once (Config.CLIENT_SWARM_DOWNLOAD);
+        otherwise, or if the swarm fails, it comes from a single holder: the quickest by
+        rank_holders() (Config.CLIENT_PROBE_HOLDERS), else `peer_address`. A large file is
+        fetched from that holder over several parallel streams (fetch_parallel()).
         """
         if not self.session_id:
             print(Fore.RED + "Client: Not logged in. Cannot download file." + Style.RESET_ALL)
             return False
+        try:
+            filepath = self._destination_file(destination_path, filename)
+        except ValueError as e:
+            print(Fore.RED + f"Client: {e}. Cannot download file ID {file_id_str}." + Style.RESET_ALL)
+            return False
 
         # 1) check access with the registry
         if not self.check_access(file_id_str):
@@ -365,34 +1583,68 @@ class FileShareClient:
              return False
 
 
-        # ensure destination directory exists
-        os.makedirs(destination_path, exist_ok=True)
+        # ensure the destination directory, and any subdirectory the filename names, exists
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        part_path = filepath + ".part" # ciphertext received so far, kept if the transfer is interrupted
 
-        sock = self._connect_socket(peer_address[0], peer_address[1])
-        if not sock:
-            return False
+        sources = [tuple(peer_address)] + [tuple(h) for h in holders or [] if tuple(h) != tuple(peer_address)]
+        verifier = None
+        if merkle_root and chunk_size and size is not None:
+            verifier = self._chunk_verifier(sources, file_id_str, content_hash, merkle_root, chunk_size, size)
+            if verifier is None:
+                logger.warning("Chunk hashes unavailable, verifying the whole file at the end only.")
 
-        filepath = os.path.join(destination_path, filename)
+        encrypted = None
+        if Config.CLIENT_SWARM_DOWNLOAD and size and holders and len(holders) > 1:
+            logger.info("Downloading file ID '%s' (%s) from %s holders...", file_id_str, filename, len(holders))
+            try:
+                # holders that keep failing would only cost connect timeouts
+                swarm_holders = self.peer_table.rank(holders, size, skip_suspended=True)
+                swarm = SwarmDownload(self, swarm_holders, file_id_str, size, file_hash=content_hash, verifier=verifier)
+                encrypted = swarm.run()
+                served = ", ".join(f"{holder}: {stats['pieces']}" for holder, stats in swarm.holder_stats.items())
+                logger.debug("Swarm download complete (pieces per holder: %s).", served)
+            except ConnectionError as e:
+                logger.warning("%s; falling back to peer %s.", e, peer_address)
+
+        if encrypted is None and Config.CLIENT_PROBE_HOLDERS and len(sources) > 1:
+            peer_address = self.rank_holders(sources, size)[0] # a cached copy may be nearer or less loaded than the owner's
+
+        if encrypted is None and size:
+            streams = self._stream_count(peer_address, size)
+            if streams > 1:
+                logger.info("Downloading file ID '%s' (%s) over %s streams...", file_id_str, filename, streams)
+                try:
+                    encrypted = self.fetch_parallel(peer_address, file_id_str, size, file_hash=content_hash,
+                                                    verifier=verifier, streams=streams)
+                except ConnectionError as e:
+                    logger.warning("%s; falling back to one stream.", e)
 
         try:
-             # send command and file ID to the peer
-            command_msg = f"{str(Commands.DOWNLOAD)}\n{file_id_str}\n"
-            sock.sendall(command_msg.encode('utf-8'))
-            print(f"Client: Requesting file ID '{file_id_str}' ({filename}) from peer {peer_address}")
-
-            # receive all encrypted data
-            encrypted = b''
-            print(f"Client: Receiving encrypted data for file ID {file_id_str}...")
-            while True:
-                chunk = sock.recv(CHUNK_SIZE)
-                if not chunk or chunk.decode(errors='ignore').strip() == str(Commands.DONE):
-                    break
-                encrypted += chunk
-            print(f"Client: Finished receiving encrypted data for file ID {file_id_str}.")
+            if encrypted is None:
+                logger.debug("Requesting file ID '%s' (%s) from peer %s", file_id_str, filename, peer_address)
+                logger.debug("Receiving encrypted data for file ID %s...", file_id_str)
+                encrypted = self._receive_ciphertext_resumable(peer_address, file_id_str, part_path, file_hash=content_hash,
+                                                               verifier=verifier)
+            logger.debug("Finished receiving encrypted data for file ID %s.", file_id_str)
+            if verifier is not None and verifier.bad_chunks:
+                logger.warning("Re-fetching %s corrupt chunk(s) of file ID %s.", len(verifier.bad_chunks), file_id_str)
+                encrypted = bytearray(encrypted)
+                self._repair_chunks(encrypted, verifier, sources, file_id_str, content_hash)
+        except ConnectionError as e:
+            print(Fore.RED + f"Client: Download of file ID {file_id_str} from {peer_address} interrupted: {e}" + Style.RESET_ALL)
+            if os.path.exists(part_path):
+                print(Fore.YELLOW + f"Client: Partial data kept in '{part_path}'; download again to resume." + Style.RESET_ALL)
+            return False
+        except Exception as e:
+            print(Fore.RED + f"Client: Error downloading file ID {file_id_str} from {peer_address}: {e}" + Style.RESET_ALL)
+            return False
+        self._discard_partial_download(part_path) # the transfer is complete; a corrupt copy must not be resumed
 
+        try:
             # decrypt
-            print("Client: Beginning decryption...")
-            plaintext = crypto_utils.decrypt_data(encrypted, decryption_key) # use the retrieved key 
+            logger.debug("Beginning decryption...")
+            plaintext = self._decrypt_download(encrypted, decryption_key, codec, file_format) # use the retrieved key
 
             with open(filepath, 'wb') as f:
                     f.write(plaintext)
@@ -402,6 +1654,9 @@ class FileShareClient:
             actual_hash = crypto_utils.compute_hash(plaintext)
             if expected_hash and actual_hash == expected_hash:
                 print(Fore.GREEN + "Client: Integrity check passed ✔" + Style.RESET_ALL)
+                own_address = list(self.peer_address) if self.peer_address else None
+                if Config.CLIENT_SEED_DOWNLOADS and own_address and own_address not in [list(h) for h in holders or []]:
+                    self.seed_downloaded_file(file_id_str, filename, encrypted, expected_hash)
             else:
                 print(Fore.RED + f"Client: WARNING—integrity check failed (expected {expected_hash}, got {actual_hash})" + Style.RESET_ALL)
 
@@ -414,10 +1669,119 @@ class FileShareClient:
             if 'f' in locals() and not f.closed: f.close()
             if os.path.exists(filepath): os.remove(filepath)
             return False
-        finally:
-            sock.close()
 
 
+    def _decrypt_download(self, encrypted, key, codec=None, file_format=None):
+        """Decrypts downloaded ciphertext in its stored `file_format` and undoes its compression `codec`."""
+        if file_format == delta.FORMAT_BLOCKS:
+            plaintext = delta.decrypt_file(encrypted, key)
+        else:
+            plaintext = crypto_utils.decrypt_data(encrypted, key)
+        return compression.decompress(plaintext, codec)
+
+    def _destination_file(self, destination_path, filename):
+        """
+        Path under `destination_path` to save a registered filename at; the name may include subdirectories.
+
+        Raises:
+            ValueError: If the name is absolute or leads out of `destination_path`.
+        """
+        name = os.path.normpath(filename)
+        if os.path.isabs(name) or os.path.splitdrive(name)[0] or name.split(os.sep)[0] == os.pardir:
+            raise ValueError(f"Unsafe filename {filename!r}")
+        return os.path.join(destination_path, name)
+
+    def _save_download(self, info, encrypted, key, destination_path):
+        """
+        Decrypts one file of a batch download, checks it against the registry entry's hash
+        and writes it under `destination_path`. Returns None, or why the file was not saved.
+        """
+        try:
+            filepath = self._destination_file(destination_path, info["filename"])
+            plaintext = self._decrypt_download(encrypted, key, info.get("codec"), info.get("format"))
+            actual_hash = crypto_utils.compute_hash(plaintext)
+            if actual_hash != info.get("file_hash"):
+                return f"Integrity check failed (expected {info.get('file_hash')}, got {actual_hash})"
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            with open(filepath, 'wb') as f:
+                f.write(plaintext)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def download_files(self, files, destination_path):
+        """
+        Downloads many files at once. `files` is {file_id: registry entry}, e.g. part of
+        get_files_from_registry(); filenames may name subdirectories of `destination_path`.
+
+        Access is checked and the keys fetched for all files in one REQUEST_KEYS round trip.
+        Each file comes from its quickest holder in the peer table; the files of one holder
+        are fetched in DOWNLOAD_MANY batches of Config.CLIENT_BATCH_FILES over pooled
+        connections, up to Config.CLIENT_MAX_STREAMS batches at once, while
+        Config.CLIENT_BATCH_WORKERS threads decrypt, verify and write the files already in.
+        The files of a batch that fails (e.g. on a peer without DOWNLOAD_MANY) are then
+        downloaded one by one. Files are not chunk-verified, seeded or resumable as in
+        download_file(); each is checked against its plaintext hash before it is written.
+
+        Returns:
+            {file_id: None if the file was saved, else why not}.
+        """
+        if not self.session_id:
+            print(Fore.RED + "Client: Not logged in. Cannot download files." + Style.RESET_ALL)
+            return {str(file_id): "Not logged in" for file_id in files}
+        files = {str(file_id): info for file_id, info in files.items()}
+        keys, errors = self.request_keys(files)
+        results = {file_id: None if file_id in keys else errors.get(file_id, "No key received") for file_id in files}
+
+        by_holder = {}
+        for file_id in keys:
+            info = files[file_id]
+            holders = info.get("holders") or [info["owner_address"]]
+            source = self.peer_table.rank(holders, info.get("size") or 0, skip_suspended=True)[0]
+            by_holder.setdefault(source, []).append(file_id)
+        batches = [(holder, file_ids[i:i + Config.CLIENT_BATCH_FILES])
+                   for holder, file_ids in by_holder.items()
+                   for i in range(0, len(file_ids), Config.CLIENT_BATCH_FILES)]
+        os.makedirs(destination_path, exist_ok=True)
+        logger.info("Downloading %s files from %s holders in %s batches...", len(keys), len(by_holder), len(batches))
+
+        with ThreadPoolExecutor(max_workers=Config.CLIENT_BATCH_WORKERS) as writers:
+            saves = {} # {file_id: future of _save_download()}
+
+            def save(file_id, encrypted):
+                saves[file_id] = writers.submit(self._save_download, files[file_id], encrypted, keys[file_id], destination_path)
+
+            def fetch(holder, batch):
+                received = set()
+                try:
+                    for file_id, encrypted in self.iter_many(holder, [(file_id, files[file_id].get("content_hash")) for file_id in batch]):
+                        received.add(file_id)
+                        if isinstance(encrypted, Exception):
+                            results[file_id] = str(encrypted)
+                        else:
+                            save(file_id, encrypted)
+                except (ConnectionError, RuntimeError, OSError, ValueError) as e:
+                    logger.warning("Batch download from %s failed (%s), fetching its files one by one.", holder, e)
+                    for file_id in batch:
+                        if file_id in received:
+                            continue
+                        try:
+                            save(file_id, self._receive_ciphertext(holder, file_id, file_hash=files[file_id].get("content_hash")))
+                        except (ConnectionError, RuntimeError, OSError, ValueError) as e:
+                            results[file_id] = str(e)
+
+            if batches:
+                with ThreadPoolExecutor(max_workers=min(len(batches), Config.CLIENT_MAX_STREAMS)) as fetchers:
+                    list(fetchers.map(lambda batch: fetch(*batch), batches))
+            for file_id, future in saves.items():
+                results[file_id] = future.result()
+
+        failed = {file_id: error for file_id, error in results.items() if error is not None}
+        for file_id, error in failed.items():
+            logger.warning("File ID %s ('%s') not downloaded: %s", file_id, files[file_id].get('filename'), error)
+        print(Fore.GREEN + f"Client: {len(files) - len(failed)} of {len(files)} files downloaded to '{destination_path}'." + Style.RESET_ALL)
+        return results
+
     def start_peer_thread(self, requested_port=0):
         """Starts the peer functionality in a separate thread."""
         try:
@@ -425,9 +1789,10 @@ class FileShareClient:
             self.peer_listening_port = peer.port # Get the actual port chosen
             self.peer_address = (Config.PEER_HOST, self.peer_listening_port)
 
-            peer_thread = threading.Thread(target=peer.start_peer, daemon=True)
+            serve = peer.start_peer_async if Config.PEER_SERVER_MODE == "asyncio" else peer.start_peer
+            peer_thread = threading.Thread(target=serve, daemon=True)
             peer_thread.start()
-            print(f"Client: Peer thread started listening on {self.peer_address}")
+            logger.info("Peer thread started listening on %s", self.peer_address)
             return True
         except Exception as e:
             print(Fore.RED + f"Client: Failed to start peer thread: {e}" + Style.RESET_ALL)
@@ -441,6 +1806,7 @@ if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
     shared_files_dir = os.path.join(script_dir, '..', '..', Config.SHARED_FILES_DIR) # Adjust path as needed
     os.makedirs(shared_files_dir, exist_ok=True)
+    setup_logging()
 
     client = FileShareClient()
 
@@ -0,0 +1,194 @@
+import math
+import statistics
+import threading
+import time
+
+from src.utils.config import Config
+
+STREAM_RATE_FADE = 0.9 # the best per-stream rate seen loses this much per multi-stream transfer
+
+
+class PeerRecord:
+    """What the client has measured of one peer. rtt and throughput are None until first measured."""
+    __slots__ = ("rtt", "throughput", "failures", "failed_at", "streams", "stream_rate", "max_streams", "multipart")
+
+    def __init__(self):
+        self.rtt = None          # seconds, moving average of connect and request round trips
+        self.throughput = None   # bytes per second, moving average of transfers
+        self.failures = 0.0      # decaying count of failed connects and transfers
+        self.failed_at = 0.0
+        self.streams = None      # parallel streams to use for the next large transfer
+        self.stream_rate = None  # bytes per second, best recent throughput of one of those streams
+        self.max_streams = None  # the peer's per-client transfer limit, from its STATS
+        self.multipart = None    # whether the peer takes multipart uploads, from its STATS
+
+    def decayed_failures(self, now: float) -> float:
+        return self.failures * 0.5 ** ((now - self.failed_at) / Config.CLIENT_PEER_FAILURE_HALF_LIFE)
+
+    def suspended(self, now: float) -> bool:
+        # more than MAX_FAILURES - 1: failures in quick succession have already decayed a little
+        return self.decayed_failures(now) > Config.CLIENT_PEER_MAX_FAILURES - 1
+
+    def report(self, now: float) -> dict:
+        return {"rtt_ms": None if self.rtt is None else round(self.rtt * 1000, 3),
+                "throughput": None if self.throughput is None else round(self.throughput),
+                "failures": round(self.decayed_failures(now), 2), "streams": self.streams}
+
+
+class PeerPerformanceTable:
+    """
+    Connect RTT, recent throughput and failures per peer, fed by the client's real transfers
+    and probes, so it can try the quickest peer first and skip dead ones without waiting.
+
+    RTT and throughput are exponential moving averages (weight Config.CLIENT_PEER_EWMA_WEIGHT
+    on the newest sample); only transfers of at least Config.CLIENT_PEER_MIN_SAMPLE_BYTES
+    count toward throughput, smaller ones are all round trip. Failures decay with a half-life
+    of Config.CLIENT_PEER_FAILURE_HALF_LIFE seconds; a peer with Config.CLIENT_PEER_MAX_FAILURES
+    recent ones is suspended (ranked last, skipped where others can serve) for about a
+    half-life, until they decay.
+
+    It also sizes multi-stream transfers per peer (stream_count(), record_streams()) and
+    keeps the stream limits the peer reports in its STATS.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._peers = {}   # {(host, port): PeerRecord}
+
+    def _record(self, peer) -> PeerRecord:
+        """Must hold the lock."""
+        peer = tuple(peer)
+        record = self._peers.get(peer)
+        if record is None:
+            record = self._peers[peer] = PeerRecord()
+        return record
+
+    @staticmethod
+    def _average(old, sample):
+        weight = Config.CLIENT_PEER_EWMA_WEIGHT
+        return sample if old is None else (1 - weight) * old + weight * sample
+
+    def record_rtt(self, peer, seconds: float):
+        with self._lock:
+            record = self._record(peer)
+            record.rtt = self._average(record.rtt, seconds)
+
+    def record_transfer(self, peer, nbytes: int, seconds: float):
+        if nbytes < Config.CLIENT_PEER_MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        with self._lock:
+            record = self._record(peer)
+            record.throughput = self._average(record.throughput, nbytes / seconds)
+
+    def throughput(self, peer) -> float | None:
+        with self._lock:
+            record = self._peers.get(tuple(peer))
+            return record.throughput if record else None
+
+    def record_failure(self, peer, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            record = self._record(peer)
+            record.failures = record.decayed_failures(now) + 1
+            record.failed_at = now
+
+    def record_stream_limits(self, peer, max_streams: int | None, multipart: bool):
+        """Records what a peer's STATS said about parallel streams: its per-client transfer limit and multipart support."""
+        with self._lock:
+            record = self._record(peer)
+            record.max_streams, record.multipart = max_streams, multipart
+
+    def stream_limits(self, peer) -> tuple[int | None, bool] | None:
+        """(per-client transfer limit, multipart support) of a peer, or None if its STATS were never read."""
+        with self._lock:
+            record = self._peers.get(tuple(peer))
+            if record is None or record.multipart is None:
+                return None
+            return record.max_streams, record.multipart
+
+    def stream_count(self, peer, nbytes: int) -> int:
+        """
+        Parallel streams for a transfer of `nbytes` with a peer: what earlier transfers
+        settled on (Config.CLIENT_INITIAL_STREAMS at first), at most Config.CLIENT_MAX_STREAMS
+        and the peer's per-client limit, and at least Config.CLIENT_STREAM_MIN_BYTES per stream.
+        """
+        with self._lock:
+            record = self._peers.get(tuple(peer))
+            streams = record.streams if record and record.streams else Config.CLIENT_INITIAL_STREAMS
+            limit = record.max_streams if record and record.max_streams else Config.CLIENT_MAX_STREAMS
+        return max(1, min(streams, Config.CLIENT_MAX_STREAMS, limit, nbytes // Config.CLIENT_STREAM_MIN_BYTES))
+
+    def record_streams(self, peer, streams: int, nbytes: int, seconds: float, stream_seconds: float):
+        """
+        Sizes the next multi-stream transfer with a peer from one that moved `nbytes` in
+        `seconds` over `streams` streams, busy `stream_seconds` between them. If each stream
+        still ran at Config.CLIENT_STREAM_SCALING of the best per-stream rate seen, the streams
+        did not compete for the link (a long, window-limited path), so the next transfer gets
+        half as many again. Otherwise the link was full, and the next one gets as many streams
+        as the total rate is worth at the best per-stream rate.
+        """
+        if nbytes < Config.CLIENT_PEER_MIN_SAMPLE_BYTES or seconds <= 0 or stream_seconds <= 0:
+            return
+        stream_rate = nbytes / stream_seconds
+        with self._lock:
+            record = self._record(peer)
+            # the best rate fades, so one lucky transfer does not set the bar for good
+            best = max(stream_rate, (record.stream_rate or 0) * STREAM_RATE_FADE)
+            if stream_rate >= Config.CLIENT_STREAM_SCALING * best:
+                following = streams + max(1, streams // 2)
+            else:
+                following = math.ceil(nbytes / seconds / best)
+            record.stream_rate = best
+            record.streams = max(1, min(Config.CLIENT_MAX_STREAMS, following))
+
+    def is_suspended(self, peer, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            record = self._peers.get(tuple(peer))
+            return record is not None and record.suspended(now)
+
+    def connect_timeout(self, peer) -> float:
+        """Config.CLIENT_CONNECT_TIMEOUT, cut down to a multiple of the RTT for peers that have answered before."""
+        with self._lock:
+            record = self._peers.get(tuple(peer))
+            rtt = record.rtt if record else None
+        if rtt is None:
+            return Config.CLIENT_CONNECT_TIMEOUT
+        return min(Config.CLIENT_CONNECT_TIMEOUT, max(Config.CLIENT_MIN_CONNECT_TIMEOUT, Config.CLIENT_CONNECT_TIMEOUT_RTTS * rtt))
+
+    def rank(self, peers, nbytes: int = 0, load: dict | None = None, skip_suspended: bool = False, now: float | None = None) -> list:
+        """
+        Orders peers by expected time to move `nbytes` (RTT + nbytes / throughput), times
+        (1 + load) where a `load` ({peer: transfers running there}) is known. Peers not
+        measured yet are assumed typical (the median of the others), so they get tried.
+        Suspended peers come last, or are left out with `skip_suspended` unless every peer
+        is suspended.
+        """
+        now = time.monotonic() if now is None else now
+        peers = [tuple(peer) for peer in peers]
+        load = {tuple(peer): value for peer, value in (load or {}).items()}
+        with self._lock:
+            records = {peer: self._peers.get(peer) for peer in peers}
+            rtts = [r.rtt for r in records.values() if r and r.rtt is not None]
+            rates = [r.throughput for r in records.values() if r and r.throughput]
+            suspended = {peer for peer, r in records.items() if r and r.suspended(now)}
+        typical_rtt = statistics.median(rtts) if rtts else 0.0
+        typical_rate = statistics.median(rates) if rates else None
+
+        def expected(peer):
+            record = records[peer]
+            rtt = record.rtt if record and record.rtt is not None else typical_rtt
+            rate = record.throughput if record and record.throughput else typical_rate
+            seconds = rtt + (nbytes / rate if rate and nbytes else 0.0)
+            return seconds * (1 + load.get(peer, 0))
+
+        order = sorted(range(len(peers)), key=lambda i: (peers[i] in suspended, expected(peers[i]), i))
+        ranked = [peers[i] for i in order]
+        if skip_suspended and len(suspended) < len(set(peers)):
+            ranked = [peer for peer in ranked if peer not in suspended]
+        return ranked
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {peer: record.report(now) for peer, record in self._peers.items()}
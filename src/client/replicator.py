@@ -0,0 +1,110 @@
+import threading
+import time
+
+from src.utils import crypto_utils, merkle
+from src.utils.config import Config
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("client.replicator")
+
+
+class Replicator:
+    """
+    Copies the files the registry assigns to this client's peer (Config.CLIENT_REPLICATE)
+    from their holders, peer to peer, without getting in the way of user transfers:
+
+    - pieces are fetched as background downloads, which the holders only serve when no
+      user download is waiting for their uplink;
+    - the replicator's own download rate is capped at Config.CLIENT_REPLICATION_RATE;
+    - one file at a time, asking for work every Config.CLIENT_REPLICATION_POLL_INTERVAL.
+
+    The replica cannot decrypt the file, so the ciphertext is checked against the registry's
+    Merkle root before it is stored, as a cached copy within the peer's cache budget, and
+    the peer registered as a holder.
+    """
+
+    def __init__(self, client, rate=None, interval=None, piece_size=None):
+        self.client = client
+        self.rate = Config.CLIENT_REPLICATION_RATE if rate is None else rate
+        self.interval = Config.CLIENT_REPLICATION_POLL_INTERVAL if interval is None else interval
+        self.piece_size = piece_size or Config.SWARM_PIECE_SIZE
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.warning("Replication round failed: %s", e)
+
+    def poll_once(self) -> int:
+        """Asks the registry for work and carries it out. Returns how many files were replicated."""
+        replicated = 0
+        for task in self.client.get_replication_tasks():
+            if self._stop.is_set():
+                break
+            replicated += bool(self.replicate(task))
+        return replicated
+
+    def _pace(self, started: float, received: int):
+        if self.rate:
+            ahead = received / self.rate - (time.monotonic() - started)
+            if ahead > 0:
+                self._stop.wait(ahead)
+
+    def fetch(self, task) -> bytearray | None:
+        """
+        Reads a task's ciphertext from its holders piece by piece, quickest holder first by the
+        client's peer table, moving on to the next holder when one fails.
+        """
+        own = tuple(self.client.peer_address or ())
+        holders = self.client.peer_table.rank([h for h in task["holders"] if tuple(h) != own], skip_suspended=True)
+        size, file_id = task["size"], str(task["file_id"])
+        data = bytearray()
+        started = time.monotonic()
+        while len(data) < size and holders and not self._stop.is_set():
+            try:
+                piece = self.client.fetch_range(holders[0], file_id, len(data), min(self.piece_size, size - len(data)),
+                                                file_hash=task.get("content_hash"), background=True)
+            except (ConnectionError, RuntimeError, OSError) as e:
+                logger.debug("Holder %s failed a replication piece of file ID %s: %s", holders[0], file_id, e)
+                holders.pop(0)
+                continue
+            if not piece:
+                holders.pop(0)
+                continue
+            data += piece
+            self._pace(started, len(data))
+        return data if len(data) == size else None
+
+    def replicate(self, task) -> bool:
+        file_id = task["file_id"]
+        if not task.get("size") or not task.get("merkle_root") or not task.get("chunk_size"):
+            return False
+        data = self.fetch(task)
+        if data is None:
+            logger.warning("Could not fetch file ID %s from any holder for replication.", file_id)
+            return False
+        if merkle.merkle_root(merkle.leaf_hashes(data, task["chunk_size"])) != task["merkle_root"]:
+            logger.warning("Replica of file ID %s does not match its Merkle root; discarded.", file_id)
+            return False
+        try:
+            # already stored or not, the peer now holds exactly these bytes
+            self.client._send_ciphertext(self.client.peer_address, task["filename"], bytes(data),
+                                         file_hash=crypto_utils.compute_hash(data), cache_file_id=str(file_id))
+        except (ConnectionError, RuntimeError) as e:
+            logger.warning("Own peer did not keep the replica of file ID %s: %s", file_id, e)
+            return False
+        logger.info("Replicated file ID %s (%s bytes).", file_id, len(data))
+        return self.client.register_holder(file_id, task["file_hash"])
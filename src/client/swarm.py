@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import deque
+
+from src.utils.config import Config
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("client.swarm")
+
+
+class SwarmDownload:
+    """
+    Fetches one file's stored ciphertext from several holders at once.
+
+    The file is split into fixed-size pieces that holders pull from a shared queue, one
+    worker thread per holder, so a fast holder simply ends up serving more pieces. A holder
+    whose measured throughput drops below Config.SWARM_SLOW_FRACTION of the best holder's
+    stops taking new pieces; a holder that fails Config.SWARM_MAX_FAILURES times is dropped
+    and its piece goes back on the queue. Once the queue is empty, idle holders also fetch
+    pieces that are still in flight elsewhere, and the first copy to arrive wins, so one
+    slow holder cannot hold up the end of the transfer.
+
+    With `streams` above 1, each holder gets that many worker threads, each on its own
+    connection: a single large transfer from one peer over a long path is then carried by
+    several TCP streams instead of one window-limited one. holder_stats count the seconds
+    of all of a holder's streams.
+
+    Every holder stores identical ciphertext (holders seed exactly the bytes they
+    downloaded), so pieces from different holders line up. The caller verifies the
+    reassembled file against its file_hash. With a ChunkVerifier each piece is also checked
+    on arrival, and a piece with a corrupt chunk counts as a failure of the holder that sent
+    it and goes back on the queue for the others.
+    """
+
+    def __init__(self, client, holders, file_id_str, size, file_hash=None, piece_size=None, verifier=None, streams=1):
+        self.client = client
+        self.holders = [tuple(holder) for holder in holders]
+        self.file_id_str = file_id_str
+        self.size = size
+        self.file_hash = file_hash
+        self.verifier = verifier
+        self.streams = max(1, streams)
+        self.piece_size = piece_size or Config.SWARM_PIECE_SIZE
+        if verifier is not None and self.piece_size % verifier.chunk_size:
+            # pieces must be made of whole chunks to be verified on their own
+            self.piece_size = max(1, self.piece_size // verifier.chunk_size) * verifier.chunk_size
+        self.piece_count = -(-size // self.piece_size)
+
+        self._cond = threading.Condition()
+        self._pending = deque(range(self.piece_count))
+        self._in_flight = {}   # {piece: set of holders fetching it}
+        self._done = set()
+        self._active = set(self.holders)
+        self._buffer = bytearray(size)
+        self.holder_stats = {holder: {"bytes": 0, "seconds": 0.0, "pieces": 0, "failures": 0} for holder in self.holders}
+
+    def _rate(self, holder):
+        stats = self.holder_stats[holder]
+        return stats["bytes"] / stats["seconds"] if stats["seconds"] else None
+
+    def _is_slow(self, holder) -> bool:
+        """True if `holder` is measurably much slower than the best holder still active. Must hold the lock."""
+        if len(self._active) < 2 or self.holder_stats[holder]["pieces"] < 2:
+            return False
+        rates = [rate for rate in map(self._rate, self._active) if rate]
+        return bool(rates) and self._rate(holder) < Config.SWARM_SLOW_FRACTION * max(rates)
+
+    def _next_piece(self, holder):
+        """Picks the next piece for `holder`: queued work first, then a duplicate of a piece in flight elsewhere."""
+        if self._pending:
+            return self._pending.popleft()
+        for piece, fetchers in self._in_flight.items():
+            if holder not in fetchers and len(fetchers) < 2:
+                return piece
+        return None
+
+    def _worker(self, holder):
+        while True:
+            with self._cond:
+                while True:
+                    if len(self._done) == self.piece_count or holder not in self._active:
+                        return
+                    if self._is_slow(holder):
+                        logger.info("Holder %s is slow, moving its share to faster holders.", holder)
+                        self._active.discard(holder)
+                        self._cond.notify_all()
+                        return
+                    piece = self._next_piece(holder)
+                    if piece is not None:
+                        break
+                    self._cond.wait(0.1)
+                self._in_flight.setdefault(piece, set()).add(holder)
+
+            offset = piece * self.piece_size
+            length = min(self.piece_size, self.size - offset)
+            start = time.perf_counter()
+            try:
+                data = self.client.fetch_range(holder, self.file_id_str, offset, length, file_hash=self.file_hash)
+                if len(data) != length:
+                    raise ConnectionError(f"Holder returned {len(data)} of {length} bytes")
+                if self.verifier is not None and self.verifier.bad_chunks_in(offset, data):
+                    raise RuntimeError(f"Piece {piece} failed chunk verification")
+            except (ConnectionError, RuntimeError, OSError, ValueError) as e:
+                with self._cond:
+                    stats = self.holder_stats[holder]
+                    stats["failures"] += 1
+                    self._give_back(piece, holder)
+                    if stats["failures"] >= Config.SWARM_MAX_FAILURES:
+                        logger.warning("Dropping holder %s: %s", holder, e)
+                        self._active.discard(holder)
+                    self._cond.notify_all()
+                continue
+
+            with self._cond:
+                stats = self.holder_stats[holder]
+                stats["seconds"] += time.perf_counter() - start
+                if piece not in self._done:
+                    self._buffer[offset:offset + length] = data
+                    self._done.add(piece)
+                    stats["bytes"] += length
+                    stats["pieces"] += 1
+                self._in_flight.pop(piece, None)
+                self._cond.notify_all()
+
+    def _give_back(self, piece, holder):
+        """Returns a failed piece to the queue unless it finished or another holder is still on it. Must hold the lock."""
+        fetchers = self._in_flight.get(piece, set())
+        fetchers.discard(holder)
+        if not fetchers:
+            self._in_flight.pop(piece, None)
+            if piece not in self._done:
+                self._pending.appendleft(piece)
+
+    def run(self) -> bytearray:
+        """
+        Downloads every piece and returns the reassembled ciphertext.
+
+        Raises:
+            ConnectionError: If every holder failed or was dropped before the file was complete.
+        """
+        workers = [threading.Thread(target=self._worker, args=(holder,), daemon=True)
+                   for holder in self.holders for _ in range(self.streams)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        if len(self._done) < self.piece_count:
+            raise ConnectionError(f"Swarm download incomplete: {len(self._done)} of {self.piece_count} pieces "
+                                  f"from {len(self.holders)} holders")
+        return self._buffer
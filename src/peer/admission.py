@@ -0,0 +1,146 @@
+import asyncio
+import threading
+from collections import Counter, deque
+
+from src.utils.config import Config
+
+
+class _Waiter:
+    """A transfer waiting for a slot; `wake` is called (under the controller lock) when one is handed over."""
+    __slots__ = ("client", "wake", "admitted")
+
+    def __init__(self, client, wake):
+        self.client = client
+        self.wake = wake
+        self.admitted = False
+
+
+class AdmissionController:
+    """
+    Bounded pool of transfer slots shared by all of a peer's connections.
+
+    At most `max_active` transfers run at once. Further transfers wait in a FIFO queue of at
+    most `max_queued` entries for up to `queue_timeout` seconds; a freed slot is handed
+    straight to the oldest waiter. A single client host may hold at most `max_per_client`
+    slots and queue entries together. A transfer that is over a limit is refused right away
+    (or when its wait times out) so the peer can answer BUSY instead of slowing everyone down.
+
+    Works for both server modes: threads block in acquire(), coroutines await acquire_async().
+    """
+
+    def __init__(self, max_active=None, max_queued=None, max_per_client=None, queue_timeout=None):
+        self.max_active = max_active or Config.PEER_MAX_ACTIVE_TRANSFERS
+        self.max_queued = Config.PEER_MAX_QUEUED_TRANSFERS if max_queued is None else max_queued
+        self.max_per_client = max_per_client or Config.PEER_MAX_TRANSFERS_PER_CLIENT
+        self.queue_timeout = Config.PEER_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._held = Counter() # {client: active + queued transfers}
+        self._waiters = deque()
+        self._stats = Counter()
+
+    def _enter(self, client, wake) -> '_Waiter | bool':
+        """
+        Admits, queues or refuses a transfer. Must hold the lock.
+
+        Returns:
+            True if admitted, a _Waiter if queued, or False if refused.
+        """
+        if self._held[client] >= self.max_per_client:
+            self._stats["rejected_per_client"] += 1
+            return False
+        if self._active < self.max_active and not self._waiters:
+            self._active += 1
+            self._held[client] += 1
+            self._stats["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.max_queued:
+            self._stats["rejected_queue_full"] += 1
+            return False
+        waiter = _Waiter(client, wake)
+        self._waiters.append(waiter)
+        self._held[client] += 1
+        self._stats["queued"] += 1
+        self._stats["peak_queue_depth"] = max(self._stats["peak_queue_depth"], len(self._waiters))
+        return waiter
+
+    def _give_up(self, waiter: _Waiter, reason: str) -> bool:
+        """Called by a waiter that timed out or was cancelled. Must hold the lock. Returns True if it got a slot anyway."""
+        if waiter.admitted:
+            return True
+        self._waiters.remove(waiter)
+        self._release_hold(waiter.client)
+        self._stats[reason] += 1
+        return False
+
+    def _release_hold(self, client):
+        self._held[client] -= 1
+        if not self._held[client]:
+            del self._held[client]
+
+    def acquire(self, client) -> bool:
+        """Blocks until `client` gets a transfer slot. Returns False if the transfer is refused."""
+        event = threading.Event()
+        with self._lock:
+            entered = self._enter(client, event.set)
+        if not isinstance(entered, _Waiter):
+            return entered
+        if event.wait(self.queue_timeout):
+            return True
+        with self._lock:
+            return self._give_up(entered, "rejected_timeout")
+
+    async def acquire_async(self, client) -> bool:
+        """Coroutine version of acquire(): waiting does not block the event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        with self._lock:
+            entered = self._enter(client, wake)
+        if not isinstance(entered, _Waiter):
+            return entered
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            with self._lock:
+                return self._give_up(entered, "rejected_timeout")
+        except asyncio.CancelledError:
+            with self._lock:
+                got_slot = self._give_up(entered, "cancelled")
+            if got_slot:
+                self.release(client)
+            raise
+
+    def release(self, client):
+        """Returns `client`'s slot, handing it to the oldest waiter if there is one."""
+        with self._lock:
+            self._release_hold(client)
+            if self._waiters:
+                waiter = self._waiters.popleft() # the slot moves over, so the active count stays the same
+                waiter.admitted = True
+                self._stats["admitted"] += 1
+                waiter.wake()
+            else:
+                self._active -= 1
+
+    def retry_after(self) -> float:
+        """Suggested back-off for a refused client, growing with the queue length."""
+        with self._lock:
+            return Config.PEER_BUSY_RETRY_AFTER * (1 + len(self._waiters) / self.max_active)
+
+    def stats(self) -> dict:
+        """Returns current load and cumulative admission counters."""
+        with self._lock:
+            snapshot = {"active": self._active, "queue_depth": len(self._waiters),
+                        "max_active": self.max_active, "max_queued": self.max_queued,
+                        "max_per_client": self.max_per_client}
+            for key in ("admitted", "queued", "peak_queue_depth",
+                        "rejected_queue_full", "rejected_per_client", "rejected_timeout"):
+                snapshot[key] = self._stats[key]
+            snapshot["rejected"] = (snapshot["rejected_queue_full"] + snapshot["rejected_per_client"]
+                                    + snapshot["rejected_timeout"])
+            return snapshot
@@ -0,0 +1,252 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+
+from src.utils.config import Config
+
+
+POLICIES = ("fair", "srpt", "fifo")
+COMPLETED_HISTORY = 100 # finished transfers kept for stats()
+
+
+class _Grant:
+    """A transfer waiting to send `nbytes`; `wake` is called (under the scheduler lock) when it may go ahead."""
+    __slots__ = ("transfer", "nbytes", "seq", "wake", "granted")
+
+    def __init__(self, transfer, nbytes, seq, wake):
+        self.transfer = transfer
+        self.nbytes = nbytes
+        self.seq = seq
+        self.wake = wake
+        self.granted = False
+
+
+class Transfer:
+    """
+    One outgoing transfer registered with a BandwidthScheduler. Before each piece of data
+    the sender calls acquire() (or acquire_async()) for permission to send up to that many
+    bytes, and release() with what it actually sent. Use as a context manager, or close()
+    when the transfer is over. A `background` transfer (replication) only gets pieces no
+    foreground transfer is waiting for.
+    """
+
+    def __init__(self, scheduler: 'BandwidthScheduler', client, size: int | None, background: bool = False):
+        self.scheduler = scheduler
+        self.client = client
+        self.size = size
+        self.background = background
+        self.sent = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def __enter__(self) -> 'Transfer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def remaining(self) -> float:
+        return float('inf') if self.size is None else max(self.size - self.sent, 0)
+
+    def throughput(self) -> float:
+        """Bytes per second achieved so far (or over the whole transfer, once closed)."""
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def report(self) -> dict:
+        return {"client": self.client, "size": self.size, "sent": self.sent,
+                "seconds": round((self.finished or time.monotonic()) - self.started, 3),
+                "throughput": self.throughput()}
+
+    def acquire(self, nbytes: int) -> int:
+        """Blocks until this transfer may send. Returns how many bytes it may send (at most one quantum)."""
+        return self.scheduler.acquire(self, nbytes)
+
+    async def acquire_async(self, nbytes: int) -> int:
+        """Coroutine version of acquire(): waiting does not block the event loop."""
+        return await self.scheduler.acquire_async(self, nbytes)
+
+    def release(self, sent: int):
+        """Hands back the send slot taken by acquire(), recording `sent` bytes."""
+        self.scheduler.release(self, sent)
+
+    def close(self):
+        if self.finished is None:
+            self.scheduler.close(self)
+
+
+class BandwidthScheduler:
+    """
+    Divides a peer's outgoing DOWNLOAD bandwidth between its concurrent transfers.
+
+    Transfers send in pieces of at most `quantum` bytes, and at most `send_slots` pieces are
+    being written at once, of which one client host holds at most `client_slots` (fewer than
+    `send_slots`, so a host that stops reading cannot stall every other transfer). When more
+    transfers want to send than there are slots, the policy picks who goes next:
+
+    - "fair": equal shares per client host, split evenly between that host's transfers, so
+      a client opening many connections does not get more of the uplink.
+    - "srpt": shortest remaining transfer first, so small files are not stuck behind a
+      multi-gigabyte download.
+    - "fifo": in the order the pieces were asked for.
+
+    Background transfers come after all foreground ones, whatever the policy. With a
+    `rate` (bytes per second) all pieces together are also paced to that rate, for peers
+    that must leave room on their uplink. Works for both server modes: threads block
+    in acquire(), coroutines await acquire_async().
+    """
+
+    def __init__(self, policy=None, rate=None, send_slots=None, quantum=None, client_slots=None):
+        self.policy = policy or Config.PEER_BANDWIDTH_POLICY
+        if self.policy not in POLICIES:
+            raise ValueError(f"Unknown bandwidth policy {self.policy!r}, expected one of {POLICIES}")
+        self.rate = Config.PEER_UPLINK_RATE if rate is None else rate
+        self.send_slots = send_slots or Config.PEER_SEND_SLOTS
+        self.quantum = quantum or Config.PEER_SEND_QUANTUM
+        self.client_slots = max(1, min(client_slots or Config.PEER_SEND_SLOTS_PER_CLIENT, self.send_slots - 1))
+        self._lock = threading.Lock()
+        self._sending = 0
+        self._sending_per_client = Counter() # {client: send slots held}
+        self._waiting = []
+        self._seq = 0
+        self._active = set()
+        self._per_client = Counter()    # {client: open transfers}
+        self._client_vtime = {}         # {client: bytes granted to the host, offset to when it joined} for "fair"
+        self._virtual_time = 0          # client vtime of the last piece granted under "fair"
+        self._burst = max(self.quantum, (self.rate or 0) / 20)
+        self._tokens = self._burst
+        self._refilled = time.monotonic()
+        self._timer = None              # pending re-dispatch once the bucket has refilled
+        self._completed = deque(maxlen=COMPLETED_HISTORY)
+        self._bytes_sent = 0
+
+    def open(self, client, size: int | None = None, background: bool = False) -> Transfer:
+        """Registers an outgoing transfer of `size` bytes (None if unknown) to `client`."""
+        transfer = Transfer(self, client, size, background)
+        with self._lock:
+            if not self._per_client[client]:
+                # a host that was idle starts level with everyone else instead of cashing in its idle time
+                self._client_vtime[client] = max(self._client_vtime.get(client, 0), self._virtual_time)
+            self._per_client[client] += 1
+            self._active.add(transfer)
+        return transfer
+
+    def close(self, transfer: Transfer):
+        with self._lock:
+            transfer.finished = time.monotonic()
+            self._active.discard(transfer)
+            self._per_client[transfer.client] -= 1
+            if not self._per_client[transfer.client]:
+                del self._per_client[transfer.client]
+                del self._client_vtime[transfer.client]
+            self._completed.append(transfer.report())
+
+    def _priority(self, grant: _Grant):
+        transfer = grant.transfer
+        if self.policy == "fair":
+            # least-served host first, then that host's least-served transfer
+            return (transfer.background, self._client_vtime[transfer.client], transfer.sent, grant.seq)
+        if self.policy == "srpt":
+            return (transfer.background, transfer.remaining, grant.seq)
+        return (transfer.background, grant.seq)
+
+    def _token_wait(self) -> float:
+        """Refills the token bucket. Must hold the lock. Returns how long until there are tokens to spend."""
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+        return 0.0 if self._tokens > 0 else -self._tokens / self.rate + 0.001
+
+    def _dispatch(self):
+        """
+        Hands free send slots to waiting pieces in policy order, skipping hosts that already
+        hold `client_slots` of them. Must hold the lock.
+
+        Under a rate cap a piece is only handed out while the token bucket is not in debt, so
+        the policy decides every piece instead of a backlog of already granted ones.
+        """
+        while self._sending < self.send_slots:
+            ready = [grant for grant in self._waiting
+                     if self._sending_per_client[grant.transfer.client] < self.client_slots]
+            if not ready:
+                return
+            wait = self._token_wait()
+            if wait:
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._dispatch_later)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            grant = min(ready, key=self._priority)
+            self._waiting.remove(grant)
+            self._sending += 1
+            client = grant.transfer.client
+            self._sending_per_client[client] += 1
+            self._virtual_time = max(self._virtual_time, self._client_vtime[client])
+            self._client_vtime[client] += grant.nbytes
+            self._tokens -= grant.nbytes if self.rate else 0
+            grant.granted = True
+            grant.wake()
+
+    def _dispatch_later(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _enter(self, transfer: Transfer, nbytes: int, wake) -> _Grant:
+        """Queues a request to send. Must hold the lock."""
+        self._seq += 1
+        grant = _Grant(transfer, min(nbytes, self.quantum), self._seq, wake)
+        self._waiting.append(grant)
+        self._dispatch()
+        return grant
+
+    def acquire(self, transfer: Transfer, nbytes: int) -> int:
+        event = threading.Event()
+        with self._lock:
+            grant = self._enter(transfer, nbytes, event.set)
+        event.wait()
+        return grant.nbytes
+
+    async def acquire_async(self, transfer: Transfer, nbytes: int) -> int:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(True))
+
+        with self._lock:
+            grant = self._enter(transfer, nbytes, wake)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not grant.granted:
+                    self._waiting.remove(grant)
+                    raise
+            self.release(transfer, 0)
+            raise
+        return grant.nbytes
+
+    def release(self, transfer: Transfer, sent: int):
+        with self._lock:
+            self._sending -= 1
+            self._sending_per_client[transfer.client] -= 1
+            if not self._sending_per_client[transfer.client]:
+                del self._sending_per_client[transfer.client]
+            transfer.sent += sent
+            self._bytes_sent += sent
+            self._dispatch()
+
+    def stats(self) -> dict:
+        """Returns the policy, per-transfer throughput of active and recently finished transfers, and totals."""
+        with self._lock:
+            return {"policy": self.policy, "rate": self.rate, "send_slots": self.send_slots, "client_slots": self.client_slots,
+                    "sending": self._sending, "waiting": len(self._waiting), "bytes_sent": self._bytes_sent,
+                    "active": [transfer.report() for transfer in self._active],
+                    "completed": list(self._completed)}
@@ -3,7 +3,11 @@ from src.utils.commands_enum import Commands
 from .strategies.command_strategy import CommandStrategy
 from .strategies.upload_strategy import UploadStrategy
 from .strategies.download_strategy import DownloadStrategy
+from .strategies.download_many_strategy import DownloadManyStrategy
 from.strategies.get_peer_files_strategy import GetPeerFilesStrategy
+from .strategies.chunk_hashes_strategy import ChunkHashesStrategy
+from .strategies.delta_upload_strategy import DeltaUploadStrategy
+from .strategies.stats_strategy import StatsStrategy
 
 class CommandFactory:
     """Factory class to create command strategy instances."""
@@ -11,7 +15,11 @@ class CommandFactory:
     _strategies = {
         Commands.UPLOAD: UploadStrategy(),
         Commands.DOWNLOAD: DownloadStrategy(),
-        Commands.GET_PEER_FILES: GetPeerFilesStrategy()
+        Commands.DOWNLOAD_MANY: DownloadManyStrategy(),
+        Commands.GET_PEER_FILES: GetPeerFilesStrategy(),
+        Commands.GET_HASHES: ChunkHashesStrategy(),
+        Commands.DELTA_UPLOAD: DeltaUploadStrategy(),
+        Commands.STATS: StatsStrategy()
        
     }
 
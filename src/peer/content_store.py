@@ -0,0 +1,278 @@
+import bisect
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from src.utils.logging_utils import get_logger
+
+
+OBJECTS_DIR = ".objects" # under the shared directory; dot-prefixed so it never shows up as a shared file
+HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+TEMP_DIR = "tmp" # under OBJECTS_DIR; uploads are received here before they are published
+STALE_TEMP_SECONDS = 24 * 3600 # temp files older than this were left behind by a crashed peer
+CACHE_POLICIES = ("lru", "lfu")
+HASH_BUFFER_SIZE = 1024 * 1024
+
+logger = get_logger("peer.content_store")
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file's contents, read in HASH_BUFFER_SIZE pieces."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """
+    Content-addressed store for uploaded ciphertext, keyed by the SHA-256 of the stored
+    bytes themselves (the `content_hash` the client registers with the registry, not the
+    plaintext `file_hash`). Every encryption uses a fresh IV, so two uploads of the same
+    plaintext are different objects here; only byte-identical ciphertext is stored once.
+    Uploads are hashed by the peer as they arrive and refused if they do not match.
+
+    Objects live in a two-level fan-out, <shared dir>/.objects/ab/cd/<hash>, so no single
+    directory grows huge. Each object has a small JSON sidecar recording the filenames it
+    was uploaded under and the registry file IDs it is known by. Lookups by hash or by
+    registry file ID are dictionary hits; identical content is stored once.
+
+    Objects committed with `cached=True` are copies of other users' files kept for
+    pull-through caching: they are tracked by last access and hit count and are the only
+    objects evict() removes. Uploading the same content without the flag pins it. The
+    registry file IDs a cached copy was uploaded for are only the uploader's claim, so they
+    are kept apart ("cached_for") and reported when the copy is evicted, never used to look
+    the copy up.
+    """
+
+    _instances = {}                      # {absolute shared directory: ContentStore}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_directory(cls, shared_dir: str) -> 'ContentStore':
+        """Returns the store that lives under `shared_dir`, loading it on first use."""
+        key = os.path.abspath(shared_dir)
+        with cls._instances_lock:
+            store = cls._instances.get(key)
+            if store is None:
+                store = cls._instances[key] = cls(key)
+            return store
+
+    @staticmethod
+    def is_valid_hash(file_hash: str) -> bool:
+        return bool(file_hash) and HASH_PATTERN.fullmatch(file_hash) is not None
+
+    def __init__(self, shared_dir: str):
+        self.root = os.path.join(shared_dir, OBJECTS_DIR)
+        self._lock = threading.Lock()
+        self._objects = {}      # {file_hash: {"size": int, "filenames": [...], "file_ids": [...]}}
+        self._by_file_id = {}   # {registry file id (str): file_hash}
+        self._hashes = []       # sorted keys of _objects, for paging through the store
+        self._access = {}       # {file_hash of a cached object: [last access time, hits]}, in memory only
+        self._load()
+
+    def _load(self):
+        """Reads every object's sidecar once at startup and clears out stale partial uploads."""
+        if not os.path.isdir(self.root):
+            return
+        self._remove_stale_temp_files()
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".json"):
+                    continue
+                file_hash = name[:-len(".json")]
+                object_path = os.path.join(dirpath, file_hash)
+                if not self.is_valid_hash(file_hash) or not os.path.isfile(object_path):
+                    continue
+                try:
+                    with open(os.path.join(dirpath, name), 'r') as f:
+                        meta = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning("Skipping unreadable metadata for %s: %s", file_hash, e)
+                    continue
+                meta["size"] = os.path.getsize(object_path)
+                self._objects[file_hash] = meta
+                if meta.get("cached"):
+                    self._access[file_hash] = [os.path.getmtime(object_path), 0]
+                for file_id in meta.get("file_ids", []):
+                    self._by_file_id[file_id] = file_hash
+        self._hashes = sorted(self._objects)
+
+    def _remove_stale_temp_files(self):
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        try:
+            entries = list(os.scandir(os.path.join(self.root, TEMP_DIR)))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def object_path(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash[:2], file_hash[2:4], file_hash)
+
+    def _write_meta(self, file_hash: str, meta: dict):
+        meta_path = self.object_path(file_hash) + ".json"
+        tmp_path = f"{meta_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({k: v for k, v in meta.items() if k != "size"}, f)
+        os.replace(tmp_path, meta_path)
+
+    def has(self, file_hash: str) -> bool:
+        with self._lock:
+            return file_hash in self._objects
+
+    def lookup(self, file_hash: str | None = None, file_id: str | None = None) -> str | None:
+        """
+        Returns the object path for a hash, or (when no hash is given) for a registry file ID
+        learned through add_alias(). Returns None if the content is not stored here.
+        """
+        with self._lock:
+            if file_hash is None:
+                file_hash = self._by_file_id.get(file_id)
+            if file_hash not in self._objects:
+                return None
+            access = self._access.get(file_hash)
+            if access is not None:
+                access[0] = time.time()
+                access[1] += 1
+        return self.object_path(file_hash)
+
+    def add_alias(self, file_hash: str, filename: str | None = None, file_id: str | None = None,
+                  cached_for: str | None = None):
+        """
+        Records another filename or registry file ID for stored content, or (`cached_for`) a
+        registry file ID a cached copy was uploaded for, which evict() reports but lookup() ignores.
+        """
+        with self._lock:
+            meta = self._objects.get(file_hash)
+            if meta is None:
+                return
+            changed = False
+            if filename and filename not in meta["filenames"]:
+                meta["filenames"].append(filename)
+                changed = True
+            if file_id is not None and file_id not in meta["file_ids"]:
+                meta["file_ids"].append(file_id)
+                self._by_file_id[file_id] = file_hash
+                changed = True
+            if cached_for is not None and cached_for not in meta.setdefault("cached_for", []):
+                meta["cached_for"].append(cached_for)
+                changed = True
+            if changed:
+                self._write_meta(file_hash, meta)
+
+    def new_temp_path(self) -> str:
+        """Returns a fresh path to stream an incoming upload into before it is published."""
+        tmp_dir = os.path.join(self.root, TEMP_DIR)
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, uuid.uuid4().hex)
+
+    def commit(self, tmp_path: str, file_hash: str, filename: str, cached: bool = False):
+        """Moves a fully received object into place under its hash."""
+        object_path = self.object_path(file_hash)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        with self._lock:
+            os.replace(tmp_path, object_path)
+            meta = self._objects.get(file_hash) or {"filenames": [], "file_ids": []}
+            if filename not in meta["filenames"]:
+                meta["filenames"].append(filename)
+            meta["size"] = os.path.getsize(object_path)
+            if file_hash not in self._objects:
+                bisect.insort(self._hashes, file_hash)
+                if cached:
+                    meta["cached"] = True
+                    self._access[file_hash] = [time.time(), 0]
+            elif not cached:
+                self._unmark_cached(file_hash, meta)
+            self._objects[file_hash] = meta
+            self._write_meta(file_hash, meta)
+
+    def _unmark_cached(self, file_hash: str, meta: dict):
+        self._access.pop(file_hash, None)
+        meta.pop("cached", None)
+
+    def pin(self, file_hash: str):
+        """Makes a cached object an owned one, which evict() never removes."""
+        with self._lock:
+            meta = self._objects.get(file_hash)
+            if meta is None or not meta.get("cached"):
+                return
+            self._unmark_cached(file_hash, meta)
+            self._write_meta(file_hash, meta)
+
+    def cache_usage(self) -> int:
+        """Bytes taken by cached objects."""
+        with self._lock:
+            return sum(self._objects[h]["size"] for h in self._access)
+
+    def evict(self, budget: int, policy: str = "lru", keep: str | None = None) -> list[str]:
+        """
+        Deletes cached objects until they take at most `budget` bytes: the least recently
+        used first ("lru"), or the least often used, oldest access breaking ties ("lfu").
+        Downloads already reading an evicted object finish from the open file.
+
+        Args:
+            keep: Hash of an object that must stay (the one just cached).
+
+        Returns:
+            The registry file IDs the evicted objects were known or cached for.
+
+        Raises:
+            ValueError: If the policy is unknown.
+        """
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Unknown cache policy {policy!r}")
+        evicted_ids = []
+        with self._lock:
+            used = sum(self._objects[h]["size"] for h in self._access)
+            if used <= budget:
+                return evicted_ids
+            if policy == "lru":
+                order = sorted(self._access, key=lambda h: self._access[h][0])
+            else:
+                order = sorted(self._access, key=lambda h: (self._access[h][1], self._access[h][0]))
+            for file_hash in order:
+                if used <= budget:
+                    break
+                if file_hash == keep:
+                    continue
+                meta = self._objects.pop(file_hash)
+                del self._access[file_hash]
+                del self._hashes[bisect.bisect_left(self._hashes, file_hash)]
+                for file_id in meta.get("file_ids", []):
+                    self._by_file_id.pop(file_id, None)
+                evicted_ids.extend(meta.get("file_ids", []) + meta.get("cached_for", []))
+                used -= meta["size"]
+                object_path = self.object_path(file_hash)
+                for path in (object_path, object_path + ".json"): # no sidecar without its object if this stops halfway
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        logger.warning("Could not delete evicted object %s: %s", file_hash, e)
+                logger.debug("Evicted cached object %s... (%s bytes).", file_hash[:12], meta["size"])
+        return evicted_ids
+
+    def entries(self) -> list[tuple[str, dict]]:
+        """Returns a snapshot of (file_hash, metadata) pairs sorted by hash."""
+        with self._lock:
+            return [(h, dict(self._objects[h])) for h in self._hashes]
+
+    def iter_entries(self, after: str | None = None, batch_size: int = 1000):
+        """Yields (file_hash, metadata) pairs sorted by hash for the hashes after `after`, batch_size per lock hold."""
+        while True:
+            with self._lock:
+                start = 0 if after is None else bisect.bisect_right(self._hashes, after)
+                batch = [(h, dict(self._objects[h])) for h in self._hashes[start:start + batch_size]]
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1][0]
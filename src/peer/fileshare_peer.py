@@ -1,6 +1,9 @@
 # src/peer/fileshare_peer.py
+import asyncio
+import logging
 import socket
 import threading
+import time
 import os
 import sys
 
@@ -9,21 +12,79 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 
 from src.utils.config import Config 
 from src.utils.commands_enum import Commands 
+from src.utils.framing import (FramedReader, KEEPALIVE_PROTOCOL_VERSION, LEGACY_PROTOCOL_VERSION, PROTOCOL_VERSION,
+                               pack_busy, pack_reply, parse_arguments, split_command)
+from src.peer.admission import AdmissionController
+from src.peer.bandwidth import BandwidthScheduler
 from src.peer.command_factory import CommandFactory 
+from src.peer.content_store import ContentStore
+from src.peer.multipart import MultipartUploads
+from src.peer.shared_index import SharedFileIndex
+from src.peer.telemetry import PeerTelemetry
+from src.utils.logging_utils import get_logger
 
 # from utils import crypto_utils
 
+logger = get_logger("peer")
 
 PEER_HOST = Config.PEER_HOST
 CHUNK_SIZE = Config.CHUNK_SIZE
 SHARED_FILES_PATH = Config.SHARED_FILES_DIR # Directory to store shared files
 
+# commands that carry one argument line after the command line, and the handler kwarg it is passed as
+ARGUMENT_FIELDS = {
+    Commands.UPLOAD: 'filename',
+    Commands.DOWNLOAD: 'file_id_str',
+    Commands.DOWNLOAD_MANY: 'file_ids',
+    Commands.GET_HASHES: 'file_id_str',
+    Commands.DELTA_UPLOAD: 'filename',
+}
+LIST_ARGUMENT_FIELDS = {'file_ids'} # fields passed every positional value instead of the first
+
+# commands that move or read whole files and therefore need a transfer slot from the admission controller
+TRANSFER_COMMANDS = {Commands.UPLOAD, Commands.DOWNLOAD, Commands.DOWNLOAD_MANY, Commands.GET_HASHES, Commands.DELTA_UPLOAD}
+
+
+def parse_argument_line(field: str | None, argument_line: bytes, version: int) -> dict:
+    """
+    Turns a request's argument line into handler kwargs. Version 1 lines are the bare value;
+    version 2+ lines are format_arguments() output, whose key=value options are passed on
+    as `options`. Commands without a `field` only take options (version 3 requests send
+    an argument line for every command, if only to carry the request id).
+    """
+    line = argument_line.decode('utf-8').strip()
+    if version <= LEGACY_PROTOCOL_VERSION:
+        return {field: line}
+    positional, options = parse_arguments(line)
+    if field is None:
+        return {'options': options}
+    if field in LIST_ARGUMENT_FIELDS:
+        return {field: positional, 'options': options}
+    return {field: positional[0] if positional else "", 'options': options}
+
+
+def reads_argument_line(command: Commands, version: int) -> bool:
+    """True if a request for `command` in `version` has an argument line after the command line."""
+    return command in ARGUMENT_FIELDS or version >= KEEPALIVE_PROTOCOL_VERSION
+
+
+def busy_reply(retry_after: float, version: int) -> bytes:
+    """BUSY reply for a refused transfer: a framed header for version 2+, a text line for legacy clients."""
+    if version > LEGACY_PROTOCOL_VERSION:
+        return pack_busy(retry_after, version)
+    return f"{Commands.BUSY} {retry_after:.2f}\n".encode('utf-8')
 
 
 class FileSharePeer:
-    def __init__(self, requested_port=0): # Allow requesting port 0 for dynamic assignment
+    def __init__(self, requested_port=0, backlog=None, max_concurrent_connections=None): # Allow requesting port 0 for dynamic assignment
         self.host = PEER_HOST
         self.port = requested_port 
+        self.backlog = backlog or Config.PEER_BACKLOG
+        self.max_concurrent_connections = max_concurrent_connections or Config.PEER_MAX_CONCURRENT_CONNECTIONS
+        self.admission = AdmissionController() # bounds concurrent UPLOAD/DOWNLOAD transfers
+        self.bandwidth = BandwidthScheduler() # divides the uplink between concurrent DOWNLOADs
+        self.telemetry = PeerTelemetry() # live counters served by STATS
+        self.multipart = MultipartUploads() # files arriving as parts over parallel connections
         self.peer_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.peer_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) 
 
@@ -32,102 +93,268 @@ class FileSharePeer:
              self.peer_socket.bind((self.host, self.port))
              self.port = self.peer_socket.getsockname()[1] # Get the actual port (if port was 0)
         except OSError as e:
-             print(f"Peer: Error binding socket to {self.host}:{self.port} - {e}")
+             logger.error("Error binding socket to %s:%s - %s", self.host, self.port, e)
              raise # Re-raise the exception to signal failure
 
 
     def start_peer(self):
         try:
-            self.peer_socket.listen(5)
-            print(f"Peer: Listening on {self.host}:{self.port}")
+            SharedFileIndex.for_directory(Config.SHARED_FILES_DIR) # build the shared-directory index before serving
+            ContentStore.for_directory(Config.SHARED_FILES_DIR)
+            self.peer_socket.listen(self.backlog)
+            logger.info("Listening on %s:%s", self.host, self.port)
             while True:
                 try:
                     client_socket, client_address = self.peer_socket.accept()
-                    print(f"Peer: Accepted connection from {client_address}")
+                    # a reply is several small writes; on a keep-alive connection Nagle would hold them for an ACK
+                    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    logger.debug("Accepted connection from %s", client_address)
                     # Start a new thread for each client connection
                     client_thread = threading.Thread(target=self.handle_client_connection,
                                                      args=(client_socket, client_address),
                                                      daemon=True) 
                     client_thread.start()
                 except Exception as e:
-                    print(f"Peer: Error accepting connection: {e}")
+                    if self.peer_socket.fileno() == -1: # server socket was closed, stop serving
+                        break
+                    logger.error("Error accepting connection: %s", e)
                     # Decide if the loop should continue or break based on the error
 
         except KeyboardInterrupt:
-             print("\nPeer: Shutting down...")
+             logger.info("Shutting down...")
         except Exception as e:
-            print(f"Peer: Server loop error: {e}")
+            logger.error("Server loop error: %s", e)
         finally:
             self.peer_socket.close()
-            print("Peer: Server socket closed.")
+            logger.info("Server socket closed.")
 
     def handle_client_connection(self, client_socket: socket.socket, client_address):
-        print(f"Peer: Handling connection from {client_address}")
+        logger.debug("Handling connection from %s", client_address)
         command_str = None
+        self.telemetry.connection_opened(client_socket)
         try:
-            # Read the first line for the command
-            command_line = b""
-            while b"\n" not in command_line:
-                 chunk = client_socket.recv(1)
-                 if not chunk: # Connection closed prematurely
-                      print(f"Peer: Connection from {client_address} closed before command received.")
-                      return
-                 command_line += chunk
-            
-            
-            command_str = command_line.decode('utf-8').strip()
-            command = Commands.from_string(command_str) # Convert string to Enum
-            
-            print(f"Peer: Received command '{command_str}' from {client_address}")
-
-            if command:
-                handler = CommandFactory.get_command_handler(command)
-                if handler:
-                    # Prepare arguments for the handler
-                    handler_args = {'client_socket': client_socket}
-
-                   
-                    if command == Commands.UPLOAD:
-                   
-                        filename_line = b""
-                        while b"\n" not in filename_line:
-                             chunk = client_socket.recv(1)
-                             if not chunk: break
-                             filename_line += chunk
-                        handler_args['filename'] = filename_line.decode('utf-8').strip()
-
-                    elif command == Commands.DOWNLOAD:
-                        
-                        file_id_line = b""
-                        while b"\n" not in file_id_line:
-                             chunk = client_socket.recv(1)
-                             if not chunk: break
-                             file_id_line += chunk
-                        handler_args['file_id_str'] = file_id_line.decode('utf-8').strip()
-
-                    elif command == Commands.GET_PEER_FILES:
-                        # for GET_PEER_FILES, the command line is the entire request for now
-                        pass 
+            # Read the command line (and below, its argument line) from one buffered read
+            reader = FramedReader(client_socket)
+            keep_alive = True
+            served = 0
+            while keep_alive:
+                try:
+                    command_line = reader.readline()
+                except socket.timeout:
+                    logger.debug("Keep-alive connection from %s idle for %ss.", client_address, Config.PEER_KEEPALIVE_TIMEOUT)
+                    return
+                if command_line is None: # Connection closed prematurely, or a keep-alive client is done
+                    if not served:
+                        logger.debug("Connection from %s closed before command received.", client_address)
+                    return
+                if served:
+                    client_socket.settimeout(None) # the idle timeout only applies between requests
 
-                    # Execute the command using the strategy
-                    print(f"Peer: Executing handler for command {command} with args: { {k:v for k,v in handler_args.items() if k!='client_socket'} }")
-                    handler.execute(**handler_args)
+                command_str = command_line.decode('utf-8').strip()
+                command_name, requested_version = split_command(command_str)
+                command = Commands.from_string(command_name) # Convert string to Enum
+
+                logger.debug("Received command '%s' from %s", command_str, client_address)
+
+                handler = CommandFactory.get_command_handler(command) if command else None
+                if not handler:
+                    logger.warning("No handler found for command '%s'" if command else "Received unknown command: '%s'", command_str)
+                    self.telemetry.failure("unknown_command")
+                    return
+
+                # Prepare arguments for the handler; the reader carries any payload bytes read past the header
+                version = min(requested_version, PROTOCOL_VERSION)
+                handler_args = {'client_socket': client_socket, 'reader': reader, 'version': version}
+                if reads_argument_line(command, version):
+                    argument_line = reader.readline() or b""
+                    handler_args.update(parse_argument_line(ARGUMENT_FIELDS.get(command), argument_line, version))
+                keep_alive = version >= KEEPALIVE_PROTOCOL_VERSION
+                if keep_alive:
+                    client_socket.sendall(pack_reply(handler_args['options'].pop('id', ''), version))
+
+                if command in TRANSFER_COMMANDS and not self.admission.acquire(client_address[0]):
+                    self.reject_busy(client_socket.sendall, command, client_address, version)
                 else:
-                    print(f"Peer: No handler found for command '{command_str}'")
-                    # Optionally send an error response to the client
-            else:
-                print(f"Peer: Received unknown command: '{command_str}'")
-                # Optionally send an error response to the client
-
-        except ConnectionResetError:
-             print(f"Peer: Connection from {client_address} reset.")
-        except socket.timeout:
-             print(f"Peer: Socket timeout handling client {client_address}.")
-        except UnicodeDecodeError:
-             print(f"Peer: Error decoding command '{command_str or '?'}' from {client_address}. Ensure UTF-8 encoding.")
+                    # Execute the command using the strategy
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Executing handler for command %s with args: %s", command,
+                                     {k: v for k, v in handler_args.items() if k not in ('client_socket', 'reader')})
+                    started = time.perf_counter()
+                    failure = None # an exception is counted by type below
+                    try:
+                        # a handler returns False when it left the connection mid-transfer
+                        completed = handler.execute(**handler_args, **self.context_args(command, client_address)) is not False
+                        failure = None if completed else f"{command}_aborted"
+                        keep_alive = completed and keep_alive
+                    finally:
+                        self.telemetry.request_done(command, time.perf_counter() - started, failure)
+                        if command in TRANSFER_COMMANDS:
+                            self.admission.release(client_address[0])
+                served += 1
+                if keep_alive:
+                    client_socket.settimeout(Config.PEER_KEEPALIVE_TIMEOUT)
+
+        except ConnectionResetError as e:
+             self.telemetry.failure(type(e).__name__)
+             logger.warning("Connection from %s reset.", client_address)
+        except socket.timeout as e:
+             self.telemetry.failure(type(e).__name__)
+             logger.warning("Socket timeout handling client %s.", client_address)
+        except UnicodeDecodeError as e:
+             self.telemetry.failure(type(e).__name__)
+             logger.warning("Error decoding command '%s' from %s. Ensure UTF-8 encoding.", command_str or '?', client_address)
+        except ValueError as e:
+             self.telemetry.failure(type(e).__name__)
+             logger.warning("Malformed request header from %s: %s", client_address, e)
         except Exception as e:
-            print(f"Peer: Error handling client {client_address} (Command: {command_str or 'N/A'}): {type(e).__name__} - {e}")
+            self.telemetry.failure(type(e).__name__)
+            logger.error("Error handling client %s (Command: %s): %s - %s", client_address, command_str or 'N/A', type(e).__name__, e)
         finally:
-            print(f"Peer: Closing connection from {client_address}")
+            logger.debug("Closing connection from %s", client_address)
+            self.telemetry.connection_closed(client_socket)
             client_socket.close()
 
+    def context_args(self, command: Commands, client_address) -> dict:
+        """
+        Extra handler kwargs for commands that need the peer's own state: a DOWNLOAD or
+        DOWNLOAD_MANY goes under the bandwidth scheduler, an UPLOAD may be one part of a
+        multipart upload, STATS gets the snapshot function.
+        """
+        if command in (Commands.DOWNLOAD, Commands.DOWNLOAD_MANY):
+            return {'bandwidth': self.bandwidth, 'client_host': client_address[0]}
+        if command == Commands.UPLOAD:
+            return {'multipart': self.multipart, 'client_host': client_address[0]}
+        if command == Commands.STATS:
+            return {'stats': self.stats}
+        return {}
+
+    def stats(self) -> dict:
+        """
+        Telemetry snapshot plus the admission controller's and bandwidth scheduler's state.
+        `multipart_uploads` (uploads in progress) also tells clients that the peer takes
+        multipart uploads.
+        """
+        snapshot = self.telemetry.snapshot()
+        snapshot["admission"] = self.admission.stats()
+        snapshot["bandwidth"] = self.bandwidth.stats()
+        snapshot["multipart_uploads"] = len(self.multipart)
+        return snapshot
+
+    def reject_busy(self, send, command, client_address, version):
+        """Sends a BUSY reply with a retry-after hint through `send` (sendall or StreamWriter.write)."""
+        self.telemetry.failure("busy")
+        retry_after = self.admission.retry_after()
+        stats = self.admission.stats()
+        logger.info("Busy, refusing %s from %s (active %s, queued %s, retry after %.2fs)", command, client_address, stats['active'], stats['queue_depth'], retry_after)
+        send(busy_reply(retry_after, version))
+
+    def start_peer_async(self):
+        """Serves connections on a single asyncio event loop instead of one thread per connection."""
+        try:
+            asyncio.run(self.serve_async())
+        except KeyboardInterrupt:
+             logger.info("Shutting down...")
+        except Exception as e:
+            logger.error("Server loop error: %s", e)
+        finally:
+            self.peer_socket.close()
+            logger.info("Server socket closed.")
+
+    async def serve_async(self):
+        """Runs the asyncio server on the already-bound peer socket until cancelled."""
+        self._connection_slots = asyncio.Semaphore(self.max_concurrent_connections)
+        await asyncio.to_thread(SharedFileIndex.for_directory, Config.SHARED_FILES_DIR)
+        await asyncio.to_thread(ContentStore.for_directory, Config.SHARED_FILES_DIR)
+        server = await asyncio.start_server(self.handle_client_connection_async,
+                                            sock=self.peer_socket,
+                                            backlog=self.backlog,
+                                            limit=CHUNK_SIZE)
+        logger.info("Listening on %s:%s (asyncio, max %s concurrent connections)", self.host, self.port, self.max_concurrent_connections)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client_connection_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        client_address = writer.get_extra_info('peername')
+        command_str = None
+        transport_socket = writer.get_extra_info('socket')
+        if transport_socket is not None:
+            # asyncio only sets TCP_NODELAY itself when the listening socket was created with proto=IPPROTO_TCP
+            transport_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # connections past the ceiling stay accepted but wait here until a slot frees up
+        async with self._connection_slots:
+            logger.debug("Handling connection from %s", client_address)
+            connection = transport_socket or writer # what telemetry reads the byte counts from
+            self.telemetry.connection_opened(connection)
+            try:
+                keep_alive = True
+                served = 0
+                while keep_alive:
+                    try:
+                        # only keep-alive connections wait for a further request with a timeout
+                        command_line = await asyncio.wait_for(reader.readline(), Config.PEER_KEEPALIVE_TIMEOUT if served else None)
+                    except asyncio.TimeoutError:
+                        logger.debug("Keep-alive connection from %s idle for %ss.", client_address, Config.PEER_KEEPALIVE_TIMEOUT)
+                        return
+                    if not command_line.endswith(b"\n"):
+                        if not served:
+                            logger.debug("Connection from %s closed before command received.", client_address)
+                        return
+
+                    command_str = command_line.decode('utf-8').strip()
+                    command_name, requested_version = split_command(command_str)
+                    command = Commands.from_string(command_name)
+
+                    logger.debug("Received command '%s' from %s", command_str, client_address)
+
+                    handler = CommandFactory.get_command_handler(command) if command else None
+                    if not handler:
+                        logger.warning("No handler found for command '%s'" if command else "Received unknown command: '%s'", command_str)
+                        self.telemetry.failure("unknown_command")
+                        return
+
+                    version = min(requested_version, PROTOCOL_VERSION)
+                    handler_args = {'version': version}
+                    if reads_argument_line(command, version):
+                        argument_line = await reader.readline()
+                        handler_args.update(parse_argument_line(ARGUMENT_FIELDS.get(command), argument_line, version))
+                    keep_alive = version >= KEEPALIVE_PROTOCOL_VERSION
+                    if keep_alive:
+                        writer.write(pack_reply(handler_args['options'].pop('id', ''), version))
+
+                    if command in TRANSFER_COMMANDS and not await self.admission.acquire_async(client_address[0]):
+                        self.reject_busy(writer.write, command, client_address, version)
+                        await writer.drain()
+                    else:
+                        logger.debug("Executing handler for command %s with args: %s", command, handler_args)
+                        started = time.perf_counter()
+                        failure = None
+                        try:
+                            completed = await handler.execute_async(reader, writer, **handler_args, **self.context_args(command, client_address)) is not False
+                            failure = None if completed else f"{command}_aborted"
+                            keep_alive = completed and keep_alive
+                        finally:
+                            self.telemetry.request_done(command, time.perf_counter() - started, failure)
+                            if command in TRANSFER_COMMANDS:
+                                self.admission.release(client_address[0])
+                    served += 1
+
+            except ConnectionResetError as e:
+                 self.telemetry.failure(type(e).__name__)
+                 logger.warning("Connection from %s reset.", client_address)
+            except UnicodeDecodeError as e:
+                 self.telemetry.failure(type(e).__name__)
+                 logger.warning("Error decoding command '%s' from %s. Ensure UTF-8 encoding.", command_str or '?', client_address)
+            except ValueError as e:
+                 self.telemetry.failure(type(e).__name__)
+                 logger.warning("Malformed request header from %s: %s", client_address, e)
+            except Exception as e:
+                self.telemetry.failure(type(e).__name__)
+                logger.error("Error handling client %s (Command: %s): %s - %s", client_address, command_str or 'N/A', type(e).__name__, e)
+            finally:
+                logger.debug("Closing connection from %s", client_address)
+                self.telemetry.connection_closed(connection)
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except Exception:
+                    pass # the client may already have gone away
@@ -0,0 +1,207 @@
+import os
+import shutil
+import threading
+import time
+
+from src.peer.content_store import hash_file
+from src.peer.staged_file import fsync_directory
+from src.utils.config import Config
+
+
+MIN_SWEEP_INTERVAL = 1.0 # seconds between sweeps for abandoned uploads, however short the timeout
+
+
+class MultipartUpload:
+    """
+    One file arriving as byte ranges over several connections at once. The parts are written
+    straight to their offsets in one preallocated temporary file; the upload is complete
+    when the received ranges together cover every byte of it, whatever their sizes (parts
+    may overlap or be retried), and its content hash is checked before it is stored.
+    """
+
+    def __init__(self, tmp_path: str, size: int, filename: str, file_hash: str):
+        self.tmp_path = tmp_path
+        self.size = size
+        self.filename = filename
+        self.file_hash = file_hash
+        self.parts = {}         # {offset: length} of the parts received in full
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+        self.aborted = False
+        self._writers = 0       # write() calls in progress; the file is not closed under them
+        self._idle = threading.Condition(self.lock)
+        self._fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        if size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self._fd, 0, size)
+            except OSError:
+                pass # preallocation is only an optimization here; a full disk fails the writes instead
+
+    def write(self, offset: int, data: bytes):
+        """
+        Writes received bytes at their offset. Once another part has completed the upload the
+        bytes are no longer needed and are dropped.
+
+        Raises:
+            ConnectionError: If the upload was abandoned (a part failed or it timed out).
+        """
+        with self.lock:
+            if self.aborted:
+                raise ConnectionError("Multipart upload was abandoned")
+            if self._fd is None:
+                return
+            self._writers += 1
+        try:
+            os.pwrite(self._fd, data, offset)
+        finally:
+            with self.lock:
+                self._writers -= 1
+                self.touched = time.monotonic()
+                if not self._writers:
+                    self._idle.notify_all()
+
+    def part_done(self, offset: int, length: int) -> bool:
+        """Records a fully received part (a retried part replaces the earlier copy). Returns True once every byte is in."""
+        with self.lock:
+            if self._fd is None: # completed (or abandoned) meanwhile
+                return False
+            self.parts[offset] = length
+            self.touched = time.monotonic()
+            return self.covered()
+
+    def covered(self) -> bool:
+        """True if the received parts leave no gap in [0, size). Called with the lock held."""
+        end = 0
+        for offset, length in sorted(self.parts.items()):
+            if offset > end:
+                return False
+            end = max(end, offset + length)
+        return end >= self.size
+
+    def _close(self):
+        """Closes the file once no write() is using it. Must hold the lock."""
+        while self._writers:
+            self._idle.wait()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def finish(self):
+        """Syncs the data once and closes the file, ready for ContentStore.commit()."""
+        with self.lock:
+            while self._writers:
+                self._idle.wait()
+            if Config.PEER_UPLOAD_FSYNC:
+                os.fsync(self._fd)
+            self._close()
+
+    def abort(self):
+        with self.lock:
+            self.aborted = True
+            self._close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class MultipartUploads:
+    """
+    The multipart uploads in progress on a peer, keyed by (client host, upload id). An upload
+    that gets no part for Config.PEER_MULTIPART_TIMEOUT seconds is abandoned and its
+    temporary file deleted, by a timer that runs while any upload is in progress. A client
+    host may have Config.PEER_MULTIPART_MAX_PER_CLIENT uploads in progress, each of at most
+    Config.PEER_MULTIPART_MAX_SIZE bytes and no more than the free disk space.
+    """
+
+    def __init__(self, timeout: float | None = None, max_size: int | None = None, max_per_client: int | None = None):
+        self.timeout = Config.PEER_MULTIPART_TIMEOUT if timeout is None else timeout
+        self.max_size = Config.PEER_MULTIPART_MAX_SIZE if max_size is None else max_size
+        self.max_per_client = Config.PEER_MULTIPART_MAX_PER_CLIENT if max_per_client is None else max_per_client
+        self._lock = threading.Lock()
+        self._uploads = {}
+        self._timer = None # pending sweep while uploads are in progress
+
+    def join(self, client, upload_id: str, store, size: int, filename: str, file_hash: str) -> MultipartUpload:
+        """
+        Returns the upload a part belongs to, starting it with the first part to arrive.
+
+        Raises:
+            ValueError: If the part disagrees with the upload's size or content hash, or a new
+                upload is too large or one too many for this client.
+        """
+        self.sweep()
+        with self._lock:
+            upload = self._uploads.get((client, upload_id))
+            if upload is not None:
+                if upload.size != size or upload.file_hash != file_hash:
+                    raise ValueError(f"Part does not match multipart upload {upload_id!r}")
+                return upload
+            if size > self.max_size:
+                raise ValueError(f"Multipart upload of {size} bytes exceeds the limit of {self.max_size} bytes")
+            if sum(1 for key in self._uploads if key[0] == client) >= self.max_per_client:
+                raise ValueError(f"Too many multipart uploads in progress (at most {self.max_per_client})")
+            tmp_path = store.new_temp_path()
+            if shutil.disk_usage(os.path.dirname(tmp_path)).free < size:
+                raise ValueError(f"Not enough disk space for a multipart upload of {size} bytes")
+            upload = self._uploads[(client, upload_id)] = MultipartUpload(tmp_path, size, filename, file_hash)
+            self._schedule_sweep()
+            return upload
+
+    def sweep(self):
+        """Abandons uploads that have had no part for `timeout` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, upload in self._uploads.items() if now - upload.touched > self.timeout]
+            uploads = [self._uploads.pop(key) for key in expired]
+        for upload in uploads:
+            upload.abort()
+
+    def _schedule_sweep(self):
+        """Starts the sweep timer if it is not running. Must hold the lock."""
+        if self._timer is None:
+            self._timer = threading.Timer(max(self.timeout / 2, MIN_SWEEP_INTERVAL), self._sweep_later)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _sweep_later(self):
+        with self._lock:
+            self._timer = None
+        self.sweep()
+        with self._lock:
+            if self._uploads:
+                self._schedule_sweep()
+
+    def complete(self, client, upload_id: str, store, cached: bool = False):
+        """
+        Moves a complete upload into the content store. Does nothing if the upload is already
+        gone: another connection's part completed it first, or it was abandoned.
+
+        Raises:
+            ValueError: If the assembled file does not hash to the upload's content hash.
+        """
+        with self._lock:
+            upload = self._uploads.pop((client, upload_id), None)
+        if upload is None:
+            return
+        try:
+            upload.finish()
+            actual = hash_file(upload.tmp_path)
+            if actual != upload.file_hash:
+                raise ValueError(f"Content hash mismatch: assembled {actual}, announced {upload.file_hash}")
+            store.commit(upload.tmp_path, upload.file_hash, upload.filename, cached=cached)
+        except BaseException:
+            upload.abort()
+            raise
+        if Config.PEER_UPLOAD_FSYNC:
+            fsync_directory(os.path.dirname(store.object_path(upload.file_hash)))
+
+    def discard(self, client, upload_id: str):
+        with self._lock:
+            upload = self._uploads.pop((client, upload_id), None)
+        if upload is not None:
+            upload.abort()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._uploads)
@@ -0,0 +1,148 @@
+import bisect
+import os
+import threading
+import time
+
+# Directory mtimes come from a coarse kernel clock, so a change made in the same tick as a
+# scan leaves the mtime untouched. A scan of a directory modified this recently is not
+# trusted: the next lookup scans again (the same trick git uses for its "racy" index).
+RACY_WINDOW_NS = 50_000_000
+
+
+class SharedFileIndex:
+    """
+    In-memory index of the regular files in a peer's shared directory.
+
+    Built with one scandir() pass and then kept current two ways: the upload path calls
+    add()/discard() as it writes files, and every lookup compares the directory's mtime
+    with the one seen at the last scan (a single stat) to pick up files that were added,
+    removed or renamed by anything else. Lookups by position are O(1); inserts are a
+    bisect into the sorted name list.
+
+    Note: rewriting an existing file in place does not change the directory mtime, so
+    sizes of files modified outside the peer are refreshed on the next directory change.
+    """
+
+    _instances = {}                      # {absolute directory path: SharedFileIndex}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_directory(cls, path: str) -> 'SharedFileIndex':
+        """Returns the shared index for `path`, building it on first use."""
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            index = cls._instances.get(key)
+            if index is None:
+                index = cls._instances[key] = cls(key)
+            return index
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._names = []        # sorted file names
+        self._sizes = {}        # {file name: size in bytes, or None if stat failed}
+        self._dir_mtime_ns = None
+        self.exists = False
+        self.rescan()
+
+    def rescan(self):
+        """Rebuilds the index from the directory contents."""
+        with self._lock:
+            names, sizes = [], {}
+            try:
+                mtime_ns = os.stat(self.path).st_mtime_ns
+                with os.scandir(self.path) as entries:
+                    for entry in entries:
+                        try:
+                            if not entry.is_file():
+                                continue
+                            sizes[entry.name] = entry.stat().st_size
+                        except OSError:
+                            sizes[entry.name] = None
+                        names.append(entry.name)
+                self.exists = True
+            except (FileNotFoundError, NotADirectoryError):
+                mtime_ns = None
+                self.exists = False
+            names.sort()
+            if mtime_ns is not None and time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+                mtime_ns = -1 # never matches, forces another scan on the next lookup
+            self._names, self._sizes, self._dir_mtime_ns = names, sizes, mtime_ns
+
+    def refresh_if_changed(self):
+        """Rescans only if the directory mtime moved since the last scan."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns != self._dir_mtime_ns:
+            self.rescan()
+
+    def _remember_dir_mtime(self):
+        # our own change moved the directory mtime; record it so it doesn't trigger a rescan
+        try:
+            self._dir_mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            pass
+
+    def add(self, name: str, size: int):
+        """Records a file written by the peer itself (new or overwritten)."""
+        with self._lock:
+            if name not in self._sizes:
+                bisect.insort(self._names, name)
+            self._sizes[name] = size
+            self.exists = True
+            self._remember_dir_mtime()
+
+    def discard(self, name: str):
+        """Forgets a file the peer deleted."""
+        with self._lock:
+            if name in self._sizes:
+                del self._sizes[name]
+                del self._names[bisect.bisect_left(self._names, name)]
+            self._remember_dir_mtime()
+
+    def name_at(self, position: int) -> str | None:
+        """Returns the file name at `position` in sorted order, or None if out of range."""
+        with self._lock:
+            self.refresh_if_changed()
+            if 0 <= position < len(self._names):
+                return self._names[position]
+            return None
+
+    def size_of(self, name: str) -> int | None:
+        with self._lock:
+            self.refresh_if_changed()
+            return self._sizes.get(name)
+
+    def __len__(self):
+        with self._lock:
+            self.refresh_if_changed()
+            return len(self._names)
+
+    def iter_entries(self, after: str | None = None, prefix: str = "", batch_size: int = 1000):
+        """
+        Yields (name, size) pairs in sorted order for the names after `after` that start with
+        `prefix`. Entries are copied out batch_size at a time under the lock, so walking a huge
+        directory neither copies it whole nor holds up uploads for the whole walk.
+        """
+        while True:
+            with self._lock:
+                self.refresh_if_changed()
+                start = bisect.bisect_left(self._names, prefix)
+                if after is not None:
+                    start = max(start, bisect.bisect_right(self._names, after))
+                batch = [(name, self._sizes[name]) for name in self._names[start:start + batch_size]]
+            for name, size in batch:
+                if not name.startswith(prefix):
+                    return # names sharing a prefix are contiguous in sorted order
+                yield name, size
+            if len(batch) < batch_size:
+                return
+            after = batch[-1][0]
+
+    def entries(self) -> list[tuple[str, int | None]]:
+        """Returns a snapshot of (name, size) pairs in sorted order."""
+        with self._lock:
+            self.refresh_if_changed()
+            return [(name, self._sizes[name]) for name in self._names]
@@ -0,0 +1,109 @@
+import errno
+import hashlib
+import os
+
+from src.utils.config import Config
+
+
+# posix_fallocate() errors that only mean the filesystem cannot preallocate; the upload goes ahead without it
+UNSUPPORTED_ERRNOS = {errno.EINVAL, errno.EOPNOTSUPP, errno.ENOSYS}
+
+
+def fsync_directory(path: str):
+    """Makes a rename into `path` durable. A no-op where directories cannot be opened (Windows)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class StagedFile:
+    """
+    An incoming upload, written to a private temporary file and only then moved into place.
+
+    Readers never see a partial file: DOWNLOAD and GET_PEER_FILES only look at the final path,
+    which changes in one os.replace() once every byte is on disk. When the size is known up
+    front the file is preallocated, so a full disk fails the upload before any data is
+    received and the data lands in as few extents as possible. Writes go through a
+    Config.PEER_UPLOAD_BUFFER_SIZE buffer, and there is a single fsync when the upload is
+    complete (if Config.PEER_UPLOAD_FSYNC) instead of anything per chunk. The SHA-256 of
+    the bytes is computed as they are written, so the upload can be checked against the
+    content hash the client announced without reading it back.
+
+    Use as a context manager: leaving the block with an exception deletes the temporary file
+    and leaves any earlier file at the final path untouched.
+    """
+
+    def __init__(self, tmp_path: str, buffer_size: int | None = None):
+        self.tmp_path = tmp_path
+        self.buffer_size = buffer_size or Config.PEER_UPLOAD_BUFFER_SIZE
+        self.written = 0
+        self._file = None
+        self._sha256 = hashlib.sha256()
+
+    def __enter__(self) -> 'StagedFile':
+        fd = os.open(self.tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        self._file = open(fd, 'wb', buffering=self.buffer_size)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+    def preallocate(self, size: int):
+        """
+        Reserves `size` bytes on disk for the upload, where the platform and filesystem support it.
+
+        Raises:
+            OSError: If the disk does not have room for the upload (ENOSPC).
+        """
+        if not size or not hasattr(os, 'posix_fallocate'):
+            return
+        try:
+            os.posix_fallocate(self._file.fileno(), 0, size)
+        except OSError as e:
+            if e.errno not in UNSUPPORTED_ERRNOS:
+                raise
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self._sha256.update(chunk)
+        self.written += len(chunk)
+
+    def hexdigest(self) -> str:
+        """SHA-256 of the bytes written so far."""
+        return self._sha256.hexdigest()
+
+    def finish(self):
+        """Flushes the buffer, trims any unused preallocation and syncs the data once."""
+        self._file.flush()
+        self._file.truncate(self.written)
+        if Config.PEER_UPLOAD_FSYNC:
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+    def publish(self, final_path: str):
+        """finish()es the upload and atomically replaces `final_path` with it."""
+        self.finish()
+        os.replace(self.tmp_path, final_path)
+        if Config.PEER_UPLOAD_FSYNC:
+            fsync_directory(os.path.dirname(final_path) or ".")
+
+    def abort(self):
+        """Discards the partial upload."""
+        if self._file is not None and not self._file.closed:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
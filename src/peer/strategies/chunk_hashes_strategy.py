@@ -0,0 +1,86 @@
+import asyncio
+import os
+import socket
+import threading
+from collections import OrderedDict
+
+from .command_strategy import CommandStrategy
+from .download_strategy import DownloadStrategy
+from src.utils import merkle
+from src.utils.config import Config
+from src.utils.framing import LEGACY_PROTOCOL_VERSION, pack_error, pack_header
+from src.utils.logging_utils import get_logger
+
+
+MIN_CHUNK_SIZE = 4 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+CACHE_ENTRIES = 64 # hash lists kept in memory, so a swarm of downloaders does not rehash the same file
+
+logger = get_logger("peer.get_hashes")
+
+
+class ChunkHashesStrategy(CommandStrategy):
+    """
+    Handles GET_HASHES: sends the Merkle leaf hashes of a stored file (32 bytes per chunk of
+    the requested chunk_size), which downloaders check against the root in the registry
+    before verifying each chunk they receive. Version 2+ only.
+    """
+
+    def __init__(self):
+        self._lookup = DownloadStrategy() # same file lookup as DOWNLOAD: by hash, by known file ID, by index
+        self._cache = OrderedDict()       # {(path, size, mtime_ns, chunk_size): [leaf hashes]}
+        self._lock = threading.Lock()
+
+    def requested_chunk_size(self, options: dict) -> int:
+        """
+        Raises:
+            ValueError: If chunk_size is missing or out of range.
+        """
+        value = options.get('chunk_size', '')
+        if not value.isdigit() or not MIN_CHUNK_SIZE <= int(value) <= MAX_CHUNK_SIZE:
+            raise ValueError(f"Invalid chunk_size {value!r}")
+        return int(value)
+
+    def leaves_for(self, filepath: str, chunk_size: int) -> list[bytes]:
+        st = os.stat(filepath)
+        key = (filepath, st.st_size, st.st_mtime_ns, chunk_size)
+        with self._lock:
+            leaves = self._cache.get(key)
+            if leaves is not None:
+                self._cache.move_to_end(key)
+                return leaves
+        leaves = merkle.file_leaf_hashes(filepath, chunk_size)
+        with self._lock:
+            self._cache[key] = leaves
+            while len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return leaves
+
+    def build_reply(self, file_id_str: str, options: dict, version: int) -> bytes:
+        """The framed hash list, or an error frame."""
+        try:
+            chunk_size = self.requested_chunk_size(options)
+        except ValueError as e:
+            return pack_error(str(e), version)
+        filepath = self._lookup.get_file_path(file_id_str, Config.SHARED_FILES_DIR, options.get('hash'))
+        if not filepath or not os.path.exists(filepath):
+            return pack_error(f"File ID {file_id_str} not found", version)
+        payload = merkle.pack_leaves(self.leaves_for(filepath, chunk_size))
+        logger.debug("Sending %s chunk hashes for '%s'.", len(payload) // merkle.DIGEST_SIZE, os.path.basename(filepath))
+        return pack_header(len(payload), version=version) + payload
+
+    def execute(self, client_socket: socket.socket, **kwargs):
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot request chunk hashes.")
+            return False
+        client_socket.sendall(self.build_reply(kwargs.get('file_id_str'), kwargs.get('options', {}), version))
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """Coroutine version of execute(): the file is hashed off the event loop."""
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot request chunk hashes.")
+            return False
+        writer.write(await asyncio.to_thread(self.build_reply, kwargs.get('file_id_str'), kwargs.get('options', {}), version))
+        await writer.drain()
@@ -1,3 +1,4 @@
+import asyncio
 import socket
 from abc import ABC, abstractmethod
 
@@ -12,5 +13,24 @@ class CommandStrategy(ABC):
         Args:
             client_socket: The socket connected to the client requesting the command.
             **kwargs: Additional arguments specific to the command (e.g., filename, file_id).
+
+        Returns:
+            False if the transfer broke off part-way, so the connection cannot carry another
+            request (keep-alive); anything else leaves it open.
+        """
+        pass
+
+    @abstractmethod
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """
+        Coroutine version of execute() used by the peer's asyncio serving mode.
+
+        Args:
+            reader: Stream the client's request (and any payload) is read from.
+            writer: Stream the response is written to.
+            **kwargs: Additional arguments specific to the command (e.g., filename, file_id).
+
+        Returns:
+            Same as execute().
         """
-        pass
\ No newline at end of file
+        pass
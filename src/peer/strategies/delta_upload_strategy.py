@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+import socket
+
+from .command_strategy import CommandStrategy
+from .upload_strategy import UploadStrategy
+from src.peer.content_store import ContentStore
+from src.peer.shared_index import SharedFileIndex
+from src.peer.staged_file import StagedFile
+from src.utils import delta
+from src.utils.config import Config
+from src.utils.framing import (FramedReader, LEGACY_PROTOCOL_VERSION, HEADER_SIZE, STATUS_EXISTS,
+                               pack_header, pack_error, unpack_header)
+from src.utils.logging_utils import get_logger
+
+
+COPY_BUFFER_SIZE = 1024 * 1024
+OP_ARGS = {delta.OP_COPY: delta.OP_COPY_ARGS, delta.OP_DATA: delta.OP_DATA_ARGS}
+
+logger = get_logger("peer.delta_upload")
+
+
+class DeltaUploadStrategy(CommandStrategy):
+    """
+    Handles DELTA_UPLOAD: builds a new version of a file from a version already in the
+    content store (the `base` hash) and a stream of ops that copy byte ranges of the base or
+    insert new bytes (see src/utils/delta.py), so only changed blocks cross the network.
+    The result is staged and published like an UPLOAD under its own content hash, which the
+    peer computes while rebuilding it (the client never sees the ciphertext copied from the
+    base) and sends back in the confirmation; the base stays in place for anyone still
+    downloading it. Version 2+ only.
+    """
+
+    def __init__(self):
+        self._upload = UploadStrategy() # same content hash check and publishing as UPLOAD
+
+    def base_path(self, options: dict, store: ContentStore) -> str | None:
+        base = options.get('base')
+        return store.lookup(file_hash=base) if ContentStore.is_valid_hash(base) else None
+
+    def copy_range(self, base_file, staged: StagedFile, offset: int, length: int):
+        base_file.seek(offset)
+        while length:
+            chunk = base_file.read(min(COPY_BUFFER_SIZE, length))
+            if not chunk:
+                raise ValueError("Copy range ends past the base version")
+            staged.write(chunk)
+            length -= len(chunk)
+
+    def read_op(self, read_exactly, remaining: int) -> tuple[bytes, tuple, int]:
+        """Reads one op header. Returns (op, args, bytes of the op stream left after it)."""
+        op = bytes(read_exactly(1))
+        args_format = OP_ARGS.get(op)
+        if args_format is None:
+            raise ValueError(f"Unknown delta op {op!r}")
+        if remaining < 1 + args_format.size:
+            raise ValueError("Delta op stream ends inside an op")
+        return op, args_format.unpack(read_exactly(args_format.size)), remaining - 1 - args_format.size
+
+    def apply_ops(self, reader: FramedReader, size: int, base_file, base_size: int, staged: StagedFile):
+        """
+        Raises:
+            ValueError: If the op stream is malformed or copies from outside the base.
+            ConnectionError: If the connection closes before the op stream is complete.
+        """
+        remaining = size
+        while remaining:
+            op, args, remaining = self.read_op(reader.read_exactly, remaining)
+            if op == delta.OP_COPY:
+                offset, length = args
+                if offset + length > base_size:
+                    raise ValueError("Copy range ends past the base version")
+                self.copy_range(base_file, staged, offset, length)
+            else:
+                (length,) = args
+                if length > remaining:
+                    raise ValueError("Delta op stream ends inside inserted data")
+                for chunk in reader.iter_payload(length):
+                    staged.write(chunk)
+                remaining -= length
+
+    def finish(self, staged: StagedFile, filename: str, file_hash: str | None, store: ContentStore,
+               index: SharedFileIndex, version: int) -> bytes:
+        """
+        Publishes a rebuilt file under the hash of its bytes and builds the confirmation, whose
+        JSON payload carries that hash for the client to register.
+
+        Raises:
+            ValueError: If the client announced a content hash (`file_hash`) the result does not match.
+        """
+        content_hash = staged.hexdigest()
+        self._upload.publish(staged, filename, file_hash or content_hash, store, index)
+        body = json.dumps({"content_hash": content_hash}).encode('utf-8')
+        return pack_header(len(body), version=version) + body
+
+    def requested_size(self, options: dict) -> int:
+        value = options.get('size', '')
+        return int(value) if value.isdigit() else 0
+
+    def execute(self, client_socket: socket.socket, **kwargs):
+        filename = kwargs.get('filename')
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        options = kwargs.get('options', {})
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot send deltas.")
+            return False
+        file_hash = self._upload.content_hash(kwargs)
+        if not filename:
+            logger.warning("Filename not provided.")
+            client_socket.sendall(pack_error("Filename not provided", version))
+            return
+
+        reader = kwargs.get('reader') or FramedReader(client_socket)
+        store = ContentStore.for_directory(Config.SHARED_FILES_DIR)
+        if file_hash and store.has(file_hash):
+            store.add_alias(file_hash, filename=filename)
+            client_socket.sendall(pack_header(0, status=STATUS_EXISTS, version=version))
+            logger.debug("Content of '%s' (%s...) already stored, skipping transfer.", filename, file_hash[:12])
+            return
+        base_path = self.base_path(options, store)
+        if base_path is None:
+            logger.warning("Base version of '%s' is not stored here.", filename)
+            client_socket.sendall(pack_error("Base version not stored here", version))
+            return
+
+        staged = StagedFile(store.new_temp_path())
+        index = SharedFileIndex.for_directory(Config.SHARED_FILES_DIR)
+        logger.debug("Rebuilding '%s' from %s... into '%s'...", filename, os.path.basename(base_path)[:12], staged.tmp_path)
+        try:
+            with staged, open(base_path, 'rb') as base_file:
+                client_socket.sendall(pack_header(0, version=version)) # ready: the base is here, send the ops
+                header = reader.read_header()
+                if header is None:
+                    raise ConnectionError("Connection closed before the transfer header")
+                staged.preallocate(self.requested_size(options))
+                self.apply_ops(reader, header.size, base_file, os.fstat(base_file.fileno()).st_size, staged)
+                confirmation = self.finish(staged, filename, file_hash, store, index, version)
+            client_socket.sendall(confirmation)
+            logger.debug("New version of '%s' stored (%s bytes).", filename, staged.written)
+        except Exception as e:
+            logger.warning("Error rebuilding '%s': %s", filename, e)
+            try:
+                client_socket.sendall(pack_error(f"Delta upload failed: {e}", version))
+            except OSError:
+                pass # client is gone
+            return False
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """Coroutine version of execute(): socket reads are awaited, disk I/O runs off the event loop."""
+        filename = kwargs.get('filename')
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        options = kwargs.get('options', {})
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot send deltas.")
+            return False
+        file_hash = self._upload.content_hash(kwargs)
+        if not filename:
+            logger.warning("Filename not provided.")
+            writer.write(pack_error("Filename not provided", version))
+            await writer.drain()
+            return
+
+        store = ContentStore.for_directory(Config.SHARED_FILES_DIR)
+        if file_hash and store.has(file_hash):
+            await asyncio.to_thread(store.add_alias, file_hash, filename=filename)
+            writer.write(pack_header(0, status=STATUS_EXISTS, version=version))
+            await writer.drain()
+            logger.debug("Content of '%s' (%s...) already stored, skipping transfer.", filename, file_hash[:12])
+            return
+        base_path = self.base_path(options, store)
+        if base_path is None:
+            logger.warning("Base version of '%s' is not stored here.", filename)
+            writer.write(pack_error("Base version not stored here", version))
+            await writer.drain()
+            return
+
+        staged = StagedFile(store.new_temp_path())
+        index = SharedFileIndex.for_directory(Config.SHARED_FILES_DIR)
+        logger.debug("Rebuilding '%s' from %s... into '%s'...", filename, os.path.basename(base_path)[:12], staged.tmp_path)
+        try:
+            await asyncio.to_thread(staged.__enter__)
+            base_file = await asyncio.to_thread(open, base_path, 'rb')
+            try:
+                writer.write(pack_header(0, version=version))
+                await writer.drain()
+                header = unpack_header(await reader.readexactly(HEADER_SIZE))
+                await asyncio.to_thread(staged.preallocate, self.requested_size(options))
+                base_size = os.fstat(base_file.fileno()).st_size
+                remaining = header.size
+                while remaining:
+                    op = await reader.readexactly(1)
+                    args_format = OP_ARGS.get(op)
+                    if args_format is None:
+                        raise ValueError(f"Unknown delta op {op!r}")
+                    if remaining < 1 + args_format.size:
+                        raise ValueError("Delta op stream ends inside an op")
+                    args = args_format.unpack(await reader.readexactly(args_format.size))
+                    remaining -= 1 + args_format.size
+                    if op == delta.OP_COPY:
+                        offset, length = args
+                        if offset + length > base_size:
+                            raise ValueError("Copy range ends past the base version")
+                        await asyncio.to_thread(self.copy_range, base_file, staged, offset, length)
+                        continue
+                    (length,) = args
+                    if length > remaining:
+                        raise ValueError("Delta op stream ends inside inserted data")
+                    remaining -= length
+                    while length:
+                        chunk = await reader.read(min(Config.CHUNK_SIZE, length))
+                        if not chunk:
+                            raise ConnectionError("Connection closed inside inserted data")
+                        length -= len(chunk)
+                        await asyncio.to_thread(staged.write, chunk)
+                confirmation = await asyncio.to_thread(self.finish, staged, filename, file_hash, store, index, version)
+            except BaseException:
+                await asyncio.to_thread(staged.abort)
+                raise
+            finally:
+                base_file.close()
+            writer.write(confirmation)
+            await writer.drain()
+            logger.debug("New version of '%s' stored (%s bytes).", filename, staged.written)
+        except Exception as e:
+            logger.warning("Error rebuilding '%s': %s", filename, e)
+            writer.write(pack_error(f"Delta upload failed: {e}", version))
+            return False
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import socket
+
+from .download_strategy import DownloadStrategy
+from src.utils.config import Config
+from src.utils.framing import LEGACY_PROTOCOL_VERSION, pack_error, pack_header
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("peer.download_many")
+
+
+class DownloadManyStrategy(DownloadStrategy):
+    """
+    Handles DOWNLOAD_MANY: sends several files back-to-back in one reply, in the order they
+    were asked for. Each file is a size header followed by its stored bytes, or an error
+    frame if this peer does not have it, so one missing file does not end the batch. The
+    `hashes` option lists the files' content hashes, comma-separated and in the same order
+    as the file IDs (empty where unknown). Version 2+ only.
+
+    A file that fits in one send chunk goes out in the same write as its header, so a batch
+    of small files costs about one send per file.
+    """
+
+    def requested_files(self, file_ids: list[str], options: dict) -> list[tuple[str, str | None]]:
+        """Pairs each requested file ID with its content hash (None if not given)."""
+        hashes = options.get('hashes', '').split(',')
+        return [(file_id, (hashes[i] or None) if i < len(hashes) else None) for i, file_id in enumerate(file_ids)]
+
+    def prepare_file(self, file_id_str: str, file_hash: str | None, small: int, version: int) -> tuple:
+        """
+        Looks up and opens one requested file.
+
+        Returns:
+            (frame, f, size). If f is None, frame is all there is to send for this file: an
+            error frame, or the header with the whole file (`size` bytes) when it is at most
+            `small` bytes. Otherwise frame is the header and the caller sends `size` bytes
+            of the open file f after it.
+        """
+        filepath = self.get_file_path(file_id_str, Config.SHARED_FILES_DIR, file_hash)
+        try:
+            f = open(filepath, 'rb') if filepath else None
+        except OSError:
+            f = None
+        if f is None:
+            logger.warning("File with ID %s not found for a batch download.", file_id_str)
+            return pack_error(f"File ID {file_id_str} not found", version), None, 0
+        size = os.fstat(f.fileno()).st_size
+        if size > small:
+            return pack_header(size, version=version), f, size
+        with f:
+            data = f.read(size)
+        return pack_header(len(data), version=version) + data, None, len(data)
+
+    def small_file_limit(self, chunk_size: int, transfer) -> int:
+        """Largest file sent in one write with its header: one chunk, and one scheduler piece."""
+        return chunk_size if transfer is None else min(chunk_size, transfer.scheduler.quantum)
+
+    def send_frame(self, client_socket: socket.socket, frame: bytes, size: int, transfer):
+        """Sends a prepared frame, carrying `size` bytes of file data, when the scheduler gives `transfer` its turn."""
+        if transfer is None or not size:
+            client_socket.sendall(frame)
+            return
+        transfer.acquire(size)
+        sent = 0
+        try:
+            client_socket.sendall(frame)
+            sent = size
+        finally:
+            transfer.release(sent)
+
+    async def send_frame_async(self, writer: asyncio.StreamWriter, frame: bytes, size: int, transfer):
+        """Coroutine version of send_frame()."""
+        if transfer is not None and size:
+            await transfer.acquire_async(size)
+        sent = 0
+        try:
+            writer.write(frame)
+            await writer.drain()
+            sent = size
+        finally:
+            if transfer is not None and size:
+                transfer.release(sent)
+
+    def execute(self, client_socket: socket.socket, **kwargs):
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot request batch downloads.")
+            return False
+        options = kwargs.get('options', {})
+        files = self.requested_files(kwargs.get('file_ids') or [], options)
+        if not files:
+            client_socket.sendall(pack_error("No file IDs provided", version))
+            return
+
+        bandwidth = kwargs.get('bandwidth')
+        chunk_size = self.send_chunk_size(options, None, client_socket)
+        transfer = bandwidth.open(kwargs.get('client_host'), None, self.is_background(options)) if bandwidth else None
+        try:
+            small = self.small_file_limit(chunk_size, transfer)
+            for file_id_str, file_hash in files:
+                frame, f, size = self.prepare_file(file_id_str, file_hash, small, version)
+                if f is None:
+                    self.send_frame(client_socket, frame, size, transfer)
+                    continue
+                with f:
+                    client_socket.sendall(frame)
+                    if transfer is None:
+                        self.send_file_contents(client_socket, f, 0, size, chunk_size)
+                    else:
+                        self.send_scheduled(client_socket, f, 0, size, transfer, chunk_size)
+            logger.debug("Sent a batch of %s files.", len(files))
+        except Exception as e:
+            logger.warning("Error sending a batch of %s files: %s", len(files), e)
+            # the client detects the missing frames as a short read
+            return False
+        finally:
+            if transfer is not None:
+                transfer.close()
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """Coroutine version of execute(): file lookups and reads run off the event loop."""
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot request batch downloads.")
+            return False
+        options = kwargs.get('options', {})
+        files = self.requested_files(kwargs.get('file_ids') or [], options)
+        if not files:
+            writer.write(pack_error("No file IDs provided", version))
+            await writer.drain()
+            return
+
+        bandwidth = kwargs.get('bandwidth')
+        chunk_size = self.send_chunk_size(options, None, writer.get_extra_info('socket'))
+        transfer = bandwidth.open(kwargs.get('client_host'), None, self.is_background(options)) if bandwidth else None
+        try:
+            small = self.small_file_limit(chunk_size, transfer)
+            for file_id_str, file_hash in files:
+                frame, f, size = await asyncio.to_thread(self.prepare_file, file_id_str, file_hash, small, version)
+                if f is None:
+                    await self.send_frame_async(writer, frame, size, transfer)
+                    continue
+                try:
+                    writer.write(frame)
+                    if transfer is None:
+                        await self.send_file_contents_async(writer, f, 0, size, chunk_size)
+                    else:
+                        await self.send_scheduled_async(writer, f, 0, size, transfer, chunk_size)
+                finally:
+                    f.close()
+            await writer.drain()
+            logger.debug("Sent a batch of %s files.", len(files))
+        except Exception as e:
+            logger.warning("Error sending a batch of %s files: %s", len(files), e)
+            return False
+        finally:
+            if transfer is not None:
+                transfer.close()
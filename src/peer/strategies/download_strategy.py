@@ -1,66 +1,305 @@
+import asyncio
+import logging
 import socket
 import os
 from .command_strategy import CommandStrategy
+from src.peer.content_store import ContentStore
+from src.peer.shared_index import SharedFileIndex
+from src.utils.chunking import chunk_limit, chunk_size_for
 from src.utils.config import Config
 from src.utils.commands_enum import Commands 
+from src.utils.framing import LEGACY_PROTOCOL_VERSION, pack_header, pack_error
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("peer.download")
 
 
 class DownloadStrategy(CommandStrategy):
     """Handles the file download command."""
 
-    def get_file_path(self, file_id_str: str, shared_files_path: str):
-        """Looks up the file path based on a simple index (file_id)."""
+    def get_file_path(self, file_id_str: str, shared_files_path: str, file_hash: str | None = None):
+        """
+        Looks up the file path for a DOWNLOAD request. A request with a content hash gets that
+        object from the content store or nothing: the file ID it came with is not trusted, so it
+        neither falls back to the ID nor is recorded for it. Without a hash, the ID is looked up
+        among the registry file IDs the store recorded at upload, and finally as a simple index
+        into the sorted shared files.
+        """
+        store = ContentStore.for_directory(shared_files_path)
+        if file_hash and ContentStore.is_valid_hash(file_hash):
+            return store.lookup(file_hash=file_hash)
+        else:
+            filepath = store.lookup(file_id=file_id_str)
+            if filepath:
+                return filepath
         try:
             file_id = int(file_id_str)
+            index = SharedFileIndex.for_directory(shared_files_path)
+            filename = index.name_at(file_id)
             # Ensure the shared directory exists
-            if not os.path.exists(shared_files_path) or not os.path.isdir(shared_files_path):
-                 print(f"Peer (Download): Shared directory '{shared_files_path}' not found.")
+            if not index.exists:
+                 logger.warning("Shared directory '%s' not found.", shared_files_path)
                  return None
 
-            files = sorted([f for f in os.listdir(shared_files_path) if os.path.isfile(os.path.join(shared_files_path, f))]) # List only files and sort
-
-            if 0 <= file_id < len(files):
-                return os.path.join(shared_files_path, files[file_id])
+            if filename is not None:
+                return os.path.join(shared_files_path, filename)
             else:
-                print(f"Peer (Download): Invalid file ID {file_id}. Max index is {len(files)-1}.")
+                logger.warning("Invalid file ID %s. Max index is %s.", file_id, len(index) - 1)
                 return None
         except ValueError:
-            print(f"Peer (Download): Invalid file ID format: '{file_id_str}'. Must be an integer.")
+            logger.warning("Invalid file ID format: '%s'. Must be an integer.", file_id_str)
             return None
         except Exception as e:
-            print(f"Peer (Download): Error accessing shared files directory '{shared_files_path}': {e}")
+            logger.error("Error accessing shared files directory '%s': %s", shared_files_path, e)
             return None
 
 
+    def is_background(self, options: dict) -> bool:
+        """True for a `background=1` download (replication), which yields the uplink to everyone else."""
+        return options.get('background') == '1'
+
+    def requested_range(self, options: dict) -> tuple[int, int | None]:
+        """
+        Returns the (offset, length) a version 2+ DOWNLOAD asked for; length None means to the end.
+
+        Raises:
+            ValueError: If offset or length is not a non-negative integer.
+        """
+        offset, length = options.get('offset', '0'), options.get('length')
+        if not offset.isdigit() or (length is not None and not length.isdigit()):
+            raise ValueError(f"Invalid byte range offset={offset!r} length={length!r}")
+        return int(offset), None if length is None else int(length)
+
+    def range_count(self, f, offset: int, length: int | None) -> int:
+        """
+        Number of bytes to send from `offset` of the open file, clamped to its end.
+
+        Raises:
+            ValueError: If offset is past the end of the file.
+        """
+        size = os.fstat(f.fileno()).st_size
+        if offset > size:
+            raise ValueError(f"Offset {offset} is beyond the end of the file ({size} bytes)")
+        return size - offset if length is None else min(length, size - offset)
+
+    def send_chunk_size(self, options: dict, count: int | None, sock) -> int:
+        """read()+sendall() size for sending `count` bytes on `sock`, within the client's advertised limit."""
+        return chunk_size_for(count, sock, limit=chunk_limit(options))
+
+    def send_file_contents(self, client_socket: socket.socket, f, offset: int = 0, count: int | None = None,
+                           chunk_size: int | None = None):
+        """
+        Sends `count` bytes (default: the rest) of an open file, starting at `offset`, to the client.
+
+        Ciphertext is stored exactly as it goes over the wire, so the kernel can copy it straight
+        from the page cache to the socket (socket.sendfile -> os.sendfile). Sockets without a
+        sendfile() method, or a disabled Config.PEER_ZERO_COPY_SEND, use the read()+sendall()
+        loop in `chunk_size` pieces (default Config.CHUNK_SIZE).
+        """
+        if count == 0: # an empty file or range; sendfile() rejects a zero count
+            return
+        if Config.PEER_ZERO_COPY_SEND and hasattr(client_socket, 'sendfile'):
+            # socket.sendfile itself falls back to send() where os.sendfile is unusable
+            client_socket.sendfile(f, offset, count)
+            return
+        chunk_size = chunk_size or Config.CHUNK_SIZE
+        f.seek(offset)
+        remaining = count
+        while remaining is None or remaining > 0:
+            chunk = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            client_socket.sendall(chunk) # Use sendall for reliability
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    async def send_file_contents_async(self, writer: asyncio.StreamWriter, f, offset: int = 0, count: int | None = None,
+                                       chunk_size: int | None = None):
+        """Coroutine version of send_file_contents(), built on loop.sendfile()."""
+        if count == 0:
+            return
+        if Config.PEER_ZERO_COPY_SEND:
+            await writer.drain()
+            # fallback=True reads through the default executor when the transport can't sendfile
+            await asyncio.get_running_loop().sendfile(writer.transport, f, offset, count, fallback=True)
+            return
+        chunk_size = chunk_size or Config.CHUNK_SIZE
+        await asyncio.to_thread(f.seek, offset)
+        remaining = count
+        while remaining is None or remaining > 0:
+            chunk = await asyncio.to_thread(f.read, chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain() # wait here instead of buffering the whole file for slow clients
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    def send_scheduled(self, client_socket: socket.socket, f, offset: int, count: int, transfer, chunk_size: int | None = None):
+        """
+        send_file_contents() in pieces, each sent when the peer's BandwidthScheduler gives `transfer`
+        its turn. A piece holds one of the scheduler's send slots, so writing it may take at most
+        Config.PEER_SEND_TIMEOUT: a client that stops reading gets socket.timeout and its slot back
+        goes to the other transfers.
+        """
+        end = offset + count
+        previous_timeout = client_socket.gettimeout()
+        client_socket.settimeout(Config.PEER_SEND_TIMEOUT)
+        try:
+            while offset < end:
+                nbytes = transfer.acquire(end - offset)
+                sent = 0
+                try:
+                    self.send_file_contents(client_socket, f, offset, nbytes, chunk_size)
+                    sent = nbytes
+                finally:
+                    transfer.release(sent)
+                offset += nbytes
+        finally:
+            client_socket.settimeout(previous_timeout)
+
+    async def send_scheduled_async(self, writer: asyncio.StreamWriter, f, offset: int, count: int, transfer,
+                                   chunk_size: int | None = None):
+        """Coroutine version of send_scheduled(); a piece not written within Config.PEER_SEND_TIMEOUT raises TimeoutError."""
+        end = offset + count
+        while offset < end:
+            nbytes = await transfer.acquire_async(end - offset)
+            sent = 0
+            try:
+                await asyncio.wait_for(self.send_file_contents_async(writer, f, offset, nbytes, chunk_size),
+                                       Config.PEER_SEND_TIMEOUT)
+                sent = nbytes
+            finally:
+                transfer.release(sent)
+            offset += nbytes
+
+    def log_sent(self, filename: str, transfer):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        if transfer is None:
+            logger.debug("File '%s' sent successfully.", filename)
+        else:
+            logger.debug("File '%s' sent successfully (%.1f MB/s).", filename, transfer.throughput() / 1e6)
+
     def execute(self, client_socket: socket.socket, **kwargs):
         """Handles sending a requested file."""
         file_id_str = kwargs.get('file_id_str')
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
         if not file_id_str:
-            print("Peer (Download): File ID not provided.")
-            # Optionally send an error back to the client
+            logger.warning("File ID not provided.")
+            if version > LEGACY_PROTOCOL_VERSION:
+                client_socket.sendall(pack_error("File ID not provided", version))
+            return
+
+        options = kwargs.get('options', {})
+        try:
+            offset, length = self.requested_range(options)
+        except ValueError as e:
+            logger.warning("%s", e)
+            client_socket.sendall(pack_error(str(e), version))
             return
 
-        filepath = self.get_file_path(file_id_str, Config.SHARED_FILES_DIR)
+        bandwidth = kwargs.get('bandwidth') # the peer's BandwidthScheduler, if it schedules downloads
+        filepath = self.get_file_path(file_id_str, Config.SHARED_FILES_DIR, options.get('hash'))
         if filepath and os.path.exists(filepath):
             filename = os.path.basename(filepath)
-            print(f"Peer (Download): Sending file '{filename}' (ID: {file_id_str})...")
+            logger.debug("Sending file '%s' (ID: %s, offset %s)...", filename, file_id_str, offset)
+            transfer = None
             try:
                 with open(filepath, 'rb') as f:
-                    while True:
-                        chunk = f.read(Config.CHUNK_SIZE)
-                        if not chunk:
-                            break
-                        client_socket.sendall(chunk) # Use sendall for reliability
-                # Send DONE signal
-                client_socket.sendall(str(Commands.DONE).encode('utf-8'))
-                print(f"Peer (Download): File '{filename}' sent successfully.")
+                    count = self.range_count(f, offset, length)
+                    chunk_size = self.send_chunk_size(options, count, client_socket) if version > LEGACY_PROTOCOL_VERSION else None
+                    if version > LEGACY_PROTOCOL_VERSION:
+                        # the size header replaces the DONE sentinel: the client stops after that many bytes
+                        client_socket.sendall(pack_header(count, version=version))
+                    if bandwidth is None:
+                        self.send_file_contents(client_socket, f, offset, count, chunk_size)
+                    else:
+                        with bandwidth.open(kwargs.get('client_host'), count, self.is_background(options)) as transfer:
+                            self.send_scheduled(client_socket, f, offset, count, transfer, chunk_size)
+                if version == LEGACY_PROTOCOL_VERSION:
+                    # Send DONE signal
+                    client_socket.sendall(str(Commands.DONE).encode('utf-8'))
+                self.log_sent(filename, transfer)
+            except ValueError as e: # requested range starts past the end of the file
+                logger.warning("%s", e)
+                if version > LEGACY_PROTOCOL_VERSION:
+                    client_socket.sendall(pack_error(str(e), version))
             except FileNotFoundError:
-                 print(f"Peer (Download): Error: File '{filename}' not found at path '{filepath}' (should not happen after check).")
-                 # Consider sending an error signal
+                 logger.error("Error: File '%s' not found at path '%s' (should not happen after check).", filename, filepath)
+                 if version > LEGACY_PROTOCOL_VERSION:
+                     client_socket.sendall(pack_error(f"File ID {file_id_str} not found", version))
             except Exception as e:
-                print(f"Peer (Download): Error sending file '{filename}': {e}")
-                # Consider sending an error signal
+                logger.warning("Error sending file '%s': %s", filename, e)
+                # the header may already be out, so the client detects this as a short read
+                return False
         else:
-            print(f"Peer (Download): Error: File with ID {file_id_str} not found or path is invalid.")
-            # Send an error signal or specific message back to the client
-            
\ No newline at end of file
+            logger.warning("Error: File with ID %s not found or path is invalid.", file_id_str)
+            if version > LEGACY_PROTOCOL_VERSION:
+                client_socket.sendall(pack_error(f"File ID {file_id_str} not found", version))
+
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """Coroutine version of execute(): file lookups and reads run off the event loop."""
+        file_id_str = kwargs.get('file_id_str')
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if not file_id_str:
+            logger.warning("File ID not provided.")
+            if version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_error("File ID not provided", version))
+                await writer.drain()
+            return
+
+        options = kwargs.get('options', {})
+        try:
+            offset, length = self.requested_range(options)
+        except ValueError as e:
+            logger.warning("%s", e)
+            writer.write(pack_error(str(e), version))
+            await writer.drain()
+            return
+
+        filepath = await asyncio.to_thread(self.get_file_path, file_id_str, Config.SHARED_FILES_DIR, options.get('hash'))
+        if not filepath or not await asyncio.to_thread(os.path.exists, filepath):
+            logger.warning("Error: File with ID %s not found or path is invalid.", file_id_str)
+            if version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_error(f"File ID {file_id_str} not found", version))
+                await writer.drain()
+            return
+
+        filename = os.path.basename(filepath)
+        logger.debug("Sending file '%s' (ID: %s, offset %s)...", filename, file_id_str, offset)
+        bandwidth, transfer = kwargs.get('bandwidth'), None
+        try:
+            f = await asyncio.to_thread(open, filepath, 'rb')
+            try:
+                count = self.range_count(f, offset, length)
+                chunk_size = None
+                if version > LEGACY_PROTOCOL_VERSION:
+                    chunk_size = self.send_chunk_size(options, count, writer.get_extra_info('socket'))
+                    writer.write(pack_header(count, version=version))
+                if bandwidth is None:
+                    await self.send_file_contents_async(writer, f, offset, count, chunk_size)
+                else:
+                    with bandwidth.open(kwargs.get('client_host'), count, self.is_background(options)) as transfer:
+                        await self.send_scheduled_async(writer, f, offset, count, transfer, chunk_size)
+            finally:
+                f.close()
+            if version == LEGACY_PROTOCOL_VERSION:
+                writer.write(str(Commands.DONE).encode('utf-8'))
+                await writer.drain()
+            self.log_sent(filename, transfer)
+        except ValueError as e: # requested range starts past the end of the file
+            logger.warning("%s", e)
+            if version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_error(str(e), version))
+                await writer.drain()
+        except FileNotFoundError:
+            logger.error("Error: File '%s' not found at path '%s' (should not happen after check).", filename, filepath)
+            if version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_error(f"File ID {file_id_str} not found", version))
+                await writer.drain()
+        except Exception as e:
+            logger.warning("Error sending file '%s': %s", filename, e)
+            return False
@@ -1,42 +1,182 @@
+import asyncio
 import socket
 import os
 import json
 from .command_strategy import CommandStrategy
+from src.peer.content_store import ContentStore
+from src.peer.shared_index import SharedFileIndex
 from src.utils.config import Config
 from src.utils.commands_enum import Commands
+from src.utils.framing import LEGACY_PROTOCOL_VERSION, pack_error, pack_header, pack_stream_frame
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("peer.get_peer_files")
+
+
 class GetPeerFilesStrategy(CommandStrategy):
-    """Handles the command to list files available on this peer."""
+    """
+    Handles the command to list files available on this peer.
+
+    Version 1 clients get the whole list as one JSON object. Version 2+ requests can page
+    through the listing (cursor=, limit=), filter it (prefix=, min_size=, max_size=) and ask
+    for format=ndjson, which streams one JSON object per line in frames as the listing is
+    walked, so neither side ever holds the full list of a huge shared directory.
+    """
+
+    def size_matches(self, size, min_size: int | None, max_size: int | None) -> bool:
+        if min_size is None and max_size is None:
+            return True
+        if not isinstance(size, int):
+            return False
+        return (min_size is None or size >= min_size) and (max_size is None or size <= max_size)
+
+    def iter_shared_files(self, shared_files_path: str, after: str | None = None, prefix: str = "",
+                          min_size: int | None = None, max_size: int | None = None):
+        """
+        Yields (cursor, entry) for the listed files: {filename, size} for the shared directory
+        sorted by name, then one entry per content-store object (which also carries its
+        file_hash) sorted by hash. Passing an entry's cursor as `after` resumes the listing
+        right behind that entry.
+        """
+        kind, _, key = (after or "").partition(":")
+        if kind != "o":
+            index = SharedFileIndex.for_directory(shared_files_path)
+            for filename, filesize in index.iter_entries(after=key if kind == "f" else None, prefix=prefix):
+                if filename.startswith('.'):
+                    continue
+                if filesize is None:
+                    logger.warning("Could not get size for %s", filename)
+                    filesize = "N/A"
+                if self.size_matches(filesize, min_size, max_size):
+                    yield f"f:{filename}", {"filename": filename, "size": filesize}
+            key = None
+        for file_hash, meta in ContentStore.for_directory(shared_files_path).iter_entries(after=key):
+            filename = meta["filenames"][0] if meta["filenames"] else file_hash
+            if filename.startswith(prefix) and self.size_matches(meta["size"], min_size, max_size):
+                yield f"o:{file_hash}", {"filename": filename, "size": meta["size"], "file_hash": file_hash}
+
+    def list_shared_files(self, shared_files_path: str):
+        """Returns the whole listing as [{filename, size}, ...] (see iter_shared_files())."""
+        return [entry for _, entry in self.iter_shared_files(shared_files_path)]
+
+    def parse_query(self, options: dict) -> dict:
+        """
+        Reads the listing options of a version 2+ request.
+
+        Raises:
+            ValueError: If an option is malformed.
+        """
+        cursor = options.get('cursor') or None
+        if cursor is not None and cursor[:2] not in ("f:", "o:"):
+            raise ValueError(f"Invalid listing cursor {cursor!r}")
+        numbers = {}
+        for key in ('min_size', 'max_size', 'limit'):
+            value = options.get(key)
+            if value is not None and not value.isdigit():
+                raise ValueError(f"Invalid {key} {value!r}")
+            numbers[key] = None if value is None else int(value)
+        listing_format = options.get('format', 'json')
+        if listing_format not in ('json', 'ndjson'):
+            raise ValueError(f"Unknown listing format {listing_format!r}")
+        limit = numbers['limit']
+        if listing_format == 'json':
+            # a JSON page is built in memory on both sides, so it is always bounded
+            limit = min(limit or Config.PEER_LIST_PAGE_SIZE, Config.PEER_LIST_MAX_PAGE_SIZE)
+        return {"cursor": cursor, "prefix": options.get('prefix', ""), "min_size": numbers['min_size'],
+                "max_size": numbers['max_size'], "limit": limit, "stream": listing_format == 'ndjson'}
+
+    def iter_reply(self, shared_files_path: str, options: dict, version: int):
+        """
+        Yields the bytes of a version 2+ reply: one framed JSON page
+        {"status", "files", "next_cursor"}, or for format=ndjson a stream of frames with one
+        file entry per line and a final {"next_cursor", "count"} line. next_cursor is None
+        once the listing is complete.
+
+        Raises:
+            ValueError: Before anything is yielded, if the options are malformed.
+        """
+        query = self.parse_query(options)
+        entries = self.iter_shared_files(shared_files_path, query["cursor"], query["prefix"],
+                                         query["min_size"], query["max_size"])
+        limit = query["limit"]
+        count, last_cursor, next_cursor = 0, None, None
+        if not query["stream"]:
+            files_list = []
+            for cursor, entry in entries:
+                if count == limit:
+                    next_cursor = last_cursor
+                    break
+                files_list.append(entry)
+                count, last_cursor = count + 1, cursor
+            body = json.dumps({"status": "OK", "files": files_list, "next_cursor": next_cursor}).encode('utf-8')
+            yield pack_header(len(body), version=version) + body
+            return
+
+        lines, buffered = [], 0
+        for cursor, entry in entries:
+            if count == limit:
+                next_cursor = last_cursor
+                break
+            line = json.dumps(entry).encode('utf-8') + b"\n"
+            lines.append(line)
+            buffered += len(line)
+            count, last_cursor = count + 1, cursor
+            if buffered >= Config.CHUNK_SIZE:
+                yield pack_stream_frame(b"".join(lines), version)
+                lines, buffered = [], 0
+        lines.append(json.dumps({"next_cursor": next_cursor, "count": count}).encode('utf-8') + b"\n")
+        yield pack_stream_frame(b"".join(lines), version)
+        yield pack_stream_frame(b"", version)
+
+    def encode_error(self, message: str, version: int) -> bytes:
+        if version <= LEGACY_PROTOCOL_VERSION:
+            return json.dumps({"status": "ERROR", "message": message}).encode('utf-8')
+        return pack_error(message, version)
 
     def execute(self, client_socket: socket.socket, **kwargs):
         """Lists files in the shared directory and sends the list to the client."""
         shared_files_path = Config.SHARED_FILES_DIR
-        files_list = []
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
 
-        print(f"Peer (GetPeerFiles): Listing files in '{shared_files_path}' for connected client.")
+        logger.debug("Listing files in '%s' for connected client.", shared_files_path)
 
         try:
-            
-            if os.path.exists(shared_files_path) and os.path.isdir(shared_files_path):
-                
-                files = [f for f in os.listdir(shared_files_path) if os.path.isfile(os.path.join(shared_files_path, f)) and not f.startswith('.')]
-                
-                for filename in sorted(files): # sort for consistent order
-                    filepath = os.path.join(shared_files_path, filename)
-                    try:
-                        filesize = os.path.getsize(filepath)
-                        files_list.append({"filename": filename, "size": filesize})
-                    except Exception as size_e:
-                        print(f"Peer (GetPeerFiles): Could not get size for {filename}: {size_e}")
-                        files_list.append({"filename": filename, "size": "N/A"}) 
-
-
-            # send the list as a JSON response
-            response = {"status": "OK", "files": files_list}
-            client_socket.sendall(json.dumps(response).encode('utf-8'))
-            print(f"Peer (GetPeerFiles): Sent file list ({len(files_list)} files) to client.")
+            if version <= LEGACY_PROTOCOL_VERSION:
+                files_list = self.list_shared_files(shared_files_path)
+                # send the list as a JSON response
+                client_socket.sendall(json.dumps({"status": "OK", "files": files_list}).encode('utf-8'))
+                logger.debug("Sent file list (%s files) to client.", len(files_list))
+                return
+            for data in self.iter_reply(shared_files_path, kwargs.get('options', {}), version):
+                client_socket.sendall(data)
+            logger.debug("Sent file list to client.")
 
         except Exception as e:
-            print(f"Peer (GetPeerFiles): Error listing or sending files: {e}")
-            error_response = {"status": "ERROR", "message": f"Error listing files: {e}"}
-            client_socket.sendall(json.dumps(error_response).encode('utf-8'))
+            logger.warning("Error listing or sending files: %s", e)
+            client_socket.sendall(self.encode_error(f"Error listing files: {e}", version))
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """Coroutine version of execute(): the directory walk and encoding run off the event loop."""
+        shared_files_path = Config.SHARED_FILES_DIR
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+
+        logger.debug("Listing files in '%s' for connected client.", shared_files_path)
 
+        try:
+            if version <= LEGACY_PROTOCOL_VERSION:
+                files_list = await asyncio.to_thread(self.list_shared_files, shared_files_path)
+                writer.write(json.dumps({"status": "OK", "files": files_list}).encode('utf-8'))
+                await writer.drain()
+                logger.debug("Sent file list (%s files) to client.", len(files_list))
+                return
+            frames = self.iter_reply(shared_files_path, kwargs.get('options', {}), version)
+            while (data := await asyncio.to_thread(next, frames, None)) is not None:
+                writer.write(data)
+                await writer.drain() # a slow reader holds up this listing only, not the event loop
+            logger.debug("Sent file list to client.")
+
+        except Exception as e:
+            logger.warning("Error listing or sending files: %s", e)
+            writer.write(self.encode_error(f"Error listing files: {e}", version))
+            await writer.drain()
@@ -0,0 +1,40 @@
+import asyncio
+import json
+import socket
+
+from .command_strategy import CommandStrategy
+from src.utils.framing import LEGACY_PROTOCOL_VERSION, pack_error, pack_header
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("peer.stats")
+
+
+class StatsStrategy(CommandStrategy):
+    """
+    Handles STATS: sends a JSON snapshot of the peer's live counters (connections, bytes in
+    and out, per-command latency, failures, admission and bandwidth state) as one frame.
+    The peer passes its snapshot function as the `stats` kwarg. Version 2+ only.
+    """
+
+    def build_reply(self, stats, version: int) -> bytes:
+        """The framed snapshot, or an error frame."""
+        if stats is None:
+            return pack_error("Statistics are not available", version)
+        payload = json.dumps(stats()).encode('utf-8')
+        return pack_header(len(payload), version=version) + payload
+
+    def execute(self, client_socket: socket.socket, **kwargs):
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot request statistics.")
+            return False
+        client_socket.sendall(self.build_reply(kwargs.get('stats'), version))
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if version <= LEGACY_PROTOCOL_VERSION:
+            logger.warning("Legacy clients cannot request statistics.")
+            return False
+        writer.write(self.build_reply(kwargs.get('stats'), version))
+        await writer.drain()
@@ -1,33 +1,343 @@
+import asyncio
+import json
 import socket
 import os
 from .command_strategy import CommandStrategy
+from src.peer.content_store import ContentStore
+from src.peer.shared_index import SharedFileIndex
+from src.peer.staged_file import StagedFile, fsync_directory
+from src.utils.chunking import chunk_limit, chunk_size_for
 from src.utils.config import Config 
 from src.utils.commands_enum import Commands 
+from src.utils.framing import (FramedReader, LEGACY_PROTOCOL_VERSION, HEADER_SIZE, STATUS_EXISTS,
+                               pack_header, pack_error, unpack_header)
+from src.utils.logging_utils import get_logger
+
+logger = get_logger("peer.upload")
 
 class UploadStrategy(CommandStrategy):
     """Handles the file upload command."""
 
+    def content_hash(self, kwargs) -> str | None:
+        """
+        Returns the `hash` option of a version 2+ upload if it is a valid SHA-256 hex digest:
+        the hash of the bytes the client is about to send, which the upload is checked against.
+        """
+        file_hash = kwargs.get('options', {}).get('hash')
+        if file_hash is not None and not ContentStore.is_valid_hash(file_hash):
+            logger.warning("Ignoring malformed content hash '%s'.", file_hash)
+            return None
+        return file_hash
+
+    def cache_request(self, kwargs) -> tuple[bool, str | None]:
+        """
+        Returns (whether the upload is a pull-through cache copy, its registry file ID): a
+        version 2+ upload with `cache=1`, a content hash and, optionally, `file_id=<registry file id>`.
+        """
+        options = kwargs.get('options', {})
+        return options.get('cache') == '1', options.get('file_id')
+
+    def ready_reply(self, kwargs, version: int) -> bytes:
+        """
+        The reply that tells a version 2+ client to start sending. A client that advertised
+        its chunk limit (the `chunk=` option) gets the peer's limit for this transfer as the
+        ASCII payload; older clients get an empty header.
+        """
+        options = kwargs.get('options', {})
+        if 'chunk' not in options:
+            return pack_header(0, version=version)
+        payload = str(chunk_limit(options)).encode('ascii')
+        return pack_header(len(payload), version=version) + payload
+
+    def receive_chunk_size(self, kwargs, size: int, sock) -> int:
+        """recv() size for an upload of `size` bytes on `sock`, within the client's advertised limit."""
+        return chunk_size_for(size, sock, limit=chunk_limit(kwargs.get('options', {})))
+
+    def part_request(self, kwargs) -> tuple[str, int, int] | None:
+        """
+        Returns (upload id, offset, total size) for one part of a multipart upload, sent as a
+        version 2+ upload with `part=<upload id>`, `offset=` and `total=`, or None for a whole-file upload.
+
+        Raises:
+            ValueError: If offset or total is not a non-negative integer.
+        """
+        options = kwargs.get('options', {})
+        if 'part' not in options:
+            return None
+        offset, total = options.get('offset', ''), options.get('total', '')
+        if not offset.isdigit() or not total.isdigit():
+            raise ValueError(f"Invalid part offset={offset!r} total={total!r}")
+        return options['part'], int(offset), int(total)
+
+    def part_refusal(self, kwargs, file_hash: str | None) -> str | None:
+        """Why a part cannot be taken, or None."""
+        if kwargs.get('multipart') is None:
+            return "Multipart uploads are not supported"
+        if file_hash is None:
+            return "Multipart uploads need a content hash"
+        return None
+
+    def cache_refusal(self, kwargs) -> str | None:
+        """Why a cache copy cannot be taken, or None. The client announces its size with `size=`."""
+        if self.content_hash(kwargs) is None:
+            return "Cache copies need a content hash"
+        size = kwargs.get('options', {}).get('size', '')
+        if not size.isdigit() or int(size) > Config.PEER_CACHE_BUDGET_BYTES:
+            return "Larger than the cache budget"
+        return None
+
+    def finish_cached(self, store: ContentStore, file_hash: str, file_id: str | None, version: int) -> bytes:
+        """
+        Notes the file ID a new cache copy was uploaded for, evicts other copies to stay within
+        Config.PEER_CACHE_BUDGET_BYTES and builds the confirmation, whose JSON payload lists
+        the file IDs evicted so the client can withdraw them from the registry. Nothing ties
+        the claimed ID to the content, so it is only reported on eviction, never looked up.
+        """
+        if file_id is not None:
+            store.add_alias(file_hash, cached_for=file_id)
+        evicted = store.evict(Config.PEER_CACHE_BUDGET_BYTES, Config.PEER_CACHE_POLICY, keep=file_hash)
+        if evicted:
+            logger.info("Cache over budget: evicted copies of file IDs %s.", ", ".join(evicted))
+        body = json.dumps({"evicted": evicted}).encode('utf-8')
+        return pack_header(len(body), version=version) + body
+
+    def publish(self, staged: StagedFile, filename: str, file_hash: str | None, store: ContentStore, index: SharedFileIndex,
+                cached: bool = False):
+        """
+        Makes a fully received upload visible to DOWNLOAD and GET_PEER_FILES in one rename:
+        into the content store if it has a content hash, otherwise into the shared directory.
+
+        Raises:
+            ValueError: If the bytes received do not hash to `file_hash`.
+        """
+        if file_hash:
+            staged.finish()
+            if staged.hexdigest() != file_hash:
+                raise ValueError(f"Content hash mismatch: received {staged.hexdigest()}, announced {file_hash}")
+            store.commit(staged.tmp_path, file_hash, filename, cached=cached)
+            if Config.PEER_UPLOAD_FSYNC:
+                fsync_directory(os.path.dirname(store.object_path(file_hash)))
+        else:
+            staged.publish(os.path.join(Config.SHARED_FILES_DIR, filename))
+            index.add(filename, staged.written)
+
+    def receive_part(self, client_socket: socket.socket, reader: FramedReader, kwargs, part, filename: str,
+                     file_hash: str, store: ContentStore, version: int):
+        """
+        Receives one part of a multipart upload into the peer's MultipartUploads (the
+        `multipart` kwarg). The part that completes the upload moves it into the content store.
+        A part that fails abandons the whole upload, so its temporary file does not linger.
+        """
+        multipart, client = kwargs['multipart'], kwargs.get('client_host')
+        upload_id, offset, total = part
+        try:
+            upload = multipart.join(client, upload_id, store, total, filename, file_hash)
+            client_socket.sendall(self.ready_reply(kwargs, version))
+            header = reader.read_header()
+            if header is None:
+                raise ConnectionError("Connection closed before the transfer header")
+            if offset + header.size > total:
+                raise ValueError(f"Part at {offset} of {header.size} bytes is past the end ({total} bytes)")
+            position = offset
+            for chunk in reader.iter_payload(header.size, self.receive_chunk_size(kwargs, header.size, client_socket)):
+                upload.write(position, chunk)
+                position += len(chunk)
+            if upload.part_done(offset, header.size):
+                multipart.complete(client, upload_id, store)
+                logger.debug("Multipart upload of '%s' (%s bytes) complete.", filename, total)
+            client_socket.sendall(pack_header(0, version=version))
+        except Exception as e:
+            logger.warning("Error receiving part of '%s' at offset %s: %s", filename, offset, e)
+            multipart.discard(client, upload_id)
+            try:
+                client_socket.sendall(pack_error(f"Upload failed: {e}", version))
+            except OSError:
+                pass
+            return False
+
+    async def receive_part_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, kwargs, part,
+                                 filename: str, file_hash: str, store: ContentStore, version: int):
+        """Coroutine version of receive_part()."""
+        multipart, client = kwargs['multipart'], kwargs.get('client_host')
+        upload_id, offset, total = part
+        try:
+            upload = await asyncio.to_thread(multipart.join, client, upload_id, store, total, filename, file_hash)
+            writer.write(self.ready_reply(kwargs, version))
+            await writer.drain()
+            header = unpack_header(await reader.readexactly(HEADER_SIZE))
+            if offset + header.size > total:
+                raise ValueError(f"Part at {offset} of {header.size} bytes is past the end ({total} bytes)")
+            chunk_size = self.receive_chunk_size(kwargs, header.size, writer.get_extra_info('socket'))
+            position, end = offset, offset + header.size
+            while position < end:
+                chunk = await reader.read(min(chunk_size, end - position))
+                if not chunk:
+                    raise ConnectionError(f"Connection closed after {position - offset} of {header.size} bytes")
+                await asyncio.to_thread(upload.write, position, chunk)
+                position += len(chunk)
+            if upload.part_done(offset, header.size):
+                await asyncio.to_thread(multipart.complete, client, upload_id, store)
+                logger.debug("Multipart upload of '%s' (%s bytes) complete.", filename, total)
+            writer.write(pack_header(0, version=version))
+            await writer.drain()
+        except Exception as e:
+            logger.warning("Error receiving part of '%s' at offset %s: %s", filename, offset, e)
+            await asyncio.to_thread(multipart.discard, client, upload_id)
+            writer.write(pack_error(f"Upload failed: {e}", version))
+            return False
+
     def execute(self, client_socket: socket.socket, **kwargs):
         
         filename = kwargs.get('filename')
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
+        if not filename:
+            logger.warning("Filename not provided.")
+            if version > LEGACY_PROTOCOL_VERSION:
+                client_socket.sendall(pack_error("Filename not provided", version))
+            return
+
+        # payload bytes that arrived together with the header are buffered in the reader
+        reader = kwargs.get('reader') or FramedReader(client_socket)
+        file_hash = self.content_hash(kwargs)
+        cached, file_id = self.cache_request(kwargs) if version > LEGACY_PROTOCOL_VERSION else (False, None)
+        refusal = self.cache_refusal(kwargs) if cached else None
+        part = None
+        try:
+            part = self.part_request(kwargs) if version > LEGACY_PROTOCOL_VERSION and not cached else None
+        except ValueError as e:
+            refusal = str(e)
+        if part is not None:
+            refusal = self.part_refusal(kwargs, file_hash)
+        if refusal:
+            logger.debug("Not receiving '%s': %s.", filename, refusal)
+            client_socket.sendall(pack_error(refusal, version))
+            return
+        store = ContentStore.for_directory(Config.SHARED_FILES_DIR)
+        if file_hash and store.has(file_hash):
+            # the same bytes are already here (checked when they were stored): record the name, skip the transfer
+            store.add_alias(file_hash, filename=filename, cached_for=file_id if cached else None)
+            if not cached:
+                store.pin(file_hash)
+            client_socket.sendall(pack_header(0, status=STATUS_EXISTS, version=version))
+            logger.debug("Content of '%s' (%s...) already stored, skipping transfer.", filename, file_hash[:12])
+            return
+        if part is not None:
+            return self.receive_part(client_socket, reader, kwargs, part, filename, file_hash, store, version)
+
+        # received into a private temporary file; the shared directory only ever sees the finished file
+        staged = StagedFile(store.new_temp_path())
+        index = SharedFileIndex.for_directory(Config.SHARED_FILES_DIR)
+        logger.debug("Receiving file '%s' to '%s'...", filename, staged.tmp_path)
+        try:
+            with staged:
+                if version > LEGACY_PROTOCOL_VERSION:
+                    # ready reply: confirms the framed protocol before the client starts streaming
+                    client_socket.sendall(self.ready_reply(kwargs, version))
+                    header = reader.read_header()
+                    if header is None:
+                        raise ConnectionError("Connection closed before the transfer header")
+                    staged.preallocate(header.size)
+                    for chunk in reader.iter_payload(header.size, self.receive_chunk_size(kwargs, header.size, client_socket)):
+                        staged.write(chunk)
+                else:
+                    while True:
+                        chunk = reader.recv(Config.CHUNK_SIZE)
+                        # Check for DONE signal
+                        if not chunk or chunk.decode('utf-8', errors='ignore').strip() == str(Commands.DONE):
+                            break
+                        staged.write(chunk)
+                self.publish(staged, filename, file_hash, store, index, cached=cached)
+            if cached:
+                client_socket.sendall(self.finish_cached(store, file_hash, file_id, version))
+            elif version > LEGACY_PROTOCOL_VERSION:
+                client_socket.sendall(pack_header(0, version=version))
+            logger.debug("File '%s' received successfully.", filename)
+        except Exception as e:
+            # the partial upload was deleted on the way out of the `with`; an older file of that name is untouched
+            logger.warning("Error receiving file '%s': %s", filename, e)
+            if version > LEGACY_PROTOCOL_VERSION:
+                try:
+                    client_socket.sendall(pack_error(f"Upload failed: {e}", version))
+                except OSError:
+                    pass # client is gone
+            return False
+
+    async def execute_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, **kwargs):
+        """Coroutine version of execute(): socket reads are awaited, disk writes run off the event loop."""
+        filename = kwargs.get('filename')
+        version = kwargs.get('version', LEGACY_PROTOCOL_VERSION)
         if not filename:
-            print("Peer (Upload): Filename not provided.")
-            # Optionally send an error back to the client
+            logger.warning("Filename not provided.")
+            if version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_error("Filename not provided", version))
+                await writer.drain()
+            return
+
+        file_hash = self.content_hash(kwargs)
+        cached, file_id = self.cache_request(kwargs) if version > LEGACY_PROTOCOL_VERSION else (False, None)
+        refusal = self.cache_refusal(kwargs) if cached else None
+        part = None
+        try:
+            part = self.part_request(kwargs) if version > LEGACY_PROTOCOL_VERSION and not cached else None
+        except ValueError as e:
+            refusal = str(e)
+        if part is not None:
+            refusal = self.part_refusal(kwargs, file_hash)
+        if refusal:
+            logger.debug("Not receiving '%s': %s.", filename, refusal)
+            writer.write(pack_error(refusal, version))
+            await writer.drain()
+            return
+        store = ContentStore.for_directory(Config.SHARED_FILES_DIR)
+        if file_hash and store.has(file_hash):
+            await asyncio.to_thread(store.add_alias, file_hash, filename=filename, cached_for=file_id if cached else None)
+            if not cached:
+                await asyncio.to_thread(store.pin, file_hash)
+            writer.write(pack_header(0, status=STATUS_EXISTS, version=version))
+            await writer.drain()
+            logger.debug("Content of '%s' (%s...) already stored, skipping transfer.", filename, file_hash[:12])
             return
+        if part is not None:
+            return await self.receive_part_async(reader, writer, kwargs, part, filename, file_hash, store, version)
 
-        filepath = os.path.join(Config.SHARED_FILES_DIR, filename)
-        print(f"Peer (Upload): Receiving file '{filename}' to '{filepath}'...")
+        staged = StagedFile(store.new_temp_path())
+        index = SharedFileIndex.for_directory(Config.SHARED_FILES_DIR)
+        logger.debug("Receiving file '%s' to '%s'...", filename, staged.tmp_path)
         try:
-            with open(filepath, 'wb') as f:
-                while True:
-                    chunk = client_socket.recv(Config.CHUNK_SIZE)
-                    # Check for DONE signal
-                    if not chunk or chunk.decode('utf-8', errors='ignore').strip() == str(Commands.DONE):
-                        break
-                    f.write(chunk)
-            print(f"Peer (Upload): File '{filename}' received successfully.")
+            await asyncio.to_thread(staged.__enter__)
+            try:
+                if version > LEGACY_PROTOCOL_VERSION:
+                    writer.write(self.ready_reply(kwargs, version))
+                    await writer.drain()
+                    header = unpack_header(await reader.readexactly(HEADER_SIZE))
+                    await asyncio.to_thread(staged.preallocate, header.size)
+                    chunk_size = self.receive_chunk_size(kwargs, header.size, writer.get_extra_info('socket'))
+                    remaining = header.size
+                    while remaining:
+                        chunk = await reader.read(min(chunk_size, remaining))
+                        if not chunk:
+                            raise ConnectionError(f"Connection closed after {header.size - remaining} of {header.size} bytes")
+                        remaining -= len(chunk)
+                        await asyncio.to_thread(staged.write, chunk)
+                else:
+                    while True:
+                        chunk = await reader.read(Config.CHUNK_SIZE)
+                        if not chunk or chunk.decode('utf-8', errors='ignore').strip() == str(Commands.DONE):
+                            break
+                        await asyncio.to_thread(staged.write, chunk)
+                await asyncio.to_thread(self.publish, staged, filename, file_hash, store, index, cached)
+            except BaseException:
+                await asyncio.to_thread(staged.abort)
+                raise
+            if cached:
+                writer.write(await asyncio.to_thread(self.finish_cached, store, file_hash, file_id, version))
+                await writer.drain()
+            elif version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_header(0, version=version))
+                await writer.drain()
+            logger.debug("File '%s' received successfully.", filename)
         except Exception as e:
-            print(f"Peer (Upload): Error receiving file '{filename}': {e}")
-            # Clean up potentially incomplete file
-            if os.path.exists(filepath):
-                os.remove(filepath)
\ No newline at end of file
+            logger.warning("Error receiving file '%s': %s", filename, e)
+            if version > LEGACY_PROTOCOL_VERSION:
+                writer.write(pack_error(f"Upload failed: {e}", version))
+            return False
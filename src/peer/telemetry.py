@@ -0,0 +1,137 @@
+import socket
+import struct
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+
+# Latency buckets: upper bounds from 1 µs to ~4.6 h, four per doubling (each about 19% wider than the last)
+LATENCY_BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(4 * 34)]
+
+# Linux struct tcp_info: tcpi_bytes_acked and tcpi_bytes_received (kernel 4.1+)
+TCP_INFO = getattr(socket, 'TCP_INFO', None)
+TCP_INFO_BYTES = struct.Struct("QQ")
+TCP_INFO_BYTES_OFFSET = 120
+TCP_INFO_SIZE = 256
+
+
+def socket_bytes(sock) -> tuple[int, int] | None:
+    """
+    (bytes received, bytes sent) on a TCP connection, as counted by the kernel, so the
+    transfer paths (including sendfile()) need no counting of their own.
+
+    Returns:
+        None where the OS does not report them.
+    """
+    if TCP_INFO is None:
+        return None
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, TCP_INFO, TCP_INFO_SIZE)
+    except (AttributeError, OSError):
+        return None
+    if len(info) < TCP_INFO_BYTES_OFFSET + TCP_INFO_BYTES.size:
+        return None
+    acked, received = TCP_INFO_BYTES.unpack_from(info, TCP_INFO_BYTES_OFFSET)
+    return received, max(acked - 1, 0) # the SYN counts as one acked byte
+
+
+class LatencyHistogram:
+    """Request latencies in fixed log-spaced buckets: constant memory, one bisect per sample."""
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def percentile(self, fraction: float) -> float | None:
+        """Upper bound (seconds) of the bucket holding the given fraction of samples, or None if empty."""
+        if not self.count:
+            return None
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else float('inf')
+        return None
+
+    def report(self) -> dict:
+        def ms(seconds):
+            return None if seconds is None else round(seconds * 1000, 3)
+        return {"count": self.count, "mean_ms": ms(self.total / self.count if self.count else None),
+                "p50_ms": ms(self.percentile(0.50)), "p99_ms": ms(self.percentile(0.99))}
+
+
+class PeerTelemetry:
+    """
+    Live counters for a peer: connections, bytes in and out, per-command latency and failures
+    by type. Updates take one short lock per connection or request, never per chunk; byte
+    counts come from the kernel (see socket_bytes()), read when a connection closes and, for
+    connections still open, when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.accepted = 0
+        self._open = set()        # sockets of connections being served
+        self._bytes_in = 0        # totals of closed connections
+        self._bytes_out = 0
+        self._bytes_known = TCP_INFO is not None
+        self._latency = {}        # {command name: LatencyHistogram}
+        self._failures = Counter()
+
+    def connection_opened(self, sock):
+        with self._lock:
+            self.accepted += 1
+            self._open.add(sock)
+
+    def connection_closed(self, sock):
+        """Must be called before the socket is closed."""
+        counted = socket_bytes(sock)
+        with self._lock:
+            self._open.discard(sock)
+            if counted is None:
+                self._bytes_known = False
+                return
+            self._bytes_in += counted[0]
+            self._bytes_out += counted[1]
+
+    def request_done(self, command, seconds: float, failure: str | None = None):
+        """Records one served request; `failure` names what went wrong, if anything."""
+        with self._lock:
+            histogram = self._latency.get(command.name)
+            if histogram is None:
+                histogram = self._latency[command.name] = LatencyHistogram()
+            histogram.record(seconds)
+            if failure:
+                self._failures[failure] += 1
+
+    def failure(self, kind: str):
+        """Counts a failure outside a request (unknown command, dropped connection, ...)."""
+        with self._lock:
+            self._failures[kind] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            open_sockets = list(self._open)
+            bytes_in, bytes_out, known = self._bytes_in, self._bytes_out, self._bytes_known
+            snapshot = {"uptime": round(time.time() - self.started, 3),
+                        "connections": {"accepted": self.accepted, "active": len(open_sockets)},
+                        "commands": {name: histogram.report() for name, histogram in self._latency.items()},
+                        "failures": dict(self._failures)}
+        for sock in open_sockets: # outside the lock: one getsockopt() per open connection
+            counted = socket_bytes(sock)
+            if counted is None:
+                continue # closing right now; connection_closed() counts it
+            bytes_in += counted[0]
+            bytes_out += counted[1]
+        snapshot["bytes"] = {"in": bytes_in, "out": bytes_out} if known else {"in": None, "out": None}
+        return snapshot
@@ -0,0 +1,47 @@
+import socket
+
+from src.utils.config import Config
+
+
+PAGE = 4096 # chunk sizes are whole pages, except for a file smaller than one chunk
+
+
+def socket_buffer_size(sock) -> int | None:
+    """The larger of a socket's send and receive buffer sizes, or None if it has none (e.g. a test double)."""
+    try:
+        return max(sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF),
+                   sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF))
+    except (AttributeError, OSError, TypeError):
+        return None
+
+
+def chunk_limit(options: dict | None = None) -> int:
+    """
+    The largest chunk this end will use in a transfer: Config.TRANSFER_MAX_CHUNK_SIZE, cut
+    down to what the other end advertised in its `chunk=` option, if it sent one.
+    """
+    advertised = (options or {}).get('chunk', '')
+    limit = Config.TRANSFER_MAX_CHUNK_SIZE
+    if advertised.isdigit():
+        limit = min(limit, max(Config.TRANSFER_MIN_CHUNK_SIZE, int(advertised)))
+    return limit
+
+
+def chunk_size_for(size: int | None, sock=None, throughput: float | None = None, limit: int | None = None) -> int:
+    """
+    Bytes per send()/recv() for one transfer of `size` bytes (None if unknown).
+
+    With a measured `throughput` (bytes/s) a chunk carries Config.TRANSFER_CHUNK_SECONDS of
+    it, so fast links make few large syscalls and slow ones still send often. Without one,
+    a chunk fills the socket's buffer. The result is kept within
+    Config.TRANSFER_MIN_CHUNK_SIZE..TRANSFER_MAX_CHUNK_SIZE and `limit` (the other end's
+    advertised limit), and is never larger than the transfer itself.
+    """
+    buffer_size = socket_buffer_size(sock) if sock is not None else None
+    if throughput:
+        chunk = int(throughput * Config.TRANSFER_CHUNK_SECONDS)
+    else:
+        chunk = buffer_size or Config.CHUNK_SIZE
+    chunk = max(Config.TRANSFER_MIN_CHUNK_SIZE, min(chunk, Config.TRANSFER_MAX_CHUNK_SIZE, limit or chunk))
+    chunk = max(PAGE, chunk - chunk % PAGE)
+    return max(1, min(chunk, size)) if size is not None else chunk
@@ -13,6 +13,7 @@ try:
     from src.client.fileshare_client import FileShareClient
     # Also need access to Commands enum for download interaction
     from src.utils.commands_enum import Commands
+    from src.utils.logging_utils import setup_logging
 except ImportError as e:
     print(f"Error importing project modules: {e}")
     print("Please ensure gui_utils.py is placed correctly within the project structure.")
@@ -663,7 +664,9 @@ class MainMenu(BasePage):
 
             # Run the download in a separate thread
             run_in_thread(self.controller.get_client().download_file, self.on_download_complete,
-                          fid, dest, owner_addr, filename, file_hash)
+                          fid, dest, owner_addr, filename, file_hash, info.get("holders"), info.get("size"),
+                          info.get("codec"), info.get("merkle_root"), info.get("chunk_size"), info.get("format"),
+                          info.get("content_hash"))
 
 
         ttk.Button(action_button_frame, text="Download", command=start_download_action, style="Accent.TButton", width=15).grid(row=0, column=0, padx=10)
@@ -939,5 +942,6 @@ if __name__ == "__main__":
          print(f"Error ensuring shared_files directory exists: {e}")
 
 
+    setup_logging()
     app = ClientGUI()
     app.mainloop()
\ No newline at end of file
@@ -10,8 +10,14 @@ class Commands(Enum):
     GET_PEERS = auto()
 
     REGISTER_FILE = auto()
+    REGISTER_FILES = auto() # register many uploaded files in one request, saved once
     GET_FILES = auto() # get files from Registry (accessible to user)
     REQUEST_KEY = auto()
+    REQUEST_KEYS = auto() # access check and key for many files in one round trip
+    REGISTER_HOLDER = auto() # announce another peer that holds a verified copy of a file
+    UNREGISTER_HOLDER = auto() # withdraw a holder whose copy was evicted from its cache
+    UPDATE_FILE = auto() # publish a new revision of a file under the same file ID
+    GET_REPLICATION_TASKS = auto() # popular files the caller's peer should copy from their holders
 
     # commands for access control
     SHARE_FILE = auto()
@@ -21,11 +27,16 @@ class Commands(Enum):
     # client-to-peer Commands
     UPLOAD = auto()
     DOWNLOAD = auto()
+    DOWNLOAD_MANY = auto() # several files back-to-back in one framed reply
     GET_PEER_FILES = auto() # New command to ask a peer what files it has
+    GET_HASHES = auto() # Merkle leaf hashes of a stored file, for per-chunk verification
+    DELTA_UPLOAD = auto() # new version of a stored file, built from the old one plus the changed blocks
+    STATS = auto() # JSON snapshot of the peer's live counters and latency histograms
 
     # control Signals
     DONE = auto()
     ERROR = auto()
+    BUSY = auto() # peer is at capacity, followed by a retry-after hint in seconds
 
 
     # string -> enum
@@ -0,0 +1,101 @@
+import zlib
+
+try:
+    import zstandard # optional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+from src.utils.config import Config
+
+
+CODEC_NONE = "none"
+CODEC_ZLIB = "zlib"
+CODEC_ZSTD = "zstd"
+
+ZLIB_LEVEL = 3 # level 6 saves another ~4% on text at more than twice the CPU time
+ZSTD_LEVEL = 3
+PROBE_LEVEL = 1 # the compressibility check only needs a rough ratio, so it uses the fastest zlib level
+
+
+def available_codecs() -> list[str]:
+    """Codecs this installation can write and read."""
+    return [CODEC_ZSTD, CODEC_ZLIB, CODEC_NONE] if zstandard else [CODEC_ZLIB, CODEC_NONE]
+
+
+def choose_codec(preference: str | None = None) -> str:
+    """
+    Resolves a codec preference ("auto", a codec name or None for Config.CLIENT_COMPRESSION).
+    "auto" picks zstd where the zstandard package is installed and zlib otherwise.
+
+    Raises:
+        ValueError: If the codec is unknown or not installed.
+    """
+    preference = preference or Config.CLIENT_COMPRESSION
+    if preference == "auto":
+        return CODEC_ZSTD if zstandard else CODEC_ZLIB
+    if preference not in available_codecs():
+        raise ValueError(f"Compression codec {preference!r} is not available (have {available_codecs()})")
+    return preference
+
+
+def is_compressible(data: bytes, sample_size: int | None = None, samples: int | None = None) -> bool:
+    """
+    Estimates whether `data` is worth compressing from a few samples spread across it.
+    Already-compressed or encrypted content (archives, media, ciphertext) comes out
+    larger or barely smaller and is left alone.
+    """
+    sample_size = sample_size or Config.COMPRESSION_SAMPLE_SIZE
+    samples = samples or Config.COMPRESSION_SAMPLES
+    if len(data) <= sample_size * samples:
+        probe = data
+    else:
+        step = (len(data) - sample_size) // (samples - 1)
+        probe = b"".join(data[i * step:i * step + sample_size] for i in range(samples))
+    if not probe:
+        return False
+    return len(zlib.compress(probe, PROBE_LEVEL)) <= len(probe) * (1 - Config.COMPRESSION_MIN_SAVING)
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == CODEC_NONE:
+        return data
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+
+def decompress(data: bytes, codec: str | None) -> bytes:
+    """
+    Inverse of compress(). Files registered before compression existed have no codec (None).
+
+    Raises:
+        ValueError: If the codec is unknown or not installed here.
+    """
+    if codec in (None, CODEC_NONE):
+        return data
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("File was compressed with zstd; install the 'zstandard' package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+
+def compress_for_upload(data: bytes, preference: str | None = None) -> tuple[str, bytes]:
+    """
+    Compresses plaintext before it is encrypted, unless the sampled check says it will not
+    shrink or the result is no smaller.
+
+    Returns:
+        (codec, payload), where codec is "none" if the data is sent as is.
+    """
+    codec = choose_codec(preference)
+    if codec == CODEC_NONE or not is_compressible(data):
+        return CODEC_NONE, data
+    payload = compress(data, codec)
+    if len(payload) >= len(data):
+        return CODEC_NONE, data
+    return codec, payload
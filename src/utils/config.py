@@ -1,9 +1,84 @@
 
+
 class Config:
     """Static configuration settings for CipherShare."""
     REGISTRY_IP = "127.0.0.1"                   # Use 127.0.0.1 for localhost testing
     REGISTRY_PORT = 5000
     PEER_HOST = '127.0.0.1'                     # Peer listens on localhost by default
-    CHUNK_SIZE = 102400                         # 100KB chunk size for file transfers
+    PEER_SERVER_MODE = "threaded"               # "threaded" (one thread per connection) or "asyncio" (single event loop)
+    PEER_BACKLOG = 128                          # listen() backlog for the peer server socket
+    PEER_MAX_CONCURRENT_CONNECTIONS = 1024      # Ceiling on connections served at once in asyncio mode
+    PEER_KEEPALIVE_TIMEOUT = 60.0               # Seconds a keep-alive connection may sit idle between requests
+    PEER_MAX_ACTIVE_TRANSFERS = 64              # UPLOAD/DOWNLOAD transfers running at once
+    PEER_MAX_QUEUED_TRANSFERS = 256             # Transfers allowed to wait for a slot before the peer replies BUSY
+    PEER_MAX_TRANSFERS_PER_CLIENT = 8           # Active + queued transfers per client host, which caps a client's parallel streams
+    PEER_MULTIPART_TIMEOUT = 300.0              # Seconds a multipart upload may go without a part before it is discarded
+    PEER_MULTIPART_MAX_SIZE = 64 * 1024 ** 3    # Largest file a multipart upload may announce (its temporary file is preallocated)
+    PEER_MULTIPART_MAX_PER_CLIENT = 4           # Multipart uploads one client host may have in progress at once
+    PEER_QUEUE_TIMEOUT = 10.0                   # Seconds a queued transfer waits for a slot before BUSY
+    PEER_BUSY_RETRY_AFTER = 1.0                 # Base retry-after hint (seconds) sent with BUSY replies
+    CLIENT_KEEPALIVE = True                     # Reuse peer connections across requests (protocol version 3)
+    CLIENT_POOL_IDLE_TIMEOUT = 30.0             # Pooled connections idle longer than this are closed (below the peer's timeout)
+    CLIENT_POOL_MAX_IDLE_PER_PEER = 8           # Idle connections kept per peer; extras are closed
+    CLIENT_BUSY_RETRIES = 3                     # Times the client retries a peer that replied BUSY
+    CLIENT_CONNECT_TIMEOUT = 5.0                # Seconds to wait for a peer to accept a connection (peers never measured)
+    CLIENT_CONNECT_TIMEOUT_RTTS = 20            # Peers with a measured RTT get this many RTTs to accept...
+    CLIENT_MIN_CONNECT_TIMEOUT = 0.5            # ...but at least this many seconds
+    CLIENT_READ_TIMEOUT = 10.0                  # Seconds a connected peer may go silent mid-request before the request fails and counts against it
+    CLIENT_PEER_EWMA_WEIGHT = 0.3               # Weight of the newest sample in a peer's moving-average RTT and throughput
+    CLIENT_PEER_MIN_SAMPLE_BYTES = 256 * 1024   # Smallest transfer that counts toward a peer's throughput
+    CLIENT_PEER_FAILURE_HALF_LIFE = 60.0        # Seconds for a peer's failure count to decay by half
+    CLIENT_PEER_MAX_FAILURES = 2                # Failure count at which a peer is skipped when others can serve
+    CLIENT_MAX_STREAMS = 8                      # Most parallel connections one file transfer opens to a peer; 1 turns multi-stream transfers off
+    CLIENT_INITIAL_STREAMS = 4                  # Streams for the first multi-stream transfer with a peer; later ones size it from measured throughput
+    CLIENT_STREAM_MIN_BYTES = 4 * 1024 * 1024   # Each stream carries at least this much, so small files go over one connection
+    CLIENT_STREAM_SCALING = 0.8                 # Streams are added while each still gets this fraction of the best per-stream throughput
+    CLIENT_RESUME_CHECKPOINT_BYTES = 8 * 1024 * 1024 # Partial downloads record their progress at least this often
+    CLIENT_SWARM_DOWNLOAD = True                # Download from every registered holder at once when there are several
+    CLIENT_SEED_DOWNLOADS = False               # Pull-through cache: keep verified downloads on the local peer and register it as a holder
+    CLIENT_PROBE_HOLDERS = True                 # Before a single-source download, ask each holder for its load (STATS) and use the quickest
+    CLIENT_BATCH_FILES = 256                    # Files per DOWNLOAD_MANY request when downloading many files at once
+    CLIENT_BATCH_WORKERS = 4                    # Threads that decrypt, verify and write the files of a batch download
+    CLIENT_UPLOAD_WORKERS = 0                   # Processes that hash, compress and encrypt the files of a directory upload; 0 is one per CPU
+    CLIENT_UPLOAD_TASK_BYTES = 4 * 1024 * 1024  # Small files of a directory upload go to those processes in groups of about this many bytes
+    PEER_CACHE_BUDGET_BYTES = 1024 ** 3         # Disk space the peer gives to cached copies of other users' files
+    PEER_CACHE_POLICY = "lru"                   # Cached copy evicted first when over budget: "lru" (least recently used) or "lfu" (least often used)
+    CLIENT_REPLICATE = False                    # Let the registry give this client's peer popular files to replicate (kept as cached copies)
+    CLIENT_REPLICATION_POLL_INTERVAL = 30.0     # Seconds between asks for replication work
+    CLIENT_REPLICATION_RATE = 4 * 1024 * 1024   # Cap on replication downloads in bytes/s; source peers also serve them after user downloads
+    REPLICATION_HALF_LIFE = 3600.0              # Seconds for a file's download demand to decay by half
+    REPLICATION_DEMAND_PER_REPLICA = 5.0        # Demand (recent downloads) per replica beyond the owner's copy
+    REPLICATION_MAX_REPLICAS = 5                # Most copies replication aims for, the owner's included
+    REPLICATION_ASSIGNMENT_TIMEOUT = 600.0      # Seconds a peer has to copy an assigned file before it is offered to others
+    REPLICATION_TASKS_PER_POLL = 1              # Files handed to a peer per ask
+    SWARM_PIECE_SIZE = 4 * 1024 * 1024          # Bytes per swarm piece
+    MERKLE_CHUNK_SIZE = 1024 * 1024             # Bytes of ciphertext per Merkle leaf; swarm pieces are a multiple of it
+    SWARM_SLOW_FRACTION = 0.25                  # Holders below this fraction of the best holder's throughput stop taking pieces
+    SWARM_MAX_FAILURES = 3                      # Failed pieces before a holder is dropped from a swarm download
+    CLIENT_COMPRESSION = "auto"                 # Compress before encrypting: "auto" (zstd if installed, else zlib), "zstd", "zlib" or "none"
+    COMPRESSION_SAMPLE_SIZE = 64 * 1024         # Bytes per sample of the compressibility check
+    COMPRESSION_SAMPLES = 8                     # Samples spread across a file for the compressibility check
+    COMPRESSION_MIN_SAVING = 0.1                # Files whose samples shrink by less than this fraction are stored uncompressed
+    CLIENT_UPLOAD_FORMAT = "stream"             # Stored format of new uploads: "stream" (one AES-CBC stream, compressed) or "blocks" (per-block records that later revisions can delta-sync)
+    DELTA_BLOCK_SIZE = 64 * 1024                # Plaintext bytes per record of the "blocks" format; the unit delta sync matches
+    DELTA_PROBE_BLOCKS = 64                     # Block-aligned positions checked ahead of a changed block before a byte-by-byte search
+    CHUNK_SIZE = 102400                         # 100KB chunk size for legacy transfers and reads of unknown size
+    TRANSFER_MIN_CHUNK_SIZE = 16 * 1024         # Smallest send()/recv() size picked for a framed transfer (tiny files go in one)
+    TRANSFER_MAX_CHUNK_SIZE = 4 * 1024 * 1024   # Largest send()/recv() size; each end advertises it and the smaller one applies
+    TRANSFER_CHUNK_SECONDS = 0.005              # A chunk carries this much of the peer's measured throughput
+    PEER_LIST_PAGE_SIZE = 1000                  # GET_PEER_FILES entries per JSON page when the client gives no limit
+    PEER_LIST_MAX_PAGE_SIZE = 10000             # Largest JSON page a client may ask for (NDJSON streams are unbounded)
+    PEER_UPLOAD_BUFFER_SIZE = 1024 * 1024       # Write buffer for incoming uploads
+    PEER_UPLOAD_FSYNC = True                    # fsync each completed upload (and its directory) before publishing it
+    PEER_BANDWIDTH_POLICY = "fair"              # Who sends next when downloads compete: "fair" (per client host), "srpt" (smallest remaining first) or "fifo"
+    PEER_UPLINK_RATE = None                     # Cap on all outgoing DOWNLOAD data in bytes/s; None for no cap
+    PEER_SEND_SLOTS = 8                         # DOWNLOAD pieces written at once; further pieces wait their turn under the policy
+    PEER_SEND_SLOTS_PER_CLIENT = 4              # Send slots one client host may hold at once (always fewer than PEER_SEND_SLOTS)
+    PEER_SEND_QUANTUM = 1024 * 1024             # Bytes per scheduled DOWNLOAD piece
+    PEER_SEND_TIMEOUT = 30.0                    # Seconds a scheduled DOWNLOAD piece may take to write before the transfer is dropped and its slot freed
+    PEER_ZERO_COPY_SEND = True                  # Serve downloads with sendfile() instead of read()+sendall()
     SHARED_FILES_DIR = "shared_files"           # Directory for peer to store received files
-    REGISTRY_DATA_FILE = "./registry_data.json" # For data persistance
\ No newline at end of file
+    REGISTRY_DATA_FILE = "./registry_data.json" # For data persistance
+    REGISTRY_MAX_REQUEST_SIZE = 16 * 1024 * 1024 # Largest JSON request the registry reads (batch requests name many files)
+    LOG_LEVEL = "INFO"                          # Level of the peer, registry and client logs; "DEBUG" adds a line per request and connection
+    LOG_FORMAT = "text"                         # "text" (one line per record) or "json" (one object per record, for log shippers)
@@ -8,6 +8,11 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 
+from src.utils.logging_utils import get_logger
+
+
+logger = get_logger("crypto")
+
 
 # DEFAULT_KEY = hashlib.sha256(b'CipherShareSymmetricKey').digest()
 
@@ -92,9 +97,28 @@ def decrypt_data(iv_and_ct: bytes, hash: bytes ) -> bytes:
     ct = iv_and_ct[AES.block_size:]
     cipher = AES.new(key, AES.MODE_CBC, iv)
     pt = unpad(cipher.decrypt(ct), AES.block_size)
-    print("File decrypted successfully")
+    logger.debug("File decrypted successfully")
     return pt
 
+def encrypt_chunks(chunks, hash: bytes) -> list[bytes]:
+    """
+    AES-CBC encrypt each chunk on its own (fresh IV each), return [IV||ciphertext, ...].
+    """
+    key = generate_key_from_hash(hash)
+    records = []
+    for chunk in chunks:
+        iv = secrets.token_bytes(AES.block_size)
+        records.append(iv + AES.new(key, AES.MODE_CBC, iv).encrypt(pad(chunk, AES.block_size)))
+    return records
+
+def decrypt_chunks(records, hash: bytes) -> list[bytes]:
+    """
+    Inverse of encrypt_chunks().
+    """
+    key = generate_key_from_hash(hash)
+    return [unpad(AES.new(key, AES.MODE_CBC, record[:AES.block_size]).decrypt(record[AES.block_size:]), AES.block_size)
+            for record in records]
+
 def compute_hash(data: bytes) -> str:
     """
     SHA-256 over in-memory bytes.
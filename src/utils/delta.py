@@ -0,0 +1,283 @@
+import hashlib
+import struct
+import zlib
+
+from src.utils import crypto_utils
+from src.utils.config import Config
+
+
+# Stored formats, as recorded in the registry file entry ("format"; entries without one are streams)
+FORMAT_STREAM = "stream" # the whole (compressed) file as one AES-CBC stream
+FORMAT_BLOCKS = "blocks" # one AES-CBC record per plaintext block, so a revision can reuse unchanged records
+
+# Layout of the "blocks" format:
+#   MAGIC | records | signature record | TRAILER
+# Every record is a RECORD_HEADER (its length) followed by IV||ciphertext of one block of at
+# most block_size plaintext bytes. The signature record holds the encrypted Signature of the
+# version, and the TRAILER points at it, so the next revision can fetch it with two ranged reads.
+MAGIC = b"CSB1"
+RECORD_HEADER = struct.Struct("!I")
+TRAILER = struct.Struct("!Q4s")                # signature record offset, MAGIC
+SIGNATURE_HEADER = struct.Struct("!II")        # block size, number of entries
+SIGNATURE_ENTRY = struct.Struct("!QII16s")     # record offset, record length (with header), weak, strong checksum
+
+# DELTA_UPLOAD ops: build the new stored file from ranges of the base version and new bytes
+OP_COPY = b"C"                                 # followed by OP_COPY_ARGS: (offset, length) in the base version
+OP_DATA = b"D"                                 # followed by OP_DATA_ARGS: (length,) and that many new bytes
+OP_COPY_ARGS = struct.Struct("!QQ")
+OP_DATA_ARGS = struct.Struct("!Q")
+
+ADLER_MOD = 65521
+
+
+def weak_checksum(block: bytes) -> int:
+    """Adler-32, which can be rolled one byte at a time (see match_blocks())."""
+    return zlib.adler32(block)
+
+
+def strong_checksum(block: bytes) -> bytes:
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+class Signature:
+    """
+    Checksums of the full-size plaintext blocks of a "blocks" version, with the position of
+    the record that encrypts each one. Stored encrypted inside the version itself, so the
+    peer learns nothing about the plaintext from it.
+    """
+
+    def __init__(self, block_size: int, entries: list[tuple[int, int, int, bytes]]):
+        self.block_size = block_size
+        self.entries = entries # [(record offset, record length, weak, strong)] in file order
+
+    def pack(self) -> bytes:
+        return SIGNATURE_HEADER.pack(self.block_size, len(self.entries)) + b"".join(
+            SIGNATURE_ENTRY.pack(*entry) for entry in self.entries)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> 'Signature':
+        """
+        Raises:
+            ValueError: If the data is not a packed Signature.
+        """
+        if len(data) < SIGNATURE_HEADER.size:
+            raise ValueError("Truncated block signature")
+        block_size, count = SIGNATURE_HEADER.unpack_from(data)
+        if len(data) != SIGNATURE_HEADER.size + count * SIGNATURE_ENTRY.size or not block_size:
+            raise ValueError("Malformed block signature")
+        return cls(block_size, list(SIGNATURE_ENTRY.iter_unpack(data[SIGNATURE_HEADER.size:])))
+
+
+def match_blocks(data: bytes, signature: Signature, probe_blocks: int | None = None) -> list[tuple]:
+    """
+    rsync's matching step: finds the blocks of `data` the base version already has.
+
+    Blocks are looked up by weak checksum and confirmed by strong checksum. After a changed
+    block the next Config.DELTA_PROBE_BLOCKS block-aligned positions are checked first,
+    which finds the end of an in-place edit without any per-byte work; only if none matches
+    does a rolling search try every byte offset of the next block, which finds where the
+    data lines up again after an insertion or deletion. Inside long stretches of new data
+    the rolling searches back off exponentially.
+
+    Returns:
+        Ops in file order: ("copy", signature entry index) or ("data", start, end).
+    """
+    probe_blocks = probe_blocks or Config.DELTA_PROBE_BLOCKS
+    size = signature.block_size
+    entries = signature.entries
+    by_weak = {}
+    for index, entry in enumerate(entries):
+        by_weak.setdefault(entry[2], []).append(index)
+    view = memoryview(data)
+    end = len(data)
+
+    def match_at(pos, previous, weak=None):
+        block = view[pos:pos + size]
+        candidates = by_weak.get(weak_checksum(block) if weak is None else weak)
+        if not candidates:
+            return None
+        if previous is not None and previous + 1 in candidates:
+            candidates = [previous + 1] + candidates # keep runs of copies contiguous
+        strong = strong_checksum(block)
+        return next((index for index in candidates if entries[index][3] == strong), None)
+
+    def roll(pos, previous):
+        """First offset in (pos, pos + size) where a known block starts, or None."""
+        last = min(pos + size, end - size)
+        if last <= pos:
+            return None
+        adler = weak_checksum(view[pos:pos + size])
+        a, b = adler & 0xffff, adler >> 16
+        for i in range(pos, last):
+            out, new = data[i], data[i + size]
+            a = (a - out + new) % ADLER_MOD
+            b = (b - size * out + a - 1) % ADLER_MOD
+            weak = (b << 16) | a
+            if weak in by_weak and match_at(i + 1, previous, weak) is not None:
+                return i + 1
+        return None
+
+    ops = []
+    literal = pos = 0
+    previous = None
+    gap = 1  # changed blocks to skip before the next rolling search, doubled after each one that fails
+    skip = 0
+    while pos + size <= end:
+        index = match_at(pos, previous)
+        if index is not None:
+            if pos > literal:
+                ops.append(("data", literal, pos))
+            ops.append(("copy", index))
+            pos += size
+            literal = pos
+            previous, gap, skip = index, 1, 0
+            continue
+        if skip:
+            skip -= 1
+            pos += size
+            continue
+        resync = next((pos + k * size for k in range(1, probe_blocks + 1)
+                       if pos + (k + 1) * size <= end and match_at(pos + k * size, previous) is not None), None)
+        if resync is None:
+            resync = roll(pos, previous)
+        if resync is not None:
+            pos = resync
+            continue
+        pos += size
+        skip, gap = gap, gap * 2
+    if end > literal:
+        ops.append(("data", literal, end))
+    return ops
+
+
+class DeltaPlan:
+    """
+    A version in the "blocks" format, described as ops against the stored bytes of a base
+    version: ranges to copy from the base and new bytes (already encrypted) to insert.
+    """
+
+    def __init__(self):
+        self.ops = []   # [(OP_COPY, offset, length) | (OP_DATA, [bytes, ...])]
+        self.size = 0   # stored size of the new version
+        self.sent = 0   # bytes inserted (sent over the network)
+        self.copied = 0 # bytes copied from the base version
+
+    def copy(self, offset: int, length: int):
+        last = self.ops[-1] if self.ops else None
+        if last and last[0] == OP_COPY and last[1] + last[2] == offset:
+            self.ops[-1] = (OP_COPY, last[1], last[2] + length)
+        else:
+            self.ops.append((OP_COPY, offset, length))
+        self.size += length
+        self.copied += length
+
+    def add(self, data: bytes):
+        if self.ops and self.ops[-1][0] == OP_DATA:
+            self.ops[-1][1].append(data)
+        else:
+            self.ops.append((OP_DATA, [data]))
+        self.size += len(data)
+        self.sent += len(data)
+
+    @property
+    def is_full(self) -> bool:
+        """True if nothing is copied, so the version can be uploaded as is."""
+        return not self.copied
+
+    def stored_bytes(self) -> bytes:
+        """The whole new version. Only for plans that copy nothing."""
+        if not self.is_full:
+            raise ValueError("Plan copies from a base version")
+        return b"".join(b"".join(op[1]) for op in self.ops)
+
+    def pack(self) -> bytes:
+        """The ops as sent with DELTA_UPLOAD."""
+        parts = []
+        for op in self.ops:
+            if op[0] == OP_COPY:
+                parts += [OP_COPY, OP_COPY_ARGS.pack(op[1], op[2])]
+            else:
+                parts += [OP_DATA, OP_DATA_ARGS.pack(sum(map(len, op[1])))] + op[1]
+        return b"".join(parts)
+
+
+def _record(ciphertext: bytes) -> bytes:
+    return RECORD_HEADER.pack(len(ciphertext)) + ciphertext
+
+
+def plan_revision(data: bytes, key, base: Signature | None = None, block_size: int | None = None) -> DeltaPlan:
+    """
+    Encrypts `data` in the "blocks" format. With the Signature of a base version, blocks the
+    base already has are copied from it instead of being encrypted and sent again.
+    """
+    block_size = base.block_size if base else block_size or Config.DELTA_BLOCK_SIZE
+    matches = match_blocks(data, base) if base else [("data", 0, len(data))]
+    plan = DeltaPlan()
+    plan.add(MAGIC)
+    entries = []
+    for op in matches:
+        if op[0] == "copy":
+            offset, length, weak, strong = base.entries[op[1]]
+            entries.append((plan.size, length, weak, strong))
+            plan.copy(offset, length)
+            continue
+        blocks = [data[i:min(i + block_size, op[2])] for i in range(op[1], op[2], block_size)]
+        for block, ciphertext in zip(blocks, crypto_utils.encrypt_chunks(blocks, key)):
+            record = _record(ciphertext)
+            if len(block) == block_size: # short blocks are never matched, so they need no entry
+                entries.append((plan.size, len(record), weak_checksum(block), strong_checksum(block)))
+            plan.add(record)
+    signature_offset = plan.size
+    plan.add(_record(crypto_utils.encrypt_chunks([Signature(block_size, entries).pack()], key)[0]))
+    plan.add(TRAILER.pack(signature_offset, MAGIC))
+    return plan
+
+
+def read_trailer(tail: bytes) -> int:
+    """
+    Returns the signature record offset from the last TRAILER.size bytes of a "blocks" file.
+
+    Raises:
+        ValueError: If the bytes are not a trailer.
+    """
+    if len(tail) != TRAILER.size:
+        raise ValueError("Truncated block format trailer")
+    offset, magic = TRAILER.unpack(tail)
+    if magic != MAGIC:
+        raise ValueError("File is not in the block format")
+    return offset
+
+
+def read_signature(record: bytes, key) -> Signature:
+    """
+    Decrypts the signature record of a "blocks" file.
+
+    Raises:
+        ValueError: If the record is malformed or does not decrypt.
+    """
+    if len(record) < RECORD_HEADER.size or RECORD_HEADER.unpack_from(record)[0] != len(record) - RECORD_HEADER.size:
+        raise ValueError("Malformed signature record")
+    return Signature.unpack(crypto_utils.decrypt_chunks([record[RECORD_HEADER.size:]], key)[0])
+
+
+def decrypt_file(stored: bytes, key) -> bytes:
+    """
+    Decrypts a whole "blocks" file.
+
+    Raises:
+        ValueError: If the file is malformed or does not decrypt with `key`.
+    """
+    if stored[:len(MAGIC)] != MAGIC:
+        raise ValueError("File is not in the block format")
+    signature_offset = read_trailer(bytes(stored[-TRAILER.size:]))
+    view = memoryview(stored)
+    records = []
+    pos = len(MAGIC)
+    while pos < signature_offset:
+        (length,) = RECORD_HEADER.unpack_from(view, pos)
+        pos += RECORD_HEADER.size
+        records.append(bytes(view[pos:pos + length]))
+        pos += length
+    if pos != signature_offset:
+        raise ValueError("Block format records overrun the signature")
+    return b"".join(crypto_utils.decrypt_chunks(records, key))
@@ -0,0 +1,248 @@
+import socket
+import struct
+from typing import NamedTuple
+from urllib.parse import quote, unquote
+
+from src.utils.config import Config
+
+
+MAX_HEADER_LINE = 64 * 1024 # refuse header lines longer than this instead of buffering forever
+
+# --- Versioned transfer framing ---
+# Version 1 is the original protocol: raw bytes terminated by the DONE sentinel (or EOF).
+# From version 2 on, every transfer starts with a fixed-size header carrying the payload
+# size, and the receiver reads exactly that many raw bytes - payload is never decoded.
+# Clients ask for a version by suffixing the command ("DOWNLOAD/2"); the peer answers in
+# min(requested, PROTOCOL_VERSION). Peers that predate versioning reject the suffixed
+# command and close the connection, which tells the client to fall back to version 1.
+# Version 3 adds keep-alive: the connection stays open for further requests, every request's
+# argument line carries an `id=` option, and every reply opens with a REPLY frame echoing it.
+# Requests may be pipelined; the peer answers them one at a time, in the order they were sent.
+PROTOCOL_VERSION = 3
+LEGACY_PROTOCOL_VERSION = 1
+KEEPALIVE_PROTOCOL_VERSION = 3
+
+FRAME_MAGIC = b"CSXF"
+HEADER_FORMAT = "!4sBBHQ" # magic, version, status, flags, payload size
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+STATUS_OK = 0
+STATUS_ERROR = 1 # payload is a UTF-8 error message
+STATUS_EXISTS = 2 # UPLOAD: the peer already stores this content, do not send the payload
+STATUS_BUSY = 3 # peer is at capacity; payload is the suggested retry-after in seconds (ASCII)
+STATUS_REPLY = 4 # version 3+: opens the reply to one request; payload is the request id (ASCII)
+
+# header flags
+FLAG_STREAM = 0x01 # one frame of a streamed reply of unknown total size; an empty frame ends the stream
+
+
+class TransferHeader(NamedTuple):
+    version: int
+    status: int
+    flags: int
+    size: int
+
+
+def pack_header(size: int, status: int = STATUS_OK, flags: int = 0, version: int = PROTOCOL_VERSION) -> bytes:
+    """Builds the header that precedes `size` bytes of payload."""
+    return struct.pack(HEADER_FORMAT, FRAME_MAGIC, version, status, flags, size)
+
+
+def unpack_header(data: bytes) -> TransferHeader:
+    """
+    Parses a transfer header.
+
+    Raises:
+        ValueError: If the data does not start with the frame magic.
+    """
+    magic, version, status, flags, size = struct.unpack(HEADER_FORMAT, data)
+    if magic != FRAME_MAGIC:
+        raise ValueError(f"Bad transfer header magic {magic!r}")
+    return TransferHeader(version, status, flags, size)
+
+
+def pack_error(message: str, version: int = PROTOCOL_VERSION) -> bytes:
+    """Builds an error header followed by its message."""
+    payload = message.encode('utf-8')
+    return pack_header(len(payload), status=STATUS_ERROR, version=version) + payload
+
+
+def pack_busy(retry_after: float, version: int = PROTOCOL_VERSION) -> bytes:
+    """Builds a BUSY header followed by the retry-after hint."""
+    payload = f"{retry_after:.2f}".encode('ascii')
+    return pack_header(len(payload), status=STATUS_BUSY, version=version) + payload
+
+
+def pack_reply(request_id: str, version: int = PROTOCOL_VERSION) -> bytes:
+    """Builds the REPLY frame that opens the reply to request `request_id` on a keep-alive connection."""
+    payload = request_id.encode('ascii')
+    return pack_header(len(payload), status=STATUS_REPLY, version=version) + payload
+
+
+def pack_stream_frame(payload: bytes, version: int = PROTOCOL_VERSION) -> bytes:
+    """Builds one frame of a streamed reply; an empty payload builds the frame that ends it."""
+    return pack_header(len(payload), flags=FLAG_STREAM, version=version) + payload
+
+
+def format_command(command, version: int = PROTOCOL_VERSION) -> str:
+    """Renders a command line token, e.g. 'DOWNLOAD/2' (plain 'DOWNLOAD' for version 1)."""
+    return str(command) if version <= LEGACY_PROTOCOL_VERSION else f"{command}/{version}"
+
+
+def split_command(command_str: str) -> tuple[str, int]:
+    """
+    Splits a command token into its name and requested protocol version.
+
+    Returns:
+        (name, version); version is 1 when the token carries no suffix.
+
+    Raises:
+        ValueError: If the version suffix is not an integer.
+    """
+    name, _, version = command_str.partition("/")
+    return name, int(version) if version else LEGACY_PROTOCOL_VERSION
+
+
+def format_arguments(*positional, **options) -> str:
+    """
+    Renders a version 2+ argument line: percent-encoded positional values followed by
+    key=value options, separated by spaces. Options whose value is None are left out.
+    """
+    tokens = [quote(str(value), safe='') for value in positional]
+    tokens += [f"{key}={quote(str(value), safe='')}" for key, value in options.items() if value is not None]
+    return " ".join(tokens)
+
+
+def parse_arguments(line: str) -> tuple[list[str], dict[str, str]]:
+    """Inverse of format_arguments(): returns (positional values, options)."""
+    positional, options = [], {}
+    for token in line.split():
+        key, sep, value = token.partition("=")
+        if sep:
+            options[key] = unquote(value)
+        else:
+            positional.append(unquote(token))
+    return positional, options
+
+
+class FramedReader:
+    """
+    Buffered reader over a connected socket.
+
+    Header lines (the command and its arguments) are parsed out of one large recv()
+    instead of one recv(1) per byte. Whatever arrives after the header, such as the
+    start of an UPLOAD payload, stays buffered and is returned first by recv().
+    """
+
+    def __init__(self, sock: socket.socket, read_size: int = Config.CHUNK_SIZE):
+        self.sock = sock
+        self.read_size = read_size
+        self._buffer = bytearray()
+
+    def _fill(self) -> bool:
+        """Reads once from the socket into the buffer. Returns False on EOF."""
+        chunk = self.sock.recv(self.read_size)
+        if not chunk:
+            return False
+        self._buffer += chunk
+        return True
+
+    def readline(self) -> bytes | None:
+        """
+        Returns the next newline-terminated line (newline included).
+
+        Returns:
+            The line, or None if the connection closed before a full line arrived.
+
+        Raises:
+            ValueError: If the line grows past MAX_HEADER_LINE without a newline.
+        """
+        scanned = 0
+        while True:
+            newline = self._buffer.find(b"\n", scanned)
+            if newline != -1:
+                line = bytes(self._buffer[:newline + 1])
+                del self._buffer[:newline + 1]
+                return line
+            if len(self._buffer) > MAX_HEADER_LINE:
+                raise ValueError(f"Header line exceeds {MAX_HEADER_LINE} bytes")
+            scanned = len(self._buffer)
+            if not self._fill():
+                return None
+
+    def recv(self, bufsize: int) -> bytes:
+        """Socket-compatible recv(): drains buffered bytes before reading from the socket."""
+        if self._buffer:
+            data = bytes(self._buffer[:bufsize])
+            del self._buffer[:bufsize]
+            return data
+        return self.sock.recv(bufsize)
+
+    @property
+    def pending(self) -> int:
+        """Number of bytes already read from the socket but not yet consumed."""
+        return len(self._buffer)
+
+    def read_exactly(self, size: int) -> bytearray:
+        """
+        Reads exactly `size` bytes into one preallocated buffer.
+
+        Raises:
+            ConnectionError: If the connection closes first.
+        """
+        data = bytearray(size)
+        view = memoryview(data)
+        received = min(len(self._buffer), size)
+        view[:received] = self._buffer[:received]
+        del self._buffer[:received]
+        while received < size:
+            n = self.sock.recv_into(view[received:], size - received)
+            if not n:
+                raise ConnectionError(f"Connection closed after {received} of {size} bytes")
+            received += n
+        return data
+
+    def read_header(self) -> TransferHeader | None:
+        """
+        Reads a transfer header.
+
+        Returns:
+            The header, or None if the connection closed before any of it arrived
+            (what a peer that does not speak the framed protocol does).
+        """
+        if not self._buffer and not self._fill():
+            return None
+        return unpack_header(self.read_exactly(HEADER_SIZE))
+
+    def iter_stream(self, header: TransferHeader):
+        """
+        Yields the payload of each frame of a streamed reply, starting with the frame whose
+        header has just been read, until the empty frame that ends the stream.
+
+        Raises:
+            ConnectionError: If the connection closes before the end of the stream.
+            RuntimeError: If the peer sends an error frame (its message is the exception text).
+        """
+        while header.size:
+            payload = self.read_exactly(header.size)
+            if header.status != STATUS_OK:
+                raise RuntimeError(payload.decode('utf-8', errors='replace'))
+            yield payload
+            header = self.read_header()
+            if header is None:
+                raise ConnectionError("Connection closed in the middle of a streamed reply")
+
+    def iter_payload(self, size: int, chunk_size: int = Config.CHUNK_SIZE):
+        """
+        Yields the `size` payload bytes that follow a header, in chunks of at most `chunk_size`.
+
+        Raises:
+            ConnectionError: If the connection closes before the whole payload arrived.
+        """
+        remaining = size
+        while remaining:
+            chunk = self.recv(min(chunk_size, remaining))
+            if not chunk:
+                raise ConnectionError(f"Connection closed after {size - remaining} of {size} bytes")
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,108 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from src.utils.config import Config
+
+
+ROOT_LOGGER = "ciphershare"
+# LogRecord attributes; anything else on a record came in through `extra=` and is logged as a field
+RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    The `ciphershare.<name>` logger. Until setup_logging() runs, only warnings and errors
+    are shown (on stderr, by the logging module's last-resort handler).
+    """
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def record_fields(record: logging.LogRecord) -> dict:
+    """Structured fields passed with `extra=` (e.g. extra={"client": address})."""
+    return {key: value for key, value in vars(record).items() if key not in RECORD_ATTRIBUTES}
+
+
+class TextFormatter(logging.Formatter):
+    """One line per record: timestamp, level, logger, message, then the fields as key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 6), "level": record.levelname, "logger": record.name,
+                 "msg": record.getMessage(), **record_fields(record)}
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the queue as they are: QueueHandler.prepare() would format the message
+    (and traceback) in the logging thread, this leaves it to the listener thread. Arguments
+    are therefore formatted after the call returns, so log values, not objects that change
+    right afterwards.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging(level=None, log_format=None, stream=None) -> QueueListener:
+    """
+    Routes every `ciphershare.*` logger through an in-memory queue to a background thread
+    that formats and writes the records, so a request only pays for the level check and,
+    when the level is enabled, for putting the record on the queue. Calling it again
+    replaces the previous setup.
+
+    Args:
+        level: Level name or number; defaults to Config.LOG_LEVEL.
+        log_format: "text" or "json"; defaults to Config.LOG_FORMAT.
+        stream: Where records are written; defaults to stdout.
+
+    Raises:
+        ValueError: If the level or format is unknown.
+    """
+    global _listener
+    level = level or Config.LOG_LEVEL
+    log_format = log_format or Config.LOG_FORMAT
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Unknown log format {log_format!r}")
+    stop_logging()
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter(TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.handlers = [DeferredQueueHandler(records)]
+    logger.propagate = False
+    _listener = QueueListener(records, handler)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Writes out any queued records and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
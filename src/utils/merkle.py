@@ -0,0 +1,140 @@
+import hashlib
+
+from src.utils.config import Config
+from src.utils.logging_utils import get_logger
+
+
+DIGEST_SIZE = hashlib.sha256().digest_size
+# domain separation between leaves and inner nodes, so a leaf can never pass for a subtree
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+logger = get_logger("merkle")
+
+
+def leaf_hash(chunk: bytes) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + chunk).digest()
+
+
+def leaf_hashes(data: bytes, chunk_size: int | None = None) -> list[bytes]:
+    """Hashes `data` in chunk_size pieces (Config.MERKLE_CHUNK_SIZE by default). Empty data has one empty leaf."""
+    chunk_size = chunk_size or Config.MERKLE_CHUNK_SIZE
+    view = memoryview(data)
+    return [leaf_hash(view[i:i + chunk_size]) for i in range(0, len(data), chunk_size)] or [leaf_hash(b"")]
+
+
+def file_leaf_hashes(path: str, chunk_size: int) -> list[bytes]:
+    """leaf_hashes() of a file on disk, read one chunk at a time."""
+    leaves = []
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            leaves.append(leaf_hash(chunk))
+    return leaves or [leaf_hash(b"")]
+
+
+def merkle_root(leaves: list[bytes]) -> str:
+    """Hex root of the tree over `leaves`; an odd node at the end of a level moves up unchanged."""
+    level = list(leaves)
+    while len(level) > 1:
+        paired = [hashlib.sha256(NODE_PREFIX + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+def pack_leaves(leaves: list[bytes]) -> bytes:
+    return b"".join(leaves)
+
+
+def unpack_leaves(data: bytes) -> list[bytes]:
+    """
+    Inverse of pack_leaves().
+
+    Raises:
+        ValueError: If the data is not a whole number of digests.
+    """
+    if not data or len(data) % DIGEST_SIZE:
+        raise ValueError(f"Chunk hash list of {len(data)} bytes is not a multiple of {DIGEST_SIZE}")
+    return [bytes(data[i:i + DIGEST_SIZE]) for i in range(0, len(data), DIGEST_SIZE)]
+
+
+class ChunkVerifier:
+    """
+    Checks a file's stored ciphertext chunk by chunk against the leaf hashes of its Merkle
+    tree. The leaves can come from any holder: they are only accepted if they hash to the
+    root recorded in the registry, after which every chunk can be verified on its own.
+    """
+
+    def __init__(self, leaves: list[bytes], chunk_size: int, size: int):
+        self.leaves = leaves
+        self.chunk_size = chunk_size
+        self.size = size
+        self.bad_chunks = set() # chunks that failed a streamed check and still have to be re-fetched
+
+    @classmethod
+    def from_leaves(cls, leaves: list[bytes], root: str, chunk_size: int, size: int) -> 'ChunkVerifier':
+        """
+        Raises:
+            ValueError: If the leaves do not match the root or the file size.
+        """
+        if merkle_root(leaves) != root:
+            raise ValueError("Chunk hashes do not match the file's Merkle root")
+        if len(leaves) != max(1, -(-size // chunk_size)):
+            raise ValueError(f"Got {len(leaves)} chunk hashes for a {size}-byte file")
+        return cls(leaves, chunk_size, size)
+
+    def chunk_range(self, index: int) -> tuple[int, int]:
+        """(offset, length) of chunk `index`."""
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    def check_chunk(self, index: int, data: bytes) -> bool:
+        return len(data) == self.chunk_range(index)[1] and leaf_hash(data) == self.leaves[index]
+
+    def bad_chunks_in(self, offset: int, data: bytes) -> list[int]:
+        """Indices of the chunks inside [offset, offset + len(data)) that do not match. `offset` must be chunk-aligned."""
+        view = memoryview(data)
+        first = offset // self.chunk_size
+        bad = []
+        for index in range(first, first + -(-len(data) // self.chunk_size)):
+            start = index * self.chunk_size - offset
+            if not self.check_chunk(index, view[start:start + self.chunk_size]):
+                bad.append(index)
+        return bad
+
+    def stream(self, offset: int = 0, prefix: bytes = b"") -> 'StreamCheck':
+        """
+        Starts checking a download that continues at `offset`. `prefix` is the data already
+        received between the start of the chunk containing `offset` and `offset` itself.
+        """
+        return StreamCheck(self, offset // self.chunk_size, prefix)
+
+
+class StreamCheck:
+    """Verifies each chunk of a download the moment its last byte arrives; failures go to verifier.bad_chunks."""
+
+    def __init__(self, verifier: ChunkVerifier, index: int, prefix: bytes):
+        self.verifier = verifier
+        self.index = index
+        self._start_chunk()
+        self.update(prefix)
+
+    def _start_chunk(self):
+        # hashed incrementally, so chunks never have to be buffered
+        self._hasher = hashlib.sha256(LEAF_PREFIX)
+        self._missing = self.verifier.chunk_range(self.index)[1] if self.index < len(self.verifier.leaves) else 0
+
+    def update(self, data: bytes):
+        view = memoryview(data)
+        while view and self._missing:
+            take = min(len(view), self._missing)
+            self._hasher.update(view[:take])
+            view = view[take:]
+            self._missing -= take
+            if not self._missing:
+                if self._hasher.digest() != self.verifier.leaves[self.index]:
+                    logger.warning("Chunk %s failed verification.", self.index)
+                    self.verifier.bad_chunks.add(self.index)
+                self.index += 1
+                self._start_chunk()
@@ -83,9 +83,10 @@ def client_ui(client):
             menu_table.add_row("9️⃣", "Revoke Access")
             menu_table.add_row("🔟", "Logout")
             menu_table.add_row("1️⃣1️⃣", "Exit")
+            menu_table.add_row("1️⃣2️⃣", "Update File (send only the changes)")
 
             console.print(menu_table)
-            choice = Prompt.ask("[cyan bold]Enter your choice[/]", choices=[str(i) for i in range(4, 12)])
+            choice = Prompt.ask("[cyan bold]Enter your choice[/]", choices=[str(i) for i in range(4, 13)])
 
             if choice == '4':
                 peers = client.get_peers()
@@ -97,12 +98,16 @@ def client_ui(client):
                     console.print("[yellow]No other peers found.[/]")
                 input("\nPress Enter to continue...")
 
-            # elif choice == '5':
-            #     filepath = Prompt.ask("[green]Enter full file path to upload[/]")
-            #     if not os.path.isfile(filepath):
-            #         console.print(f"[red]Error: File not found at '{filepath}'[/]")
-            #         continue
-            #     client.upload_file(filepath)
+            elif choice == '5':
+                filepath = Prompt.ask("[green]Enter full path of the file or directory to upload[/]")
+                if os.path.isdir(filepath):
+                    client.upload_directory(filepath)
+                elif os.path.isfile(filepath):
+                    client.upload_file(filepath)
+                else:
+                    console.print(f"[red]Error: File not found at '{filepath}'[/]")
+                    continue
+                input("\nPress Enter to continue...")
 
             # elif choice == '6':
             #     files = client.get_files_from_registry()
@@ -169,10 +174,12 @@ def client_ui(client):
                     allowed = ", ".join(info.get("allowed_users", []))
                     console.print(f"[blue]ID: {file_id} | Filename: {info['filename']} | Owner: {info['owner']} | Shared With: {allowed}[/]")
 
-                file_id = Prompt.ask("[green]Enter file ID to download[/]")
-                if file_id not in files:
-                    console.print(f"[red]Error: File ID '{file_id}' not found.[/]")
+                file_ids = [fid.strip() for fid in Prompt.ask("[green]Enter file ID(s) to download (comma-separated)[/]").split(",") if fid.strip()]
+                unknown = [fid for fid in file_ids if fid not in files]
+                if unknown or not file_ids:
+                    console.print(f"[red]Error: File ID '{', '.join(unknown)}' not found.[/]")
                     continue
+                file_id = file_ids[0]
 
                 info = files[file_id]
                 owner_addr = info.get("owner_address")
@@ -196,7 +203,14 @@ def client_ui(client):
                     else:
                         continue
 
-                client.download_file(file_id, dest_path, owner_addr, filename, file_hash)
+                if len(file_ids) > 1:
+                    # one registry round trip and batched peer requests for the lot
+                    client.download_files({fid: files[fid] for fid in file_ids}, dest_path)
+                    continue
+                client.download_file(file_id, dest_path, owner_addr, filename, file_hash,
+                                     holders=info.get("holders"), size=info.get("size"), codec=info.get("codec"),
+                                     merkle_root=info.get("merkle_root"), chunk_size=info.get("chunk_size"),
+                                     file_format=info.get("format"), content_hash=info.get("content_hash"))
 
             elif choice == '8':
                 files = client.get_files_from_registry()
@@ -263,6 +277,29 @@ def client_ui(client):
                 except:
                     console.print("[red]Please enter a number.[/]")
 
+            elif choice == '12':
+                files = client.get_files_from_registry()
+                owned_files = {fid: info for fid, info in files.items() if info.get("owner") == client.username}
+
+                if not owned_files:
+                    console.print("[yellow]You don’t own any files to update.[/]")
+                    continue
+
+                for file_id in sorted(owned_files.keys(), key=int):
+                    info = owned_files[file_id]
+                    console.print(f"[blue]ID: {file_id} | Filename: {info['filename']} | Revision: {info.get('revision', 0)}[/]")
+
+                file_id = Prompt.ask("[green]Enter the ID of the file to update[/]")
+                if file_id not in owned_files:
+                    console.print("[red]Invalid ID or not your file.[/]")
+                    continue
+
+                filepath = Prompt.ask("[green]Enter full path of the new version[/]")
+                if not os.path.isfile(filepath):
+                    console.print(f"[red]Error: File not found at '{filepath}'[/]")
+                    continue
+                client.update_file(file_id, filepath)
+
             elif choice == '10':
                 client.username = None
                 client.session_id = None
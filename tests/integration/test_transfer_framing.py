@@ -0,0 +1,884 @@
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import pytest
+
+import src.peer.fileshare_peer as peer_module
+from src.client.fileshare_client import FileShareClient
+from src.client.swarm import SwarmDownload
+from src.utils.config import Config
+from src.utils import crypto_utils, delta, merkle
+from src.utils.commands_enum import Commands
+from src.utils.framing import (FramedReader, PROTOCOL_VERSION, LEGACY_PROTOCOL_VERSION, STATUS_ERROR, STATUS_OK,
+                               STATUS_REPLY)
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Fixture: a real peer on loopback ─────────────────────────
+
+@pytest.fixture
+def peer_address(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog) # accept connections before the server thread gets going
+    threading.Thread(target=peer.start_peer, daemon=True).start()
+    yield (peer.host, peer.port)
+    peer.peer_socket.close()
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_framed_round_trip_with_sentinel_in_payload(peer_address, tmp_path):
+    name = "test_framed_round_trip_with_sentinel_in_payload"
+    print_header(name)
+
+    # a chunk that is exactly the DONE sentinel used to end legacy transfers early
+    payload = os.urandom(Config.CHUNK_SIZE) + str(Commands.DONE).encode() + os.urandom(1000)
+    client = FileShareClient()
+    client._send_ciphertext(peer_address, "blob.bin", payload)
+    assert (tmp_path / "blob.bin").read_bytes() == payload
+
+    assert client._receive_ciphertext(peer_address, "0") == payload
+    assert client.peer_protocol_versions[peer_address] == PROTOCOL_VERSION
+
+    print_footer(name)
+
+def test_framed_download_unknown_id_raises(peer_address):
+    name = "test_framed_download_unknown_id_raises"
+    print_header(name)
+
+    client = FileShareClient()
+    with pytest.raises(RuntimeError, match="not found"):
+        client._receive_ciphertext(peer_address, "7")
+
+    print_footer(name)
+
+def test_falls_back_to_legacy_peer(peer_address, tmp_path, monkeypatch):
+    name = "test_falls_back_to_legacy_peer"
+    print_header(name)
+
+    # a peer from before versioning does not recognise 'DOWNLOAD/2' and hangs up
+    monkeypatch.setattr(peer_module, "split_command", lambda command_str: (command_str, LEGACY_PROTOCOL_VERSION))
+    (tmp_path / "old.bin").write_bytes(b"legacy bytes")
+
+    client = FileShareClient()
+    assert client._receive_ciphertext(peer_address, "0") == b"legacy bytes"
+    assert client.peer_protocol_versions[peer_address] == LEGACY_PROTOCOL_VERSION
+    assert [entry["filename"] for entry in client.iter_peer_files(peer_address)] == ["old.bin"]
+
+    print_footer(name)
+
+def test_duplicate_upload_skips_payload(peer_address, tmp_path, monkeypatch):
+    name = "test_duplicate_upload_skips_payload"
+    print_header(name)
+
+    payload = os.urandom(50_000)
+    file_hash = hashlib.sha256(payload).hexdigest()
+    client = FileShareClient()
+    client._send_ciphertext(peer_address, "first.bin", payload, file_hash=file_hash)
+
+    # the second upload of the same content must finish without streaming the bytes
+    sent = []
+    class CountingSocket:
+        def __init__(self, sock):
+            self.sock = sock
+        def sendall(self, data):
+            sent.append(len(data))
+            self.sock.sendall(data)
+        def __getattr__(self, attr):
+            return getattr(self.sock, attr)
+    real_connect = client._connect_socket
+    monkeypatch.setattr(client, "_connect_socket", lambda address, port: CountingSocket(real_connect(address, port)))
+    client.close_connections() # pooled connections were opened without the counting wrapper
+    client._send_ciphertext(peer_address, "second.bin", payload, file_hash=file_hash)
+    assert sum(sent) < 1000
+
+    object_dir = tmp_path / ".objects" / file_hash[:2] / file_hash[2:4]
+    assert (object_dir / file_hash).read_bytes() == payload
+    assert not (tmp_path / "first.bin").exists()
+
+    # downloads resolve by hash; the file ID a downloader names is not recorded for the content
+    assert client._receive_ciphertext(peer_address, "12", file_hash=file_hash) == payload
+    with pytest.raises(RuntimeError, match="not found"):
+        client._receive_ciphertext(peer_address, "12")
+    # a hash the peer does not store is not found, whatever the file ID would point at
+    (tmp_path / "plain.bin").write_bytes(b"unrelated")
+    assert client._receive_ciphertext(peer_address, "0") == b"unrelated"
+    with pytest.raises(RuntimeError, match="not found"):
+        client._receive_ciphertext(peer_address, "0", file_hash="0" * 64)
+
+    print_footer(name)
+
+def test_reencrypted_upload_is_stored_separately(peer_address):
+    name = "test_reencrypted_upload_is_stored_separately"
+    print_header(name)
+
+    # the same plaintext encrypted twice gives different ciphertext, and each keeps its own object
+    key = "k" * 64
+    plaintext = os.urandom(20_000)
+    client = FileShareClient()
+    copies = [crypto_utils.encrypt_data(plaintext, key) for _ in range(2)]
+    for i, ciphertext in enumerate(copies):
+        assert client._send_ciphertext(peer_address, f"copy{i}.bin", ciphertext, file_hash=hashlib.sha256(ciphertext).hexdigest())
+    for ciphertext in copies:
+        assert client._receive_ciphertext(peer_address, "0", file_hash=hashlib.sha256(ciphertext).hexdigest()) == ciphertext
+
+    # a hash that does not match the bytes sent is refused, and nothing is stored under it
+    claimed = hashlib.sha256(plaintext).hexdigest()
+    with pytest.raises(RuntimeError, match="hash mismatch"):
+        client._send_ciphertext(peer_address, "liar.bin", copies[0] + b"x", file_hash=claimed)
+    with pytest.raises(RuntimeError):
+        client._receive_ciphertext(peer_address, "99", file_hash=claimed)
+
+    print_footer(name)
+
+class CuttingSocket:
+    """Wraps a client socket and drops the connection after `limit` received bytes."""
+    def __init__(self, sock, limit):
+        self.sock = sock
+        self.limit = limit
+    def recv(self, bufsize):
+        self._check()
+        data = self.sock.recv(min(bufsize, self.limit))
+        self.limit -= len(data)
+        return data
+    def recv_into(self, buffer, nbytes=0):
+        self._check()
+        n = self.sock.recv_into(buffer, min(nbytes or len(buffer), self.limit))
+        self.limit -= n
+        return n
+    def _check(self):
+        if self.limit <= 0:
+            raise ConnectionResetError("connection cut by test")
+    def __getattr__(self, attr):
+        return getattr(self.sock, attr)
+
+def test_ranged_fetch(peer_address, tmp_path):
+    name = "test_ranged_fetch"
+    print_header(name)
+
+    payload = os.urandom(300_000)
+    (tmp_path / "blob.bin").write_bytes(payload)
+    client = FileShareClient()
+    assert client.fetch_range(peer_address, "0", 1000, 5000) == payload[1000:6000]
+    assert client.fetch_range(peer_address, "0", 299_990, 5000) == payload[299_990:]
+    assert client.fetch_range(peer_address, "0", 123_456) == payload[123_456:]
+    with pytest.raises(RuntimeError, match="beyond the end"):
+        client.fetch_range(peer_address, "0", 400_000)
+
+    print_footer(name)
+
+def test_interrupted_download_resumes(peer_address, tmp_path, monkeypatch):
+    name = "test_interrupted_download_resumes"
+    print_header(name)
+
+    key = "k" * 64
+    plaintext = os.urandom(3 * Config.CHUNK_SIZE + 777)
+    file_hash = hashlib.sha256(plaintext).hexdigest()
+    ciphertext = crypto_utils.encrypt_data(plaintext, key)
+    content_hash = hashlib.sha256(ciphertext).hexdigest()
+    client = FileShareClient()
+    client._send_ciphertext(peer_address, "big.bin", ciphertext, file_hash=content_hash)
+
+    client.session_id = "session"
+    monkeypatch.setattr(client, "check_access", lambda file_id: True)
+    monkeypatch.setattr(client, "request_key", lambda file_id: key)
+    monkeypatch.setattr(Config, "CLIENT_RESUME_CHECKPOINT_BYTES", Config.CHUNK_SIZE)
+
+    real_connect = client._connect_socket
+    requested_offsets = []
+    def connect_and_cut(limit):
+        def connect(address, port):
+            return CuttingSocket(real_connect(address, port), limit)
+        monkeypatch.setattr(client, "_connect_socket", connect)
+        client.close_connections()
+
+    # an uninterrupted download needs no resume state
+    assert client.download_file("5", str(tmp_path / "direct"), peer_address, "big.bin", file_hash, content_hash=content_hash)
+    assert (tmp_path / "direct" / "big.bin").read_bytes() == plaintext
+    assert not (tmp_path / "direct" / "big.bin.part").exists()
+
+    downloads = tmp_path / "downloads"
+    part = downloads / "big.bin.part"
+
+    # first attempt drops a little over one chunk in
+    connect_and_cut(Config.CHUNK_SIZE + 5000)
+    assert not client.download_file("5", str(downloads), peer_address, "big.bin", file_hash, content_hash=content_hash)
+    kept = part.stat().st_size
+    assert kept > Config.CHUNK_SIZE
+    assert (downloads / "big.bin.part.resume").exists()
+
+    # second attempt drops again further on, third completes
+    connect_and_cut(Config.CHUNK_SIZE)
+    assert not client.download_file("5", str(downloads), peer_address, "big.bin", file_hash, content_hash=content_hash)
+    assert part.stat().st_size > kept
+
+    original_fetch = client._open_framed_request
+    def record_offset(address, command, argument):
+        requested_offsets.append(argument)
+        return original_fetch(address, command, argument)
+    monkeypatch.setattr(client, "_open_framed_request", record_offset)
+    connect_and_cut(10**9)
+    assert client.download_file("5", str(downloads), peer_address, "big.bin", file_hash, content_hash=content_hash)
+
+    assert "offset=" in requested_offsets[0]
+    assert hashlib.sha256((downloads / "big.bin").read_bytes()).hexdigest() == file_hash
+    assert not part.exists() and not (downloads / "big.bin.part.resume").exists()
+
+    print_footer(name)
+
+def test_swarm_download_from_two_peers(peer_address, tmp_path, monkeypatch):
+    name = "test_swarm_download_from_two_peers"
+    print_header(name)
+
+    # a second peer on the same shared directory holds the same stored ciphertext
+    second = peer_module.FileSharePeer(requested_port=0)
+    second.peer_socket.listen(second.backlog)
+    threading.Thread(target=second.start_peer, daemon=True).start()
+    holders = [list(peer_address), [second.host, second.port]]
+
+    key = "k" * 64
+    plaintext = os.urandom(5 * Config.CHUNK_SIZE)
+    file_hash = hashlib.sha256(plaintext).hexdigest()
+    ciphertext = crypto_utils.encrypt_data(plaintext, key)
+    content_hash = hashlib.sha256(ciphertext).hexdigest()
+    client = FileShareClient()
+    client._send_ciphertext(peer_address, "swarm.bin", ciphertext, file_hash=content_hash)
+
+    swarm = SwarmDownload(client, holders, "9", len(ciphertext), file_hash=content_hash, piece_size=Config.CHUNK_SIZE // 2)
+    assert swarm.run() == ciphertext
+    assert sum(stats["pieces"] for stats in swarm.holder_stats.values()) == swarm.piece_count
+
+    client.session_id = "session"
+    monkeypatch.setattr(client, "check_access", lambda file_id: True)
+    monkeypatch.setattr(client, "request_key", lambda file_id: key)
+    assert client.download_file("9", str(tmp_path / "out"), peer_address, "swarm.bin", file_hash,
+                                holders=holders, size=len(ciphertext), content_hash=content_hash)
+    assert hashlib.sha256((tmp_path / "out" / "swarm.bin").read_bytes()).hexdigest() == file_hash
+
+    second.peer_socket.close()
+    print_footer(name)
+
+@pytest.mark.parametrize("serve", ["start_peer", "start_peer_async"])
+def test_multi_stream_upload_and_download(serve, tmp_path, monkeypatch):
+    name = f"test_multi_stream_upload_and_download[{serve}]"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "CLIENT_STREAM_MIN_BYTES", 64 * 1024)
+    monkeypatch.setattr(Config, "CLIENT_PEER_MIN_SAMPLE_BYTES", 1)
+    monkeypatch.setattr(Config, "SWARM_PIECE_SIZE", 64 * 1024)
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog)
+    threading.Thread(target=getattr(peer, serve), daemon=True).start()
+    address = (peer.host, peer.port)
+
+    ciphertext = os.urandom(1024 * 1024 + 5)
+    file_hash = hashlib.sha256(ciphertext).hexdigest()
+    client = FileShareClient()
+    parts = []
+    send_part = client._send_part
+    monkeypatch.setattr(client, "_send_part", lambda *args: parts.append(args[5]) or send_part(*args))
+    assert client._upload_ciphertext(address, "multi.bin", ciphertext, file_hash)
+    assert len(parts) == Config.CLIENT_INITIAL_STREAMS
+    assert client.peer_table.stream_limits(address) == (Config.PEER_MAX_TRANSFERS_PER_CLIENT, True)
+    assert client.fetch_range(address, "multi.bin", 0, file_hash=file_hash) == ciphertext
+    assert len(peer.multipart) == 0
+
+    # the same content again is not sent
+    assert not client._send_ciphertext_parallel(address, "again.bin", ciphertext, file_hash, 3)
+
+    streams = client.peer_table.stream_count(address, len(ciphertext))
+    assert 1 < streams <= Config.CLIENT_MAX_STREAMS
+    assert client.fetch_parallel(address, "multi.bin", len(ciphertext), file_hash=file_hash) == ciphertext
+
+    client.close_connections()
+    peer.peer_socket.close()
+    print_footer(name)
+
+def test_pull_through_cache_evicts_and_withdraws(peer_address, monkeypatch):
+    name = "test_pull_through_cache_evicts_and_withdraws"
+    print_header(name)
+
+    size = 3 * Config.CHUNK_SIZE
+    monkeypatch.setattr(Config, "PEER_CACHE_BUDGET_BYTES", size + size // 2)
+    client = FileShareClient()
+    client.session_id = "session"
+    client.peer_address = peer_address
+    requests = []
+    monkeypatch.setattr(client, "_send_registry_request",
+                        lambda request: requests.append(request) or {"status": "OK", "holders": []})
+
+    copies = [os.urandom(size) for _ in range(2)]
+    for file_id, ciphertext in enumerate(copies, start=1):
+        file_hash = hashlib.sha256(ciphertext).hexdigest()
+        assert client.seed_downloaded_file(str(file_id), f"{file_id}.bin", ciphertext, file_hash)
+    # the second copy pushed the first out of the budget: the peer dropped it and so did the registry
+    assert [(r["command"], r["file_id"]) for r in requests] == [
+        ("REGISTER_HOLDER", "1"), ("UNREGISTER_HOLDER", "1"), ("REGISTER_HOLDER", "2")]
+    assert requests[1]["holder_address"] == list(peer_address)
+    hashes = [hashlib.sha256(ciphertext).hexdigest() for ciphertext in copies]
+    with pytest.raises(RuntimeError):
+        client._receive_ciphertext(peer_address, "1", file_hash=hashes[0])
+    assert client._receive_ciphertext(peer_address, "2", file_hash=hashes[1]) == copies[1]
+    with pytest.raises(RuntimeError, match="not found"):
+        client._receive_ciphertext(peer_address, "2") # the file ID the copy was cached for is not a lookup alias
+
+    oversized = os.urandom(2 * size)
+    assert not client.seed_downloaded_file("3", "3.bin", oversized, hashlib.sha256(oversized).hexdigest())
+    assert len(requests) == 3
+
+    # an unreachable holder ranks after a live one
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))
+    dead_address = dead.getsockname()
+    dead.close()
+    assert client.rank_holders([dead_address, peer_address]) == [tuple(peer_address), tuple(dead_address)]
+
+    client.close_connections()
+    print_footer(name)
+
+def test_peer_table_learns_from_transfers_and_skips_dead_peers(peer_address, tmp_path, monkeypatch):
+    name = "test_peer_table_learns_from_transfers_and_skips_dead_peers"
+    print_header(name)
+
+    (tmp_path / "listed.txt").write_bytes(b"x")
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))
+    dead_address = dead.getsockname()
+    dead.close()
+
+    client = FileShareClient()
+    client.session_id = "session"
+    monkeypatch.setattr(client, "get_peers", lambda: [dead_address, peer_address])
+    attempts = []
+    connect = client._connect_socket
+    monkeypatch.setattr(client, "_connect_socket", lambda host, port: attempts.append((host, port)) or connect(host, port))
+    for _ in range(3):
+        listings = client.get_files_from_peers()
+        assert [entry["filename"] for entry in listings[tuple(peer_address)]] == ["listed.txt"]
+    # two failed connects suspend the dead peer; the third listing does not try it
+    assert attempts.count(tuple(dead_address)) == 2
+    assert client.peer_table.is_suspended(dead_address)
+
+    payload = os.urandom(1024 * 1024)
+    client._send_ciphertext(peer_address, "blob.bin", payload)
+    assert client.fetch_range(peer_address, "0", 0) == payload
+    measured = client.peer_table.snapshot()[tuple(peer_address)]
+    assert measured["rtt_ms"] > 0 and measured["throughput"] > 0 and measured["failures"] == 0
+
+    client.close_connections()
+    print_footer(name)
+
+class FlippingSocket:
+    """Wraps a client socket and inverts the byte at stream position `position` of what it receives."""
+    def __init__(self, sock, position):
+        self.sock = sock
+        self.position = position
+    def recv_into(self, buffer, nbytes=0):
+        n = self.sock.recv_into(buffer, nbytes)
+        if 0 <= self.position < n:
+            buffer[self.position] ^= 0xFF
+        self.position -= n
+        return n
+    def recv(self, bufsize):
+        data = bytearray(self.sock.recv(bufsize))
+        if 0 <= self.position < len(data):
+            data[self.position] ^= 0xFF
+        self.position -= len(data)
+        return bytes(data)
+    def __getattr__(self, attr):
+        return getattr(self.sock, attr)
+
+def test_corrupt_chunk_is_refetched_alone(peer_address, tmp_path, monkeypatch):
+    name = "test_corrupt_chunk_is_refetched_alone"
+    print_header(name)
+
+    chunk_size = 64 * 1024
+    key = "k" * 64
+    plaintext = os.urandom(10 * chunk_size)
+    file_hash = hashlib.sha256(plaintext).hexdigest()
+    ciphertext = crypto_utils.encrypt_data(plaintext, key)
+    content_hash = hashlib.sha256(ciphertext).hexdigest()
+    root = merkle.merkle_root(merkle.leaf_hashes(ciphertext, chunk_size))
+    client = FileShareClient()
+    client._send_ciphertext(peer_address, "tree.bin", ciphertext, file_hash=content_hash)
+
+    # the peer's hash list checks out against the root from the upload
+    leaves = client.fetch_chunk_hashes(peer_address, "0", chunk_size, file_hash=content_hash)
+    verifier = merkle.ChunkVerifier.from_leaves(leaves, root, chunk_size, len(ciphertext))
+
+    # a byte flipped in transit inside chunk 3 is caught on arrival
+    real_connect = client._connect_socket
+    monkeypatch.setattr(client, "_connect_socket", lambda address, port: FlippingSocket(real_connect(address, port), 3 * chunk_size + 500))
+    client.close_connections()
+    received = client._receive_ciphertext_resumable(peer_address, "0", str(tmp_path / "tree.part"), file_hash=content_hash,
+                                                   verifier=verifier)
+    assert verifier.bad_chunks == {3}
+
+    # only that chunk is fetched again
+    monkeypatch.setattr(client, "_connect_socket", real_connect)
+    client.close_connections()
+    fetched = []
+    original_fetch_range = client.fetch_range
+    def record_range(peer, file_id_str, offset, length=None, file_hash=None):
+        fetched.append((offset, length))
+        return original_fetch_range(peer, file_id_str, offset, length, file_hash=file_hash)
+    monkeypatch.setattr(client, "fetch_range", record_range)
+    repaired = bytearray(received)
+    client._repair_chunks(repaired, verifier, [peer_address], "0", content_hash)
+    assert repaired == ciphertext and fetched == [(3 * chunk_size, chunk_size)]
+    assert not verifier.bad_chunks
+
+    # the whole download path with the registry's root and chunk size
+    client.session_id = "session"
+    monkeypatch.setattr(client, "check_access", lambda file_id: True)
+    monkeypatch.setattr(client, "request_key", lambda file_id: key)
+    assert client.download_file("0", str(tmp_path / "out"), peer_address, "tree.bin", file_hash, size=len(ciphertext),
+                                merkle_root=root, chunk_size=chunk_size, content_hash=content_hash)
+    assert (tmp_path / "out" / "tree.bin").read_bytes() == plaintext
+
+    # a hash list that does not match the root is not used
+    assert client._chunk_verifier([peer_address], "0", content_hash, "00" * 32, chunk_size, len(ciphertext)) is None
+
+    print_footer(name)
+
+@pytest.mark.parametrize("server", ["start_peer", "start_peer_async"])
+def test_delta_upload_rebuilds_new_version(server, tmp_path, monkeypatch):
+    name = f"test_delta_upload_rebuilds_new_version[{server}]"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "DELTA_BLOCK_SIZE", 16 * 1024)
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog)
+    threading.Thread(target=getattr(peer, server), daemon=True).start()
+    address = (peer.host, peer.port)
+
+    key = "k" * 64
+    old = os.urandom(2 * 1024 * 1024)
+    stored = delta.plan_revision(old, key).stored_bytes()
+    old_hash = hashlib.sha256(stored).hexdigest()
+    client = FileShareClient()
+    client._send_ciphertext(address, "doc.bin", stored, file_hash=old_hash)
+
+    new = bytearray(old)
+    new[500_000:520_000] = os.urandom(20_000)
+    new[1_000_000:1_000_000] = b"inserted"
+    new = bytes(new)
+    signature = client.fetch_signature(address, "0", old_hash, len(stored), key)
+    plan = delta.plan_revision(new, key, signature)
+    assert plan.sent < len(stored) // 20
+    new_hash = client._send_delta(address, "doc.bin", plan, old_hash)
+    rebuilt = client._receive_ciphertext(address, "0", file_hash=new_hash)
+    # the peer keys the rebuilt version by the hash of the bytes it stored
+    assert hashlib.sha256(rebuilt).hexdigest() == new_hash
+    assert len(rebuilt) == plan.size and delta.decrypt_file(rebuilt, key) == new
+    # both versions stay available under their own hashes
+    assert delta.decrypt_file(client._receive_ciphertext(address, "0", file_hash=old_hash), key) == old
+
+    # rebuilding the same content again stores nothing new; an unknown base is refused
+    assert client._send_delta(address, "doc.bin", plan, old_hash) == new_hash
+    with pytest.raises(RuntimeError, match="Base version"):
+        client._send_delta(address, "doc.bin", plan, "cd" * 32)
+
+    peer.peer_socket.close()
+    print_footer(name)
+
+def test_update_file_registers_revision(peer_address, tmp_path, monkeypatch):
+    name = "test_update_file_registers_revision"
+    print_header(name)
+
+    key = "k" * 64
+    client = FileShareClient()
+    client.session_id, client.username, client.key, client.peer_address = "session", "alice", key, peer_address
+    monkeypatch.setattr(Config, "CLIENT_UPLOAD_FORMAT", delta.FORMAT_BLOCKS)
+    registered = {}
+    monkeypatch.setattr(client, "register_file_with_registry", lambda filename, file_hash, **entry: registered.update(
+        {"0": dict(entry, filename=filename, file_hash=file_hash, owner="alice", format=entry["file_format"])}) or 0)
+    revisions = []
+    monkeypatch.setattr(client, "register_revision", lambda file_id, file_hash, **entry: revisions.append(
+        dict(entry, file_hash=file_hash)) or len(revisions))
+    monkeypatch.setattr(client, "get_files_from_registry", lambda: registered)
+
+    path = tmp_path / "report.bin"
+    data = os.urandom(1024 * 1024)
+    path.write_bytes(data)
+    assert client.upload_file(str(path))
+    assert registered["0"]["format"] == delta.FORMAT_BLOCKS and registered["0"]["codec"] == "none"
+
+    sent = []
+    original_send_delta = client._send_delta
+    monkeypatch.setattr(client, "_send_delta", lambda *args: sent.append(args[2]) or original_send_delta(*args))
+    path.write_bytes(data[:300_000] + b"edit" + data[300_004:])
+    assert client.update_file("0", str(path))
+    assert sent and sent[0].sent < 200_000
+    entry = revisions[0]
+    assert entry["file_format"] == delta.FORMAT_BLOCKS and entry["merkle_root"] is None
+
+    # the registered revision downloads like any file
+    client.session_id = "session"
+    monkeypatch.setattr(client, "check_access", lambda file_id: True)
+    monkeypatch.setattr(client, "request_key", lambda file_id: key)
+    assert client.download_file("0", str(tmp_path / "out"), peer_address, "report.bin", entry["file_hash"],
+                                size=entry["size"], file_format=entry["file_format"], content_hash=entry["content_hash"])
+    assert (tmp_path / "out" / "report.bin").read_bytes() == path.read_bytes()
+
+    print_footer(name)
+
+def count_connections(client, monkeypatch):
+    """Patches the client's connect helper and returns the list of sockets it opens from then on."""
+    opened = []
+    real_connect = client._connect_socket
+    def connect(address, port):
+        sock = real_connect(address, port)
+        opened.append(sock)
+        return sock
+    monkeypatch.setattr(client, "_connect_socket", connect)
+    return opened
+
+def test_keepalive_reuses_one_connection(peer_address, monkeypatch):
+    name = "test_keepalive_reuses_one_connection"
+    print_header(name)
+
+    client = FileShareClient()
+    opened = count_connections(client, monkeypatch)
+    payload = os.urandom(20_000)
+    file_hash = hashlib.sha256(payload).hexdigest()
+
+    client._send_ciphertext(peer_address, "ka.bin", payload, file_hash=file_hash)
+    for _ in range(3):
+        assert client._receive_ciphertext(peer_address, "3", file_hash=file_hash) == payload
+    assert client.fetch_range(peer_address, "3", 100, 10, file_hash=file_hash) == payload[100:110]
+    with pytest.raises(RuntimeError, match="not found"):
+        client._receive_ciphertext(peer_address, "99")
+    listing = client.get_peer_files_page(peer_address)
+    assert listing["status"] == "OK" and listing["files"][0]["file_hash"] == file_hash
+
+    # an error reply is read in full, so even that does not cost the connection
+    assert len(opened) == 1
+    assert client.connection_pool.stats()["reused"] == 6
+
+    monkeypatch.setattr(Config, "CLIENT_KEEPALIVE", False)
+    client.close_connections()
+    client._receive_ciphertext(peer_address, "3", file_hash=file_hash)
+    client._receive_ciphertext(peer_address, "3", file_hash=file_hash)
+    assert len(opened) == 3
+
+    print_footer(name)
+
+def test_pipelined_requests_are_answered_in_order(peer_address, tmp_path):
+    name = "test_pipelined_requests_are_answered_in_order"
+    print_header(name)
+
+    (tmp_path / "a.bin").write_bytes(b"first file")
+    sock = socket.create_connection(peer_address)
+    try:
+        # both requests go out before any reply is read
+        sock.sendall(b"DOWNLOAD/3\n0 id=7\nDOWNLOAD/3\n5 id=8\nGET_PEER_FILES/3\nid=9\n")
+        reader = FramedReader(sock)
+        replies = []
+        for _ in range(3):
+            opening = reader.read_header()
+            assert opening.status == STATUS_REPLY
+            request_id = reader.read_exactly(opening.size).decode()
+            header = reader.read_header()
+            replies.append((request_id, header.status, bytes(reader.read_exactly(header.size))))
+    finally:
+        sock.close()
+
+    assert replies[0] == ("7", STATUS_OK, b"first file")
+    assert replies[1][:2] == ("8", STATUS_ERROR)
+    assert replies[2][0] == "9" and json.loads(replies[2][2])["files"][0]["filename"] == "a.bin"
+
+    print_footer(name)
+
+def test_connection_closed_by_idle_peer_is_replaced(peer_address, tmp_path, monkeypatch):
+    name = "test_connection_closed_by_idle_peer_is_replaced"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "PEER_KEEPALIVE_TIMEOUT", 0.1)
+    (tmp_path / "a.bin").write_bytes(b"still here")
+    client = FileShareClient()
+    opened = count_connections(client, monkeypatch)
+
+    assert client._receive_ciphertext(peer_address, "0") == b"still here"
+    time.sleep(0.3) # the peer hangs up the idle connection, the client's pool has not evicted it yet
+    assert client._receive_ciphertext(peer_address, "0") == b"still here"
+    assert len(opened) == 2
+    assert client.peer_protocol_versions[peer_address] == PROTOCOL_VERSION # not mistaken for a legacy peer
+
+    print_footer(name)
+
+def test_async_peer_keeps_connections_open(tmp_path, monkeypatch):
+    name = "test_async_peer_keeps_connections_open"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    (tmp_path / "a.bin").write_bytes(b"async bytes")
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog)
+    threading.Thread(target=peer.start_peer_async, daemon=True).start()
+
+    client = FileShareClient()
+    opened = count_connections(client, monkeypatch)
+    address = (peer.host, peer.port)
+    for _ in range(3):
+        assert client._receive_ciphertext(address, "0") == b"async bytes"
+    assert client.get_peer_files_page(address)["files"][0]["filename"] == "a.bin"
+    assert len(opened) == 1
+
+    print_footer(name)
+
+def test_listing_pages_and_streams_large_directory(peer_address, tmp_path, monkeypatch):
+    name = "test_listing_pages_and_streams_large_directory"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "CHUNK_SIZE", 256) # several NDJSON frames
+    for i in range(250):
+        (tmp_path / f"{'log' if i % 2 else 'img'}_{i:03d}.bin").write_bytes(b"x" * i)
+    client = FileShareClient()
+    opened = count_connections(client, monkeypatch)
+
+    # cursor pagination walks every file exactly once, in name order
+    names, cursor = [], None
+    while True:
+        page = client.get_peer_files_page(peer_address, cursor=cursor, limit=40)
+        assert page["status"] == "OK" and len(page["files"]) <= 40
+        names += [entry["filename"] for entry in page["files"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert names == sorted(os.listdir(tmp_path))
+
+    streamed = list(client.iter_peer_files(peer_address, prefix="log_", min_size=100, max_size=199))
+    assert [entry["size"] for entry in streamed] == list(range(101, 200, 2))
+
+    # stopping early discards the half-read connection, the next request gets a fresh one
+    first = next(client.iter_peer_files(peer_address))
+    assert first["filename"] == "img_000.bin"
+    assert client.get_peer_files_page(peer_address, limit=1)["files"] == [first]
+    assert len(opened) == 2
+
+    assert client.get_peer_files_page(peer_address, cursor="bogus")["status"] == "ERROR"
+
+    print_footer(name)
+
+def test_async_peer_streams_listing(tmp_path, monkeypatch):
+    name = "test_async_peer_streams_listing"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "CHUNK_SIZE", 256)
+    for i in range(120):
+        (tmp_path / f"f_{i:03d}.bin").write_bytes(b"y")
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog)
+    threading.Thread(target=peer.start_peer_async, daemon=True).start()
+
+    client = FileShareClient()
+    address = (peer.host, peer.port)
+    assert len(list(client.iter_peer_files(address))) == 120
+    assert client.get_peer_files_page(address, cursor="f:f_100.bin")["files"][0]["filename"] == "f_101.bin"
+
+    print_footer(name)
+
+@pytest.mark.parametrize("server", ["start_peer", "start_peer_async"])
+def test_stats_reports_transfers(server, tmp_path, monkeypatch):
+    name = f"test_stats_reports_transfers[{server}]"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog)
+    threading.Thread(target=getattr(peer, server), daemon=True).start()
+    address = (peer.host, peer.port)
+
+    payload = os.urandom(1024 * 1024)
+    client = FileShareClient()
+    client._send_ciphertext(address, "blob.bin", payload)
+    assert client._receive_ciphertext(address, "0") == payload
+    with pytest.raises(RuntimeError):
+        client.fetch_chunk_hashes(address, "0", chunk_size=1) # refused: chunk size out of range
+
+    stats = client.get_peer_stats(address)
+    assert stats["connections"]["accepted"] >= 1 and stats["connections"]["active"] >= 1
+    # both transfers went over the connection that is still open in the pool
+    assert stats["bytes"]["in"] >= len(payload) and stats["bytes"]["out"] >= len(payload)
+    for command in ("UPLOAD", "DOWNLOAD", "GET_HASHES"):
+        latency = stats["commands"][command]
+        assert latency["count"] == 1 and 0 < latency["p50_ms"] <= latency["p99_ms"]
+    assert stats["admission"]["admitted"] == 3 and stats["admission"]["active"] == 0
+    assert stats["bandwidth"]["bytes_sent"] >= len(payload)
+
+    client.close_connections()
+    peer.peer_socket.close()
+    print_footer(name)
+
+@pytest.mark.parametrize("server", ["start_peer", "start_peer_async"])
+def test_download_many_in_batches(server, tmp_path, monkeypatch):
+    name = f"test_download_many_in_batches[{server}]"
+    print_header(name)
+
+    shared = tmp_path / "shared"
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(shared))
+    monkeypatch.setattr(Config, "CLIENT_BATCH_FILES", 3)
+    monkeypatch.setattr(Config, "TRANSFER_MAX_CHUNK_SIZE", 64 * 1024) # the large file goes out after its header
+    peer = peer_module.FileSharePeer(requested_port=0)
+    peer.peer_socket.listen(peer.backlog)
+    threading.Thread(target=getattr(peer, server), daemon=True).start()
+    address = (peer.host, peer.port)
+
+    key = "k" * 64
+    client = FileShareClient()
+    client.session_id = "session"
+    plaintexts = {str(i): os.urandom(100 * i) for i in range(6)}
+    plaintexts["6"] = os.urandom(300 * 1024)
+    files = {}
+    for file_id, plaintext in plaintexts.items():
+        ciphertext = crypto_utils.encrypt_data(plaintext, key)
+        content_hash = crypto_utils.compute_hash(ciphertext)
+        client._send_ciphertext(address, f"{file_id}.bin", ciphertext, file_hash=content_hash)
+        files[file_id] = {"filename": f"dir/{file_id}.bin", "file_hash": crypto_utils.compute_hash(plaintext),
+                          "content_hash": content_hash, "owner_address": list(address)}
+    files["7"] = {"filename": "missing.bin", "file_hash": "ab" * 32, "content_hash": "ab" * 32, "owner_address": list(address)}
+    files["8"] = {"filename": "secret.bin", "file_hash": "cd" * 32, "owner_address": list(address)}
+    requests = []
+    monkeypatch.setattr(client, "_send_registry_request", lambda request: requests.append(request) or {
+        "status": "OK", "keys": {file_id: key for file_id in request["file_ids"] if file_id != "8"},
+        "errors": {"8": "Access denied"}})
+    client.close_connections()
+    opened = count_connections(client, monkeypatch)
+
+    results = client.download_files(files, str(tmp_path / "out"))
+    assert [request["command"] for request in requests] == ["REQUEST_KEYS"]
+    assert results["8"] == "Access denied" and "not found" in results["7"]
+    assert all(results[file_id] is None for file_id in plaintexts)
+    for file_id, plaintext in plaintexts.items():
+        assert (tmp_path / "out" / "dir" / f"{file_id}.bin").read_bytes() == plaintext
+    # 8 files with keys in batches of 3, on at most as many connections
+    assert 1 <= len(opened) <= 3
+    assert client.get_peer_stats(address)["commands"]["DOWNLOAD_MANY"]["count"] == 3
+
+    client.close_connections()
+    peer.peer_socket.close()
+    print_footer(name)
+
+def test_download_many_falls_back_to_single_downloads(peer_address, tmp_path, monkeypatch):
+    name = "test_download_many_falls_back_to_single_downloads"
+    print_header(name)
+
+    # a peer from before DOWNLOAD_MANY hangs up on it
+    monkeypatch.delitem(peer_module.CommandFactory._strategies, Commands.DOWNLOAD_MANY)
+    key = "k" * 64
+    client = FileShareClient()
+    client.session_id = "session"
+    files = {}
+    for file_id in ("0", "1"):
+        plaintext = os.urandom(1000)
+        ciphertext = crypto_utils.encrypt_data(plaintext, key)
+        content_hash = crypto_utils.compute_hash(ciphertext)
+        client._send_ciphertext(peer_address, f"{file_id}.bin", ciphertext, file_hash=content_hash)
+        files[file_id] = {"filename": f"{file_id}.bin", "file_hash": crypto_utils.compute_hash(plaintext),
+                          "content_hash": content_hash, "owner_address": list(peer_address)}
+    files["1"]["filename"] = "../escape.bin"
+    monkeypatch.setattr(client, "_send_registry_request",
+                        lambda request: {"status": "OK", "keys": {"0": key, "1": key}, "errors": {}})
+
+    results = client.download_files(files, str(tmp_path / "out"))
+    assert results["0"] is None and "Unsafe filename" in results["1"]
+    assert (tmp_path / "out" / "0.bin").exists() and not (tmp_path / "escape.bin").exists()
+    assert client.peer_protocol_versions[tuple(peer_address)] == PROTOCOL_VERSION
+
+    client.close_connections()
+    print_footer(name)
+
+def test_download_file_into_subdirectory(peer_address, tmp_path, monkeypatch):
+    name = "test_download_file_into_subdirectory"
+    print_header(name)
+
+    key = "k" * 64
+    plaintext = os.urandom(5000)
+    ciphertext = crypto_utils.encrypt_data(plaintext, key)
+    content_hash = crypto_utils.compute_hash(ciphertext)
+    client = FileShareClient()
+    client._send_ciphertext(peer_address, "a.bin", ciphertext, file_hash=content_hash)
+    client.session_id = "session"
+    monkeypatch.setattr(client, "check_access", lambda file_id: True)
+    monkeypatch.setattr(client, "request_key", lambda file_id: key)
+
+    # a directory-uploaded name recreates its subdirectories under the destination
+    out = tmp_path / "out"
+    assert client.download_file("0", str(out), peer_address, "photos/2024/a.bin", crypto_utils.compute_hash(plaintext),
+                                content_hash=content_hash)
+    assert (out / "photos" / "2024" / "a.bin").read_bytes() == plaintext
+
+    # a name leading out of the destination is refused before anything is fetched
+    monkeypatch.setattr(client, "check_access", lambda file_id: pytest.fail("access checked for an unsafe name"))
+    assert not client.download_file("0", str(out), peer_address, "../escape.bin", crypto_utils.compute_hash(plaintext),
+                                    content_hash=content_hash)
+    assert not (tmp_path / "escape.bin").exists()
+
+    client.close_connections()
+    print_footer(name)
+
+def test_upload_directory_registers_in_one_request(peer_address, tmp_path, monkeypatch):
+    name = "test_upload_directory_registers_in_one_request"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "CLIENT_UPLOAD_WORKERS", 2)
+    monkeypatch.setattr(Config, "CLIENT_UPLOAD_TASK_BYTES", 8 * 1024) # several process pool tasks
+    plaintexts = {f"photos/{i}.bin": os.urandom(1000 * i) for i in range(8)}
+    plaintexts["photos/2024/big.bin"] = os.urandom(300 * 1024)
+    plaintexts["photos/2024/notes.txt"] = b"compressible " * 1000
+    for filename, plaintext in plaintexts.items():
+        (tmp_path / filename).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / filename).write_bytes(plaintext)
+
+    key = "k" * 64
+    client = FileShareClient()
+    client.session_id, client.key, client.peer_address = "session", key, peer_address
+    requests = []
+    monkeypatch.setattr(client, "_send_registry_request", lambda request: requests.append(request) or {
+        "status": "OK", "file_ids": list(range(len(request["files"])))})
+    opened = count_connections(client, monkeypatch)
+
+    file_ids, errors = client.upload_directory(str(tmp_path / "photos"))
+    assert errors == {}
+    assert sorted(file_ids) == sorted(plaintexts)
+    assert [request["command"] for request in requests] == ["REGISTER_FILES"]
+    assert len(opened) == 1 # every upload over one keep-alive connection
+    entries = {entry["filename"]: entry for entry in requests[0]["files"]}
+    assert entries["photos/2024/notes.txt"]["codec"] != "none"
+    assert entries["photos/2024/big.bin"]["file_hash"] == crypto_utils.compute_hash(plaintexts["photos/2024/big.bin"])
+
+    # what was registered downloads back to the same tree
+    files = {str(file_id): dict(entries[filename], owner_address=list(peer_address)) for filename, file_id in file_ids.items()}
+    monkeypatch.setattr(client, "_send_registry_request",
+                        lambda request: {"status": "OK", "keys": {file_id: key for file_id in request["file_ids"]}, "errors": {}})
+    assert not any(client.download_files(files, str(tmp_path / "out")).values())
+    for filename, plaintext in plaintexts.items():
+        assert (tmp_path / "out" / filename).read_bytes() == plaintext
+
+    # a refused registration is reported for every file
+    monkeypatch.setattr(client, "_send_registry_request", lambda request: {"status": "ERROR", "message": "Authentication required"})
+    file_ids, errors = client.upload_directory(str(tmp_path / "photos"))
+    assert file_ids == {} and set(errors) == set(plaintexts)
+    assert "Authentication required" in errors["photos/0.bin"]
+
+    client.close_connections()
+    print_footer(name)
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+
+from src.peer.admission import AdmissionController
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_queue_full_and_per_client_rejections():
+    name = "test_queue_full_and_per_client_rejections"
+    print_header(name)
+
+    admission = AdmissionController(max_active=2, max_queued=0, max_per_client=1, queue_timeout=0)
+    assert admission.acquire("10.0.0.1")
+    assert not admission.acquire("10.0.0.1")   # per-client cap
+    assert admission.acquire("10.0.0.2")
+    assert not admission.acquire("10.0.0.3")   # pool full, no queue
+
+    stats = admission.stats()
+    assert stats["active"] == 2
+    assert stats["rejected_per_client"] == 1 and stats["rejected_queue_full"] == 1
+    assert stats["rejected"] == 2
+
+    admission.release("10.0.0.1")
+    assert admission.acquire("10.0.0.3")
+
+    print_footer(name)
+
+def test_released_slot_goes_to_oldest_waiter():
+    name = "test_released_slot_goes_to_oldest_waiter"
+    print_header(name)
+
+    admission = AdmissionController(max_active=1, max_queued=4, max_per_client=4, queue_timeout=5)
+    assert admission.acquire("a")
+
+    order = []
+    def wait_for_slot(client):
+        assert admission.acquire(client)
+        order.append(client)
+        admission.release(client)
+
+    waiters = []
+    for client in ("b", "c"):
+        waiters.append(threading.Thread(target=wait_for_slot, args=(client,)))
+        waiters[-1].start()
+        while admission.stats()["queue_depth"] < len(waiters):
+            time.sleep(0.001)
+    assert admission.stats()["peak_queue_depth"] == 2
+
+    admission.release("a")
+    for t in waiters:
+        t.join(2)
+    assert order == ["b", "c"]
+    assert admission.stats()["active"] == 0
+
+    print_footer(name)
+
+def test_queued_transfer_times_out():
+    name = "test_queued_transfer_times_out"
+    print_header(name)
+
+    admission = AdmissionController(max_active=1, max_queued=1, max_per_client=2, queue_timeout=0.05)
+    assert admission.acquire("a")
+    assert not admission.acquire("b")
+    stats = admission.stats()
+    assert stats["rejected_timeout"] == 1 and stats["queue_depth"] == 0
+
+    admission.release("a")
+    assert admission.stats()["active"] == 0
+
+    print_footer(name)
+
+def test_async_waiter_woken_by_release():
+    name = "test_async_waiter_woken_by_release"
+    print_header(name)
+
+    admission = AdmissionController(max_active=1, max_queued=1, max_per_client=2, queue_timeout=5)
+
+    async def run():
+        assert await admission.acquire_async("a")
+        waiter = asyncio.create_task(admission.acquire_async("b"))
+        await asyncio.sleep(0.01)
+        assert admission.stats()["queue_depth"] == 1
+        admission.release("a")
+        return await waiter
+
+    assert asyncio.run(run())
+    assert admission.stats()["active"] == 1
+
+    print_footer(name)
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.peer.bandwidth import BandwidthScheduler
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+def grant_order(scheduler, transfers):
+    """Queues one piece per transfer while another transfer holds the only send slot; returns who got the slot in which order."""
+    blocker = scheduler.open("blocker", 1)
+    assert blocker.acquire(1) == 1
+    order = []
+    def send_piece(transfer):
+        transfer.acquire(scheduler.quantum)
+        order.append(transfer)
+        transfer.release(scheduler.quantum)
+
+    threads = []
+    for transfer in transfers:
+        threads.append(threading.Thread(target=send_piece, args=(transfer,)))
+        threads[-1].start()
+        while scheduler.stats()["waiting"] < len(threads):
+            time.sleep(0.001)
+    blocker.release(1)
+    blocker.close()
+    for t in threads:
+        t.join(2)
+    return order
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_srpt_sends_smallest_remaining_first():
+    name = "test_srpt_sends_smallest_remaining_first"
+    print_header(name)
+
+    scheduler = BandwidthScheduler(policy="srpt", send_slots=1, quantum=1000)
+    huge, small, medium = (scheduler.open("a", 20 * 10**9), scheduler.open("b", 3000), scheduler.open("c", 10**6))
+    assert grant_order(scheduler, [huge, small, medium]) == [small, medium, huge]
+
+    fifo = BandwidthScheduler(policy="fifo", send_slots=1, quantum=1000)
+    transfers = [fifo.open("a", 20 * 10**9), fifo.open("b", 3000)]
+    assert grant_order(fifo, transfers) == transfers
+
+    print_footer(name)
+
+def test_fair_share_is_per_client_host():
+    name = "test_fair_share_is_per_client_host"
+    print_header(name)
+
+    scheduler = BandwidthScheduler(policy="fair", send_slots=1, quantum=1000)
+    first, second = scheduler.open("10.0.0.1", None), scheduler.open("10.0.0.1", None)
+    for _ in range(3): # the busy host has already had some of the uplink
+        first.release(first.acquire(1000))
+    other = scheduler.open("10.0.0.2", None)
+
+    # the newcomer goes first, then the busy host's transfer that has had less
+    assert grant_order(scheduler, [first, second, other]) == [other, second, first]
+
+    print_footer(name)
+
+@pytest.mark.parametrize("policy", ["fair", "srpt", "fifo"])
+def test_background_transfers_go_last(policy):
+    name = f"test_background_transfers_go_last[{policy}]"
+    print_header(name)
+
+    scheduler = BandwidthScheduler(policy=policy, send_slots=1, quantum=1000)
+    replica = scheduler.open("10.0.0.9", 1000, background=True) # newest host, smallest transfer, asks first
+    user = scheduler.open("10.0.0.1", 10**9)
+    assert grant_order(scheduler, [replica, user]) == [user, replica]
+
+    print_footer(name)
+
+def test_rate_cap_paces_all_transfers():
+    name = "test_rate_cap_paces_all_transfers"
+    print_header(name)
+
+    scheduler = BandwidthScheduler(rate=1_000_000, send_slots=4, quantum=100_000)
+    start = time.monotonic()
+    with scheduler.open("a", 600_000) as a, scheduler.open("b", 600_000) as b:
+        for _ in range(3):
+            for transfer in (a, b):
+                transfer.release(transfer.acquire(200_000))
+    # 600 KB at 1 MB/s, less the 100 KB burst allowance and the last piece, which goes out on credit
+    assert time.monotonic() - start >= 0.35
+
+    stats = scheduler.stats()
+    assert stats["bytes_sent"] == 600_000 and stats["active"] == []
+    assert [entry["sent"] for entry in stats["completed"]] == [300_000, 300_000]
+    assert all(0 < entry["throughput"] < 1_000_000 for entry in stats["completed"])
+
+    print_footer(name)
+
+def test_async_waiters_and_cancellation():
+    name = "test_async_waiters_and_cancellation"
+    print_header(name)
+
+    scheduler = BandwidthScheduler(policy="srpt", send_slots=1, quantum=1000)
+
+    async def scenario():
+        big, small = scheduler.open("a", 10**6), scheduler.open("b", 10)
+        assert await big.acquire_async(5000) == 1000 # never more than a quantum at a time
+        waiting = asyncio.ensure_future(small.acquire_async(10))
+        cancelled = asyncio.ensure_future(big.acquire_async(1000))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        big.release(1000)
+        assert await waiting == 10
+        small.release(10)
+        return scheduler.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["sending"] == 0 and stats["waiting"] == 0
+
+    with pytest.raises(ValueError):
+        BandwidthScheduler(policy="random")
+
+    print_footer(name)
@@ -0,0 +1,83 @@
+import socket
+import pytest
+
+from src.client.fileshare_client import FileShareClient
+from src.peer.strategies.upload_strategy import UploadStrategy
+from src.utils.chunking import chunk_limit, chunk_size_for
+from src.utils.config import Config
+from src.utils.framing import HEADER_SIZE, unpack_header
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+@pytest.fixture(autouse=True)
+def chunk_config(monkeypatch):
+    monkeypatch.setattr(Config, "CHUNK_SIZE", 100 * 1024)
+    monkeypatch.setattr(Config, "TRANSFER_MIN_CHUNK_SIZE", 16 * 1024)
+    monkeypatch.setattr(Config, "TRANSFER_MAX_CHUNK_SIZE", 4 * 1024 * 1024)
+    monkeypatch.setattr(Config, "TRANSFER_CHUNK_SECONDS", 0.005)
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_chunk_size_follows_throughput_buffers_and_size():
+    name = "test_chunk_size_follows_throughput_buffers_and_size"
+    print_header(name)
+
+    big = 10**9
+    assert chunk_size_for(big) == 100 * 1024                           # nothing known
+    assert chunk_size_for(big, throughput=400 * 1024**2) == 2 * 1024**2  # 5 ms at 400 MB/s
+    assert chunk_size_for(big, throughput=10**12) == 4 * 1024**2        # capped...
+    assert chunk_size_for(big, throughput=10**12, limit=10**6) == 999424  # ...and within the other end's limit, in whole pages
+    assert chunk_size_for(big, throughput=10**5) == 16 * 1024           # slow link: the floor
+    assert chunk_size_for(3000, throughput=10**9) == 3000               # a tiny file goes in one piece
+
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
+    buffered = chunk_size_for(big, sock)
+    sock.close()
+    assert buffered >= 1024 * 1024 and buffered % 4096 == 0             # fills the socket buffer
+
+    print_footer(name)
+
+class FakeConnection:
+    def __init__(self, reply):
+        self.address = ("10.0.0.1", 1)
+        self.sent = []
+        self.sock = self
+        self.reader = self
+        self._reply = reply
+    def sendall(self, data):
+        self.sent.append(bytes(data))
+    def read_exactly(self, size):
+        data, self._reply = self._reply[:size], self._reply[size:]
+        return data
+
+def test_each_end_advertises_its_chunk_limit():
+    name = "test_each_end_advertises_its_chunk_limit"
+    print_header(name)
+
+    strategy = UploadStrategy()
+    assert unpack_header(strategy.ready_reply({"options": {}}, 3)).size == 0 # older clients get the plain reply
+    reply = strategy.ready_reply({"options": {"chunk": str(64 * 1024)}}, 3)
+    assert reply[HEADER_SIZE:] == b"65536"
+    assert chunk_limit({"chunk": "1"}) == 16 * 1024                     # never below the floor
+    assert chunk_limit({"chunk": "junk"}) == 4 * 1024**2
+
+    client = FileShareClient()
+    client.peer_table.record_transfer(("10.0.0.1", 1), 10**9, 1.0)     # fast: would pick 4 MB chunks
+    connection = FakeConnection(reply[HEADER_SIZE:])
+    client._send_payload(connection, unpack_header(reply[:HEADER_SIZE]), b"x" * 200000)
+    assert [len(piece) for piece in connection.sent[1:]] == [65536, 65536, 65536, 3392]
+
+    print_footer(name)
@@ -0,0 +1,72 @@
+import os
+import pytest
+
+from src.utils import compression
+from src.utils.config import Config
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+TEXT = b"".join(f"2024-05-01T12:00:{i % 60:02d} INFO request {i} served in {i % 97} ms\n".encode() for i in range(20000))
+
+# ─── Tests ────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("codec", compression.available_codecs())
+def test_round_trip(codec):
+    name = f"test_round_trip[{codec}]"
+    print_header(name)
+
+    assert compression.decompress(compression.compress(TEXT, codec), codec) == TEXT
+
+    print_footer(name)
+
+def test_text_is_compressed_and_random_data_is_not(monkeypatch):
+    name = "test_text_is_compressed_and_random_data_is_not"
+    print_header(name)
+
+    codec, payload = compression.compress_for_upload(TEXT, "zlib")
+    assert codec == "zlib" and len(payload) < len(TEXT) / 5
+    assert compression.decompress(payload, codec) == TEXT
+
+    noise = os.urandom(2 * 1024 * 1024) # stands in for archives, media and other already-compressed files
+    assert not compression.is_compressible(noise)
+    assert compression.compress_for_upload(noise, "zlib") == ("none", noise)
+
+    # mostly incompressible with one compressible stretch: the spread-out samples see mostly noise
+    mixed = os.urandom(1024 * 1024) + b"\0" * 64 * 1024 + os.urandom(1024 * 1024)
+    assert not compression.is_compressible(mixed)
+
+    monkeypatch.setattr(Config, "CLIENT_COMPRESSION", "none")
+    assert compression.compress_for_upload(TEXT) == ("none", TEXT)
+    assert compression.compress_for_upload(b"", "zlib") == ("none", b"")
+
+    print_footer(name)
+
+def test_codec_selection_and_unknown_codecs(monkeypatch):
+    name = "test_codec_selection_and_unknown_codecs"
+    print_header(name)
+
+    assert compression.decompress(b"raw", None) == b"raw" # files registered before compression existed
+    assert compression.choose_codec("auto") == ("zstd" if compression.zstandard else "zlib")
+    with pytest.raises(ValueError):
+        compression.decompress(b"x", "lzma")
+
+    monkeypatch.setattr(compression, "zstandard", None)
+    assert compression.choose_codec("auto") == "zlib"
+    with pytest.raises(ValueError, match="zstandard"):
+        compression.decompress(b"x", "zstd")
+    with pytest.raises(ValueError):
+        compression.choose_codec("zstd")
+
+    print_footer(name)
@@ -0,0 +1,109 @@
+import time
+
+from src.client.connection_pool import ConnectionPool
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Fakes ────────────────────────────────────────────────────
+
+class FakeSocket:
+    def __init__(self, address):
+        self.address = address
+        self.closed = False
+    def close(self):
+        self.closed = True
+
+class FakeConnector:
+    """connect(host, port) callable that records every socket it opens."""
+    def __init__(self, unreachable=()):
+        self.opened = []
+        self.unreachable = set(unreachable)
+    def __call__(self, host, port):
+        if (host, port) in self.unreachable:
+            return None
+        sock = FakeSocket((host, port))
+        self.opened.append(sock)
+        return sock
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_released_keepalive_connection_is_reused_per_peer():
+    name = "test_released_keepalive_connection_is_reused_per_peer"
+    print_header(name)
+
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, idle_timeout=60, max_idle_per_peer=4)
+    first = pool.acquire(["127.0.0.1", 9000]) # addresses from the registry arrive as lists
+    first.keep_alive = True
+    pool.release(first)
+
+    assert pool.acquire(("127.0.0.1", 9000)) is first
+    other = pool.acquire(("127.0.0.1", 9001))
+    assert other is not first and len(connector.opened) == 2
+
+    # while `first` is checked out, a second caller for the same peer gets its own connection
+    assert pool.acquire(("127.0.0.1", 9000)) is not first
+    assert pool.stats()["opened"] == 3 and pool.stats()["reused"] == 1
+
+    print_footer(name)
+
+def test_non_keepalive_and_discarded_connections_are_closed():
+    name = "test_non_keepalive_and_discarded_connections_are_closed"
+    print_header(name)
+
+    connector = FakeConnector(unreachable={("10.0.0.9", 1)})
+    pool = ConnectionPool(connector, idle_timeout=60, max_idle_per_peer=1)
+    assert pool.acquire(("10.0.0.9", 1)) is None
+
+    legacy = pool.acquire(("127.0.0.1", 9000))
+    pool.release(legacy) # peer never answered in a keep-alive version
+    assert legacy.sock.closed
+
+    broken = pool.acquire(("127.0.0.1", 9000))
+    broken.keep_alive = True
+    pool.discard(broken)
+    assert broken.sock.closed and pool.stats()["idle"] == 0
+
+    # only max_idle_per_peer connections are parked, the rest are closed
+    a, b = pool.acquire(("127.0.0.1", 9000)), pool.acquire(("127.0.0.1", 9000))
+    a.keep_alive = b.keep_alive = True
+    pool.release(a)
+    pool.release(b)
+    assert not a.sock.closed and b.sock.closed and pool.stats()["idle"] == 1
+
+    pool.close_all()
+    assert a.sock.closed and pool.stats()["idle"] == 0
+
+    print_footer(name)
+
+def test_idle_connections_are_evicted():
+    name = "test_idle_connections_are_evicted"
+    print_header(name)
+
+    connector = FakeConnector()
+    pool = ConnectionPool(connector, idle_timeout=0.05)
+    connection = pool.acquire(("127.0.0.1", 9000))
+    connection.keep_alive = True
+    pool.release(connection)
+    time.sleep(0.1)
+
+    fresh = pool.acquire(("127.0.0.1", 9000))
+    assert fresh is not connection and connection.sock.closed
+    assert pool.stats()["evicted"] == 1
+
+    # request ids count up per connection; `requests` tells fresh and reused connections apart
+    assert (fresh.requests, fresh.next_request_id(), fresh.next_request_id(), fresh.requests) == (0, "1", "2", 2)
+
+    print_footer(name)
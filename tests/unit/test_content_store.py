@@ -0,0 +1,161 @@
+import hashlib
+import os
+import pytest
+
+from src.peer.content_store import ContentStore
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+def store_object(store, data, filename, cached=False):
+    file_hash = hashlib.sha256(data).hexdigest()
+    tmp_path = store.new_temp_path()
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    store.commit(tmp_path, file_hash, filename, cached=cached)
+    return file_hash
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_commit_uses_sharded_layout(tmp_path):
+    name = "test_commit_uses_sharded_layout"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    file_hash = store_object(store, b"ciphertext", "notes.txt")
+
+    path = store.lookup(file_hash=file_hash)
+    assert path == os.path.join(str(tmp_path), ".objects", file_hash[:2], file_hash[2:4], file_hash)
+    with open(path, "rb") as f:
+        assert f.read() == b"ciphertext"
+    assert store.has(file_hash)
+    assert store.lookup(file_hash="0" * 64) is None
+
+    print_footer(name)
+
+def test_duplicate_content_stored_once(tmp_path):
+    name = "test_duplicate_content_stored_once"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    file_hash = store_object(store, b"same bytes", "a.txt")
+    store.add_alias(file_hash, filename="b.txt")
+
+    [(listed_hash, meta)] = store.entries()
+    assert listed_hash == file_hash
+    assert meta["filenames"] == ["a.txt", "b.txt"]
+    assert meta["size"] == len(b"same bytes")
+
+    print_footer(name)
+
+def test_file_id_alias_survives_reload(tmp_path):
+    name = "test_file_id_alias_survives_reload"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    file_hash = store_object(store, b"payload", "report.pdf")
+    store.add_alias(file_hash, file_id="42")
+    assert store.lookup(file_id="42") == store.lookup(file_hash=file_hash)
+
+    reloaded = ContentStore(str(tmp_path))
+    assert reloaded.lookup(file_id="42") == store.lookup(file_hash=file_hash)
+    assert reloaded.entries()[0][1]["filenames"] == ["report.pdf"]
+    assert reloaded.lookup(file_id="7") is None
+
+    print_footer(name)
+
+def test_reload_removes_stale_partial_uploads(tmp_path):
+    name = "test_reload_removes_stale_partial_uploads"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    store_object(store, b"payload", "report.pdf")
+    stale, in_flight = store.new_temp_path(), store.new_temp_path()
+    for path in (stale, in_flight):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+    os.utime(stale, (0, 0)) # left behind by a peer that crashed long ago
+
+    ContentStore(str(tmp_path))
+    assert not os.path.exists(stale) and os.path.exists(in_flight)
+
+    print_footer(name)
+
+@pytest.mark.parametrize("value", ["", "abc", "../" + "a" * 61, "A" * 64])
+def test_rejects_malformed_hashes(value):
+    name = f"test_rejects_malformed_hashes[{value[:8]}]"
+    print_header(name)
+
+    assert not ContentStore.is_valid_hash(value)
+    assert ContentStore.is_valid_hash("ab" * 32)
+
+    print_footer(name)
+
+def test_iter_entries_pages_in_hash_order(tmp_path):
+    name = "test_iter_entries_pages_in_hash_order"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    hashes = sorted(store_object(store, bytes([i]), f"{i}.bin") for i in range(7))
+
+    assert [h for h, _ in store.iter_entries(batch_size=3)] == hashes
+    assert [h for h, _ in store.iter_entries(after=hashes[2], batch_size=2)] == hashes[3:]
+    assert [h for h, _ in ContentStore(str(tmp_path)).iter_entries()] == hashes # reloaded in order
+
+    print_footer(name)
+
+def test_cached_for_ids_are_not_lookup_aliases(tmp_path):
+    name = "test_cached_for_ids_are_not_lookup_aliases"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    cached = store_object(store, b"c" * 100, "c.bin", cached=True)
+    store.add_alias(cached, cached_for="7") # the uploader's claim
+    assert store.lookup(file_id="7") is None
+    assert ContentStore(str(tmp_path)).lookup(file_id="7") is None # nor after a reload
+    assert store.evict(0) == ["7"] # but the copy is withdrawn under it when evicted
+
+    print_footer(name)
+
+@pytest.mark.parametrize("policy", ["lru", "lfu"])
+def test_evict_removes_only_cached_copies(tmp_path, policy):
+    name = f"test_evict_removes_only_cached_copies[{policy}]"
+    print_header(name)
+
+    store = ContentStore(str(tmp_path))
+    owned = store_object(store, b"o" * 100, "mine.bin")
+    old = store_object(store, b"a" * 100, "a.bin", cached=True)
+    store.add_alias(old, file_id="1")
+    hot = store_object(store, b"b" * 100, "b.bin", cached=True)
+    store.add_alias(hot, file_id="2")
+    store.lookup(file_hash=hot)
+    store.lookup(file_hash=hot)
+    store.lookup(file_hash=old) # most recent access, but fewer hits than `hot`
+    new = store_object(store, b"c" * 100, "c.bin", cached=True)
+    assert store.cache_usage() == 300
+
+    evicted = store.evict(200, policy, keep=new)
+    gone = hot if policy == "lru" else old
+    assert evicted == ["2" if policy == "lru" else "1"]
+    assert not store.has(gone) and not os.path.exists(store.object_path(gone))
+    assert store.lookup(file_id=evicted[0]) is None
+    assert store.has(new) and store.has(owned)
+
+    store.evict(0, policy, keep=new) # the copy just cached and owned uploads stay
+    assert store.has(new) and store.has(owned) and store.cache_usage() == 100
+    store.pin(new)
+    assert store.evict(0, policy) == [] and store.has(new)
+    assert [h for h, _ in ContentStore(str(tmp_path)).entries()] == sorted([owned, new]) # reload sees no leftovers
+
+    print_footer(name)
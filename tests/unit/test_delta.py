@@ -0,0 +1,108 @@
+import os
+import random
+import pytest
+
+from src.utils import delta
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+KEY = "k" * 64
+BLOCK = 4096
+
+def apply(plan, base: bytes) -> bytes:
+    """What the peer does with a DeltaPlan."""
+    out = bytearray()
+    for op in plan.ops:
+        out += base[op[1]:op[1] + op[2]] if op[0] == delta.OP_COPY else b"".join(op[1])
+    return bytes(out)
+
+def signature_of(stored: bytes) -> delta.Signature:
+    offset = delta.read_trailer(stored[-delta.TRAILER.size:])
+    return delta.read_signature(stored[offset:-delta.TRAILER.size], KEY)
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_full_plan_round_trip():
+    name = "test_full_plan_round_trip"
+    print_header(name)
+
+    data = os.urandom(10 * BLOCK + 100)
+    plan = delta.plan_revision(data, KEY, block_size=BLOCK)
+    assert plan.is_full
+    stored = plan.stored_bytes()
+    assert len(stored) == plan.size and delta.decrypt_file(stored, KEY) == data
+    # one entry per full block; the short last block has none
+    signature = signature_of(stored)
+    assert signature.block_size == BLOCK and len(signature.entries) == 10
+    assert delta.decrypt_file(delta.plan_revision(b"", KEY, block_size=BLOCK).stored_bytes(), KEY) == b""
+
+    with pytest.raises(ValueError):
+        delta.decrypt_file(os.urandom(200), KEY)
+    with pytest.raises(ValueError):
+        delta.read_signature(stored[:40], KEY)
+
+    print_footer(name)
+
+def test_in_place_edit_sends_only_changed_blocks():
+    name = "test_in_place_edit_sends_only_changed_blocks"
+    print_header(name)
+
+    data = os.urandom(64 * BLOCK)
+    base = delta.plan_revision(data, KEY, block_size=BLOCK).stored_bytes()
+    edited = bytearray(data)
+    edited[10 * BLOCK + 5:13 * BLOCK - 7] = os.urandom(3 * BLOCK - 12) # three blocks
+    plan = delta.plan_revision(bytes(edited), KEY, signature_of(base))
+    assert not plan.is_full
+    assert plan.sent < 4 * BLOCK + 4096 # three blocks, the signature and record overhead
+    assert delta.decrypt_file(apply(plan, base), KEY) == edited
+
+    print_footer(name)
+
+def test_insertions_and_deletions_realign():
+    name = "test_insertions_and_deletions_realign"
+    print_header(name)
+
+    random.seed(7)
+    data = os.urandom(64 * BLOCK)
+    base = delta.plan_revision(data, KEY, block_size=BLOCK).stored_bytes()
+    edited = bytearray(data)
+    edited[5 * BLOCK + 123:5 * BLOCK + 123] = os.urandom(777)   # insertion shifts everything after it
+    del edited[40 * BLOCK + 1000:40 * BLOCK + 1500]              # and a deletion shifts it back a bit
+    ops = delta.match_blocks(bytes(edited), signature_of(base))
+    copies = sum(1 for op in ops if op[0] == "copy")
+    assert copies >= 64 - 4
+    plan = delta.plan_revision(bytes(edited), KEY, signature_of(base))
+    assert delta.decrypt_file(apply(plan, base), KEY) == edited
+
+    # a second revision matches against the first one's signature, literal records included
+    again = bytearray(edited)
+    again[30 * BLOCK:30 * BLOCK + 10] = b"x" * 10
+    second = apply(plan, base)
+    plan2 = delta.plan_revision(bytes(again), KEY, signature_of(second))
+    assert plan2.sent < 3 * BLOCK + 4096
+    assert delta.decrypt_file(apply(plan2, second), KEY) == again
+
+    print_footer(name)
+
+def test_new_data_is_sent_whole():
+    name = "test_new_data_is_sent_whole"
+    print_header(name)
+
+    base = delta.plan_revision(os.urandom(16 * BLOCK), KEY, block_size=BLOCK).stored_bytes()
+    unrelated = os.urandom(200 * BLOCK)
+    plan = delta.plan_revision(unrelated, KEY, signature_of(base))
+    assert plan.is_full and delta.decrypt_file(plan.stored_bytes(), KEY) == unrelated
+
+    print_footer(name)
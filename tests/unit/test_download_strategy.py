@@ -1,12 +1,18 @@
+import asyncio
 import os
 import tempfile
 import socket
 import json
+import threading
+import time
 import pytest
 
+from src.peer.bandwidth import BandwidthScheduler
 from src.peer.strategies.download_strategy import DownloadStrategy
+from src.peer.strategies.download_many_strategy import DownloadManyStrategy
 from src.utils.config import Config
 from src.utils.commands_enum import Commands
+from src.utils.framing import FramedReader, HEADER_SIZE, STATUS_ERROR, unpack_header
 
 # ─── Helpers & Decorators ────────────────────────────────────────────
 CYAN   = "\033[36m"
@@ -28,6 +34,16 @@ class DummySocket:
     def sendall(self, data):
         self.sent += data
 
+class DummyStreamWriter:
+    def __init__(self):
+        self.sent = b""
+    def write(self, data):
+        self.sent += data
+    async def drain(self):
+        pass
+    def get_extra_info(self, name, default=None):
+        return default
+
 # ─── Fixture: Setup a temp shared directory ────────────────────────────────
 @pytest.fixture
 def shared_dir(tmp_path, monkeypatch):
@@ -87,3 +103,205 @@ def test_execute_sends_file_and_done(shared_dir):
     assert str(Commands.DONE).encode() in sock.sent
 
     print_footer(name)
+
+def test_execute_async_sends_file_and_done(shared_dir, monkeypatch):
+    name = "test_execute_async_sends_file_and_done"
+    print_header(name)
+
+    # the fake writer has no transport for loop.sendfile(), so use the copying path
+    monkeypatch.setattr(Config, "PEER_ZERO_COPY_SEND", False)
+    ds = DownloadStrategy()
+    writer = DummyStreamWriter()
+    async def run():
+        await ds.execute_async(asyncio.StreamReader(), writer, file_id_str="1")
+    asyncio.run(run())
+
+    assert writer.sent == b"BBB" + str(Commands.DONE).encode()
+
+    print_footer(name)
+
+def test_execute_zero_copy_on_real_socket(shared_dir, monkeypatch):
+    name = "test_execute_zero_copy_on_real_socket"
+    print_header(name)
+
+    calls = []
+    real_sendfile = os.sendfile
+    def counting_sendfile(*args):
+        calls.append(args)
+        return real_sendfile(*args)
+    monkeypatch.setattr(os, "sendfile", counting_sendfile)
+
+    server_side, client_side = socket.socketpair()
+    DownloadStrategy().execute(server_side, file_id_str="1", version=2)
+    server_side.close()
+
+    reader = FramedReader(client_side)
+    header = reader.read_header()
+    assert bytes(reader.read_exactly(header.size)) == b"BBB"
+    assert calls # the kernel did the copy
+    client_side.close()
+
+    print_footer(name)
+
+def test_execute_async_zero_copy_on_real_socket(shared_dir):
+    name = "test_execute_async_zero_copy_on_real_socket"
+    print_header(name)
+
+    server_side, client_side = socket.socketpair()
+
+    async def run():
+        reader, writer = await asyncio.open_connection(sock=server_side)
+        await DownloadStrategy().execute_async(reader, writer, file_id_str="0")
+        writer.close()
+        await writer.wait_closed()
+    asyncio.run(run())
+
+    received = b""
+    while chunk := client_side.recv(1024):
+        received += chunk
+    assert received == b"AAA" + str(Commands.DONE).encode()
+    client_side.close()
+
+    print_footer(name)
+
+def test_execute_sends_requested_range(shared_dir, monkeypatch):
+    name = "test_execute_sends_requested_range"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "PEER_ZERO_COPY_SEND", False)
+    sock = DummySocket()
+    DownloadStrategy().execute(sock, file_id_str="1", version=2, options={"offset": "1", "length": "5"})
+    header = unpack_header(sock.sent[:HEADER_SIZE])
+    assert header.size == 2 and sock.sent[HEADER_SIZE:] == b"BB"
+
+    writer = DummyStreamWriter()
+    async def run():
+        await DownloadStrategy().execute_async(asyncio.StreamReader(), writer, file_id_str="0", version=2,
+                                               options={"offset": "2"})
+    asyncio.run(run())
+    assert unpack_header(writer.sent[:HEADER_SIZE]).size == 1 and writer.sent[HEADER_SIZE:] == b"A"
+
+    print_footer(name)
+
+def test_execute_rejects_bad_range(shared_dir):
+    name = "test_execute_rejects_bad_range"
+    print_header(name)
+
+    for options in ({"offset": "-1"}, {"offset": "4"}, {"length": "x"}):
+        sock = DummySocket()
+        DownloadStrategy().execute(sock, file_id_str="0", version=2, options=options)
+        assert unpack_header(sock.sent[:HEADER_SIZE]).status == STATUS_ERROR
+
+    print_footer(name)
+
+def test_execute_sends_empty_range_as_one_frame(shared_dir):
+    name = "test_execute_sends_empty_range_as_one_frame"
+    print_header(name)
+
+    # offset == size and length=0 are valid, empty ranges: an OK header for 0 bytes and nothing else
+    for options in ({"offset": "3"}, {"length": "0"}):
+        server_side, client_side = socket.socketpair()
+        DownloadStrategy().execute(server_side, file_id_str="1", version=2, options=options)
+        server_side.close()
+        received = b""
+        while chunk := client_side.recv(1024):
+            received += chunk
+        client_side.close()
+        header = unpack_header(received[:HEADER_SIZE])
+        assert header.status == 0 and header.size == 0 and len(received) == HEADER_SIZE
+
+        server_side, client_side = socket.socketpair()
+        async def run():
+            reader, writer = await asyncio.open_connection(sock=server_side)
+            await DownloadStrategy().execute_async(reader, writer, file_id_str="0", version=2, options=options)
+            writer.close()
+            await writer.wait_closed()
+        asyncio.run(run())
+        received = b""
+        while chunk := client_side.recv(1024):
+            received += chunk
+        client_side.close()
+        header = unpack_header(received[:HEADER_SIZE])
+        assert header.status == 0 and header.size == 0 and len(received) == HEADER_SIZE
+
+    print_footer(name)
+
+def test_execute_async_missing_file(shared_dir, monkeypatch):
+    name = "test_execute_async_missing_file"
+    print_header(name)
+
+    # an index entry whose file vanished is a "not found" error frame, as in the threaded path
+    monkeypatch.setattr(DownloadStrategy, "get_file_path",
+                        lambda self, *args: os.path.join(shared_dir, "gone.txt"))
+    writer = DummyStreamWriter()
+    async def run():
+        await DownloadStrategy().execute_async(asyncio.StreamReader(), writer, file_id_str="7", version=2)
+    asyncio.run(run())
+    header = unpack_header(writer.sent[:HEADER_SIZE])
+    assert header.status == STATUS_ERROR and writer.sent[HEADER_SIZE:] == b"File ID 7 not found"
+
+    print_footer(name)
+
+def test_stalled_client_cannot_hold_every_send_slot(shared_dir, monkeypatch):
+    name = "test_stalled_client_cannot_hold_every_send_slot"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "PEER_SEND_TIMEOUT", 2.0)
+    data = os.urandom(4 * 1024 * 1024)
+    with open(os.path.join(shared_dir, "c.bin"), "wb") as f:
+        f.write(data)
+    scheduler = BandwidthScheduler(policy="fifo", send_slots=4, quantum=256 * 1024)
+
+    # one host opens as many downloads as there are send slots and never reads them
+    stalled, results, pairs = [], [], []
+    for _ in range(scheduler.send_slots):
+        server_side, client_side = socket.socketpair()
+        pairs.append((server_side, client_side))
+        stalled.append(threading.Thread(target=lambda sock=server_side: results.append(
+            DownloadStrategy().execute(sock, file_id_str="2", version=2, bandwidth=scheduler, client_host="10.0.0.1"))))
+        stalled[-1].start()
+    while scheduler.stats()["sending"] < scheduler.client_slots:
+        time.sleep(0.01)
+
+    # another host's download still gets a slot and finishes long before the stalled ones time out
+    server_side, client_side = socket.socketpair()
+    client_side.settimeout(10) # without a free slot this download would never start
+    started = time.monotonic()
+    sender = threading.Thread(target=DownloadStrategy().execute, args=(server_side,),
+                              kwargs={"file_id_str": "2", "version": 2, "bandwidth": scheduler, "client_host": "10.0.0.2"})
+    sender.start()
+    reader = FramedReader(client_side)
+    header = reader.read_header()
+    assert bytes(reader.read_exactly(header.size)) == data
+    assert time.monotonic() - started < Config.PEER_SEND_TIMEOUT
+    sender.join(5)
+
+    # the stalled transfers time out and give their slots back
+    for thread in stalled:
+        thread.join(10)
+    assert results == [False] * scheduler.send_slots
+    assert scheduler.stats()["sending"] == 0
+    for pair in pairs + [(server_side, client_side)]:
+        for sock in pair:
+            sock.close()
+
+    print_footer(name)
+
+def test_download_many_sends_files_back_to_back(shared_dir):
+    name = "test_download_many_sends_files_back_to_back"
+    print_header(name)
+
+    sock = DummySocket()
+    DownloadManyStrategy().execute(sock, file_ids=["1", "9", "0"], version=2, options={"hashes": ",,"})
+    frames, data = [], sock.sent
+    while data:
+        header = unpack_header(data[:HEADER_SIZE])
+        frames.append((header.status, data[HEADER_SIZE:HEADER_SIZE + header.size]))
+        data = data[HEADER_SIZE + header.size:]
+    # a missing file is an error frame in its place; the batch goes on
+    assert frames[0] == (0, b"BBB") and frames[2] == (0, b"AAA")
+    assert frames[1][0] == STATUS_ERROR and b"not found" in frames[1][1]
+
+    assert DownloadManyStrategy().execute(DummySocket(), file_ids="0") is False # legacy clients cannot batch
+
+    print_footer(name)
@@ -1,9 +1,11 @@
 import os
 import json
+import socket
 import pytest
 
 from src.client.fileshare_client import FileShareClient
 from src.utils.commands_enum import Commands
+from src.utils.config import Config
 
 # ─── Helpers & Fakes ─────────────────────────────────────────────────────────────
 
@@ -37,7 +39,7 @@ class DummyPeer:
 def client(monkeypatch):
     """Return a FileShareClient with its socket connector stubbed out."""
     c = FileShareClient()
-    monkeypatch.setattr(c, "_connect_socket", lambda a, p: DummySocket())
+    monkeypatch.setattr(c, "_connect_socket", lambda a, p, record=True: DummySocket())
     return c
 
 # ─── Decorative Print Helpers ────────────────────────────────────────────────────
@@ -61,7 +63,7 @@ def print_warning(msg):
 # ─── Unit Tests ──────────────────────────────────────────────────────────────────
 def test_register_user_success(monkeypatch, client, capsys):
     print_header("test_register_user_success")
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(b'{"status": "OK"}'))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(b'{"status": "OK"}'))
     client.peer_address = ("127.0.0.1", 5000)
     assert client.register_user("u", "p") is True
     assert "Registration successful" in capsys.readouterr().out
@@ -69,7 +71,7 @@ def test_register_user_success(monkeypatch, client, capsys):
 
 def test_register_user_failure(monkeypatch, client, capsys):
     print_header("test_register_user_failure")
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(b'{"status": "ERROR", "message": "duplicate"}'))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(b'{"status": "ERROR", "message": "duplicate"}'))
     client.peer_address = ("127.0.0.1", 5000)
     assert not client.register_user("u", "p")
     assert "Registration failed" in capsys.readouterr().out
@@ -79,7 +81,7 @@ def test_register_user_failure(monkeypatch, client, capsys):
 def test_login_user_success(monkeypatch, client, capsys):
     print_header("test_login_user_success")
     mock_reply = {"status": "OK", "session_id": "abc", "key": "somekey"}
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(json.dumps(mock_reply).encode()))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(json.dumps(mock_reply).encode()))
     client.peer_address = ("127.0.0.1", 5000)
     assert client.login_user("u", "p") is True
     assert client.session_id == "abc" and client.key == "somekey"
@@ -88,7 +90,7 @@ def test_login_user_success(monkeypatch, client, capsys):
 
 def test_login_user_failure(monkeypatch, client, capsys):
     print_header("test_login_user_failure")
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(b'{"status": "ERROR", "message": "invalid"}'))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(b'{"status": "ERROR", "message": "invalid"}'))
     client.peer_address = ("127.0.0.1", 5000)
     assert not client.login_user("u", "x")
     out = capsys.readouterr().out
@@ -101,7 +103,7 @@ def test_get_peers(monkeypatch, client):
     client.session_id = "abc"
     client.peer_address = ("2.2.2.2", 2000)
     peer_list = [["1.1.1.1", 1000], ["2.2.2.2", 2000]]
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(json.dumps(peer_list).encode()))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(json.dumps(peer_list).encode()))
     assert client.get_peers() == [("1.1.1.1", 1000)]
     print_footer("test_get_peers")
 
@@ -110,7 +112,7 @@ def test_register_file_with_registry(monkeypatch, client):
     client.session_id = "abc"
     client.username = "user"
     client.peer_address = ("1.2.3.4", 4321)
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(b'{"status": "OK", "file_id": 77}'))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(b'{"status": "OK", "file_id": 77}'))
     assert client.register_file_with_registry("test.txt", "hash123") == 77
     print_footer("test_register_file_with_registry")
 
@@ -118,7 +120,7 @@ def test_get_files_from_registry(monkeypatch, client):
     print_header("test_get_files_from_registry")
     client.session_id = "abc"
     mock_files = {"file_1": {"filename": "a.txt"}}
-    monkeypatch.setattr(client, "_connect_socket", lambda a, p: DummySocket(json.dumps(mock_files).encode()))
+    monkeypatch.setattr(client, "_connect_socket", lambda a, p, record=True: DummySocket(json.dumps(mock_files).encode()))
     assert client.get_files_from_registry()["file_1"]["filename"] == "a.txt"
     print_footer("test_get_files_from_registry")
 
@@ -151,4 +153,37 @@ def test_start_peer_thread(monkeypatch, client):
     monkeypatch.setattr("src.client.fileshare_client.FileSharePeer", DummyPeer)
     assert client.start_peer_thread() is True
     assert client.peer_address[1] == 12345
-    print_footer("test_start_peer_thread")
\ No newline at end of file
+    print_footer("test_start_peer_thread")
+def test_silent_peer_times_out(monkeypatch):
+    print_header("test_silent_peer_times_out")
+    monkeypatch.setattr(Config, "CLIENT_READ_TIMEOUT", 0.2)
+    # the kernel completes the connect, but nobody ever answers the request
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    address = server.getsockname()
+    c = FileShareClient()
+    try:
+        with pytest.raises(ConnectionError, match="timed out"):
+            c.fetch_range(address, "0", 0)
+        assert c.peer_table.snapshot()[address]["failures"] > 0
+        assert c.connection_pool.stats()["idle"] == 0 # the silent connection is not pooled
+    finally:
+        c.close_connections()
+        server.close()
+    print_footer("test_silent_peer_times_out")
+
+def test_registry_connections_stay_out_of_peer_table():
+    print_header("test_registry_connections_stay_out_of_peer_table")
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    address = server.getsockname()
+    c = FileShareClient()
+    sock = c._connect_socket(*address, record=False)
+    assert sock is not None
+    sock.close()
+    server.close()
+    assert c._connect_socket(*address, record=False) is None # nothing listens there any more
+    assert c.peer_table.snapshot() == {} # neither the connect nor the failure is a peer sample
+    print_footer("test_registry_connections_stay_out_of_peer_table")
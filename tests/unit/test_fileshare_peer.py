@@ -1,10 +1,17 @@
 # tests/unit/test_fileshare_peer.py
+import asyncio
+import json
 import socket
 import pytest
 
 import src.peer.fileshare_peer as peer_module
 from src.utils.commands_enum import Commands
 from src.peer.command_factory import CommandFactory
+from src.peer.admission import AdmissionController
+from src.peer.bandwidth import BandwidthScheduler
+from src.peer.multipart import MultipartUploads
+from src.peer.telemetry import PeerTelemetry
+from src.utils.framing import HEADER_SIZE, STATUS_BUSY, unpack_header
 
 # ─── Decorative Print Helpers ────────────────────────────────
 CYAN   = "\033[36m"
@@ -72,6 +79,39 @@ class DummyClientConn:
     def close(self):
         self.closed = True
 
+class DummyStreamWriter:
+    """Simulates an asyncio StreamWriter for handle_client_connection_async()."""
+    def __init__(self):
+        self.sent = b""
+        self.closed = False
+
+    def get_extra_info(self, name):
+        return ('127.0.0.1', 4444) if name == 'peername' else None
+
+    def write(self, data):
+        self.sent += data
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    async def wait_closed(self):
+        pass
+
+def run_async_connection(peer, data):
+    """Feeds `data` through handle_client_connection_async() and returns the writer."""
+    async def run():
+        peer._connection_slots = asyncio.Semaphore(1)
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        writer = DummyStreamWriter()
+        await peer.handle_client_connection_async(reader, writer)
+        return writer
+    return asyncio.run(run())
+
 # ─── Tests ────────────────────────────────────────────────────
 
 def test_init_picks_ephemeral_port(monkeypatch):
@@ -88,17 +128,21 @@ def test_init_picks_ephemeral_port(monkeypatch):
 
     print_footer(name)
 
-def test_handle_unknown_command(capsys):
+def test_handle_unknown_command(caplog):
     name = "test_handle_unknown_command"
     print_header(name)
 
     # Bypass __init__
     peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController()
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
 
     conn = DummyClientConn([b"FOO\n"])
     peer.handle_client_connection(conn, ('1.2.3.4', 1111))
 
-    out = capsys.readouterr().out
+    out = caplog.text
     assert "unknown command" in out.lower() or "no handler" in out.lower()
     assert conn.closed
 
@@ -120,6 +164,10 @@ def test_handle_upload_invokes_strategy():
                        lambda cmd: FakeUpload() if cmd == Commands.UPLOAD else None)
 
     peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController()
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
     conn = DummyClientConn([b"UPLOAD\n", b"myfile.txt\n"])
     peer.handle_client_connection(conn, ('1.2.3.4', 2222))
 
@@ -129,6 +177,34 @@ def test_handle_upload_invokes_strategy():
 
     print_footer(name)
 
+def test_handle_upload_keeps_payload_read_with_header():
+    name = "test_handle_upload_keeps_payload_read_with_header"
+    print_header(name)
+
+    called = {}
+    class FakeUpload:
+        def execute(self, client_socket, **kwargs):
+            reader = kwargs['reader']
+            called['payload'] = reader.recv(1024) + reader.recv(1024)
+
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(CommandFactory, "get_command_handler",
+                       lambda cmd: FakeUpload() if cmd == Commands.UPLOAD else None)
+
+    peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController()
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
+    # header and the first payload bytes arrive in the same read
+    conn = DummyClientConn([b"UPLOAD\nmyfile.txt\nhello ", b"world"])
+    peer.handle_client_connection(conn, ('1.2.3.4', 2222))
+
+    assert called['payload'] == b"hello world"
+    monkeypatch.undo()
+
+    print_footer(name)
+
 def test_handle_download_invokes_strategy():
     name = "test_handle_download_invokes_strategy"
     print_header(name)
@@ -145,6 +221,10 @@ def test_handle_download_invokes_strategy():
                        lambda cmd: FakeDownload() if cmd == Commands.DOWNLOAD else None)
 
     peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController()
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
     conn = DummyClientConn([b"DOWNLOAD\n", b"42\n"])
     peer.handle_client_connection(conn, ('5.6.7.8', 3333))
 
@@ -153,3 +233,112 @@ def test_handle_download_invokes_strategy():
     monkeypatch.undo()
 
     print_footer(name)
+
+def test_async_handle_download_invokes_strategy():
+    name = "test_async_handle_download_invokes_strategy"
+    print_header(name)
+
+    called = {}
+    class FakeDownload:
+        async def execute_async(self, reader, writer, **kwargs):
+            called['writer'] = writer
+            called['file_id_str'] = kwargs.get('file_id_str')
+
+    monkeypatch = pytest.MonkeyPatch()
+    monkeypatch.setattr(CommandFactory, "get_command_handler",
+                       lambda cmd: FakeDownload() if cmd == Commands.DOWNLOAD else None)
+
+    peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController()
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
+    writer = run_async_connection(peer, b"DOWNLOAD\n42\n")
+
+    assert called['writer'] is writer
+    assert called['file_id_str'] == "42"
+    assert writer.closed
+    monkeypatch.undo()
+
+    print_footer(name)
+
+def test_async_get_peer_files_over_loopback(tmp_path, monkeypatch):
+    name = "test_async_get_peer_files_over_loopback"
+    print_header(name)
+
+    (tmp_path / "a.txt").write_text("AAA")
+    monkeypatch.setattr(peer_module.Config, "SHARED_FILES_DIR", str(tmp_path))
+
+    async def run():
+        peer = peer_module.FileSharePeer(requested_port=0)
+        server = asyncio.create_task(peer.serve_async())
+        await asyncio.sleep(0.05)
+        reader, writer = await asyncio.open_connection(peer.host, peer.port)
+        writer.write(f"{Commands.GET_PEER_FILES}\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        server.cancel()
+        peer.peer_socket.close()
+        return response
+
+    response = asyncio.run(run())
+    assert b'"filename": "a.txt"' in response and b'"size": 3' in response
+
+    print_footer(name)
+
+def test_saturated_peer_replies_busy(monkeypatch):
+    name = "test_saturated_peer_replies_busy"
+    print_header(name)
+
+    peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController(max_active=1, max_queued=0, max_per_client=4, queue_timeout=0)
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
+    assert peer.admission.acquire("10.0.0.9") # another client holds the only slot
+
+    strategy = CommandFactory._strategies[Commands.DOWNLOAD]
+    monkeypatch.setattr(strategy, "execute", lambda **kwargs: pytest.fail("transfer should not start"))
+
+    conn = DummyClientConn([b"DOWNLOAD/2\n0\n"])
+    peer.handle_client_connection(conn, ('1.2.3.4', 1111))
+
+    header = unpack_header(conn.sent[:HEADER_SIZE])
+    assert header.status == STATUS_BUSY
+    assert float(conn.sent[HEADER_SIZE:HEADER_SIZE + header.size]) > 0
+    assert peer.admission.stats()["rejected_queue_full"] == 1
+
+    conn = DummyClientConn([b"DOWNLOAD\n0\n"])
+    peer.handle_client_connection(conn, ('1.2.3.4', 1111))
+    assert conn.sent.startswith(b"BUSY ")
+
+    print_footer(name)
+
+def test_stats_reports_requests_and_failures(monkeypatch):
+    name = "test_stats_reports_requests_and_failures"
+    print_header(name)
+
+    peer = peer_module.FileSharePeer.__new__(peer_module.FileSharePeer)
+    peer.admission = AdmissionController()
+    peer.bandwidth = BandwidthScheduler()
+    peer.telemetry = PeerTelemetry()
+    peer.multipart = MultipartUploads()
+    strategy = CommandFactory._strategies[Commands.DOWNLOAD]
+    monkeypatch.setattr(strategy, "execute", lambda **kwargs: False) # broke off mid-transfer
+
+    peer.handle_client_connection(DummyClientConn([b"NOPE/3\n"]), ('1.2.3.4', 1111))
+    peer.handle_client_connection(DummyClientConn([b"DOWNLOAD/3\n0 id=1\n"]), ('1.2.3.4', 1111))
+    conn = DummyClientConn([b"STATS/3\nid=2\n"])
+    peer.handle_client_connection(conn, ('1.2.3.4', 1111))
+
+    reply = unpack_header(conn.sent[:HEADER_SIZE]) # REPLY frame carrying the request id
+    body = conn.sent[HEADER_SIZE + reply.size:]
+    header = unpack_header(body[:HEADER_SIZE])
+    stats = json.loads(body[HEADER_SIZE:HEADER_SIZE + header.size])
+    assert stats["connections"] == {"accepted": 3, "active": 1}
+    assert stats["commands"]["DOWNLOAD"]["count"] == 1
+    assert stats["failures"] == {"unknown_command": 1, "DOWNLOAD_aborted": 1}
+    assert stats["admission"]["admitted"] == 1 and "bandwidth" in stats
+
+    print_footer(name)
@@ -0,0 +1,180 @@
+import pytest
+
+from src.utils.framing import (FramedReader, MAX_HEADER_LINE, HEADER_SIZE, PROTOCOL_VERSION,
+                               FLAG_STREAM, STATUS_ERROR, pack_header, pack_error, pack_stream_frame, unpack_header,
+                               format_command, split_command, format_arguments, parse_arguments)
+from src.utils.commands_enum import Commands
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Fakes ────────────────────────────────────────────────────
+
+class CountingSocket:
+    """Returns predefined chunks and counts recv() calls."""
+    def __init__(self, chunks):
+        self._chunks = chunks[:]
+        self.recv_calls = 0
+
+    def recv(self, bufsize):
+        self.recv_calls += 1
+        data = self._chunks.pop(0) if self._chunks else b""
+        if len(data) > bufsize: # like a real socket, never return more than asked for
+            self._chunks.insert(0, data[bufsize:])
+            data = data[:bufsize]
+        return data
+
+    def recv_into(self, buffer, nbytes):
+        data = self.recv(nbytes)
+        buffer[:len(data)] = data
+        return len(data)
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_header_lines_parsed_from_one_recv():
+    name = "test_header_lines_parsed_from_one_recv"
+    print_header(name)
+
+    sock = CountingSocket([b"UPLOAD\nreport.pdf\n"])
+    reader = FramedReader(sock)
+    assert reader.readline() == b"UPLOAD\n"
+    assert reader.readline() == b"report.pdf\n"
+    assert sock.recv_calls == 1
+
+    print_footer(name)
+
+def test_payload_after_header_is_kept():
+    name = "test_payload_after_header_is_kept"
+    print_header(name)
+
+    sock = CountingSocket([b"UPLOAD\nreport.pdf\nPAY", b"LOAD"])
+    reader = FramedReader(sock)
+    reader.readline(); reader.readline()
+    assert reader.pending == 3
+    assert reader.recv(1024) == b"PAY"
+    assert reader.recv(1024) == b"LOAD"
+    assert reader.recv(1024) == b""
+
+    print_footer(name)
+
+def test_line_split_across_reads():
+    name = "test_line_split_across_reads"
+    print_header(name)
+
+    reader = FramedReader(CountingSocket([b"DOWN", b"LOAD\n4", b"2\n"]))
+    assert reader.readline() == b"DOWNLOAD\n"
+    assert reader.readline() == b"42\n"
+
+    print_footer(name)
+
+def test_eof_before_newline_returns_none():
+    name = "test_eof_before_newline_returns_none"
+    print_header(name)
+
+    reader = FramedReader(CountingSocket([b"GET_PEER"]))
+    assert reader.readline() is None
+
+    print_footer(name)
+
+def test_oversized_header_rejected():
+    name = "test_oversized_header_rejected"
+    print_header(name)
+
+    reader = FramedReader(CountingSocket([b"A" * (MAX_HEADER_LINE + 1)]))
+    with pytest.raises(ValueError):
+        reader.readline()
+
+    print_footer(name)
+
+def test_header_round_trip():
+    name = "test_header_round_trip"
+    print_header(name)
+
+    data = pack_header(1 << 40, flags=3)
+    assert len(data) == HEADER_SIZE
+    header = unpack_header(data)
+    assert (header.version, header.status, header.flags, header.size) == (PROTOCOL_VERSION, 0, 3, 1 << 40)
+    with pytest.raises(ValueError):
+        unpack_header(b"X" * HEADER_SIZE)
+
+    print_footer(name)
+
+def test_read_header_and_payload_without_decoding():
+    name = "test_read_header_and_payload_without_decoding"
+    print_header(name)
+
+    payload = b"DONE" * 10 + bytes(range(256))
+    stream = pack_header(len(payload)) + payload + b"trailing"
+    reader = FramedReader(CountingSocket([stream[:5], stream[5:40], stream[40:]]))
+    header = reader.read_header()
+    assert b"".join(reader.iter_payload(header.size, chunk_size=7)) == payload
+    assert reader.recv(1024) == b"trailing"
+
+    print_footer(name)
+
+def test_read_header_none_on_immediate_eof_and_error_frames():
+    name = "test_read_header_none_on_immediate_eof_and_error_frames"
+    print_header(name)
+
+    assert FramedReader(CountingSocket([])).read_header() is None
+
+    reader = FramedReader(CountingSocket([pack_error("nope")]))
+    header = reader.read_header()
+    assert header.status == STATUS_ERROR
+    assert bytes(reader.read_exactly(header.size)) == b"nope"
+
+    print_footer(name)
+
+def test_stream_frames_until_empty_frame():
+    name = "test_stream_frames_until_empty_frame"
+    print_header(name)
+
+    data = pack_stream_frame(b"one\n") + pack_stream_frame(b"two\n") + pack_stream_frame(b"") + b"next"
+    reader = FramedReader(CountingSocket([data[:5], data[5:]]))
+    header = reader.read_header()
+    assert header.flags & FLAG_STREAM
+    assert [bytes(p) for p in reader.iter_stream(header)] == [b"one\n", b"two\n"]
+    assert reader.recv(1024) == b"next"
+
+    # an error frame ends the stream with the peer's message; EOF before the end frame is an error too
+    reader = FramedReader(CountingSocket([pack_stream_frame(b"a\n") + pack_error("disk gone")]))
+    with pytest.raises(RuntimeError, match="disk gone"):
+        list(reader.iter_stream(reader.read_header()))
+    reader = FramedReader(CountingSocket([pack_stream_frame(b"a\n")]))
+    with pytest.raises(ConnectionError):
+        list(reader.iter_stream(reader.read_header()))
+
+    print_footer(name)
+
+def test_versioned_command_tokens():
+    name = "test_versioned_command_tokens"
+    print_header(name)
+
+    assert format_command(Commands.DOWNLOAD, 2) == "DOWNLOAD/2"
+    assert format_command(Commands.DOWNLOAD, 1) == "DOWNLOAD"
+    assert split_command("DOWNLOAD/2") == ("DOWNLOAD", 2)
+    assert split_command("UPLOAD") == ("UPLOAD", 1)
+
+    print_footer(name)
+
+def test_argument_line_round_trip():
+    name = "test_argument_line_round_trip"
+    print_header(name)
+
+    line = format_arguments("my file=v2.txt", hash="ab" * 32, offset=None)
+    assert line == "my%20file%3Dv2.txt hash=" + "ab" * 32
+    assert parse_arguments(line) == (["my file=v2.txt"], {"hash": "ab" * 32})
+    assert parse_arguments("") == ([], {})
+
+    print_footer(name)
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import pytest
+
+from src.peer.content_store import ContentStore
+from src.peer.strategies.get_peer_files_strategy import GetPeerFilesStrategy
+from src.utils.config import Config
+from src.utils.framing import FLAG_STREAM, HEADER_SIZE, unpack_header
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+def split_frames(data):
+    """Splits concatenated frames into [(header, payload), ...]."""
+    frames = []
+    while data:
+        header = unpack_header(data[:HEADER_SIZE])
+        frames.append((header, data[HEADER_SIZE:HEADER_SIZE + header.size]))
+        data = data[HEADER_SIZE + header.size:]
+    return frames
+
+# ─── Fixture ──────────────────────────────────────────────────
+
+@pytest.fixture
+def shared(tmp_path):
+    for i in range(5):
+        (tmp_path / f"file{i}.txt").write_bytes(b"x" * (i * 10))
+    (tmp_path / ".hidden").write_text("not listed")
+    store = ContentStore.for_directory(str(tmp_path))
+    data = b"stored object"
+    tmp = store.new_temp_path()
+    with open(tmp, "wb") as f:
+        f.write(data)
+    store.commit(tmp, hashlib.sha256(data).hexdigest(), "file9.bin")
+    return str(tmp_path)
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_pages_cover_directory_and_store_once(shared):
+    name = "test_pages_cover_directory_and_store_once"
+    print_header(name)
+
+    strategy = GetPeerFilesStrategy()
+    names, cursor = [], None
+    while True:
+        [(header, body)] = split_frames(b"".join(strategy.iter_reply(shared, {"cursor": cursor, "limit": "2"}, 3)))
+        page = json.loads(body)
+        names += [entry["filename"] for entry in page["files"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert names == [entry["filename"] for entry in strategy.list_shared_files(shared)]
+    assert names == [f"file{i}.txt" for i in range(5)] + ["file9.bin"]
+
+    print_footer(name)
+
+def test_filters_and_ndjson_stream(shared, monkeypatch):
+    name = "test_filters_and_ndjson_stream"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "CHUNK_SIZE", 40)
+    strategy = GetPeerFilesStrategy()
+    frames = split_frames(b"".join(strategy.iter_reply(shared, {"format": "ndjson", "min_size": "10", "max_size": "30"}, 3)))
+    assert len(frames) > 2 and all(header.flags & FLAG_STREAM for header, _ in frames)
+    assert frames[-1][1] == b""
+    lines = [json.loads(line) for _, payload in frames for line in payload.splitlines()]
+    assert [entry["filename"] for entry in lines[:-1]] == ["file1.txt", "file2.txt", "file3.txt", "file9.bin"]
+    assert lines[-1] == {"next_cursor": None, "count": 4}
+
+    frames = split_frames(b"".join(strategy.iter_reply(shared, {"format": "ndjson", "prefix": "file1", "limit": "1"}, 3)))
+    assert [json.loads(line) for line in frames[0][1].splitlines()] == [
+        {"filename": "file1.txt", "size": 10}, {"next_cursor": None, "count": 1}]
+
+    print_footer(name)
+
+@pytest.mark.parametrize("options", [{"cursor": "x:1"}, {"limit": "-1"}, {"min_size": "big"}, {"format": "xml"}])
+def test_malformed_options_rejected(options):
+    name = "test_malformed_options_rejected"
+    print_header(name)
+
+    with pytest.raises(ValueError):
+        GetPeerFilesStrategy().parse_query(options)
+
+    print_footer(name)
@@ -0,0 +1,81 @@
+import io
+import json
+import logging
+import threading
+import pytest
+
+from src.utils import logging_utils
+from src.utils.logging_utils import get_logger, setup_logging, stop_logging
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Fixture: restore the default (unconfigured) logging setup ──
+
+@pytest.fixture(autouse=True)
+def reset_logging():
+    yield
+    stop_logging()
+    root = logging.getLogger(logging_utils.ROOT_LOGGER)
+    root.handlers = []
+    root.propagate = True
+    root.setLevel(logging.NOTSET)
+
+class Expensive:
+    """Records which thread formatted it, if any."""
+    def __init__(self):
+        self.formatted_in = None
+
+    def __str__(self):
+        self.formatted_in = threading.current_thread()
+        return "expensive"
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_records_are_formatted_on_the_listener_thread():
+    name = "test_records_are_formatted_on_the_listener_thread"
+    print_header(name)
+
+    out = io.StringIO()
+    setup_logging("INFO", "text", out)
+    logger = get_logger("test")
+    skipped, logged = Expensive(), Expensive()
+    logger.debug("Value %s", skipped)
+    logger.info("Value %s", logged, extra={"client": "1.2.3.4"})
+    stop_logging() # drains the queue
+
+    assert skipped.formatted_in is None # level disabled: never formatted
+    assert logged.formatted_in not in (None, threading.current_thread())
+    line, = out.getvalue().splitlines()
+    assert "INFO" in line and "ciphershare.test: Value expensive client=1.2.3.4" in line
+
+    print_footer(name)
+
+def test_json_format_and_validation():
+    name = "test_json_format_and_validation"
+    print_header(name)
+
+    out = io.StringIO()
+    setup_logging("DEBUG", "json", out)
+    get_logger("test").debug("Sent %d files", 3, extra={"user": "moamen"})
+    stop_logging()
+    entry = json.loads(out.getvalue())
+    assert entry["level"] == "DEBUG" and entry["msg"] == "Sent 3 files" and entry["user"] == "moamen"
+
+    with pytest.raises(ValueError):
+        setup_logging("INFO", "xml")
+    with pytest.raises(ValueError):
+        setup_logging("LOUD", "text")
+
+    print_footer(name)
@@ -0,0 +1,87 @@
+import os
+import pytest
+
+from src.utils import merkle
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+CHUNK = 4096
+DATA = os.urandom(5 * CHUNK + 123) # six chunks, the last one short
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_root_changes_with_any_chunk(tmp_path):
+    name = "test_root_changes_with_any_chunk"
+    print_header(name)
+
+    leaves = merkle.leaf_hashes(DATA, CHUNK)
+    assert len(leaves) == 6
+    root = merkle.merkle_root(leaves)
+    path = tmp_path / "blob"
+    path.write_bytes(DATA)
+    assert merkle.file_leaf_hashes(str(path), CHUNK) == leaves
+    assert merkle.unpack_leaves(merkle.pack_leaves(leaves)) == leaves
+
+    for index in range(6):
+        tampered = bytearray(DATA)
+        tampered[index * CHUNK] ^= 0xFF
+        assert merkle.merkle_root(merkle.leaf_hashes(bytes(tampered), CHUNK)) != root
+    assert merkle.merkle_root(merkle.leaf_hashes(b"", CHUNK)) == merkle.merkle_root([merkle.leaf_hash(b"")])
+
+    print_footer(name)
+
+def test_leaves_must_match_root_and_size():
+    name = "test_leaves_must_match_root_and_size"
+    print_header(name)
+
+    leaves = merkle.leaf_hashes(DATA, CHUNK)
+    root = merkle.merkle_root(leaves)
+    assert merkle.ChunkVerifier.from_leaves(leaves, root, CHUNK, len(DATA)).bad_chunks_in(0, DATA) == []
+
+    forged = list(leaves)
+    forged[2] = merkle.leaf_hash(b"forged")
+    with pytest.raises(ValueError, match="Merkle root"):
+        merkle.ChunkVerifier.from_leaves(forged, root, CHUNK, len(DATA))
+    with pytest.raises(ValueError, match="chunk hashes"):
+        merkle.ChunkVerifier.from_leaves(leaves, root, CHUNK, len(DATA) + CHUNK)
+    with pytest.raises(ValueError):
+        merkle.unpack_leaves(b"x" * 33)
+
+    print_footer(name)
+
+def test_stream_flags_only_corrupt_chunks():
+    name = "test_stream_flags_only_corrupt_chunks"
+    print_header(name)
+
+    leaves = merkle.leaf_hashes(DATA, CHUNK)
+    verifier = merkle.ChunkVerifier(leaves, CHUNK, len(DATA))
+    tampered = bytearray(DATA)
+    tampered[CHUNK + 7] ^= 0x01
+    tampered[-1] ^= 0x01
+
+    # resumed 100 bytes into chunk 1, fed in uneven pieces
+    offset = CHUNK + 100
+    check = verifier.stream(offset, bytes(tampered[CHUNK:offset]))
+    for i in range(offset, len(tampered), 1000):
+        check.update(bytes(tampered[i:i + 1000]))
+    assert verifier.bad_chunks == {1, 5}
+
+    assert verifier.bad_chunks_in(2 * CHUNK, bytes(tampered[2 * CHUNK:])) == [5]
+    offset, length = verifier.chunk_range(5)
+    assert (offset, length) == (5 * CHUNK, 123)
+    assert verifier.check_chunk(5, DATA[offset:offset + length])
+    assert not verifier.check_chunk(5, DATA[offset:offset + length - 1])
+
+    print_footer(name)
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import threading
+import time
+import pytest
+
+import src.peer.multipart as multipart_module
+from src.peer.content_store import ContentStore
+from src.peer.multipart import MultipartUploads
+from src.utils.config import Config
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "SHARED_FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(Config, "PEER_UPLOAD_FSYNC", False)
+    return ContentStore(str(tmp_path))
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_parts_in_any_order_make_the_file(store):
+    name = "test_parts_in_any_order_make_the_file"
+    print_header(name)
+
+    data = os.urandom(1000)
+    file_hash = hashlib.sha256(data).hexdigest()
+    uploads = MultipartUploads()
+    upload = uploads.join("10.0.0.1", "u1", store, len(data), "big.bin", file_hash)
+    assert uploads.join("10.0.0.1", "u1", store, len(data), "big.bin", file_hash) is upload
+    assert uploads.join("10.0.0.2", "u1", store, len(data), "big.bin", file_hash) is not upload # another client's upload
+    with pytest.raises(ValueError):
+        uploads.join("10.0.0.1", "u1", store, 999, "big.bin", file_hash)
+
+    for offset in (600, 0, 600): # the last part is sent twice (a retry)
+        upload.write(offset, data[offset:offset + 400 if offset == 600 else 600])
+        done = upload.part_done(offset, 400 if offset == 600 else 600)
+    assert done
+    uploads.complete("10.0.0.1", "u1", store)
+    assert open(store.lookup(file_hash=file_hash), "rb").read() == data
+    assert len(uploads) == 1
+
+    print_footer(name)
+
+def test_overlapping_parts_do_not_complete_early(store):
+    name = "test_overlapping_parts_do_not_complete_early"
+    print_header(name)
+
+    data = os.urandom(1000)
+    file_hash = hashlib.sha256(data).hexdigest()
+    uploads = MultipartUploads()
+    upload = uploads.join("10.0.0.1", "u1", store, len(data), "big.bin", file_hash)
+
+    # 0-600 and 200-600 add up to the size but leave 600-1000 unwritten
+    upload.write(0, data[:600])
+    assert not upload.part_done(0, 600)
+    upload.write(200, data[200:600])
+    assert not upload.part_done(200, 400)
+    upload.write(500, data[500:])
+    assert upload.part_done(500, 500)
+    uploads.complete("10.0.0.1", "u1", store)
+    assert open(store.lookup(file_hash=file_hash), "rb").read() == data
+
+    print_footer(name)
+
+def test_abandoned_upload_is_discarded(store):
+    name = "test_abandoned_upload_is_discarded"
+    print_header(name)
+
+    uploads = MultipartUploads(timeout=0)
+    stale = uploads.join("10.0.0.1", "old", store, 10, "a.bin", "ab" * 32)
+    stale.write(0, b"12345")
+    uploads.join("10.0.0.1", "new", store, 10, "b.bin", "cd" * 32)
+    assert not os.path.exists(stale.tmp_path)
+    assert len(uploads) == 1
+
+    print_footer(name)
+
+def test_upload_size_and_count_are_bounded(store):
+    name = "test_upload_size_and_count_are_bounded"
+    print_header(name)
+
+    uploads = MultipartUploads(max_size=1000, max_per_client=2)
+    with pytest.raises(ValueError, match="exceeds"):
+        uploads.join("10.0.0.1", "huge", store, 1001, "a.bin", "ab" * 32)
+    uploads.join("10.0.0.1", "u1", store, 10, "a.bin", "ab" * 32)
+    uploads.join("10.0.0.1", "u2", store, 10, "b.bin", "cd" * 32)
+    uploads.join("10.0.0.1", "u2", store, 10, "b.bin", "cd" * 32) # a further part of an upload in progress
+    with pytest.raises(ValueError, match="Too many"):
+        uploads.join("10.0.0.1", "u3", store, 10, "c.bin", "ef" * 32)
+    uploads.join("10.0.0.2", "u3", store, 10, "c.bin", "ef" * 32) # other hosts are not affected
+    assert len(uploads) == 3
+    assert len(os.listdir(os.path.join(store.root, "tmp"))) == 3
+
+    print_footer(name)
+
+def test_abandoned_upload_is_swept_on_a_timer(store, monkeypatch):
+    name = "test_abandoned_upload_is_swept_on_a_timer"
+    print_header(name)
+
+    monkeypatch.setattr(multipart_module, "MIN_SWEEP_INTERVAL", 0.05)
+    uploads = MultipartUploads(timeout=0.1)
+    upload = uploads.join("10.0.0.1", "u1", store, 10, "a.bin", "ab" * 32)
+    deadline = time.monotonic() + 5
+    while len(uploads) and time.monotonic() < deadline: # no further join() comes along to sweep
+        time.sleep(0.02)
+    assert len(uploads) == 0
+    assert not os.path.exists(upload.tmp_path)
+    with pytest.raises(ConnectionError):
+        upload.write(0, b"late") # a connection still sending to it finds it gone
+
+    print_footer(name)
+
+def test_late_part_after_completion(store):
+    name = "test_late_part_after_completion"
+    print_header(name)
+
+    data = os.urandom(1000)
+    file_hash = hashlib.sha256(data).hexdigest()
+    uploads = MultipartUploads()
+    upload = uploads.join("10.0.0.1", "u1", store, len(data), "big.bin", file_hash)
+    upload.write(0, data)
+    assert upload.part_done(0, len(data))
+    uploads.complete("10.0.0.1", "u1", store)
+
+    # a retried part that was still arriving: its bytes are dropped and completing again is a no-op
+    upload.write(500, data[500:])
+    assert not upload.part_done(500, 500)
+    uploads.complete("10.0.0.1", "u1", store)
+    assert open(store.lookup(file_hash=file_hash), "rb").read() == data
+
+    print_footer(name)
+
+def test_finish_waits_for_writes_in_progress(store, monkeypatch):
+    name = "test_finish_waits_for_writes_in_progress"
+    print_header(name)
+
+    uploads = MultipartUploads()
+    upload = uploads.join("10.0.0.1", "u1", store, 10, "a.bin", "ab" * 32)
+    writing, proceed = threading.Event(), threading.Event()
+    real_pwrite = os.pwrite
+    def slow_pwrite(fd, data, offset):
+        writing.set()
+        proceed.wait(5)
+        return real_pwrite(fd, data, offset)
+    monkeypatch.setattr(multipart_module.os, "pwrite", slow_pwrite)
+
+    writer = threading.Thread(target=upload.write, args=(0, b"0123456789"))
+    writer.start()
+    writing.wait(5)
+    finisher = threading.Thread(target=upload.finish)
+    finisher.start()
+    time.sleep(0.1)
+    assert finisher.is_alive() # the file stays open under the write
+    proceed.set()
+    writer.join(5)
+    finisher.join(5)
+    assert not finisher.is_alive()
+    assert open(upload.tmp_path, "rb").read() == b"0123456789"
+
+    print_footer(name)
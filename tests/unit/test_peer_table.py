@@ -0,0 +1,109 @@
+import pytest
+
+from src.client.peer_table import PeerPerformanceTable
+from src.utils.config import Config
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+NEAR, FAR, FAST, NEW = ("10.0.0.1", 1), ("10.0.0.2", 1), ("10.0.0.3", 1), ("10.0.0.4", 1)
+
+@pytest.fixture(autouse=True)
+def table_config(monkeypatch):
+    monkeypatch.setattr(Config, "CLIENT_PEER_EWMA_WEIGHT", 0.5)
+    monkeypatch.setattr(Config, "CLIENT_PEER_MIN_SAMPLE_BYTES", 1000)
+    monkeypatch.setattr(Config, "CLIENT_PEER_FAILURE_HALF_LIFE", 10.0)
+    monkeypatch.setattr(Config, "CLIENT_PEER_MAX_FAILURES", 2)
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_rank_by_expected_transfer_time():
+    name = "test_rank_by_expected_transfer_time"
+    print_header(name)
+
+    table = PeerPerformanceTable()
+    table.record_rtt(NEAR, 0.001)
+    table.record_transfer(NEAR, 10**6, 1.0)      # 1 MB/s
+    table.record_rtt(FAST, 0.050)
+    table.record_transfer(FAST, 10**6, 0.1)      # 10 MB/s
+    table.record_transfer(FAST, 10, 5.0)         # too small to say anything about throughput
+    table.record_rtt(FAR, 0.200)
+    table.record_rtt(FAR, 0.100)
+    assert table.snapshot()[FAR]["rtt_ms"] == 150.0 # moving average
+
+    # small requests are all round trip; big transfers go to the fast link
+    assert table.rank([FAR, FAST, NEAR]) == [NEAR, FAST, FAR]
+    # FAR's throughput is unknown, so it is assumed typical (the median): better than NEAR's 1 MB/s
+    assert table.rank([FAR, FAST, NEAR], nbytes=10**7) == [FAST, FAR, NEAR]
+    # a busy fast peer loses to an idle one
+    assert table.rank([FAST, NEAR], nbytes=10**7, load={FAST: 20}) == [NEAR, FAST]
+    # an unmeasured peer counts as typical (the median) rather than best or worst
+    assert table.rank([FAR, NEW, NEAR]) == [NEAR, NEW, FAR]
+
+    print_footer(name)
+
+def test_failing_peers_are_suspended_until_failures_decay(monkeypatch):
+    name = "test_failing_peers_are_suspended_until_failures_decay"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "CLIENT_CONNECT_TIMEOUT", 5.0)
+    monkeypatch.setattr(Config, "CLIENT_MIN_CONNECT_TIMEOUT", 0.5)
+    monkeypatch.setattr(Config, "CLIENT_CONNECT_TIMEOUT_RTTS", 20)
+    table = PeerPerformanceTable()
+    table.record_rtt(NEAR, 0.050)
+    assert table.connect_timeout(NEAR) == pytest.approx(1.0)
+    assert table.connect_timeout(NEW) == 5.0
+
+    table.record_failure(FAR, now=1)
+    assert not table.is_suspended(FAR, now=1)
+    table.record_failure(FAR, now=1)
+    assert table.is_suspended(FAR, now=1)
+    assert table.rank([FAR, NEAR], now=1) == [NEAR, FAR]
+    assert table.rank([FAR, NEAR], skip_suspended=True, now=1) == [NEAR]
+    assert table.rank([FAR], skip_suspended=True, now=1) == [FAR] # nobody better to ask
+    assert not table.is_suspended(FAR, now=12) # one half-life later
+
+    print_footer(name)
+
+def test_streams_grow_until_they_compete(monkeypatch):
+    name = "test_streams_grow_until_they_compete"
+    print_header(name)
+
+    monkeypatch.setattr(Config, "CLIENT_INITIAL_STREAMS", 4)
+    monkeypatch.setattr(Config, "CLIENT_MAX_STREAMS", 16)
+    monkeypatch.setattr(Config, "CLIENT_STREAM_MIN_BYTES", 10**6)
+    monkeypatch.setattr(Config, "CLIENT_STREAM_SCALING", 0.8)
+    table = PeerPerformanceTable()
+    size = 10**8
+    assert table.stream_count(FAR, size) == 4
+    assert table.stream_count(FAR, 2 * 10**6) == 2  # at least CLIENT_STREAM_MIN_BYTES per stream
+
+    # a long path: every stream runs at 1 MB/s however many there are, so more streams are worth it
+    table.record_streams(FAR, 4, size, 25.0, 100.0)
+    assert table.stream_count(FAR, size) == 6
+    table.record_streams(FAR, 6, size, 100 / 6, 100.0)
+    assert table.stream_count(FAR, size) == 9
+
+    # a full link: 9 streams only move 5 MB/s between them, worth 6 streams at the best
+    # per-stream rate (1 MB/s, faded to 0.9 MB/s)
+    table.record_streams(FAR, 9, size, 20.0, 180.0)
+    assert table.stream_count(FAR, size) == 6
+
+    # the peer's own per-client limit wins
+    table.record_stream_limits(FAR, 3, True)
+    assert table.stream_limits(FAR) == (3, True)
+    assert table.stream_count(FAR, size) == 3
+    assert table.stream_limits(NEW) is None
+
+    print_footer(name)
@@ -4,6 +4,7 @@ import pytest
 from src.utils.commands_enum import Commands
 from src.utils.crypto_utils import generate_session_id
 import src.central_registry.registry as registry_module
+from src.central_registry.replication import ReplicationPlanner
 
 # ─── FakeSocket ──────────────────────────────────────────────────────────────────
 class FakeSocket:
@@ -19,6 +20,9 @@ class FakeSocket:
         self.sent_data += data
         return len(data)
 
+    def sendall(self, data):
+        self.sent_data += data
+
     def close(self):
         self.closed = True
 
@@ -30,6 +34,7 @@ def clear_registry_state():
     registry_module.USER_SESSIONS.clear()
     registry_module.SHARED_FILES.clear()
     registry_module.FILE_ID_COUNTER = 0
+    registry_module.REPLICATION = ReplicationPlanner()
     yield
 
 # ─── Helper Function ──────────────────────────────────────────────────────────────
@@ -150,7 +155,10 @@ def test_register_file_and_get_files():
         "session_id": session_id,
         "filename": "test.txt",
         "owner_address": ["127.0.0.1", 5000],
-        "file_hash": "abc123"
+        "file_hash": "abc123",
+        "codec": "zlib",
+        "merkle_root": "ab" * 32,
+        "chunk_size": 1048576
     }).decode())
     assert resp["status"] == "OK"
     file_id = resp["file_id"]
@@ -159,4 +167,259 @@ def test_register_file_and_get_files():
         "session_id": session_id
     }).decode())
     assert str(file_id) in files
-    print_footer("test_register_file_and_get_files")
\ No newline at end of file
+    assert files[str(file_id)]["codec"] == "zlib"
+    assert files[str(file_id)]["merkle_root"] == "ab" * 32 and files[str(file_id)]["chunk_size"] == 1048576
+    print_footer("test_register_file_and_get_files")
+def test_register_holder():
+    print_header("test_register_holder")
+    session_id = register_and_login()
+    file_id = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILE.name,
+        "session_id": session_id,
+        "filename": "test.txt",
+        "owner_address": ["127.0.0.1", 6000],
+        "file_hash": "abc123",
+        "size": 48
+    }).decode())["file_id"]
+
+    def register(address, file_hash="abc123"):
+        return json.loads(send_request_and_get_response({
+            "command": Commands.REGISTER_HOLDER.name,
+            "session_id": session_id,
+            "file_id": file_id,
+            "holder_address": address,
+            "file_hash": file_hash
+        }).decode())
+
+    resp = register(["127.0.0.1", 5000]) # the user's own peer
+    assert resp["status"] == "OK"
+    assert resp["holders"] == [["127.0.0.1", 6000], ["127.0.0.1", 5000]]
+
+    resp = register(["127.0.0.1", 7000]) # someone else's peer
+    assert resp == {"status": "ERROR", "message": "Holder is not this user's peer"}
+    assert register(["127.0.0.1", 5000], "not-the-hash")["status"] == "ERROR"
+
+    files = json.loads(send_request_and_get_response({
+        "command": Commands.GET_FILES.name,
+        "session_id": session_id
+    }).decode())
+    assert files[str(file_id)]["size"] == 48
+    assert len(files[str(file_id)]["holders"]) == 2
+    print_footer("test_register_holder")
+
+class ShortSendSocket(FakeSocket):
+    """send() takes at most 16 bytes at a time, like a socket whose buffer is nearly full."""
+    def send(self, data):
+        self.sent_data += data[:16]
+        return min(len(data), 16)
+
+def test_get_files_reply_is_sent_in_full():
+    print_header("test_get_files_reply_is_sent_in_full")
+    session_id = register_and_login()
+    for i in range(20):
+        send_request_and_get_response({
+            "command": Commands.REGISTER_FILE.name,
+            "session_id": session_id,
+            "filename": f"file{i}.txt",
+            "owner_address": ["127.0.0.1", 5000],
+            "file_hash": "abc123"
+        })
+    sock = ShortSendSocket(json.dumps({"command": Commands.GET_FILES.name, "session_id": session_id}).encode())
+    registry_module.handle_client(sock)
+    assert len(json.loads(sock.sent_data.decode())) == 20
+    print_footer("test_get_files_reply_is_sent_in_full")
+
+def test_unregister_holder():
+    print_header("test_unregister_holder")
+    session_id = register_and_login()
+    file_id = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILE.name,
+        "session_id": session_id,
+        "filename": "test.txt",
+        "owner_address": ["127.0.0.1", 6000],
+        "file_hash": "abc123"
+    }).decode())["file_id"]
+    send_request_and_get_response({
+        "command": Commands.REGISTER_HOLDER.name,
+        "session_id": session_id,
+        "file_id": file_id,
+        "holder_address": ["127.0.0.1", 5000],
+        "file_hash": "abc123"
+    })
+
+    def unregister(address):
+        return json.loads(send_request_and_get_response({
+            "command": Commands.UNREGISTER_HOLDER.name,
+            "session_id": session_id,
+            "file_id": file_id,
+            "holder_address": address
+        }).decode())
+
+    assert unregister(["127.0.0.1", 6000])["status"] == "ERROR" # the owner's copy
+    assert unregister(["127.0.0.1", 7000])["status"] == "ERROR" # not this user's peer
+    resp = unregister(["127.0.0.1", 5000])
+    assert resp == {"status": "OK", "holders": [["127.0.0.1", 6000]]}
+    print_footer("test_unregister_holder")
+
+def test_replication_task_lets_peer_register_as_holder(monkeypatch):
+    print_header("test_replication_task_lets_peer_register_as_holder")
+    monkeypatch.setattr(registry_module.Config, "REPLICATION_DEMAND_PER_REPLICA", 2.0)
+    owner_session = register_and_login()
+    file_id = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILE.name,
+        "session_id": owner_session,
+        "filename": "hot.bin",
+        "owner_address": ["127.0.0.1", 5000],
+        "file_hash": "abc123",
+        "size": 4096,
+        "merkle_root": "ab" * 32,
+        "chunk_size": 1024
+    }).decode())["file_id"]
+    send_request_and_get_response({"command": Commands.REGISTER_USER.name, "username": "other",
+                                   "password": "pw", "peer_address": ("127.0.0.1", 6000)})
+    other_session = json.loads(send_request_and_get_response({"command": Commands.LOGIN_USER.name, "username": "other",
+                                                              "password": "pw", "peer_address": ("127.0.0.1", 6000)}).decode())["session_id"]
+
+    def tasks(session_id):
+        return json.loads(send_request_and_get_response({"command": Commands.GET_REPLICATION_TASKS.name,
+                                                         "session_id": session_id}).decode())["tasks"]
+
+    assert tasks(other_session) == [] # no demand yet
+    for _ in range(3): # demand decays from the moment it is recorded, so two would fall just short of 2.0
+        send_request_and_get_response({"command": Commands.REQUEST_KEY.name, "session_id": owner_session, "file_id": file_id})
+    [task] = tasks(other_session)
+    assert task["file_id"] == file_id and task["merkle_root"] == "ab" * 32 and task["holders"] == [["127.0.0.1", 5000]]
+
+    # "other" may not read the file, but may hold the replica it was assigned
+    resp = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_HOLDER.name,
+        "session_id": other_session,
+        "file_id": file_id,
+        "holder_address": ["127.0.0.1", 6000],
+        "file_hash": "abc123"
+    }).decode())
+    assert resp == {"status": "OK", "holders": [["127.0.0.1", 5000], ["127.0.0.1", 6000]]}
+    assert tasks(other_session) == []
+    print_footer("test_replication_task_lets_peer_register_as_holder")
+
+def test_update_file_keeps_id_and_history():
+    print_header("test_update_file_keeps_id_and_history")
+    session_id = register_and_login()
+    file_id = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILE.name,
+        "session_id": session_id,
+        "filename": "notes.txt",
+        "owner_address": ["127.0.0.1", 5000],
+        "file_hash": "v1",
+        "size": 100,
+        "format": "blocks"
+    }).decode())["file_id"]
+    send_request_and_get_response({
+        "command": Commands.REGISTER_HOLDER.name,
+        "session_id": session_id,
+        "file_id": file_id,
+        "holder_address": ["127.0.0.1", 6000],
+        "file_hash": "v1"
+    })
+
+    resp = json.loads(send_request_and_get_response({
+        "command": Commands.UPDATE_FILE.name,
+        "session_id": session_id,
+        "file_id": file_id,
+        "owner_address": ["127.0.0.1", 5000],
+        "file_hash": "v2",
+        "size": 120,
+        "format": "blocks"
+    }).decode())
+    assert resp == {"status": "OK", "file_id": file_id, "revision": 1}
+
+    info = json.loads(send_request_and_get_response({
+        "command": Commands.GET_FILES.name,
+        "session_id": session_id
+    }).decode())[str(file_id)]
+    assert info["file_hash"] == "v2" and info["size"] == 120 and info["revision"] == 1
+    assert info["revisions"][0]["file_hash"] == "v1" and info["revisions"][0]["size"] == 100
+    # the other holder only has revision 0
+    assert info["holders"] == [["127.0.0.1", 5000]]
+
+    resp = json.loads(send_request_and_get_response({
+        "command": Commands.UPDATE_FILE.name,
+        "session_id": session_id,
+        "file_id": 10**6,
+        "owner_address": ["127.0.0.1", 5000],
+        "file_hash": "v3"
+    }).decode())
+    assert resp["status"] == "ERROR"
+    print_footer("test_update_file_keeps_id_and_history")
+
+def test_request_keys_for_many_files():
+    print_header("test_request_keys_for_many_files")
+    session_id = register_and_login()
+    file_ids = [json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILE.name,
+        "session_id": session_id,
+        "filename": f"{i}.txt",
+        "owner_address": ["127.0.0.1", 5000],
+        "file_hash": f"h{i}"
+    }).decode())["file_id"] for i in range(300)]
+    registry_module.SHARED_FILES[file_ids[-1]]["allowed_users"] = ["someone-else"]
+
+    # hundreds of IDs do not fit one recv(); the request arrives in pieces
+    data = json.dumps({
+        "command": Commands.REQUEST_KEYS.name,
+        "session_id": session_id,
+        "file_ids": [str(file_id) for file_id in file_ids] + ["999999", "x"]
+    }).encode()
+    sock = FakeSocket(None)
+    pieces = [data[i:i + 1000] for i in range(0, len(data), 1000)]
+    sock.recv = lambda bufsize: pieces.pop(0) if pieces else b""
+    registry_module.handle_client(sock)
+    resp = json.loads(sock.sent_data.decode())
+
+    assert resp["status"] == "OK"
+    assert len(resp["keys"]) == 299
+    assert set(resp["keys"].values()) == {registry_module.USER_CREDENTIALS["moamen"]["key"]}
+    assert resp["errors"] == {str(file_ids[-1]): "Access denied", "999999": "File not found", "x": "Invalid File ID format"}
+    print_footer("test_request_keys_for_many_files")
+
+def test_register_files_in_one_batch(monkeypatch):
+    print_header("test_register_files_in_one_batch")
+    session_id = register_and_login()
+    saves = []
+    monkeypatch.setattr(registry_module, "save_registry_data", lambda: saves.append(1))
+    files = [{"filename": f"dir/{i}.txt", "file_hash": f"h{i}", "size": 32, "codec": "none"} for i in range(3)]
+    resp = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILES.name,
+        "session_id": session_id,
+        "owner_address": ["127.0.0.1", 5000],
+        "files": files
+    }).decode())
+
+    assert resp == {"status": "OK", "file_ids": [0, 1, 2]}
+    assert len(saves) == 1
+    assert registry_module.FILE_ID_COUNTER == 3
+    entry = registry_module.SHARED_FILES[2]
+    assert entry["filename"] == "dir/2.txt" and entry["owner"] == "moamen" and entry["allowed_users"] == ["moamen"]
+    assert entry["holders"] == [["127.0.0.1", 5000]] and entry["revision"] == 0
+
+    # a batch with one bad entry registers nothing
+    resp = json.loads(send_request_and_get_response({
+        "command": Commands.REGISTER_FILES.name,
+        "session_id": session_id,
+        "owner_address": ["127.0.0.1", 5000],
+        "files": files + [{"filename": "no-hash.txt"}]
+    }).decode())
+    assert resp["status"] == "ERROR"
+    assert len(registry_module.SHARED_FILES) == 3 and len(saves) == 1
+
+    # names that would be saved outside the downloader's destination are refused
+    for unsafe in ("../escape.txt", "dir/../../escape.txt", "/etc/passwd", "..\\escape.txt", "C:escape.txt"):
+        resp = json.loads(send_request_and_get_response({
+            "command": Commands.REGISTER_FILES.name,
+            "session_id": session_id,
+            "owner_address": ["127.0.0.1", 5000],
+            "files": files + [{"filename": unsafe, "file_hash": "h"}]
+        }).decode())
+        assert resp["status"] == "ERROR" and "Unsafe filename" in resp["message"]
+    assert len(registry_module.SHARED_FILES) == 3
+    print_footer("test_register_files_in_one_batch")
@@ -0,0 +1,77 @@
+import pytest
+
+from src.central_registry.replication import ReplicationPlanner
+from src.utils.config import Config
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+@pytest.fixture(autouse=True)
+def replication_config(monkeypatch):
+    monkeypatch.setattr(Config, "REPLICATION_HALF_LIFE", 100.0)
+    monkeypatch.setattr(Config, "REPLICATION_DEMAND_PER_REPLICA", 2.0)
+    monkeypatch.setattr(Config, "REPLICATION_MAX_REPLICAS", 3)
+    monkeypatch.setattr(Config, "REPLICATION_ASSIGNMENT_TIMEOUT", 10.0)
+    monkeypatch.setattr(Config, "REPLICATION_TASKS_PER_POLL", 1)
+
+def entry(owner, merkle_root="ab" * 32):
+    return {"owner_address": owner, "holders": [list(owner)], "merkle_root": merkle_root}
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_target_replicas_follow_decaying_demand():
+    name = "test_target_replicas_follow_decaying_demand"
+    print_header(name)
+
+    planner = ReplicationPlanner()
+    assert planner.target_replicas(1, now=0) == 1
+    for _ in range(4):
+        planner.record_download(1, now=0)
+    assert planner.target_replicas(1, now=0) == 3
+    assert planner.demand(1, now=100) == pytest.approx(2.0) # one half-life later
+    assert planner.target_replicas(1, now=100) == 2
+    for _ in range(100):
+        planner.record_download(1, now=100)
+    assert planner.target_replicas(1, now=100) == 3 # capped
+
+    print_footer(name)
+
+def test_assign_spreads_hot_files_over_asking_peers():
+    name = "test_assign_spreads_hot_files_over_asking_peers"
+    print_header(name)
+
+    owner, a, b, c = ("h", 1), ("h", 2), ("h", 3), ("h", 4)
+    files = {1: entry(owner), 2: entry(owner), 3: entry(owner, merkle_root=None)}
+    planner = ReplicationPlanner()
+    for _ in range(6):
+        planner.record_download(1, now=0)
+        planner.record_download(3, now=0) # hot, but cannot be verified by a replica
+    planner.record_download(2, now=0)
+    planner.record_download(2, now=0)
+
+    assert planner.assign(owner, files, now=0) == [] # holds everything it could copy
+    assert planner.assign(a, files, now=0) == [1] # shortfall 2 beats shortfall 1
+    assert planner.assign(b, files, now=0) == [1] # still one short with a's copy pending
+    assert planner.assign(c, files, now=0) == [2]
+    assert planner.assign(("h", 5), files, now=0) == [] # every shortfall is covered
+
+    assert planner.is_assigned(1, list(a), now=0)
+    files[1]["holders"].append(list(a))
+    planner.completed(1, a)
+    assert not planner.is_assigned(1, a, now=0)
+    # b never reported back: after the timeout its assignment goes to someone else
+    assert planner.assign(("h", 5), files, now=5) == []
+    assert planner.assign(("h", 5), files, now=11) == [1]
+
+    print_footer(name)
@@ -0,0 +1,80 @@
+import os
+
+from src.client.peer_table import PeerPerformanceTable
+from src.client.replicator import Replicator
+from src.utils import merkle
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+class FakeClient:
+    """Holders serve `data`, except the ones listed in `broken`; records what the replicator does."""
+    def __init__(self, data, tasks, broken=()):
+        self.data = data
+        self.tasks = tasks
+        self.broken = set(broken)
+        self.peer_address = ("127.0.0.1", 9000)
+        self.peer_table = PeerPerformanceTable()
+        self.fetches, self.stored, self.registered = [], [], []
+
+    def get_replication_tasks(self):
+        return self.tasks
+
+    def fetch_range(self, holder, file_id, offset, length, file_hash=None, background=False):
+        self.fetches.append((holder, offset, background))
+        if holder in self.broken:
+            raise ConnectionError("holder is down")
+        return self.data[offset:offset + length]
+
+    def _send_ciphertext(self, peer_address, filename, ciphertext, file_hash=None, cache_file_id=None):
+        self.stored.append((peer_address, filename, ciphertext, cache_file_id))
+        return True
+
+    def register_holder(self, file_id, file_hash):
+        self.registered.append(file_id)
+        return True
+
+def task_for(data, holders, chunk_size=1000, merkle_root=None):
+    return {"file_id": 7, "filename": "hot.bin", "file_hash": "f" * 64, "size": len(data), "chunk_size": chunk_size,
+            "merkle_root": merkle_root or merkle.merkle_root(merkle.leaf_hashes(data, chunk_size)), "holders": holders}
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_replicates_in_background_pieces_and_skips_failed_holders():
+    name = "test_replicates_in_background_pieces_and_skips_failed_holders"
+    print_header(name)
+
+    data = os.urandom(10_000)
+    down, up = ["127.0.0.1", 9001], ["127.0.0.1", 9002]
+    client = FakeClient(data, [task_for(data, [down, up, list(("127.0.0.1", 9000))])], broken=[tuple(down)])
+    assert Replicator(client, rate=0, piece_size=4000).poll_once() == 1
+
+    assert all(background for _, _, background in client.fetches)
+    assert [offset for holder, offset, _ in client.fetches if holder == tuple(up)] == [0, 4000, 8000]
+    assert ("127.0.0.1", 9000) not in [holder for holder, _, _ in client.fetches] # never from ourselves
+    assert client.stored == [(client.peer_address, "hot.bin", data, "7")]
+    assert client.registered == [7]
+
+    print_footer(name)
+
+def test_rejects_ciphertext_that_fails_the_merkle_root():
+    name = "test_rejects_ciphertext_that_fails_the_merkle_root"
+    print_header(name)
+
+    data = os.urandom(3000)
+    client = FakeClient(data, [task_for(data, [["127.0.0.1", 9001]], merkle_root="00" * 32)])
+    assert Replicator(client, rate=0).poll_once() == 0
+    assert client.stored == [] and client.registered == []
+
+    print_footer(name)
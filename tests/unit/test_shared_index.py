@@ -0,0 +1,109 @@
+import os
+import pytest
+
+from src.peer.shared_index import SharedFileIndex
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+def bump_dir_mtime(path):
+    # filesystem timestamps can be coarse; force a visible change
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+# ─── Fixture ──────────────────────────────────────────────────
+
+@pytest.fixture
+def shared(tmp_path):
+    (tmp_path / "b.txt").write_text("BB")
+    (tmp_path / "a.txt").write_text("A")
+    (tmp_path / "subdir").mkdir()
+    return tmp_path
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_index_built_sorted_with_sizes(shared):
+    name = "test_index_built_sorted_with_sizes"
+    print_header(name)
+
+    index = SharedFileIndex(str(shared))
+    assert index.entries() == [("a.txt", 1), ("b.txt", 2)]
+    assert index.name_at(1) == "b.txt"
+    assert index.name_at(2) is None
+    assert index.name_at(-1) is None
+
+    print_footer(name)
+
+def test_add_and_discard_without_rescan(shared, monkeypatch):
+    name = "test_add_and_discard_without_rescan"
+    print_header(name)
+
+    index = SharedFileIndex(str(shared))
+    (shared / "aa.txt").write_text("xyz")
+    index.add("aa.txt", 3)
+    monkeypatch.setattr(index, "rescan", lambda: pytest.fail("unexpected rescan"))
+    assert index.name_at(1) == "aa.txt"
+    assert index.size_of("aa.txt") == 3
+
+    os.remove(shared / "a.txt")
+    index.discard("a.txt")
+    assert [n for n, _ in index.entries()] == ["aa.txt", "b.txt"]
+
+    print_footer(name)
+
+def test_external_changes_picked_up_by_mtime(shared):
+    name = "test_external_changes_picked_up_by_mtime"
+    print_header(name)
+
+    index = SharedFileIndex(str(shared))
+    (shared / "0.txt").write_text("zero")
+    bump_dir_mtime(shared)
+    assert index.name_at(0) == "0.txt"
+    assert len(index) == 3
+
+    print_footer(name)
+
+def test_missing_directory(tmp_path):
+    name = "test_missing_directory"
+    print_header(name)
+
+    index = SharedFileIndex(str(tmp_path / "nope"))
+    assert not index.exists
+    assert index.entries() == []
+
+    print_footer(name)
+
+def test_for_directory_returns_shared_instance(shared):
+    name = "test_for_directory_returns_shared_instance"
+    print_header(name)
+
+    assert SharedFileIndex.for_directory(str(shared)) is SharedFileIndex.for_directory(str(shared) + "/")
+
+    print_footer(name)
+
+def test_iter_entries_resumes_after_cursor_and_filters_prefix(shared):
+    name = "test_iter_entries_resumes_after_cursor_and_filters_prefix"
+    print_header(name)
+
+    for filename in ("ab.txt", "ac.txt", "b0.txt"):
+        (shared / filename).write_text("x")
+    index = SharedFileIndex(str(shared))
+
+    assert [n for n, _ in index.iter_entries(batch_size=2)] == ["a.txt", "ab.txt", "ac.txt", "b.txt", "b0.txt"]
+    assert [n for n, _ in index.iter_entries(after="ab.txt", batch_size=2)] == ["ac.txt", "b.txt", "b0.txt"]
+    assert [n for n, _ in index.iter_entries(prefix="a", batch_size=1)] == ["a.txt", "ab.txt", "ac.txt"]
+    assert [n for n, _ in index.iter_entries(after="a.txt", prefix="b")] == ["b.txt", "b0.txt"]
+    assert list(index.iter_entries(after="zz")) == []
+
+    print_footer(name)
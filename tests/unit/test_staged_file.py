@@ -0,0 +1,80 @@
+import errno
+import os
+import pytest
+
+from src.peer.staged_file import StagedFile
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_publish_replaces_final_file_in_one_step(tmp_path):
+    name = "test_publish_replaces_final_file_in_one_step"
+    print_header(name)
+
+    final = tmp_path / "shared.bin"
+    final.write_bytes(b"old version")
+    with StagedFile(str(tmp_path / "upload.tmp"), buffer_size=4) as staged:
+        staged.preallocate(64)
+        staged.write(b"new ")
+        staged.write(b"version")
+        assert final.read_bytes() == b"old version" # readers keep seeing the old file until publish
+        staged.publish(str(final))
+
+    assert final.read_bytes() == b"new version" # the unused preallocation was trimmed
+    assert staged.written == 11
+    assert not (tmp_path / "upload.tmp").exists()
+
+    print_footer(name)
+
+def test_failed_upload_leaves_no_trace(tmp_path):
+    name = "test_failed_upload_leaves_no_trace"
+    print_header(name)
+
+    final = tmp_path / "shared.bin"
+    final.write_bytes(b"old version")
+    with pytest.raises(ConnectionError):
+        with StagedFile(str(tmp_path / "upload.tmp")) as staged:
+            staged.write(b"partial")
+            raise ConnectionError("client went away")
+
+    assert final.read_bytes() == b"old version"
+    assert os.listdir(tmp_path) == ["shared.bin"]
+
+    print_footer(name)
+
+def test_preallocate_skips_unsupported_filesystems_but_not_full_disks(tmp_path, monkeypatch):
+    name = "test_preallocate_skips_unsupported_filesystems_but_not_full_disks"
+    print_header(name)
+
+    if not hasattr(os, "posix_fallocate"):
+        pytest.skip("no posix_fallocate on this platform")
+
+    def unsupported(fd, offset, length):
+        raise OSError(errno.EOPNOTSUPP, "not supported")
+    monkeypatch.setattr(os, "posix_fallocate", unsupported)
+    with StagedFile(str(tmp_path / "a.tmp")) as staged:
+        staged.preallocate(1 << 20)
+        staged.abort()
+
+    def full(fd, offset, length):
+        raise OSError(errno.ENOSPC, "no space left")
+    monkeypatch.setattr(os, "posix_fallocate", full)
+    with pytest.raises(OSError):
+        with StagedFile(str(tmp_path / "b.tmp")) as staged:
+            staged.preallocate(1 << 40)
+    assert os.listdir(tmp_path) == []
+
+    print_footer(name)
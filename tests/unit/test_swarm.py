@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+import pytest
+
+from src.client.swarm import SwarmDownload
+from src.utils import framing, merkle
+from src.utils.config import Config
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Fake ─────────────────────────────────────────────────────
+
+class FakeHolders:
+    """Stands in for FileShareClient.fetch_range(): every holder serves the same bytes."""
+    def __init__(self, data, delays=None, broken=(), corrupt=(), garbled=()):
+        self.data = data
+        self.delays = delays or {}
+        self.broken = set(broken)
+        self.corrupt = set(corrupt)
+        self.garbled = set(garbled)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def fetch_range(self, holder, file_id_str, offset, length=None, file_hash=None):
+        with self.lock:
+            self.requests.append((holder, offset))
+        time.sleep(self.delays.get(holder, 0))
+        if holder in self.broken:
+            raise ConnectionError("holder unreachable")
+        if holder in self.garbled:
+            framing.unpack_header(b"HTTP/1.1 200 OK" + b"\0" * (framing.HEADER_SIZE - 15))
+        if holder in self.corrupt:
+            return bytes(b ^ 0xFF for b in self.data[offset:offset + length])
+        return self.data[offset:offset + length]
+
+HOLDERS = [("127.0.0.1", 7001), ("127.0.0.1", 7002), ("127.0.0.1", 7003)]
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_reassembles_pieces_from_all_holders():
+    name = "test_reassembles_pieces_from_all_holders"
+    print_header(name)
+
+    data = os.urandom(10_000)
+    fake = FakeHolders(data, delays={holder: 0.005 for holder in HOLDERS})
+    swarm = SwarmDownload(fake, HOLDERS, "3", len(data), piece_size=1000)
+    assert swarm.run() == data
+    assert all(stats["pieces"] > 0 for stats in swarm.holder_stats.values())
+    assert sum(stats["pieces"] for stats in swarm.holder_stats.values()) == 10
+
+    print_footer(name)
+
+def test_failing_holder_is_dropped():
+    name = "test_failing_holder_is_dropped"
+    print_header(name)
+
+    data = os.urandom(8_000)
+    fake = FakeHolders(data, broken={HOLDERS[0]})
+    swarm = SwarmDownload(fake, HOLDERS, "3", len(data), piece_size=1000)
+    assert swarm.run() == data
+    assert swarm.holder_stats[HOLDERS[0]]["failures"] == Config.SWARM_MAX_FAILURES
+    assert swarm.holder_stats[HOLDERS[0]]["pieces"] == 0
+
+    print_footer(name)
+
+def test_slow_holder_serves_less():
+    name = "test_slow_holder_serves_less"
+    print_header(name)
+
+    data = os.urandom(40_000)
+    fake = FakeHolders(data, delays={HOLDERS[0]: 0.05, HOLDERS[1]: 0.002, HOLDERS[2]: 0.002})
+    swarm = SwarmDownload(fake, HOLDERS, "3", len(data), piece_size=1000)
+    assert swarm.run() == data
+    slow, fast = swarm.holder_stats[HOLDERS[0]], swarm.holder_stats[HOLDERS[1]]
+    assert slow["pieces"] < fast["pieces"]
+
+    print_footer(name)
+
+def test_all_holders_failing_raises():
+    name = "test_all_holders_failing_raises"
+    print_header(name)
+
+    fake = FakeHolders(b"x" * 3000, broken=set(HOLDERS))
+    with pytest.raises(ConnectionError, match="incomplete"):
+        SwarmDownload(fake, HOLDERS, "3", 3000, piece_size=1000).run()
+
+    print_footer(name)
+
+def test_corrupt_holder_is_dropped_by_chunk_verification():
+    name = "test_corrupt_holder_is_dropped_by_chunk_verification"
+    print_header(name)
+
+    data = os.urandom(10 * 4096)
+    verifier = merkle.ChunkVerifier(merkle.leaf_hashes(data, 4096), 4096, len(data))
+    fake = FakeHolders(data, corrupt={HOLDERS[0]})
+    # a piece size that is not a whole number of chunks is rounded down to one
+    swarm = SwarmDownload(fake, HOLDERS, "3", len(data), piece_size=10_000, verifier=verifier)
+    assert swarm.piece_size == 8192
+    assert swarm.run() == data
+    assert swarm.holder_stats[HOLDERS[0]]["pieces"] == 0
+    assert swarm.holder_stats[HOLDERS[0]]["failures"] >= 1
+
+    print_footer(name)
+
+def test_holder_sending_a_bad_header_is_dropped():
+    name = "test_holder_sending_a_bad_header_is_dropped"
+    print_header(name)
+
+    data = os.urandom(8_000)
+    fake = FakeHolders(data, garbled={HOLDERS[0]})
+    swarm = SwarmDownload(fake, HOLDERS, "3", len(data), piece_size=1000)
+    assert swarm.run() == data
+    assert swarm.holder_stats[HOLDERS[0]]["failures"] == Config.SWARM_MAX_FAILURES
+    assert swarm.holder_stats[HOLDERS[0]]["pieces"] == 0
+    assert not swarm._in_flight
+
+    print_footer(name)
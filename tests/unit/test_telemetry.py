@@ -0,0 +1,92 @@
+import socket
+import threading
+
+from src.peer.telemetry import LATENCY_BOUNDS, LatencyHistogram, PeerTelemetry, socket_bytes
+from src.utils.commands_enum import Commands
+
+# ─── Decorative Print Helpers ────────────────────────────────
+CYAN   = "\033[36m"
+GREEN  = "\033[32m"
+YELLOW = "\033[33m"
+RESET  = "\033[0m"
+
+def print_header(name):
+    print(f"\n{CYAN}{'─' * 60}{RESET}")
+    print(f"{YELLOW}▶ Running {name}{RESET}")
+    print(f"{CYAN}{'─' * 60}{RESET}")
+
+def print_footer(name):
+    print(f"{GREEN}✔ {name} passed{RESET}")
+
+# ─── Tests ────────────────────────────────────────────────────
+
+def test_histogram_percentiles_within_one_bucket():
+    name = "test_histogram_percentiles_within_one_bucket"
+    print_header(name)
+
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) is None
+    for _ in range(98):
+        histogram.record(0.002)
+    histogram.record(0.5)
+    histogram.record(0.5)
+    # a percentile is the upper bound of its bucket: at most one bucket (~19%) above the sample
+    assert 0.002 <= histogram.percentile(0.50) < 0.002 * 1.2
+    assert 0.5 <= histogram.percentile(0.99) < 0.5 * 1.2
+    report = histogram.report()
+    assert report["count"] == 100 and report["p50_ms"] < report["p99_ms"]
+
+    histogram.record(LATENCY_BOUNDS[-1] * 10) # past the last bucket
+    assert histogram.percentile(1.0) == float('inf')
+
+    print_footer(name)
+
+def test_telemetry_counts_requests_and_failures():
+    name = "test_telemetry_counts_requests_and_failures"
+    print_header(name)
+
+    telemetry = PeerTelemetry()
+    telemetry.connection_opened("conn")
+    telemetry.request_done(Commands.DOWNLOAD, 0.01)
+    telemetry.request_done(Commands.DOWNLOAD, 0.02, "DOWNLOAD_aborted")
+    telemetry.failure("busy")
+    snapshot = telemetry.snapshot()
+    assert snapshot["connections"] == {"accepted": 1, "active": 1}
+    assert snapshot["commands"]["DOWNLOAD"]["count"] == 2
+    assert snapshot["failures"] == {"DOWNLOAD_aborted": 1, "busy": 1}
+
+    telemetry.connection_closed("conn") # no TCP counters on this one
+    snapshot = telemetry.snapshot()
+    assert snapshot["connections"]["active"] == 0
+    assert snapshot["bytes"] == {"in": None, "out": None}
+
+    print_footer(name)
+
+def test_socket_bytes_counts_loopback_traffic():
+    name = "test_socket_bytes_counts_loopback_traffic"
+    print_header(name)
+
+    server = socket.create_server(("127.0.0.1", 0))
+    sender = socket.create_connection(server.getsockname())
+    receiver, _ = server.accept()
+    before = socket_bytes(sender)
+    if before is None:
+        print(f"{YELLOW}⚠ TCP_INFO not available here{RESET}")
+    else:
+        def drain():
+            left = 200_000
+            while left:
+                left -= len(receiver.recv(left))
+        reader = threading.Thread(target=drain)
+        reader.start()
+        sender.sendall(b"x" * 200_000)
+        reader.join()
+        telemetry = PeerTelemetry()
+        telemetry.connection_opened(receiver)
+        assert telemetry.snapshot()["bytes"]["in"] == 200_000
+        telemetry.connection_closed(receiver)
+        assert telemetry.snapshot()["bytes"]["in"] == 200_000
+    for s in (sender, receiver, server):
+        s.close()
+
+    print_footer(name)
@@ -1,6 +1,8 @@
 import os
 import pytest
 
+from src.peer.content_store import ContentStore
+from src.peer.multipart import MultipartUploads
 from src.peer.strategies.upload_strategy import UploadStrategy
 from src.utils.config import Config
 from src.utils.commands_enum import Commands
@@ -54,3 +56,67 @@ def test_execute_writes_file_and_stops(temp_shared):
     assert open(path, "rb").read() == b"helloworld"
 
     print_footer(name)
+
+def test_upload_is_invisible_until_complete(temp_shared):
+    name = "test_upload_is_invisible_until_complete"
+    print_header(name)
+
+    final = os.path.join(temp_shared, "file.txt")
+    with open(final, "wb") as f:
+        f.write(b"previous")
+
+    seen = []
+    class WatchingSocket(DummySocket):
+        def recv(self, bufsize):
+            # what a concurrent DOWNLOAD or listing would see while the upload streams in
+            seen.append((sorted(n for n in os.listdir(temp_shared) if not n.startswith('.')), open(final, "rb").read()))
+            return super().recv(bufsize)
+
+    UploadStrategy().execute(WatchingSocket([b"hello", b"world", str(Commands.DONE).encode()]), filename="file.txt")
+
+    assert all(entry == (["file.txt"], b"previous") for entry in seen)
+    assert open(final, "rb").read() == b"helloworld"
+    assert os.listdir(os.path.join(temp_shared, ".objects", "tmp")) == []
+
+    print_footer(name)
+
+def test_failed_upload_keeps_previous_file(temp_shared):
+    name = "test_failed_upload_keeps_previous_file"
+    print_header(name)
+
+    final = os.path.join(temp_shared, "file.txt")
+    with open(final, "wb") as f:
+        f.write(b"previous")
+
+    class BrokenSocket(DummySocket):
+        def recv(self, bufsize):
+            if not self._chunks:
+                raise ConnectionResetError("client went away")
+            return super().recv(bufsize)
+
+    UploadStrategy().execute(BrokenSocket([b"half of the"]), filename="file.txt")
+
+    assert open(final, "rb").read() == b"previous"
+    assert os.listdir(os.path.join(temp_shared, ".objects", "tmp")) == []
+
+    print_footer(name)
+
+def test_failed_part_abandons_multipart_upload(temp_shared):
+    name = "test_failed_part_abandons_multipart_upload"
+    print_header(name)
+
+    class PartSocket(DummySocket):
+        sent = b""
+        def sendall(self, data):
+            self.sent += data
+
+    file_hash = "ab" * 32
+    uploads = MultipartUploads()
+    upload = uploads.join("10.0.0.1", "u1", ContentStore.for_directory(temp_shared), 100, "big.bin", file_hash)
+    # the second part's connection closes before its transfer header
+    UploadStrategy().execute(PartSocket([b""]), filename="big.bin", version=2, multipart=uploads, client_host="10.0.0.1",
+                             options={"hash": file_hash, "part": "u1", "offset": "50", "total": "100"})
+    assert len(uploads) == 0
+    assert not os.path.exists(upload.tmp_path)
+
+    print_footer(name)